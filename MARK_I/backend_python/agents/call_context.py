@@ -0,0 +1,94 @@
+"""
+Call context
+
+Identity of the call handled by the job: call id, agent, pathway execution,
+room and user. The job metadata is parsed once, when the job starts, into a
+CallContext stored on the session userdata (PathwaySessionData.call_context);
+the node agents and metric emitters read it instead of decoding
+ctx.job.metadata on every utterance.
+
+The context is updated in place as the call progresses (inbound call record
+created, pathway execution started), so every reader sees the current values.
+ctx.job.metadata itself is never rewritten.
+"""
+
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rooms created for a call record by the agent routes: agent-call-<call id>
+CALL_ROOM_PREFIX = "agent-call-"
+
+
+def parse_job_metadata(raw_metadata: Optional[str]) -> Dict[str, Any]:
+    """Job metadata as a dict ({} when missing or not a JSON object)"""
+    if not raw_metadata:
+        return {}
+    try:
+        metadata = json.loads(raw_metadata)
+    except (json.JSONDecodeError, ValueError, TypeError) as e:
+        logger.warning(f"⚠️ Invalid JSON in job metadata: {e}, using empty metadata")
+        return {}
+    return metadata if isinstance(metadata, dict) else {}
+
+
+def _int_or_none(value: Any) -> Optional[int]:
+    try:
+        return int(value) if value is not None and value != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class CallContext:
+    """Parsed-once identity of the call, shared by the agents of the session"""
+    room_name: str
+    call_id: Optional[str] = None
+    agent_id: Optional[int] = None
+    pathway_execution_id: Optional[str] = None
+    user_id: Optional[str] = None
+    is_inbound: bool = False
+    # Job metadata as dispatched (read only)
+    metadata: Dict[str, Any] = field(default_factory=dict, repr=False)
+
+    @property
+    def dial_info(self) -> Dict[str, Any]:
+        return self.metadata.get("dial_info") or {}
+
+    @classmethod
+    def from_job(cls, job_ctx) -> "CallContext":
+        """Context of a LiveKit job: flat dispatch metadata (call_dispatch) or dial_info (agent launcher)"""
+        room_name = getattr(job_ctx.room, "name", "") or ""
+        metadata = parse_job_metadata(getattr(job_ctx.job, "metadata", None))
+        dial_info = metadata.get("dial_info") or {}
+
+        def pick(*keys):
+            for source in (metadata, dial_info):
+                for key in keys:
+                    if source.get(key):
+                        return source[key]
+            return None
+
+        call_id = pick("supabase_call_id", "call_id")
+        if not call_id and room_name.startswith(CALL_ROOM_PREFIX):
+            call_id = room_name[len(CALL_ROOM_PREFIX):] or None
+
+        return cls(
+            room_name=room_name,
+            call_id=str(call_id) if call_id else None,
+            agent_id=_int_or_none(pick("agent_id")),
+            pathway_execution_id=pick("pathway_execution_id"),
+            user_id=pick("user_id"),
+            metadata=metadata,
+        )
+
+    def telemetry_fields(self) -> Dict[str, Any]:
+        """Keyword arguments of telemetry.emit() for this call"""
+        return {
+            "room_name": self.room_name,
+            "agent_id": self.agent_id,
+            "pathway_execution_id": self.pathway_execution_id,
+        }
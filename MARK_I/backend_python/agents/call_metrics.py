@@ -0,0 +1,235 @@
+"""
+Per-call latency metrics
+
+MetricsAggregator groups the session's STT/EOU/LLM/TTS metrics by speech_id
+into turns with bounded memory whatever the call length:
+
+- turns still receiving metrics: the last MAX_OPEN_TURNS speech ids
+- completed turns: a ring buffer of the last RECENT_TURNS turn summaries
+- streaming p50/p90/p99 (P² estimators, constant memory) of the EOU delay,
+  LLM time to first token, TTS time to first byte and total turn latency
+
+summary() is the call's latency profile, persisted once at job shutdown.
+"""
+
+import math
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+
+from livekit.agents import metrics
+
+# Speech ids kept while their metrics arrive (metrics of a turn arrive within seconds)
+MAX_OPEN_TURNS = 32
+# Completed turn summaries kept for the profile
+RECENT_TURNS = 20
+PERCENTILES = (0.5, 0.9, 0.99)
+LATENCY_SERIES = ("eou_delay", "llm_ttft", "tts_ttfb", "turn_latency")
+
+
+class P2Quantile:
+    """P² estimator of one quantile (Jain & Chlamtac): five markers, no stored samples"""
+    def __init__(self, quantile: float):
+        self.quantile = quantile
+        self.initial: List[float] = []
+        self.heights: List[float] = []
+        self.positions: List[int] = []
+        self.desired: List[float] = []
+        self.increments = [0.0, quantile / 2, quantile, (1 + quantile) / 2, 1.0]
+
+    def add(self, value: float):
+        if len(self.initial) < 5:
+            self.initial.append(value)
+            if len(self.initial) == 5:
+                self.heights = sorted(self.initial)
+                self.positions = [1, 2, 3, 4, 5]
+                q = self.quantile
+                self.desired = [1, 1 + 2 * q, 1 + 4 * q, 3 + 2 * q, 5]
+            return
+
+        heights, positions = self.heights, self.positions
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = next(i for i in range(4) if heights[i] <= value < heights[i + 1])
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in (1, 2, 3):
+            offset = self.desired[i] - positions[i]
+            if (offset >= 1 and positions[i + 1] - positions[i] > 1) or (offset <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if offset > 0 else -1
+                height = self._parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + step * (heights[i + step] - heights[i]) / (positions[i + step] - positions[i])
+                heights[i] = height
+                positions[i] += step
+
+    def _parabolic(self, i: int, step: int) -> float:
+        h, n = self.heights, self.positions
+        return h[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - step) * (h[i] - h[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self) -> Optional[float]:
+        if self.heights:
+            return self.heights[2]
+        if not self.initial:
+            return None
+        ordered = sorted(self.initial)
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(self.quantile * len(ordered)) - 1))]
+
+
+class LatencySeries:
+    """Count, mean, max and streaming percentiles of one latency (seconds)"""
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.quantiles = [P2Quantile(q) for q in PERCENTILES]
+
+    def add(self, value: Optional[float]):
+        if value is None or value < 0:
+            return
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        for quantile in self.quantiles:
+            quantile.add(value)
+
+    def summary(self) -> Dict[str, Any]:
+        if not self.count:
+            return {"count": 0}
+        summary = {"count": self.count, "mean": round(self.total / self.count, 4), "max": round(self.max, 4)}
+        for quantile in self.quantiles:
+            summary[f"p{round(quantile.quantile * 100)}"] = round(quantile.value(), 4)
+        return summary
+
+
+class MetricsAggregator:
+    """Aggregates metrics by speech_id to build complete turn metrics"""
+
+    def __init__(self):
+        self.metrics_by_speech_id: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.recent_turns: deque = deque(maxlen=RECENT_TURNS)
+        self.latency = {name: LatencySeries() for name in LATENCY_SERIES}
+        self.turns = 0
+        self.llm_tokens = {"prompt_tokens": 0, "prompt_cached_tokens": 0, "completion_tokens": 0}
+
+    def add_metric(self, metric) -> Optional[dict]:
+        """Add a metric; returns the turn summary the first time its turn is complete"""
+        speech_id = getattr(metric, 'speech_id', None)
+        if not speech_id:
+            return None
+
+        metrics_dict = self.metrics_by_speech_id.get(speech_id)
+        if metrics_dict is None:
+            metrics_dict = {}
+            self.metrics_by_speech_id[speech_id] = metrics_dict
+            while len(self.metrics_by_speech_id) > MAX_OPEN_TURNS:
+                self.metrics_by_speech_id.popitem(last=False)
+
+        if isinstance(metric, metrics.STTMetrics):
+            metrics_dict['stt'] = {
+                'audio_duration': metric.audio_duration,
+                'duration': metric.duration,
+                'streamed': metric.streamed
+            }
+        elif isinstance(metric, metrics.EOUMetrics):
+            metrics_dict['eou'] = {
+                'transcription_delay': metric.transcription_delay,
+                'end_of_utterance_delay': metric.end_of_utterance_delay,
+                'on_user_turn_completed_delay': getattr(metric, 'on_user_turn_completed_delay', 0)
+            }
+            self.latency['eou_delay'].add(metric.end_of_utterance_delay)
+        elif isinstance(metric, metrics.LLMMetrics):
+            metrics_dict['llm'] = {
+                'ttft': metric.ttft,
+                'duration': metric.duration,
+                'tokens_per_second': getattr(metric, 'tokens_per_second', 0),
+                'completion_tokens': getattr(metric, 'completion_tokens', 0),
+                'prompt_tokens': getattr(metric, 'prompt_tokens', 0),
+                'prompt_cached_tokens': getattr(metric, 'prompt_cached_tokens', 0),
+                'total_tokens': getattr(metric, 'total_tokens', 0)
+            }
+            self.latency['llm_ttft'].add(metric.ttft)
+            for key in self.llm_tokens:
+                self.llm_tokens[key] += metrics_dict['llm'][key] or 0
+        elif isinstance(metric, metrics.TTSMetrics):
+            metrics_dict['tts'] = {
+                'ttfb': metric.ttfb,
+                'duration': metric.duration,
+                'audio_duration': metric.audio_duration,
+                'streamed': getattr(metric, 'streamed', False),
+                'characters_count': getattr(metric, 'characters_count', 0)
+            }
+            self.latency['tts_ttfb'].add(metric.ttfb)
+        else:
+            return None
+
+        if not metrics_dict.get('latency_recorded') and all(part in metrics_dict for part in ('eou', 'llm', 'tts')):
+            metrics_dict['latency_recorded'] = True
+            self.latency['turn_latency'].add(self._total_latency(metrics_dict))
+
+        turn_summary = self.get_turn_summary(speech_id)
+        if turn_summary.get('complete') and not metrics_dict.get('reported'):
+            metrics_dict['reported'] = True
+            self.turns += 1
+            self.recent_turns.append({
+                'speech_id': speech_id,
+                'eou_delay': round(metrics_dict.get('eou', {}).get('end_of_utterance_delay', 0), 3),
+                'llm_ttft': round(turn_summary['llm_ttft'], 3),
+                'tts_ttfb': round(turn_summary['tts_ttfb'], 3),
+                'total_latency': round(turn_summary['total_conversation_latency'], 3),
+            })
+            return turn_summary
+        return None
+
+    @staticmethod
+    def _total_latency(turn_data: dict) -> float:
+        if 'eou' in turn_data and 'llm' in turn_data and 'tts' in turn_data:
+            return (
+                turn_data['eou']['end_of_utterance_delay'] +
+                turn_data['llm']['ttft'] +
+                turn_data['tts']['ttfb']
+            )
+        return 0
+
+    def get_turn_summary(self, speech_id: str) -> dict:
+        """Get a complete turn summary for a speech_id"""
+        if speech_id not in self.metrics_by_speech_id:
+            return {}
+
+        turn_data = self.metrics_by_speech_id[speech_id]
+
+        return {
+            'speech_id': speech_id,
+            'stt_final_latency': turn_data.get('eou', {}).get('transcription_delay', 0),
+            'stt_audio_duration': turn_data.get('stt', {}).get('audio_duration', 0),
+            'stt_streamed': turn_data.get('stt', {}).get('streamed', False),
+            'llm_ttft': turn_data.get('llm', {}).get('ttft', 0),
+            'llm_total': turn_data.get('llm', {}).get('duration', 0),
+            'llm_tokens_per_sec': turn_data.get('llm', {}).get('tokens_per_second', 0),
+            'llm_data': turn_data.get('llm', {}),  # Include full LLM data for detailed analysis
+            'tts_ttfb': turn_data.get('tts', {}).get('ttfb', 0),
+            'tts_total': turn_data.get('tts', {}).get('duration', 0),
+            'tts_audio_duration': turn_data.get('tts', {}).get('audio_duration', 0),
+            'tts_data': turn_data.get('tts', {}),  # Include full TTS data for detailed analysis
+            'total_conversation_latency': self._total_latency(turn_data),
+            'complete': 'llm' in turn_data and 'tts' in turn_data and ('stt' in turn_data or 'eou' in turn_data)  # STT+LLM+TTS or EOU+LLM+TTS
+        }
+
+    def summary(self) -> dict:
+        """Latency profile of the call"""
+        return {
+            'turns': self.turns,
+            'latency': {name: series.summary() for name, series in self.latency.items()},
+            'llm_tokens': dict(self.llm_tokens),
+            'recent_turns': list(self.recent_turns),
+        }
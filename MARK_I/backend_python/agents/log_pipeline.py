@@ -0,0 +1,171 @@
+"""
+Worker log pipeline
+
+Loggers of the voice worker only put records on an in-memory queue
+(QueueHandler); a QueueListener thread formats them and writes them to
+stderr. Logging a line on the audio path never formats, writes or flushes
+synchronously.
+
+- LOG_FORMAT: "json" (one JSON object per line, default) or "text"
+- LOG_LEVEL: root level (INFO); LOG_LEVELS: per-logger levels,
+  e.g. "livekit=WARNING,pathway_global_context=DEBUG"
+- per-utterance metric lines (logged with extra=METRIC_LOG) are sampled:
+  one in LOG_METRICS_SAMPLE_EVERY is kept, warnings and errors always are
+
+setup_logging() installs the pipeline once per process; ensure_logging() is
+cheap and restores it when a library replaced the root handlers.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_METRICS_SAMPLE_EVERY = max(1, int(os.getenv("LOG_METRICS_SAMPLE_EVERY", "10")))
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# extra= of high-frequency metric log lines (sampled)
+METRIC_LOG = {"sampled": True}
+
+# LogRecord attributes; anything else on a record came from extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+_traceback_formatter = logging.Formatter()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and extra= fields"""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key != "sampled":
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps one in `every` records logged with extra=METRIC_LOG below WARNING"""
+    def __init__(self, every: int = LOG_METRICS_SAMPLE_EVERY):
+        super().__init__()
+        self.every = every
+        self.counts: Dict[str, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sampled", False) or record.levelno >= logging.WARNING:
+            return True
+        # Counted per call site so every metric keeps its own 1-in-N
+        site = f"{record.pathname}:{record.lineno}"
+        count = self.counts.get(site, 0)
+        self.counts[site] = count + 1
+        return count % self.every == 0
+
+
+class _PipelineQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler of the pipeline (recognized by ensure_logging)"""
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now (they may change later); the traceback stays a separate field
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_queue_handler: Optional[_PipelineQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def _output_handler() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stderr)
+    if LOG_FORMAT == "text":
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT, datefmt="%Y-%m-%d %H:%M:%S"))
+    else:
+        handler.setFormatter(JsonFormatter())
+    return handler
+
+
+def _apply_levels():
+    logging.getLogger().setLevel(LOG_LEVEL)
+    for item in LOG_LEVELS.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+
+def _start_listener():
+    global _listener, _listener_pid
+    if _listener is not None and _listener_pid == os.getpid():
+        return
+    # A forked job process inherits the handler but not the listener thread
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, _output_handler(), respect_handler_level=True)
+    _listener.start()
+    _listener_pid = os.getpid()
+
+
+def setup_logging():
+    """Route every logger of the process through the queue (idempotent)"""
+    global _queue_handler
+    with _lock:
+        if _queue_handler is None:
+            _queue_handler = _PipelineQueueHandler(queue.SimpleQueue())
+            _queue_handler.addFilter(SamplingFilter())
+            _apply_levels()
+            atexit.register(stop_logging)
+        _start_listener()
+        _install_root_handler()
+
+
+def _install_root_handler():
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if handler is not _queue_handler:
+            root.removeHandler(handler)
+    if _queue_handler not in root.handlers:
+        root.addHandler(_queue_handler)
+    # Records propagate to the root handler only (no direct stream handlers left by libraries)
+    for logger_obj in list(logging.Logger.manager.loggerDict.values()):
+        if not isinstance(logger_obj, logging.Logger):
+            continue
+        console_handlers = [handler for handler in logger_obj.handlers if type(handler) is logging.StreamHandler]
+        for handler in console_handlers:
+            logger_obj.removeHandler(handler)
+        if console_handlers:
+            logger_obj.propagate = True
+
+
+def ensure_logging():
+    """Re-install the pipeline if the root handlers were replaced (e.g. by LiveKit's CLI)"""
+    root = logging.getLogger()
+    if _queue_handler is not None and root.handlers == [_queue_handler] and _listener_pid == os.getpid():
+        return
+    setup_logging()
+
+
+def stop_logging():
+    """Write the queued records and stop the listener (process exit)"""
+    global _listener
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+        _listener = None
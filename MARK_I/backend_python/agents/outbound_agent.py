@@ -18,230 +18,33 @@ import sys
 import locale
 from typing import Any, Optional
 import uuid
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 import random
 import httpx
 import time
 import base64
 from datetime import datetime
 
-# ===== ULTIMATE POWERSHELL LOGGING FIX =====
+# ===== LOGGING =====
+# Records are queued and written by a listener thread (log_pipeline): logging a
+# line never formats, writes or flushes on the audio path.
 # This must be applied BEFORE any other imports or logging setup
-import threading
-from typing import TextIO
-
-
-def setup_ultimate_powershell_logging():
-    """Apply comprehensive fixes for PowerShell logging issues"""
-    print("[LOGGING] Applying ultimate PowerShell logging fixes...")
-
-    # 1. FORCE UNBUFFERED OUTPUT AT OS LEVEL
-    if sys.platform == 'win32':
-        os.environ['PYTHONUNBUFFERED'] = '1'
-        os.environ['PYTHONIOENCODING'] = 'utf-8'
-        os.environ['PYTHONDONTWRITEBYTECODE'] = '1'
-
-        if hasattr(sys.stdout, 'reconfigure'):
-            sys.stdout.reconfigure(
-    encoding='utf-8',
-    errors='replace',
-     line_buffering=True)
-            sys.stderr.reconfigure(
-    encoding='utf-8',
-    errors='replace',
-     line_buffering=True)
-
-        sys.stdout = ForceFlushingTextIO(sys.stdout)
-        sys.stderr = ForceFlushingTextIO(sys.stderr)
-
-    # 2. CLEAR ALL EXISTING HANDLERS
-    root_logger = logging.getLogger()
-    for handler in root_logger.handlers[:]:
-        root_logger.removeHandler(handler)
-
-    for name in logging.Logger.manager.loggerDict:
-        logger = logging.getLogger(name)
-        for handler in logger.handlers[:]:
-            logger.removeHandler(handler)
-
-    # 3. CREATE POWERSHELL-OPTIMIZED HANDLER
-    handler = PowerShellCompatibleHandler()
-    handler.setLevel(logging.INFO)
-
-    formatter = logging.Formatter(
-        fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    handler.setFormatter(formatter)
-
-    # 4. APPLY TO ROOT LOGGER
-    root_logger.setLevel(logging.INFO)
-    root_logger.addHandler(handler)
-
-    # 5. START PERSISTENT LOGGING MONITOR
-    start_logging_monitor()
-
-    print("[LOGGING] Ultimate PowerShell logging fix completed!")
-
-
-def start_logging_monitor():
-    """Start a background thread that continuously enforces logging configuration"""
-    global _logging_monitor_active
-    _logging_monitor_active = True
-
-    def monitor_logging():
-        """Background thread that enforces logging configuration every 2 seconds"""
-        while _logging_monitor_active:
-            try:
-                # Check if our handler is still present
-                root_logger = logging.getLogger()
-                has_powershell_handler = any(
-    isinstance(
-        h, PowerShellCompatibleHandler) for h in root_logger.handlers)
-
-                if not has_powershell_handler:
-                    print("[LOGGING MONITOR] Reapplying logging fix...")
-                    reapply_logging_fix()
-
-                # Also ensure key loggers have our handler
-                for logger_name in [
-    'livekit.agents',
-    'outbound-caller',
-     'pathway_global_context']:
-                    logger_obj = logging.getLogger(logger_name)
-                    has_handler = any(
-    isinstance(
-        h, PowerShellCompatibleHandler) for h in logger_obj.handlers)
-                    if not has_handler:
-                        handler = PowerShellCompatibleHandler()
-                        handler.setLevel(logging.INFO)
-                        formatter = logging.Formatter(
-                            fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                            datefmt='%Y-%m-%d %H:%M:%S'
-                        )
-                        handler.setFormatter(formatter)
-                        logger_obj.addHandler(handler)
-                        logger_obj.setLevel(logging.INFO)
-
-            except Exception as e:
-                print(f"[LOGGING MONITOR ERROR] {e}")
-
-            time.sleep(2)  # Check every 2 seconds
-
-    monitor_thread = threading.Thread(target=monitor_logging, daemon=True)
-    monitor_thread.start()
-    print("[LOGGING] Started persistent logging monitor")
-
-
-def stop_logging_monitor():
-    """Stop the logging monitor"""
-    global _logging_monitor_active
-    _logging_monitor_active = False
+from log_pipeline import ensure_logging, setup_logging
 
+if sys.platform == 'win32':
+    os.environ['PYTHONIOENCODING'] = 'utf-8'
+    os.environ['PYTHONDONTWRITEBYTECODE'] = '1'
+    if hasattr(sys.stdout, 'reconfigure'):
+        sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+        sys.stderr.reconfigure(encoding='utf-8', errors='replace')
 
-# Global flag for logging monitor
-_logging_monitor_active = False
+setup_logging()
 
 
 def reapply_logging_fix():
-    """Re-apply logging fix - call this after LiveKit initialization"""
-    print("[LOGGING] Re-applying PowerShell logging fix after LiveKit...")
-
-    # Clear any handlers LiveKit may have added
-    root_logger = logging.getLogger()
-    livekit_handlers = []
-    for handler in root_logger.handlers[:]:
-        if not isinstance(handler, PowerShellCompatibleHandler):
-            livekit_handlers.append(handler)
-            root_logger.removeHandler(handler)
-
-    # Ensure our PowerShell handler is present
-    has_powershell_handler = any(isinstance(
-        h, PowerShellCompatibleHandler) for h in root_logger.handlers)
-    if not has_powershell_handler:
-        handler = PowerShellCompatibleHandler()
-        handler.setLevel(logging.INFO)
-        formatter = logging.Formatter(
-            fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        handler.setFormatter(formatter)
-        root_logger.addHandler(handler)
-
-    # Also apply to LiveKit loggers specifically
-    for logger_name in [
-    'livekit.agents',
-    'livekit.rtc',
-    'outbound-caller',
-     'workflow-agent']:
-        logger = logging.getLogger(logger_name)
-        logger.handlers.clear()
-        handler = PowerShellCompatibleHandler()
-        handler.setLevel(logging.INFO)
-        formatter = logging.Formatter(
-            fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-        logger.setLevel(logging.INFO)
-
-    print("[LOGGING] PowerShell logging fix re-applied!")
-
-class ForceFlushingTextIO:
-    """Wrapper that forces immediate flushing for PowerShell compatibility"""
-    
-    def __init__(self, wrapped_stream: TextIO):
-        self._wrapped = wrapped_stream
-        
-    def write(self, text):
-        try:
-            result = self._wrapped.write(text)
-            self._wrapped.flush()
-            return result
-        except Exception:
-            return self._wrapped.write(text)
-    
-    def flush(self):
-        try:
-            self._wrapped.flush()
-        except Exception:
-            pass
-    
-    def __getattr__(self, name):
-        return getattr(self._wrapped, name)
+    """Re-install the log pipeline if LiveKit replaced the root handlers (no-op otherwise)"""
+    ensure_logging()
 
-class PowerShellCompatibleHandler(logging.StreamHandler):
-    """Logging handler optimized for PowerShell compatibility"""
-    
-    def __init__(self):
-        super().__init__(sys.stderr)
-        self._lock = threading.Lock()
-    
-    def emit(self, record):
-        """Emit a record with PowerShell-specific optimizations"""
-        with self._lock:
-            try:
-                msg = self.format(record)
-                stream = self.stream
-                stream.write(msg + '\n')
-                stream.flush()
-                
-                if sys.platform == 'win32' and hasattr(stream, 'fileno'):
-                    try:
-                        os.fsync(stream.fileno())
-                    except (OSError, AttributeError):
-                        pass
-                        
-            except Exception as e:
-                try:
-                    print(f"LOGGING ERROR: {e}")
-                    print(f"ORIGINAL MESSAGE: {record.getMessage()}")
-                except:
-                    pass
-
-# APPLY THE FIX IMMEDIATELY
-setup_ultimate_powershell_logging()
 
 # Forcer l'encodage UTF-8 pour Windows (legacy support)
 if sys.platform == 'win32':
@@ -293,6 +96,14 @@ try:
     import sys
     sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'api'))
     from db_client import supabase_service_client
+    # Async queries so lookups don't block the voice session's event loop
+    from db_async import fetch_one, get_async_db, insert_call
+    # Agent, voice, pathway and phone-number rows are cached per job process
+    from config_cache import cache_stats, cached
+    # Pathway transitions and variables are appended as events, flushed at shutdown
+    from pathway_events import flush_events as flush_pathway_events
+    # Outbound HTTP clients are pooled per job and closed at shutdown
+    from http_clients import close_http_clients, get_http_client
     logger.info("✅ Supabase client imported successfully")
 except Exception as e:
     logger.error(f"❌ Failed to import supabase client: {e}")
@@ -317,96 +128,18 @@ from livekit.plugins import (
     openai,
     cartesia,
     elevenlabs,
-    silero,
     deepgram,
 )
 from livekit.agents.llm import ChatMessage
 from pydantic import BaseModel, Field
 from typing import AsyncIterable
 from voice_adaptation_manager import VoiceAdaptationManager
+from worker_resources import CallTimeline, get_http_session, get_openai_client, get_vad, prewarm, prewarm_plugins
+from telemetry import emit as emit_telemetry, flush as flush_telemetry
+from call_metrics import MetricsAggregator
+from call_context import CALL_ROOM_PREFIX, CallContext
 
 
-class MetricsAggregator:
-    """Aggregates metrics by speech_id to build complete turn metrics"""
-    
-    def __init__(self):
-        self.metrics_by_speech_id = {}
-        
-    def add_metric(self, metric):
-        """Add a metric to the aggregator"""
-        speech_id = getattr(metric, 'speech_id', None)
-        if not speech_id:
-            return
-            
-        if speech_id not in self.metrics_by_speech_id:
-            self.metrics_by_speech_id[speech_id] = {}
-            
-        metrics_dict = self.metrics_by_speech_id[speech_id]
-        
-        if isinstance(metric, metrics.STTMetrics):
-            metrics_dict['stt'] = {
-                'audio_duration': metric.audio_duration,
-                'duration': metric.duration,
-                'streamed': metric.streamed
-            }
-        elif isinstance(metric, metrics.EOUMetrics):
-            metrics_dict['eou'] = {
-                'transcription_delay': metric.transcription_delay,
-                'end_of_utterance_delay': metric.end_of_utterance_delay,
-                'on_user_turn_completed_delay': getattr(metric, 'on_user_turn_completed_delay', 0)
-            }
-        elif isinstance(metric, metrics.LLMMetrics):
-            metrics_dict['llm'] = {
-                'ttft': metric.ttft,
-                'duration': metric.duration,
-                'tokens_per_second': getattr(metric, 'tokens_per_second', 0),
-                'completion_tokens': getattr(metric, 'completion_tokens', 0),
-                'prompt_tokens': getattr(metric, 'prompt_tokens', 0),
-                'prompt_cached_tokens': getattr(metric, 'prompt_cached_tokens', 0),
-                'total_tokens': getattr(metric, 'total_tokens', 0)
-            }
-        elif isinstance(metric, metrics.TTSMetrics):
-            metrics_dict['tts'] = {
-                'ttfb': metric.ttfb,
-                'duration': metric.duration,
-                'audio_duration': metric.audio_duration,
-                'streamed': getattr(metric, 'streamed', False),
-                'characters_count': getattr(metric, 'characters_count', 0)
-            }
-    
-    def get_turn_summary(self, speech_id: str) -> dict:
-        """Get a complete turn summary for a speech_id"""
-        if speech_id not in self.metrics_by_speech_id:
-            return {}
-            
-        turn_data = self.metrics_by_speech_id[speech_id]
-        
-        # Calculate total conversation latency
-        total_latency = 0
-        if 'eou' in turn_data and 'llm' in turn_data and 'tts' in turn_data:
-            total_latency = (
-                turn_data['eou']['end_of_utterance_delay'] +
-                turn_data['llm']['ttft'] +
-                turn_data['tts']['ttfb']
-            )
-        
-        return {
-            'speech_id': speech_id,
-            'stt_final_latency': turn_data.get('eou', {}).get('transcription_delay', 0),
-            'stt_audio_duration': turn_data.get('stt', {}).get('audio_duration', 0),
-            'stt_streamed': turn_data.get('stt', {}).get('streamed', False),
-            'llm_ttft': turn_data.get('llm', {}).get('ttft', 0),
-            'llm_total': turn_data.get('llm', {}).get('duration', 0),
-            'llm_tokens_per_sec': turn_data.get('llm', {}).get('tokens_per_second', 0),
-            'llm_data': turn_data.get('llm', {}),  # Include full LLM data for detailed analysis
-            'tts_ttfb': turn_data.get('tts', {}).get('ttfb', 0),
-            'tts_total': turn_data.get('tts', {}).get('duration', 0),
-            'tts_audio_duration': turn_data.get('tts', {}).get('audio_duration', 0),
-            'tts_data': turn_data.get('tts', {}),  # Include full TTS data for detailed analysis
-            'total_conversation_latency': total_latency,
-            'complete': len(turn_data) >= 3  # STT+LLM+TTS or EOU+LLM+TTS
-        }
-
 # RE-APPLY LOGGING FIX AFTER LIVEKIT IMPORTS
 reapply_logging_fix()
 
@@ -676,48 +409,44 @@ class OutboundCaller(Agent):
         """Main run loop for the agent's conversational logic."""
         
         # ✅ CRITICAL: FORCE LOGGING FIX AT CALL START
-        print("[CALL] ENFORCING LOGGING FIX AT CALL START")
         reapply_logging_fix()
         logger.info("✅ LOGGING FIX ENFORCED AT CALL START")
         
         # ✅ DIRECT CONSOLE OUTPUT - BYPASSES ALL LOGGING SYSTEMS
-        print("=" * 60)
-        print("🎯 AGENT RUN METHOD STARTED - CALL EXECUTION BEGINNING", flush=True)
-        print("=" * 60)
+        logger.info("🎯 AGENT RUN METHOD STARTED - CALL EXECUTION BEGINNING")
         
         logger.info("ENTERING OutboundCaller.run - TOP OF METHOD")
         sess = self._session
         if not sess:
-            print("❌ ERROR: Agent session not found in agent.run(), cannot proceed.")
             logger.error("Agent session not found in agent.run(), cannot proceed.")
             return
 
-        print(f"✅ Agent session found: {type(sess)}", flush=True)
+        logger.info(f"✅ Agent session found: {type(sess)}")
+
+        # Call identity parsed once by the entrypoint (parsed here for sessions without it)
+        call_context = getattr(sess.userdata, "call_context", None) if hasattr(sess, "userdata") else None
+        if call_context is None:
+            call_context = CallContext.from_job(get_job_context())
 
         # Initialize pathway integration if available
         pathway_execution_id = None
         if PATHWAY_INTEGRATION_AVAILABLE:
-            print("🔄 Initializing pathway integration...", flush=True)
+            logger.info("🔄 Initializing pathway integration...")
             try:
-                # Extract pathway information from metadata
-                job_ctx = get_job_context()
-                raw_metadata = job_ctx.job.metadata
-                metadata = json.loads(raw_metadata) if raw_metadata else {}
+                call_id = call_context.call_id
+                agent_id = call_context.agent_id
                 
-                call_id = metadata.get("supabase_call_id")
-                agent_id = metadata.get("agent_id")
-                
-                print(f"📋 Call metadata: call_id={call_id}, agent_id={agent_id}", flush=True)
+                logger.info(f"📋 Call metadata: call_id={call_id}, agent_id={agent_id}")
                 
                 if call_id and agent_id:
-                    # Auto-start pathway for this call
-                    pathway_execution_id = await auto_start_pathway_for_new_call(
+                    # Auto-start pathway for this call, unless an execution is already running
+                    pathway_execution_id = call_context.pathway_execution_id or await auto_start_pathway_for_new_call(
                         call_id=str(call_id),
                         agent_id=int(agent_id),
                         session_metadata={"room_name": room.name}
                     )
+                    call_context.pathway_execution_id = pathway_execution_id
                     if pathway_execution_id:
-                        print(f"✅ Pathway execution started: {pathway_execution_id}", flush=True)
                         logger.info(f"Pathway execution started: {pathway_execution_id}")
                         
                         # Send call answered event
@@ -726,31 +455,25 @@ class OutboundCaller(Agent):
                             "agent_id": agent_id,
                             "timestamp": time.time()
                         })
-                        print(f"📞 Call answered event sent", flush=True)
+                        logger.info("📞 Call answered event sent")
                     else:
-                        print("ℹ️ No default pathway found for this agent", flush=True)
                         logger.info("No default pathway found for this agent")
                 else:
-                    print("⚠️ Missing call_id or agent_id in metadata - pathway integration disabled", flush=True)
                     logger.warning("Missing call_id or agent_id in metadata - pathway integration disabled")
             except Exception as e:
-                print(f"❌ Error initializing pathway integration: {e}", flush=True)
                 logger.error(f"Error initializing pathway integration: {e}")
                 pathway_execution_id = None
         else:
-            print("⚠️ Pathway integration not available", flush=True)
+            logger.warning("⚠️ Pathway integration not available")
 
-        print("🎙️ Handling initial greeting...", flush=True)
+        logger.info("🎙️ Handling initial greeting...")
 
         # === PHASE 5: BIDIRECTIONAL GREETING LOGIC ===
         # Check if this is an inbound call
-        job_ctx = get_job_context()
-        metadata = json.loads(job_ctx.job.metadata) if job_ctx.job.metadata else {}
-        is_inbound = metadata.get("is_inbound_call", False)
+        is_inbound = call_context.is_inbound
 
         if is_inbound:
             # === INBOUND CALL GREETING ===
-            print(f"📞 INBOUND call detected - fetching greeting from pathway/database")
             logger.info(f"INBOUND call detected - fetching greeting from pathway/database")
             
             # Get pathway session data (already loaded in entrypoint)
@@ -783,49 +506,39 @@ class OutboundCaller(Agent):
                 if greeting_text:
                     try:
                         await sess.say(greeting_text, allow_interruptions=True)
-                        print("✅ Pathway greeting delivered for inbound call.", flush=True)
                         logger.info("Pathway greeting delivered for inbound call.")
                     except Exception as e:
-                        print(f"❌ Error delivering pathway greeting: {e}", flush=True)
                         logger.error(f"Error delivering pathway greeting: {e}")
                 else:
-                    print("⚠️ No greeting found in pathway - using agent default instructions", flush=True)
                     logger.warning("No greeting found in pathway - using agent default instructions")
             else:
-                print("⚠️ No pathway data available for inbound greeting - using agent instructions", flush=True)
                 logger.warning("No pathway data available for inbound greeting")
 
         else:
             # === OUTBOUND CALL GREETING (EXISTING LOGIC UNCHANGED) ===
-            print(f"📞 OUTBOUND call detected - using existing greeting logic")
             logger.info(f"OUTBOUND call detected - using existing greeting logic")
 
         # Handle initial greeting based on wait_for_greeting setting
         if self.wait_for_greeting:
-            print(f"⏳ Agent '{self.name}' configured to wait for user greeting first")
             logger.info(f"Agent '{self.name}' configured to wait for user greeting first")
             # Wait for user input first, then deliver greeting
             try:
-                print("👂 Waiting for user to speak first...")
                 logger.info("Waiting for user to speak first...")
                 async for user_input in sess.user_input():
                     if not user_input.is_final:
                         continue
                     
-                    print(f"👤 User spoke first: '{user_input.text}'. Now delivering initial greeting.")
                     logger.info(f"User spoke first: '{user_input.text}'. Now delivering initial greeting.")
                     
                     # Deliver initial greeting as response to user's first input
                     if self.initial_greeting:
                         await sess.say(self.initial_greeting, allow_interruptions=True)
-                        print("✅ Initial greeting delivered after user spoke.", flush=True)
                         logger.info("Initial greeting delivered after user spoke.")
                     
                     # Continue with normal conversation flow
                     break
                     
             except Exception as e:
-                print(f"❌ Error while waiting for user greeting: {e}", flush=True)
                 logger.error(f"Error while waiting for user greeting: {e}")
                 # Fallback: deliver greeting anyway
                 if self.initial_greeting:
@@ -833,17 +546,13 @@ class OutboundCaller(Agent):
         else:
             # Standard behavior: deliver greeting immediately
             if self.initial_greeting:
-                print(f"🎙️ Agent '{self.name}' delivering immediate greeting: '{self.initial_greeting}'")
                 logger.info(f"Agent '{self.name}' delivering immediate greeting: '{self.initial_greeting}'")
                 try:
                     await say_with_voice_adaptation(sess, voice_adapt, self.initial_greeting, stage="greeting", analysis_text=self.initial_greeting, allow_interruptions_default=True)
-                    print("✅ Initial greeting delivered immediately.", flush=True)
                     logger.info("Initial greeting delivered immediately.")
                 except Exception as e:
-                    print(f"❌ Error delivering initial greeting: {e}", flush=True)
                     logger.error(f"Error delivering initial greeting: {e}")
             else:
-                print("ℹ️ No initial greeting to deliver.", flush=True)
                 logger.info("No initial greeting to deliver.")
 
         # Main conversation loop
@@ -853,24 +562,21 @@ class OutboundCaller(Agent):
         reapply_logging_fix()
         logger.info("✅ FINAL LOGGING FIX ENFORCED BEFORE CONVERSATION")
         
-        print("🔄 ENTERING MAIN CONVERSATION LOOP", flush=True)
-        print("👂 Listening for user input...", flush=True)
+        logger.info("🔄 ENTERING MAIN CONVERSATION LOOP")
+        logger.info("👂 Listening for user input...")
         
         try:
             async for user_input in sess.user_input():
                 if not user_input.is_final:
                     continue # Attendre la transcription finale
 
-                print(f"👤 USER SAID: '{user_input.text}'", flush=True)
                 logger.info(f"User said: '{user_input.text}'")
                 
                 # Send speech detection event to pathway
                 if PATHWAY_INTEGRATION_AVAILABLE and pathway_execution_id:
-                    print("📡 Sending speech event to pathway...", flush=True)
+                    logger.info("📡 Sending speech event to pathway...")
                     try:
-                        job_ctx = get_job_context()
-                        metadata = json.loads(job_ctx.job.metadata) if job_ctx.job.metadata else {}
-                        call_id = metadata.get("supabase_call_id")
+                        call_id = call_context.call_id
                         
                         if call_id:
                             await handle_call_event("speech_detected", str(call_id), {
@@ -878,39 +584,31 @@ class OutboundCaller(Agent):
                                 "confidence": getattr(user_input, 'confidence', 1.0),
                                 "timestamp": time.time()
                             })
-                            print("✅ Speech event sent to pathway", flush=True)
+                            logger.info("✅ Speech event sent to pathway")
                     except Exception as e:
-                        print(f"❌ Error sending speech event to pathway: {e}", flush=True)
                         logger.error(f"Error sending speech event to pathway: {e}")
                 
                 # Pour une conversation simple, l'historique peut juste être le dernier message utilisateur.
                 # Pour des conversations plus complexes, vous géreriez un historique plus long.
                 history = [ChatMessage(role="user", content=user_input.text)]
                 
-                print(f"🤖 Sending to LLM with history: {[msg.content for msg in history]}", flush=True)
                 logger.info(f"Sending to LLM with history: {history}")
                 # Le system_prompt est déjà défini au niveau de l'Agent (super().__init__(instructions=...))
                 # et devrait être utilisé par le plugin LLM.
                 llm_stream = await sess.llm.chat(history=history) 
                 
-                print("🎙️ Streaming LLM response to TTS...", flush=True)
                 logger.info("Streaming LLM response to TTS.")
                 # Use interruption threshold setting with voice adaptation
                 allow_interruptions = True if self.interruption_threshold > 0 else False
                 await say_with_voice_adaptation(sess, voice_adapt, llm_stream, stage="conversation", analysis_text=user_input.text, allow_interruptions_default=allow_interruptions)
-                print("✅ Agent finished responding to user input.", flush=True)
                 logger.info("Agent finished responding to user input.")
         except asyncio.CancelledError:
-            print(f"⚠️ Agent run loop for '{self.name}' cancelled.", flush=True)
             logger.info(f"Agent run loop for '{self.name}' cancelled.")
         except Exception as e:
-            print(f"❌ Error in agent run loop for '{self.name}': {e}", flush=True)
             logger.error(f"Error in agent run loop for '{self.name}': {e}", exc_info=True)
         finally:
-            print(f"🏁 Agent run loop for '{self.name}' finished.", flush=True)
             logger.info(f"Agent run loop for '{self.name}' finished.")
         
-        print("🚪 Exiting OutboundCaller.run after conversation loop.", flush=True)
         logger.info("Exiting OutboundCaller.run after conversation loop.")
 
 
@@ -931,32 +629,32 @@ async def get_telnyx_call_duration(call_control_id: str | None) -> int | None: #
     }
     
     try:
-        async with httpx.AsyncClient() as client:
-            logger.info(f"Tentative de récupération de la durée via Telnyx pour call_control_id: {call_control_id}")
-            response = await client.get(url, headers=headers)
-            
-            if response.status_code == 404:
-                logger.warning(f"Call not found in Telnyx for call_control_id: {call_control_id}")
-                return None
-            elif response.status_code == 422:
-                logger.warning(f"Invalid call_control_id format for Telnyx: {call_control_id}")
-                return None
-            
-            response.raise_for_status()
-            data = response.json()
+        # Pooled client of the Telnyx API (keep-alive), closed at job shutdown
+        logger.info(f"Tentative de récupération de la durée via Telnyx pour call_control_id: {call_control_id}")
+        response = await get_http_client(url).get(url, headers=headers)
+        
+        if response.status_code == 404:
+            logger.warning(f"Call not found in Telnyx for call_control_id: {call_control_id}")
+            return None
+        elif response.status_code == 422:
+            logger.warning(f"Invalid call_control_id format for Telnyx: {call_control_id}")
+            return None
+        
+        response.raise_for_status()
+        data = response.json()
+        
+        if not data.get("data"):
+            logger.warning(f"No data field in Telnyx response for call_control_id: {call_control_id}")
+            return None
             
-            if not data.get("data"):
-                logger.warning(f"No data field in Telnyx response for call_control_id: {call_control_id}")
-                return None
-                
-            duration = data["data"].get("call_duration_secs")
-            if duration is None:
-                logger.warning(f"No call_duration_secs in Telnyx response for call_control_id: {call_control_id}")
-                return None
-                
-            logger.info(f"Durée réelle récupérée via Telnyx pour call_control_id {call_control_id}: {duration}s")
-            return duration
+        duration = data["data"].get("call_duration_secs")
+        if duration is None:
+            logger.warning(f"No call_duration_secs in Telnyx response for call_control_id: {call_control_id}")
+            return None
             
+        logger.info(f"Durée réelle récupérée via Telnyx pour call_control_id {call_control_id}: {duration}s")
+        return duration
+        
     except httpx.HTTPStatusError as e:
         logger.error(f"Erreur HTTP lors de la récupération de la durée via Telnyx: {e.response.status_code} - {e.response.text}")
         return None
@@ -994,10 +692,9 @@ async def update_call_status_in_backend(room_name: str, new_status: str, supabas
 
     logger.info(f"Tentative de mise à jour des infos pour room {room_name} (Supabase ID: {supabase_call_id}) avec payload: {payload} via backend: {update_url}")
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.patch(update_url, json=payload, headers=headers)
-            response.raise_for_status()
-            logger.info(f"Infos mises à jour avec succès pour room {room_name} (Supabase ID: {supabase_call_id}): {response.json()}")
+        response = await get_http_client(update_url).patch(update_url, json=payload, headers=headers)
+        response.raise_for_status()
+        logger.info(f"Infos mises à jour avec succès pour room {room_name} (Supabase ID: {supabase_call_id}): {response.json()}")
     except httpx.HTTPStatusError as e:
         logger.error(f"Erreur HTTP lors de la mise à jour des infos pour {room_name} (Supabase ID: {supabase_call_id}): {e.response.status_code} - {e.response.text}")
     except Exception as e:
@@ -1007,59 +704,38 @@ async def entrypoint(ctx: JobContext):
     """
     Entry point for the outbound calling agent
     """
-    print("🚀 ENTRYPOINT CALLED - OUTBOUND AGENT STARTING", flush=True)
+    logger.info("🚀 ENTRYPOINT CALLED - OUTBOUND AGENT STARTING")
     
     # ✅ INITIALIZE session_start_agent early to avoid UnboundLocalError
     session_start_agent = None
     session = None
+    timeline = CallTimeline(ctx.proc)
     
     logger.info(f"📞 Outbound Agent entrypoint called")
     
-    # ✅ EXTRACT CALL_ID FROM ROOM NAME (for outbound calls)
+    # ✅ CALL CONTEXT: job metadata parsed once, shared with the node agents through the session userdata
+    call_context = CallContext.from_job(ctx)
+    metadata = call_context.metadata
+    dial_info = call_context.dial_info
+    
+    # Supabase call id of calls whose room was created for a call record ("agent-call-<id>")
     call_id = None
-    try:
-        # Try to extract call_id from room name like "agent-call-123"
-        if ctx.room.name.startswith("agent-call-"):
-            call_id = int(ctx.room.name.split('-')[-1])
-            print(f"📋 Starting entrypoint for supabase_call_id: {call_id}", flush=True)
-            logger.info(f"Starting entrypoint for supabase_call_id: {call_id}")
-        else:
-            # This is an inbound call with room name like "call_+33661329235_fqCVoDYpu8b9"
-            print(f"📞 Inbound call detected with room name: {ctx.room.name}", flush=True)
-            logger.info(f"Inbound call detected with room name: {ctx.room.name}")
-            call_id = None  # No supabase call_id for inbound calls
-    except (ValueError, IndexError) as e:
-        print(f"⚠️ Could not extract supabase_call_id from room name '{ctx.room.name}': {e}", flush=True)
-        logger.warning(f"Could not extract supabase_call_id from room name '{ctx.room.name}': {e}")
-        # Continue anyway - this might be an inbound call
-        call_id = None
-        
-    # ✅ EXTRACT METADATA AND DIAL_INFO
-    dial_info = {}
+    if ctx.room.name.startswith(CALL_ROOM_PREFIX):
+        call_id = call_context.call_id
+        logger.info(f"Starting entrypoint for supabase_call_id: {call_id}")
+    else:
+        # This is an inbound call with room name like "call_+33661329235_fqCVoDYpu8b9"
+        logger.info(f"Inbound call detected with room name: {ctx.room.name}")
+        
     if not ctx.job.metadata:
         # For inbound calls, no metadata is expected
         if call_id is None:
-            print("📞 Inbound call: No metadata expected, proceeding...", flush=True)
             logger.info("Inbound call: No metadata expected, proceeding...")
         else:
             logger.error("No job metadata provided. Cannot proceed with outbound call.")
             return
-
-    # Extract call details from job metadata
-    metadata = {}
-    if ctx.job.metadata:
-        import json
-        try:
-            metadata = json.loads(ctx.job.metadata)
-            dial_info = metadata.get("dial_info", {})
-            logger.info(f"📋 Extracted dial_info: {dial_info}")
-        except (json.JSONDecodeError, ValueError) as e:
-            print(f"⚠️ Invalid JSON in metadata: {e}, using empty metadata", flush=True)
-            logger.warning(f"Invalid JSON in metadata: {e}, using empty metadata")
-            metadata = {}
-            dial_info = {}
-    else:
-        dial_info = {}
+    elif dial_info:
+        logger.info(f"📋 Extracted dial_info: {dial_info}")
         
     # === PHASE 5: CALL DIRECTION DETECTION ===
     # Check for phone number in dial_info (outbound) or top-level metadata (inbound)
@@ -1079,99 +755,90 @@ async def entrypoint(ctx: JobContext):
         is_inbound_call = True
         logger.info("📞 INBOUND call detected - customer already connected")
 
-    # Store direction in metadata for agent access
-    metadata["is_inbound_call"] = is_inbound_call
-    if ctx.job.metadata:
-        ctx.job.metadata = json.dumps(metadata)
-    
-    # ✅ FIRST: Connect to the room
-    await ctx.connect()
-    logger.info("✅ Connected to LiveKit room")
-    
-    # RE-APPLY LOGGING FIX AFTER LIVEKIT CONNECTION
-    reapply_logging_fix()
-    logger.info("✅ Logging fix re-applied after LiveKit connection")
+    # Direction is read by the agents from the call context (the job metadata is left as dispatched)
+    call_context.is_inbound = is_inbound_call
     
     # ✅ INBOUND CALL SETUP - MUST RUN BEFORE AI MODEL CONFIGURATION
     if is_inbound_call:
-        print("🔍 UNIVERSAL AGENT: Waiting for SIP participant to extract receiving phone number...", flush=True)
+        # Inbound calls connect first: the SIP participant tells which agent answers
+        await timeline.timed("room_connect", ctx.connect())
+        timeline.mark("room_connected")
+        logger.info("✅ Connected to LiveKit room")
+        reapply_logging_fix()
+        
         logger.info("UNIVERSAL AGENT: Waiting for SIP participant to extract receiving phone number...")
         
         # Wait for SIP participant to connect and extract receiving phone number
         receiving_phone_number = None
         
         # Wait for participant connection to get SIP details
-        print("👂 Waiting for SIP participant to connect...", flush=True)
+        logger.info("👂 Waiting for SIP participant to connect...")
         participant = await ctx.wait_for_participant()
         
         if participant.kind == rtc.ParticipantKind.PARTICIPANT_KIND_SIP:
-            print(f"🔍 SIP participant detected - extracting receiving number...", flush=True)
             logger.info(f"SIP participant attributes: {participant.attributes}")
             
             # Extract receiving phone number (DNIS) from SIP participant attributes
             for attr_key in ["sip.trunkPhoneNumber", "sip_call_to", "call_to", "dnis", "to", "called_number"]:
                 if attr_key in participant.attributes:
                     receiving_phone_number = participant.attributes[attr_key]
-                    print(f"📱 Found receiving phone number: {receiving_phone_number} (from {attr_key})", flush=True)
                     logger.info(f"Found receiving phone number: {receiving_phone_number} (from {attr_key})")
                     break
             
             if receiving_phone_number:
                 # Get inbound agent ID from phone number
-                inbound_agent_id = await get_inbound_agent_id_for_phone_number(receiving_phone_number)
+                inbound_agent_id = await timeline.timed("inbound_agent_lookup", get_inbound_agent_id_for_phone_number(receiving_phone_number))
                 
                 if inbound_agent_id:
-                    print(f"✅ Found inbound agent ID: {inbound_agent_id} for {receiving_phone_number}", flush=True)
                     logger.info(f"Found inbound agent ID: {inbound_agent_id} for {receiving_phone_number}")
                     
-                    # Create call record in database for this inbound call
-                    inbound_call_id = await create_inbound_call_record(
-                        receiving_phone_number=receiving_phone_number,
-                        caller_phone_number=participant.attributes.get("sip.phoneNumber"),
-                        agent_id=inbound_agent_id,
-                        room_name=ctx.room.name
+                    # Create the call record and load the agent's AI model configuration concurrently
+                    inbound_call_id, agent_ai_config = await asyncio.gather(
+                        timeline.timed("inbound_call_record", create_inbound_call_record(
+                            receiving_phone_number=receiving_phone_number,
+                            caller_phone_number=participant.attributes.get("sip.phoneNumber"),
+                            agent_id=inbound_agent_id,
+                            room_name=ctx.room.name
+                        )),
+                        timeline.timed("agent_ai_models", load_agent_ai_models(inbound_agent_id)),
                     )
                     
                     if inbound_call_id:
-                        print(f"📞 Created inbound call record: {inbound_call_id}", flush=True)
                         logger.info(f"Created inbound call record: {inbound_call_id}")
                         
-                        # Load agent's AI model configuration from database
-                        agent_ai_config = await load_agent_ai_models(inbound_agent_id)
-                        
-                        # Update metadata to include call info for pathway system
-                        metadata.update({
-                            "supabase_call_id": inbound_call_id,
-                            "agent_id": inbound_agent_id,
+                        # Call record and agent of the inbound call, seen by the node agents through the call context
+                        call_context.call_id = str(inbound_call_id)
+                        call_context.agent_id = inbound_agent_id
+                        # Local copy: the dispatched metadata stays untouched
+                        metadata = {
+                            **metadata,
                             "ai_models": agent_ai_config,  # ✅ ADD AGENT'S AI CONFIG
                             "dial_info": {
                                 "agent_id": inbound_agent_id,
                                 "phone_number": receiving_phone_number  # For compatibility
                             }
-                        })
+                        }
                         
                         # Set call_id so pathway system kicks in
                         call_id = inbound_call_id
-                        print(f"🔄 Inbound call will use pathway system with call_id: {call_id}", flush=True)
                         logger.info(f"Inbound call will use pathway system with call_id: {call_id}")
                     else:
-                        print(f"❌ Failed to create call record for {receiving_phone_number}", flush=True)
                         logger.error(f"Failed to create call record for {receiving_phone_number}")
                 else:
-                    print(f"❌ No agent configuration found for {receiving_phone_number} - using fallback", flush=True)
                     logger.warning(f"No agent configuration found for {receiving_phone_number} - using fallback")
             else:
-                print("⚠️ Could not extract receiving phone number from SIP participant attributes", flush=True)
                 logger.warning("Could not extract receiving phone number from SIP participant attributes")
-                print(f"Available attributes: {list(participant.attributes.keys())}", flush=True)
+                logger.info(f"Available attributes: {list(participant.attributes.keys())}")
 
     # ✅ CONFIGURE AI MODELS FROM JOB METADATA (AFTER INBOUND CALL SETUP)
     logger.info("Configuring AI models from job metadata...")
     
     ai_models = metadata.get("ai_models", {})
     
-    # Configure VAD (Voice Activity Detection)
-    vad = silero.VAD.load()
+    # Configure VAD (Voice Activity Detection) - loaded once per process by prewarm()
+    vad = get_vad(ctx.proc)
+    # Plugin HTTP session shared by the jobs of this process
+    http_session = get_http_session(ctx.proc)
     
     # Configure STT (Speech-to-Text) - will be updated after voice config
     stt_config = ai_models.get("stt", {})
@@ -1180,15 +847,46 @@ async def entrypoint(ctx: JobContext):
     tts_config = ai_models.get("tts", {})
     voice_id = tts_config.get("voice_id", "65b25c5d-ff07-4687-a04c-da2f43ef6fa9")
     
-    # Get complete voice configuration (provider, language, model)
-    voice_config = await get_voice_configuration(voice_id)
+    # ✅ INDEPENDENT LOOKUPS RUN CONCURRENTLY: voice configuration, pathway auto-start + config
+    # and, for outbound calls, the room connection
+    agent_id = call_context.agent_id
+    setup_steps = [
+        timeline.timed("voice_config", get_voice_configuration(voice_id)),
+        timeline.timed("pathway_setup", setup_call_pathway(call_id, agent_id, ctx.room.name, call_context.pathway_execution_id)),
+    ]
+    if not is_inbound_call:
+        setup_steps.append(timeline.timed("room_connect", ctx.connect()))
+    setup_results = await asyncio.gather(*setup_steps, return_exceptions=True)
+    
+    # The room connection is required, the lookups fall back to defaults
+    if not is_inbound_call:
+        if isinstance(setup_results[2], BaseException):
+            raise setup_results[2]
+        timeline.mark("room_connected")
+        logger.info("✅ Connected to LiveKit room")
+        # RE-APPLY LOGGING FIX AFTER LIVEKIT CONNECTION
+        reapply_logging_fix()
+        logger.info("✅ Logging fix re-applied after LiveKit connection")
+    
+    voice_config = setup_results[0]
+    if isinstance(voice_config, BaseException):
+        logger.error(f"Error getting voice configuration: {voice_config}")
+        voice_config = {"provider": "cartesia", "language": "fr", "model": "sonic-2-2025-03-07", "voice_name": "Unknown", "voice_id": voice_id}
+    call_details, pathway_config, execution_id = (None, None, None)
+    if isinstance(setup_results[1], BaseException):
+        logger.error(f"Error during pathway setup: {setup_results[1]}")
+    else:
+        call_details, pathway_config, execution_id = setup_results[1]
+    if execution_id:
+        call_context.pathway_execution_id = execution_id
+    timeline.mark("lookups_done")
     tts_provider = voice_config["provider"]
     voice_language = voice_config["language"]
     voice_model = voice_config["model"]
     voice_name = voice_config["voice_name"]
     
     if tts_provider == "elevenlabs":
-        print(f"🎙️ Using ElevenLabs TTS with voice: {voice_name} ({voice_id}) - {voice_language}", flush=True)
+        logger.info(f"🎙️ Using ElevenLabs TTS with voice: {voice_name} ({voice_id}) - {voice_language}")
         
         # Configure ElevenLabs voice settings - Optimized for natural human-like speech
         voice_settings = elevenlabs.VoiceSettings(
@@ -1202,15 +900,16 @@ async def entrypoint(ctx: JobContext):
         tts = elevenlabs.TTS(
             voice_id=voice_id,
             model=voice_model,  # Use dynamic model from voice config
-            voice_settings=voice_settings
+            voice_settings=voice_settings,
+            http_session=http_session
         )
     else:
         # Use Cartesia with sonic-turbo for French language
-        print(f"🎙️ Using Cartesia TTS with voice: {voice_name} ({voice_id}) - {voice_language}", flush=True)
+        logger.info(f"🎙️ Using Cartesia TTS with voice: {voice_name} ({voice_id}) - {voice_language}")
         # Use sonic-turbo for French language, upgrade other models if needed
         if voice_language == "fr":
             final_cartesia_model = "sonic-turbo-2025-03-07"  # Turbo model for French
-            print(f"🚀 Using Cartesia Sonic Turbo for French: {final_cartesia_model}", flush=True)
+            logger.info(f"🚀 Using Cartesia Sonic Turbo for French: {final_cartesia_model}")
         else:
             final_cartesia_model = voice_model
             if final_cartesia_model == "sonic-2":
@@ -1219,7 +918,8 @@ async def entrypoint(ctx: JobContext):
         tts = cartesia.TTS(
             model=final_cartesia_model,
             voice=voice_id,
-            language=voice_language
+            language=voice_language,
+            http_session=http_session
         )
     
     # Configure STT with Deepgram Nova-3 - OPTIMIZED FOR SPEED & FRENCH  
@@ -1227,6 +927,7 @@ async def entrypoint(ctx: JobContext):
         model="nova-3",  # Deepgram's fastest and most accurate model (54% better than nova-2)
         language="fr",   # French language
         endpointing_ms=50,   # ULTRA-aggressive endpointing for speed (reduced from 100ms)
+        http_session=http_session,
     )
     
     # Configure LLM (Large Language Model) - USING GPT-4O-MINI
@@ -1235,9 +936,11 @@ async def entrypoint(ctx: JobContext):
         model=llm_config.get("model", "gpt-4o-mini"),  # GPT-4o-mini for better performance
         parallel_tool_calls=False,  # ✅ CRITICAL: Required for workflow agents with function tools
         temperature=llm_config.get("temperature", 0.1),  # ULTRA-LOW temp for speed (reduced from 0.3)
+        client=get_openai_client(ctx.proc),  # Shared keep-alive pool of the worker process
         # Note: LiveKit OpenAI LLM automatically handles streaming and token limits
     )
     
+    timeline.mark("models_configured")
     logger.info("✅ AI Models configured successfully")
     # Initialize voice adaptation manager (feature-flaggable + per-agent overrides)
     voice_adapt_enabled = os.getenv('VOICE_ADAPTATION_ENABLED', 'true').lower() in ('1','true','yes','on')
@@ -1266,39 +969,10 @@ async def entrypoint(ctx: JobContext):
         rate_limit_seconds=voice_adapt_rate_limit,
         memory_limit=voice_adapt_memory
     )
-    print(f"🎙️ TTS configured: {tts_provider} provider with voice {voice_id}", flush=True)
+    logger.info(f"🎙️ TTS configured: {tts_provider} provider with voice {voice_id}")
     
-    # ✅ AUTO-START PATHWAY EXECUTION IF NEEDED
+    # ✅ CREATE SESSION WITH CORRECT AGENT (pathway config fetched with the lookups above)
     try:
-        # Import the auto-start function
-        import sys
-        sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'api'))
-        from agent_pathway_integration import auto_start_pathway_for_new_call
-        
-        agent_id = metadata.get('dial_info', {}).get('agent_id')
-        if agent_id and call_id is not None:
-            # Check if pathway execution already exists, if not create it
-            execution_id = await auto_start_pathway_for_new_call(
-                call_id=str(call_id), 
-                agent_id=agent_id,
-                session_metadata={"room_name": ctx.room.name}
-            )
-            logger.info(f"✅ Auto-started pathway execution: {execution_id}")
-        elif call_id is None:
-            logger.info("Inbound call: Skipping pathway auto-start (no call_id)")
-        
-    except Exception as e:
-        logger.error(f"Error in auto-start pathway: {e}")
-    
-    # ✅ FETCH PATHWAY CONFIG AND CREATE SESSION WITH CORRECT AGENT
-    try:
-        # Fetch pathway config (only for calls with call_id)
-        pathway_config = None
-        execution_id = None
-        
-        if call_id is not None:
-            pathway_config, execution_id = await get_pathway_for_call(call_id)
-            
         if not pathway_config:
             if call_id is not None:
                 logger.error(f"No pathway configuration found for call_id {call_id}. Using agent fallback.")
@@ -1314,18 +988,21 @@ async def entrypoint(ctx: JobContext):
             if call_id is not None:
                 try:
                     logger.info(f"🔍 Looking up agent configuration via call_id: {call_id}")
-                    call_details = await get_call_details_from_supabase(supabase_service_client, call_id)
+                    # Call details were fetched with the pathway setup
                     if call_details and call_details.get("agent_id"):
                         agent_id = call_details.get("agent_id")
                         logger.info(f"🔍 Found agent_id {agent_id} from call record")
                         
                         # Get agent configuration directly by ID
-                        agent_response = supabase_service_client.table("agents").select(
-                            "id, name, system_prompt, initial_greeting"
-                        ).eq("id", agent_id).maybe_single().execute()
+                        agent_row = await timeline.timed("fallback_agent_config", cached(
+                            ("agent", agent_id, "prompt"),
+                            lambda: fetch_one(get_async_db().table("agents").select(
+                                "id, name, system_prompt, initial_greeting"
+                            ).eq("id", agent_id)),
+                        ))
                         
-                        if agent_response.data:
-                            agent_data = agent_response.data
+                        if agent_row:
+                            agent_data = agent_row
                             agent_instructions = agent_data.get("system_prompt", agent_instructions)
                             agent_greeting = agent_data.get("initial_greeting")
                             logger.info(f"✅ Using agent instructions from database for {agent_data.get('name')}: {agent_instructions[:50]}...")
@@ -1344,7 +1021,7 @@ async def entrypoint(ctx: JobContext):
                 if receiving_number:
                     try:
                         logger.info(f"🔍 Looking up agent configuration for inbound number: {receiving_number}")
-                        agent_config = await get_agent_config_by_phone_number(receiving_number)
+                        agent_config = await timeline.timed("fallback_agent_config", get_agent_config_by_phone_number(receiving_number))
                         if agent_config:
                             agent_instructions = agent_config.get("instructions", agent_instructions)
                             agent_greeting = agent_config.get("initial_greeting")
@@ -1406,7 +1083,9 @@ async def entrypoint(ctx: JobContext):
                 pathway_config=pathway_config,
                 agent_instances={},
                 current_node_id=None,
-                collected_data={}
+                collected_data={},
+                pathway_id=(call_details or {}).get("pathway_id"),
+                pathway_version=(call_details or {}).get("pathway_version"),
             )
             # Pass per-agent voice adaptation config into session data
             try:
@@ -1416,7 +1095,7 @@ async def entrypoint(ctx: JobContext):
                 pass
             
             # Pre-initialize conversation nodes
-            conversation_nodes = [node for node in pathway_config.get('nodes', []) if node.get('type') == 'conversation']
+            conversation_nodes = session_data.graph.nodes_of_type('conversation')
             for node_config in conversation_nodes:
                 node_id = node_config.get('id')
                 if node_id:
@@ -1489,118 +1168,40 @@ async def entrypoint(ctx: JobContext):
     def _on_metrics_collected(ev: MetricsCollectedEvent):
         """Handle metrics collected from the session"""
         metric = ev.metrics
+        usage_collector.collect(metric)  # Collect for cost estimation
+        turn_summary = metrics_aggregator.add_metric(metric)
         
-        # Log all metrics for debugging
-        metrics.log_metrics(metric)
+        # Per-metric lines only in debug logs; one line per completed turn otherwise
+        if logger.isEnabledFor(logging.DEBUG):
+            metrics.log_metrics(metric)
+        if not turn_summary:
+            return
         
-        # Add to aggregators
-        metrics_aggregator.add_metric(metric)
-        usage_collector.collect(metric)  # Collect for cost estimation
-        speech_id = getattr(metric, 'speech_id', None)
-        
-        # Handle specific metric types
-        if isinstance(metric, metrics.STTMetrics):
-            logger.info(f"📊 STT Metrics - speech_id: {speech_id}, "
-                       f"audio_duration: {metric.audio_duration:.3f}s, "
-                       f"duration: {metric.duration:.3f}s, streamed: {metric.streamed}")
-        
-        elif isinstance(metric, metrics.EOUMetrics):
-            logger.info(f"📊 EOU Metrics - speech_id: {speech_id}, "
-                       f"transcription_delay: {metric.transcription_delay:.3f}s, "
-                       f"end_of_utterance_delay: {metric.end_of_utterance_delay:.3f}s")
-        
-        elif isinstance(metric, metrics.LLMMetrics):
-            # Enhanced LLM metrics logging per LiveKit docs
-            completion_tokens = getattr(metric, 'completion_tokens', 0)
-            prompt_tokens = getattr(metric, 'prompt_tokens', 0)
-            prompt_cached_tokens = getattr(metric, 'prompt_cached_tokens', 0)
-            total_tokens = getattr(metric, 'total_tokens', 0)
-            tokens_per_second = getattr(metric, 'tokens_per_second', 0)
-            
-            logger.info(f"📊 LLM Metrics - speech_id: {speech_id}, "
-                       f"ttft: {metric.ttft:.3f}s, duration: {metric.duration:.3f}s, "
-                       f"tokens/sec: {tokens_per_second:.1f}, "
-                       f"completion_tokens: {completion_tokens}, prompt_tokens: {prompt_tokens}, "
-                       f"cached_tokens: {prompt_cached_tokens}, total_tokens: {total_tokens}")
-        
-        elif isinstance(metric, metrics.TTSMetrics):
-            # Enhanced TTS metrics logging per LiveKit docs
-            characters_count = getattr(metric, 'characters_count', 0)
-            streamed = getattr(metric, 'streamed', False)
-            
-            # Calculate TTS efficiency metrics
-            chars_per_sec = characters_count / metric.duration if metric.duration > 0 else 0
-            real_time_factor = metric.audio_duration / metric.duration if metric.duration > 0 else 0
-            
-            logger.info(f"📊 TTS Metrics - speech_id: {speech_id}, "
-                       f"ttfb: {metric.ttfb:.3f}s, duration: {metric.duration:.3f}s, "
-                       f"audio_duration: {metric.audio_duration:.3f}s, "
-                       f"characters: {characters_count}, streamed: {streamed}, "
-                       f"efficiency: {chars_per_sec:.1f}chars/s, RT_factor: {real_time_factor:.2f}x")
-        
-        # Check if we have a complete turn and emit structured metrics
-        if speech_id:
-            turn_summary = metrics_aggregator.get_turn_summary(speech_id)
-            if turn_summary.get('complete'):
-                # Enhanced turn complete logging with token and TTS metrics
-                llm_data = turn_summary.get('llm_data', {})
-                tts_data = turn_summary.get('tts_data', {})
-                
-                completion_tokens = llm_data.get('completion_tokens', 0)
-                prompt_tokens = llm_data.get('prompt_tokens', 0)
-                total_tokens = llm_data.get('total_tokens', 0)
-                tokens_per_sec = llm_data.get('tokens_per_second', 0)
-                
-                tts_characters = tts_data.get('characters_count', 0)
-                tts_streamed = tts_data.get('streamed', False)
-                tts_audio_duration = tts_data.get('audio_duration', 0)
-                
-                # Calculate TTS efficiency (characters per second)
-                tts_char_per_sec = tts_characters / turn_summary['tts_total'] if turn_summary['tts_total'] > 0 else 0
-                
-                logger.info(f"🎯 TURN COMPLETE - {speech_id}: "
-                           f"STT={turn_summary['stt_final_latency']:.3f}s, "
-                           f"LLM_TTFT={turn_summary['llm_ttft']:.3f}s, "
-                           f"LLM_Total={turn_summary['llm_total']:.3f}s, "
-                           f"TTS_TTFB={turn_summary['tts_ttfb']:.3f}s, "
-                           f"TTS_Total={turn_summary['tts_total']:.3f}s, "
-                           f"Total_Latency={turn_summary['total_conversation_latency']:.3f}s, "
-                           f"Tokens={completion_tokens}/{total_tokens} @{tokens_per_sec:.1f}tok/s, "
-                           f"TTS={tts_characters}chars @{tts_char_per_sec:.1f}c/s, streamed={tts_streamed}")
-                
-                # Emit structured event for external tracking (async via task)
-                async def emit_turn_metrics():
-                    try:
-                        from agent_pathway_integration import handle_call_event
-                        job_ctx = get_job_context()
-                        metadata = {}
-                        if job_ctx and job_ctx.job and job_ctx.job.metadata:
-                            try:
-                                metadata = json.loads(job_ctx.job.metadata)
-                            except Exception:
-                                metadata = {}
-                        call_id = metadata.get('supabase_call_id') or metadata.get('call_id')
-                        if call_id:
-                            await handle_call_event("turn_metrics_complete", str(call_id), turn_summary)
-                    except Exception as e:
-                        logger.debug(f"Failed to emit turn metrics: {e}")
-                
-                # Use asyncio.create_task for async operation in sync callback
-                import asyncio
-                try:
-                    asyncio.create_task(emit_turn_metrics())
-                except Exception as e:
-                    logger.debug(f"Failed to create turn metrics task: {e}")
+        logger.info(f"🎯 TURN COMPLETE - {turn_summary['speech_id']}: "
+                    f"EOU={metrics_aggregator.recent_turns[-1]['eou_delay']:.3f}s, "
+                    f"LLM_TTFT={turn_summary['llm_ttft']:.3f}s, TTS_TTFB={turn_summary['tts_ttfb']:.3f}s, "
+                    f"Total_Latency={turn_summary['total_conversation_latency']:.3f}s")
+        
+        # Structured event for external tracking (queued, written by the telemetry flusher)
+        if call_context.call_id:
+            emit_telemetry("turn_metrics_complete", call_context.call_id, turn_summary, **call_context.telemetry_fields())
 
-    # Add session end callback for usage summary
-    async def log_usage_summary():
+    # At session end: usage and latency profile of the call, then drain the telemetry queue
+    async def persist_call_summary():
         try:
-            summary = usage_collector.get_summary()
-            logger.info(f"💰 Session Usage Summary: {summary}")
+            usage_summary = usage_collector.get_summary()
+            latency_profile = metrics_aggregator.summary()
+            logger.info(f"💰 Session Usage Summary: {usage_summary}")
+            logger.info(f"⏱️ Call latency profile ({latency_profile['turns']} turns): {latency_profile['latency']}")
+            logger.info(f"🗃️ Config cache: {cache_stats()}")
+            if call_context.call_id:
+                emit_telemetry("call_summary", call_context.call_id, {
+                    "latency_profile": latency_profile,
+                    "usage": asdict(usage_summary),
+                }, **call_context.telemetry_fields())
         except Exception as e:
-            logger.debug(f"Failed to log usage summary: {e}")
-    
-    ctx.add_shutdown_callback(log_usage_summary)
+            logger.debug(f"Failed to build call summary: {e}")
+        await asyncio.gather(flush_telemetry(), flush_pathway_events())
 
     # ✅ SAFETY CHECK: Ensure both session and session_start_agent are defined
     if session is None:
@@ -1629,21 +1230,47 @@ async def entrypoint(ctx: JobContext):
         # Use default fallback instructions
         session_start_agent = Agent(instructions="I am Pam from TechSolutions Pro. How can I help you today?")
     
+    # Node agents and OutboundCaller read the call identity from the session userdata
+    if isinstance(session.userdata, PathwaySessionData):
+        session.userdata.call_context = call_context
+        # Node transitions and collected data are persisted behind the conversation, flushed at hangup
+        if call_context.pathway_execution_id:
+            session.userdata.start_state_buffer(
+                call_context.pathway_execution_id,
+                call_context.call_id,
+                variables=(call_details or {}).get("pathway_variables"),
+            )
+    
+    # LiveKit runs the shutdown callbacks concurrently: one callback orders the job's shutdown.
+    # Call summary and pathway state are written first, then the pooled HTTP connections are closed.
+    async def shut_down_job():
+        shutdown_writes = [persist_call_summary()]
+        if isinstance(session.userdata, PathwaySessionData):
+            shutdown_writes.append(session.userdata.close_state_buffer())
+        for result in await asyncio.gather(*shutdown_writes, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.error(f"❌ Error during job shutdown: {result}")
+        await close_http_clients()
+    
+    ctx.add_shutdown_callback(shut_down_job)
+    
     # Note: Dynamic agent configuration removed - inbound calls now use pathway system
     
+    # Open the TTS/STT streaming connections while the phone rings
+    prewarm_plugins(tts, stt, llm)
+    timeline.mark("session_ready")
+    
     # ✅ SIP CALL INITIATION (conditional based on call direction)
     if not is_inbound_call:
         # OUTBOUND: Create SIP participant to initiate call
-        print("📞 Creating SIP participant to initiate outbound call...", flush=True)
         logger.info("Creating SIP participant to initiate outbound call...")
         
         phone_number = metadata.get("dial_info", {}).get("phone_number")
         sip_trunk_id = metadata.get("dial_info", {}).get("sip_trunk_id")
             
-        print(f"📱 Phone: {phone_number}, Trunk: {sip_trunk_id}", flush=True)
+        logger.info(f"📱 Phone: {phone_number}, Trunk: {sip_trunk_id}")
         
         if phone_number and sip_trunk_id:
-            print(f"☎️ Dialing {phone_number} using SIP trunk {sip_trunk_id}", flush=True)
             logger.info(f"Dialing {phone_number} using SIP trunk {sip_trunk_id}")
             
             await ctx.api.sip.create_sip_participant(
@@ -1655,13 +1282,12 @@ async def entrypoint(ctx: JobContext):
                     wait_until_answered=True,
                 )
             )
-            print(f"📞 SIP call initiated to {phone_number}. Waiting for participant to join...", flush=True)
+            timeline.mark("call_answered")
             logger.info(f"SIP call initiated to {phone_number}. Waiting for participant to join...")
         else:
-            print("⚠️ Missing phone_number or sip_trunk_id - cannot initiate SIP call", flush=True)
+            logger.warning("⚠️ Missing phone_number or sip_trunk_id - cannot initiate SIP call")
     else:
         # INBOUND: Customer already connected via SIP trunk/dispatch rule
-        print("📞 INBOUND call - customer already connected, waiting for participant...", flush=True)
         logger.info("INBOUND call - customer already connected, waiting for participant...")
     
     # Note: Inbound call setup moved earlier to run before pathway logic
@@ -1671,13 +1297,13 @@ async def entrypoint(ctx: JobContext):
     reapply_logging_fix()
     logger.info("✅ Final logging fix applied before session start")
     
-    print("🎬 STARTING LIVEKIT SESSION", flush=True)
-    print(f"   Agent: {type(session_start_agent)}", flush=True)
-    print(f"   Room: {ctx.room.name}", flush=True)
+    logger.info(f"🎬 Starting LiveKit session: agent {type(session_start_agent).__name__}, room {ctx.room.name}")
     
+    timeline.log_setup()
+    timeline.watch_first_audio(session)
     await session.start(agent=session_start_agent, room=ctx.room)
 
-    print("🏁 SESSION COMPLETED", flush=True)
+    logger.info("🏁 SESSION COMPLETED")
 
 
 def find_start_node_id(pathway_config: dict) -> str | None:
@@ -1705,40 +1331,81 @@ def find_start_node_id(pathway_config: dict) -> str | None:
     return None
 
 
-async def get_pathway_for_call(call_id: int) -> tuple[dict | None, str | None]:
+def _pathway_config_from_call_details(call_id: int, call_details: dict | None) -> tuple[dict | None, str | None]:
+    """Pathway configuration and execution id of fetched call details"""
+    if call_details and call_details.get("pathway_config"):
+        pathway_config_json = json.loads(call_details["pathway_config"])
+        entry_point = pathway_config_json.get("entry_point", "NOT_FOUND")
+        logger.info(f"🔍 DEBUG: Fetched pathway config for call_id {call_id} with entry_point: {entry_point}")
+        logger.info(f"Fetched pathway config for call_id {call_id}: {pathway_config_json}")
+        return pathway_config_json, call_details.get("pathway_execution_id")
+    logger.warning(f"No pathway config found for call_id {call_id} in Supabase.")
+    return None, None
+
+
+async def get_pathway_for_call(call_id: int, pathway_execution_id: str | None = None) -> tuple[dict | None, str | None]:
     """Fetch the pathway configuration associated with a call."""
-    # This function needs to be implemented to fetch the pathway config from your backend
-    # based on the call_id. For now, it's a placeholder.
-    # In a real scenario, you'd call an API endpoint like:
-    # backend_url = os.getenv("BACKEND_API_URL", "http://localhost:8000")
-    # response = await httpx.AsyncClient().get(f"{backend_url}/pathways/call/{call_id}")
-    # if response.status_code == 200:
-    #     return response.json(), response.json().get("pathway_execution_id")
-    # else:
-    #     logger.error(f"Failed to fetch pathway config for call_id {call_id}: {response.status_code} - {response.text}")
-    #     return None, None
-
-    # Placeholder for actual backend call
-    logger.info(f"Placeholder: Fetching pathway config for call_id {call_id} from backend...")
-    # In a real scenario, you would fetch the pathway config from your backend
-    # For example, using Supabase:
     try:
-        # Assuming you have a function to get call details from Supabase
-        call_details = await get_call_details_from_supabase(supabase_service_client, call_id)
-        if call_details and call_details.get("pathway_config"):
-            pathway_config_json = json.loads(call_details["pathway_config"])
-            entry_point = pathway_config_json.get("entry_point", "NOT_FOUND")
-            logger.info(f"🔍 DEBUG: Fetched pathway config for call_id {call_id} with entry_point: {entry_point}")
-            logger.info(f"Fetched pathway config for call_id {call_id}: {pathway_config_json}")
-            return pathway_config_json, call_details.get("pathway_execution_id")
-        else:
-            logger.warning(f"No pathway config found for call_id {call_id} in Supabase.")
-            return None, None
+        call_details = await get_call_details_from_supabase(call_id, pathway_execution_id=pathway_execution_id)
+        return _pathway_config_from_call_details(call_id, call_details)
     except Exception as e:
         logger.error(f"Error fetching pathway config from Supabase for call_id {call_id}: {e}", exc_info=True)
         return None, None
 
 
+async def setup_call_pathway(call_id: str | None, agent_id: int | None, room_name: str, pathway_execution_id: str | None = None) -> tuple[dict | None, dict | None, str | None]:
+    """Auto-start the agent's default pathway for the call, then fetch the call with its pathway config.
+
+    An execution already started by the dispatcher (pathway_execution_id) is used as is.
+    Returns (call_details, pathway_config, pathway_execution_id).
+    """
+    if call_id is None:
+        logger.info("Inbound call: Skipping pathway auto-start (no call_id)")
+        return None, None, None
+
+    execution_id = pathway_execution_id
+    if agent_id and not execution_id:
+        try:
+            from agent_pathway_integration import auto_start_pathway_for_new_call
+            # Check if pathway execution already exists, if not create it
+            execution_id = await auto_start_pathway_for_new_call(
+                call_id=str(call_id),
+                agent_id=agent_id,
+                session_metadata={"room_name": room_name}
+            )
+            logger.info(f"✅ Auto-started pathway execution: {execution_id}")
+        except Exception as e:
+            logger.error(f"Error in auto-start pathway: {e}")
+
+    try:
+        # A just-started execution is fetched alongside the call
+        call_details = await get_call_details_from_supabase(call_id, pathway_execution_id=execution_id)
+    except Exception as e:
+        logger.error(f"Error fetching pathway config from Supabase for call_id {call_id}: {e}", exc_info=True)
+        return None, None, None
+    pathway_config, execution_id = _pathway_config_from_call_details(call_id, call_details)
+    return call_details, pathway_config, execution_id
+
+
+async def _get_phone_number_row(receiving_phone_number: str) -> dict | None:
+    return await cached(
+        ("phone_number", receiving_phone_number, "routing"),
+        lambda: fetch_one(get_async_db().table("phone_numbers").select(
+            "inbound_agent_id, phone_number_e164"
+        ).eq("phone_number_e164", receiving_phone_number)),
+    )
+
+
+async def _get_voice_row(voice_id: str) -> dict | None:
+    # Voice ID is stored in cartesia_voice_id for both providers
+    return await cached(
+        ("voice", voice_id),
+        lambda: fetch_one(get_async_db().table("voices").select(
+            "provider, language_code, name, provider_model"
+        ).eq("cartesia_voice_id", voice_id)),
+    )
+
+
 async def get_inbound_agent_id_for_phone_number(receiving_phone_number: str) -> int | None:
     """
     Get the inbound agent ID for a receiving phone number.
@@ -1757,15 +1424,13 @@ async def get_inbound_agent_id_for_phone_number(receiving_phone_number: str) ->
             return None
         
         # Get inbound_agent_id from phone_numbers table
-        phone_response = supabase_service_client.table("phone_numbers").select(
-            "inbound_agent_id"
-        ).eq("phone_number_e164", receiving_phone_number).maybe_single().execute()
+        phone_row = await _get_phone_number_row(receiving_phone_number)
         
-        if not phone_response.data:
+        if not phone_row:
             logger.warning(f"❌ Phone number {receiving_phone_number} not found in database")
             return None
         
-        inbound_agent_id = phone_response.data.get("inbound_agent_id")
+        inbound_agent_id = phone_row.get("inbound_agent_id")
         
         if not inbound_agent_id:
             logger.warning(f"❌ No inbound_agent_id configured for phone number {receiving_phone_number}")
@@ -1797,15 +1462,18 @@ async def load_agent_ai_models(agent_id: int) -> dict:
             return {}
         
         # Get agent's AI model configuration
-        agent_response = supabase_service_client.table("agents").select(
-            "tts_provider, tts_model, tts_voice, llm_provider, llm_model, llm_temperature, stt_provider, stt_model, stt_language, vad_provider"
-        ).eq("id", agent_id).maybe_single().execute()
+        agent_row = await cached(
+            ("agent", agent_id, "ai_models"),
+            lambda: fetch_one(get_async_db().table("agents").select(
+                "tts_provider, tts_model, tts_voice, llm_provider, llm_model, llm_temperature, stt_provider, stt_model, stt_language, vad_provider"
+            ).eq("id", agent_id)),
+        )
         
-        if not agent_response.data:
+        if not agent_row:
             logger.warning(f"❌ Agent {agent_id} not found in database for AI models")
             return {}
         
-        agent_data = agent_response.data
+        agent_data = agent_row
         
         # Build AI models configuration in expected format
         ai_models = {}
@@ -1813,7 +1481,6 @@ async def load_agent_ai_models(agent_id: int) -> dict:
         # TTS Configuration
         if agent_data.get("tts_provider"):
             voice_id = agent_data.get("tts_voice", "f9836c6e-a0bd-460e-9d3c-f7299fa60f94")
-            print(f"🎙️ Loading TTS voice for agent {agent_id}: {voice_id}", flush=True)
             logger.info(f"Loading TTS voice for agent {agent_id}: {voice_id}")
             
             ai_models["tts"] = {
@@ -1845,7 +1512,6 @@ async def load_agent_ai_models(agent_id: int) -> dict:
             }
         
         loaded_voice = ai_models.get('tts', {}).get('voice_id', 'default')
-        print(f"✅ Agent {agent_id} AI models loaded - Voice: {loaded_voice}", flush=True)
         logger.info(f"✅ Loaded AI models for agent {agent_id}: TTS={loaded_voice}")
         return ai_models
         
@@ -1870,14 +1536,12 @@ async def get_voice_provider(voice_id: str) -> str:
             return "cartesia"  # Default fallback
         
         # Look up voice by voice ID (stored in cartesia_voice_id field for both providers)
-        voice_response = supabase_service_client.table("voices").select(
-            "provider, language_code, name"
-        ).eq("cartesia_voice_id", voice_id).maybe_single().execute()
-        
-        if voice_response.data and voice_response.data.get("provider"):
-            provider = voice_response.data["provider"]
-            voice_name = voice_response.data.get("name", "Unknown")
-            language = voice_response.data.get("language_code", "en")
+        voice_row = await _get_voice_row(voice_id)
+        
+        if voice_row and voice_row.get("provider"):
+            provider = voice_row["provider"]
+            voice_name = voice_row.get("name", "Unknown")
+            language = voice_row.get("language_code", "en")
             logger.info(f"🎙️ Voice '{voice_name}' ({voice_id}) uses provider: {provider} (language: {language})")
             return provider
         else:
@@ -1910,12 +1574,10 @@ async def get_voice_configuration(voice_id: str) -> dict:
             }
         
         # Look up complete voice information
-        voice_response = supabase_service_client.table("voices").select(
-            "provider, language_code, name, provider_model"
-        ).eq("cartesia_voice_id", voice_id).maybe_single().execute()
+        voice_row = await _get_voice_row(voice_id)
         
-        if voice_response.data:
-            voice_data = voice_response.data
+        if voice_row:
+            voice_data = voice_row
             provider = voice_data.get("provider", "cartesia")
             language = voice_data.get("language_code", "fr")
             voice_name = voice_data.get("name", "Unknown")
@@ -1979,16 +1641,19 @@ async def create_inbound_call_record(receiving_phone_number: str, caller_phone_n
             return None
         
         # Get user_id for the agent (needed for call record)
-        agent_response = supabase_service_client.table("agents").select(
-            "user_id, default_pathway_id"
-        ).eq("id", agent_id).maybe_single().execute()
+        agent_row = await cached(
+            ("agent", agent_id, "owner"),
+            lambda: fetch_one(get_async_db().table("agents").select(
+                "user_id, default_pathway_id"
+            ).eq("id", agent_id)),
+        )
         
-        if not agent_response.data:
+        if not agent_row:
             logger.error(f"❌ Agent {agent_id} not found in database")
             return None
         
-        user_id = agent_response.data.get("user_id")
-        default_pathway_id = agent_response.data.get("default_pathway_id")
+        user_id = agent_row.get("user_id")
+        default_pathway_id = agent_row.get("default_pathway_id")
         
         # Create call record
         call_data = {
@@ -2005,10 +1670,10 @@ async def create_inbound_call_record(receiving_phone_number: str, caller_phone_n
         # Note: pathway_execution_id will be set later by auto_start_pathway_for_new_call
         logger.info(f"🛤️ Agent has default pathway: {default_pathway_id} (will be used for execution)")
         
-        call_response = supabase_service_client.table("calls").insert(call_data).execute()
+        call_row = await insert_call(call_data)
         
-        if call_response.data:
-            call_id = call_response.data[0]["id"]
+        if call_row:
+            call_id = call_row["id"]
             logger.info(f"✅ Created inbound call record with ID: {call_id}")
             return call_id
         else:
@@ -2038,15 +1703,13 @@ async def get_agent_config_by_phone_number(receiving_phone_number: str) -> dict
             return None
         
         # Step 1: Get inbound_agent_id from phone_numbers table
-        phone_response = supabase_service_client.table("phone_numbers").select(
-            "inbound_agent_id, phone_number_e164"
-        ).eq("phone_number_e164", receiving_phone_number).maybe_single().execute()
+        phone_row = await _get_phone_number_row(receiving_phone_number)
         
-        if not phone_response.data:
+        if not phone_row:
             logger.warning(f"❌ Phone number {receiving_phone_number} not found in database")
             return None
         
-        phone_data = phone_response.data
+        phone_data = phone_row
         inbound_agent_id = phone_data.get("inbound_agent_id")
         
         if not inbound_agent_id:
@@ -2056,15 +1719,18 @@ async def get_agent_config_by_phone_number(receiving_phone_number: str) -> dict
         logger.info(f"📞 Found inbound_agent_id: {inbound_agent_id} for number {receiving_phone_number}")
         
         # Step 2: Get agent configuration from agents table
-        agent_response = supabase_service_client.table("agents").select(
-            "id, name, system_prompt, initial_greeting, wait_for_greeting, interruption_threshold, supports_inbound"
-        ).eq("id", inbound_agent_id).maybe_single().execute()
+        agent_row = await cached(
+            ("agent", inbound_agent_id, "inbound_config"),
+            lambda: fetch_one(get_async_db().table("agents").select(
+                "id, name, system_prompt, initial_greeting, wait_for_greeting, interruption_threshold, supports_inbound"
+            ).eq("id", inbound_agent_id)),
+        )
         
-        if not agent_response.data:
+        if not agent_row:
             logger.warning(f"❌ Agent {inbound_agent_id} not found in agents table")
             return None
         
-        agent_data = agent_response.data
+        agent_data = agent_row
         
         # Verify agent supports inbound calls
         if not agent_data.get("supports_inbound", False):
@@ -2088,13 +1754,20 @@ async def get_agent_config_by_phone_number(receiving_phone_number: str) -> dict
         return None
 
 
-async def get_call_details_from_supabase(supabase_client, call_id: int) -> dict | None:
+async def _fetch_pathway_execution(execution_id: str) -> dict | None:
+    return await fetch_one(get_async_db().table("pathway_executions").select(
+        "id, pathway_id, status, variables"
+    ).eq("id", execution_id))
+
+
+async def get_call_details_from_supabase(call_id: int, pathway_execution_id: str | None = None) -> dict | None:
     """
     Fetch call details and associated pathway configuration from Supabase.
     
     Args:
-        supabase_client: The Supabase client instance
         call_id: The call ID to fetch details for
+        pathway_execution_id: Execution expected on the call, if known; it is then
+            fetched concurrently with the call instead of after it
     
     Returns:
         Dict containing call details and pathway_config, or None if not found
@@ -2103,15 +1776,20 @@ async def get_call_details_from_supabase(supabase_client, call_id: int) -> dict
         logger.info(f"🔍 Fetching call details for call_id: {call_id}")
         
         # First, get the call details including pathway_execution_id
-        call_response = supabase_client.table("calls").select(
+        call_query = fetch_one(get_async_db().table("calls").select(
             "id, pathway_execution_id, current_pathway_node_id, pathway_variables, agent_id, user_id, status"
-        ).eq("id", call_id).maybe_single().execute()
+        ).eq("id", call_id))
+        prefetched_execution = None
+        if pathway_execution_id:
+            call_row, prefetched_execution = await asyncio.gather(call_query, _fetch_pathway_execution(pathway_execution_id))
+        else:
+            call_row = await call_query
         
-        if not call_response.data:
+        if not call_row:
             logger.warning(f"❌ Call {call_id} not found in database")
             return None
         
-        call_data = call_response.data
+        call_data = call_row
         pathway_execution_id = call_data.get("pathway_execution_id")
         
         logger.info(f"📞 Call {call_id} found with pathway_execution_id: {pathway_execution_id}")
@@ -2122,29 +1800,33 @@ async def get_call_details_from_supabase(supabase_client, call_id: int) -> dict
             return call_data
         
         # Get pathway execution details
-        execution_response = supabase_client.table("pathway_executions").select(
-            "id, pathway_id, status, variables"
-        ).eq("id", pathway_execution_id).maybe_single().execute()
+        if prefetched_execution and str(prefetched_execution.get("id")) == str(pathway_execution_id):
+            execution_row = prefetched_execution
+        else:
+            execution_row = await _fetch_pathway_execution(pathway_execution_id)
         
-        if not execution_response.data:
+        if not execution_row:
             logger.warning(f"❌ Pathway execution {pathway_execution_id} not found")
             return call_data
         
-        execution_data = execution_response.data
+        execution_data = execution_row
         pathway_id = execution_data.get("pathway_id")
         
         logger.info(f"📋 Pathway execution found with pathway_id: {pathway_id}")
         
         # Get the actual pathway configuration
-        pathway_response = supabase_client.table("pathways").select(
-            "id, name, config, status"
-        ).eq("id", pathway_id).maybe_single().execute()
+        pathway_row = await cached(
+            ("pathway", pathway_id, "config"),
+            lambda: fetch_one(get_async_db().table("pathways").select(
+                "id, name, config, status, updated_at"
+            ).eq("id", pathway_id)),
+        )
         
-        if not pathway_response.data:
+        if not pathway_row:
             logger.warning(f"❌ Pathway {pathway_id} not found")
             return call_data
         
-        pathway_data = pathway_response.data
+        pathway_data = pathway_row
         pathway_config = pathway_data.get("config", {})
         
         logger.info(f"✅ Found pathway '{pathway_data.get('name')}' with config")
@@ -2155,7 +1837,9 @@ async def get_call_details_from_supabase(supabase_client, call_id: int) -> dict
             "pathway_config": json.dumps(pathway_config) if pathway_config else None,
             "pathway_execution_id": pathway_execution_id,
             "pathway_name": pathway_data.get("name"),
-            "pathway_status": pathway_data.get("status")
+            "pathway_status": pathway_data.get("status"),
+            "pathway_id": pathway_id,
+            "pathway_version": pathway_data.get("updated_at"),
         }
         
         return result
@@ -2166,8 +1850,8 @@ async def get_call_details_from_supabase(supabase_client, call_id: int) -> dict
 
 
 if __name__ == "__main__":
-    # Basic logging config for the worker process
-    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    # Logging of the worker process goes through the log pipeline (set up at import)
+    ensure_logging()
 
     # The launcher script (`agent_launcher.py`) is responsible for setting up the
     # environment, including loading .env files and assigning a dynamic port.
@@ -2190,6 +1874,7 @@ if __name__ == "__main__":
     # Define the worker options
     opts = WorkerOptions(
         entrypoint_fnc=entrypoint,
+        prewarm_fnc=prewarm,  # Loads Silero VAD and plugin clients once per process
         agent_name=worker_name,
         port=http_port,  # Pass the dynamically assigned port here
     )
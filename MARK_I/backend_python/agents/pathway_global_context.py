@@ -1,41 +1,45 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 from dataclasses import dataclass, field
 import json
 import os
 import sys
-from typing import Dict, Any, Optional, List, Set, AsyncIterable
+import time
+from typing import Dict, Any, Optional, List, Set, AsyncIterable, Tuple
 from livekit.agents import Agent, AgentSession, RunContext, function_tool, get_job_context
 from voice_adaptation_manager import VoiceAdaptationManager
+from pathway_graph import PathwayGraph, compile_pathway
+from call_context import CallContext
+# Per-utterance latency lines are sampled by the log pipeline
+from log_pipeline import METRIC_LOG
 
 logger = logging.getLogger(__name__)
 
-# Add the API directory to the path for crypto utilities
+# Add the API directory to the path for the database modules
 api_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'api')
 if api_path not in sys.path:
     sys.path.insert(0, api_path)
 
-try:
-    from crypto_utils import decrypt_credentials
-    crypto_utils_available = True
-    logger.info("✅ crypto_utils imported successfully")
-except ImportError as e:
-    crypto_utils_available = False
-    logger.warning(f"⚠️ Could not import crypto_utils: {e}")
+# Metrics go to the worker's telemetry queue, off the speech path
+from telemetry import emit as emit_telemetry
+# App connections are resolved once and cached with their decrypted credentials
+from app_connections import prefetch_app_connection, resolve_app_access_token
+# Pathway state changes are written behind the conversation
+from pathway_state import PathwayStateBuffer
+# Outbound API calls reuse the job's pooled HTTP connections
+from http_clients import get_aiohttp_session
 
-# Check for cryptography library availability
-try:
-    from cryptography.fernet import Fernet
-    import base64
-    cryptography_available = True
-except ImportError:
-    cryptography_available = False
-    logger.warning("⚠️ Cryptography library not available - app actions will be disabled")
+# Build the agents of the next possible nodes while the current node speaks
+TRANSITION_PREFETCH_ENABLED = os.getenv('PATHWAY_TRANSITION_PREFETCH', 'true').lower() in ('1', 'true', 'yes', 'on')
+# App connections are looked up for this user when the call has none
+DEFAULT_APP_USER_ID = 'b55837c4-270f-4f1f-8023-7ab09ee5f44d'  # Test user
 
-# Import database client
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-from api.db_client import supabase_service_client
+
+def _app_action_name(node_config: Dict[str, Any]) -> Optional[str]:
+    action_data = node_config.get('config', {}).get('data', {})
+    return action_data.get('app_name') or action_data.get('selected_app_name')
 
 
 @dataclass
@@ -54,38 +58,66 @@ class PathwaySessionData:
     # To store business-logic data collected during the call
     collected_data: Dict[str, Any] = field(default_factory=dict)
     
+    # Pathway row id and version (updated_at): compiled pathways are shared per version
+    pathway_id: Optional[str] = None
+    pathway_version: Optional[str] = None
+    
+    # Call, agent, pathway execution and user of the job, parsed once from the job metadata
+    call_context: Optional[CallContext] = None
+    
+    # When the pending transition's handoff started (transition gap)
+    transition_started_at: Optional[float] = field(default=None, repr=False)
+    
+    # Write-behind buffer of the pathway execution's state (set when the call has an execution)
+    state_buffer: Optional[PathwayStateBuffer] = field(default=None, repr=False)
+    
+    # Indexed view of pathway_config, compiled on first use
+    _graph: Optional[PathwayGraph] = field(default=None, init=False, repr=False)
+    _graph_config: Optional[Dict[str, Any]] = field(default=None, init=False, repr=False)
+    
+    @property
+    def graph(self) -> PathwayGraph:
+        """Pathway compiled for O(1) node/edge lookups (recompiled if pathway_config is replaced)."""
+        if self._graph is None or self._graph_config is not self.pathway_config:
+            self._graph = compile_pathway(self.pathway_config, self.pathway_id, self.pathway_version)
+            self._graph_config = self.pathway_config
+        return self._graph
+    
     def get_node_by_id(self, node_id: str) -> Optional[Dict[str, Any]]:
         """Get a node's configuration from the pathway."""
-        for node in self.pathway_config.get('nodes', []):
-            if node.get('id') == node_id:
-                return node
-        return None
+        return self.graph.node(node_id)
 
     def get_next_conversation_node(self, current_node_id: str) -> Optional[str]:
         """Find the next conversation node following the pathway edges."""
-        edges = self.pathway_config.get('edges', [])
-        nodes = self.pathway_config.get('nodes', [])
-        
-        # Find all outgoing edges from current node
-        outgoing_edges = [edge for edge in edges if edge.get('source') == current_node_id]
-        
-        for edge in outgoing_edges:
-            target_node_id = edge.get('target')
-            target_node = next((n for n in nodes if n.get('id') == target_node_id), None)
-            
-            if target_node and target_node.get('type') == 'conversation':
-                return target_node_id
-                
-            # If target is a condition, follow its edges to find next conversation node
-            elif target_node and target_node.get('type') == 'condition':
-                condition_edges = [e for e in edges if e.get('source') == target_node_id]
-                for condition_edge in condition_edges:
-                    next_target_id = condition_edge.get('target')
-                    next_target = next((n for n in nodes if n.get('id') == next_target_id), None)
-                    if next_target and next_target.get('type') == 'conversation':
-                        return next_target_id
-        
-        return None
+        return self.graph.next_conversation_node(current_node_id)
+
+    def prefetch_app_credentials(self, app_name: str, user_id: str):
+        """Start loading an app connection into the resolver cache (used by the app_action node)"""
+        prefetch_app_connection(app_name, user_id)
+
+    def start_state_buffer(self, execution_id: str, call_id: Optional[str] = None, variables: Optional[Dict[str, Any]] = None):
+        """Persist the node and collected data of this session to the pathway execution (write-behind)"""
+        if self.state_buffer is None:
+            self.state_buffer = PathwayStateBuffer(execution_id, call_id, self.current_node_id, variables)
+            self.state_buffer.start()
+        return self.state_buffer
+
+    async def close_state_buffer(self):
+        """Write the pending state and complete the execution (job shutdown callback)"""
+        if self.state_buffer is not None:
+            await self.state_buffer.close()
+
+    def record_node(self, node_id: Optional[str], result: Optional[Dict[str, Any]] = None):
+        """The session moved to a node"""
+        self.current_node_id = node_id
+        if self.state_buffer is not None:
+            self.state_buffer.record_node(node_id, result)
+
+    def record_collected_data(self, key: str, value: Any):
+        """Business data collected during the call (persisted as pathway variables)"""
+        self.collected_data[key] = value
+        if self.state_buffer is not None:
+            self.state_buffer.record_variables({key: value})
 
 
 class PathwayNodeAgent(Agent):
@@ -126,6 +158,9 @@ class PathwayNodeAgent(Agent):
         
         # Initialize transition state
         self._pending_transition = None
+        # Agents built ahead for the nodes this one can transition to, keyed by node_id
+        self._prefetched_agents: Dict[str, 'PathwayNodeAgent'] = {}
+        self._prefetch_task: Optional[asyncio.Task] = None
     
     @function_tool
     async def make_transition(self, target_node_name: str):
@@ -138,51 +173,17 @@ class PathwayNodeAgent(Agent):
         """
         logger.info(f"🎯 Transition requested to: {target_node_name}")
         
-        # Find the target node by name with flexible matching
-        all_nodes = self.pathway_config.get('nodes', [])
-        target_node = None
-        target_node_lower = target_node_name.lower().strip()
-        
-        logger.info(f"🔍 Looking for node matching: '{target_node_name}'")
-        logger.info(f"🔍 Available nodes: {[n.get('name', 'No name') for n in all_nodes]}")
+        # Find the target node by name: exact, then fuzzy (60% similarity), then partial match
+        target_node, match_type, score = self.session_data.graph.resolve_name(target_node_name)
         
-        # Try exact name match first
-        for node in all_nodes:
-            node_name = node.get('name', '').lower().strip()
-            if node_name == target_node_lower:
-                target_node = node
-                logger.info(f"✅ Exact match found: {node.get('name')}")
-                break
-        
-        # If no exact match, try fuzzy matching (remove common words and check similarity)
-        if not target_node:
-            import difflib
-            best_match = None
-            best_score = 0.0
-            
-            for node in all_nodes:
-                node_name = node.get('name', '').lower().strip()
-                # Calculate similarity score
-                score = difflib.SequenceMatcher(None, target_node_lower, node_name).ratio()
-                if score > best_score and score > 0.6:  # 60% similarity threshold
-                    best_score = score
-                    best_match = node
-            
-            if best_match:
-                target_node = best_match
-                logger.info(f"✅ Fuzzy match found: {best_match.get('name')} (score: {best_score:.2f})")
-        
-        # Last resort: partial match
-        if not target_node:
-            for node in all_nodes:
-                node_name = node.get('name', '').lower().strip()
-                if target_node_lower in node_name or node_name in target_node_lower:
-                    target_node = node
-                    logger.info(f"✅ Partial match found: {node.get('name')}")
-                    break
+        if target_node and match_type == "fuzzy":
+            logger.info(f"✅ Fuzzy match found: {target_node.get('name')} (score: {score:.2f})")
+        elif target_node:
+            logger.info(f"✅ {match_type.capitalize()} match found: {target_node.get('name')}")
         
         if not target_node:
             logger.error(f"❌ Target node '{target_node_name}' not found in pathway")
+            logger.info(f"🔍 Available nodes: {[n.get('name', 'No name') for n in self.session_data.graph.nodes]}")
             return f"Je ne peux pas vous diriger vers '{target_node_name}'. Puis-je vous aider autrement?"
         
         target_node_id = target_node.get('id')
@@ -191,8 +192,12 @@ class PathwayNodeAgent(Agent):
         # Update session data with new current node
         self.session_data.current_node_id = target_node_id
         
-        # Store the transition for later processing
+        # Store the transition for later processing; its agent is built while the reply is spoken
         self._pending_transition = target_node
+        try:
+            self._prefetch_target(target_node)
+        except Exception as e:
+            logger.debug(f"Could not prefetch agent for {target_node_id}: {e}")
         
         # Return a response that indicates the transition is happening
         target_name = target_node.get('name', 'cette section')
@@ -205,8 +210,7 @@ class PathwayNodeAgent(Agent):
         This follows the LiveKit pattern where function tools return Agent instances.
         """
         # Find target node configuration
-        all_nodes = self.pathway_config.get('nodes', [])
-        target_node = next((n for n in all_nodes if n.get('id') == target_node_id), None)
+        target_node = self.session_data.graph.node(target_node_id)
         
         if not target_node:
             logger.error(f"❌ Target node {target_node_id} not found in pathway")
@@ -215,19 +219,65 @@ class PathwayNodeAgent(Agent):
         # Update session data with new current node
         self.session_data.current_node_id = target_node_id
         
-        # Create new PathwayNodeAgent for target node (proper LiveKit pattern)
-        target_agent = PathwayNodeAgent(
-            node_config=target_node,
-            session_data=self.session_data,
-            chat_ctx=self.chat_ctx  # ✅ Preserve chat context in transition
-        )
+        # Agent built ahead while this node was speaking (its chat context is set at handoff)
+        target_agent = self._prefetched_agents.pop(target_node_id, None)
+        if target_agent is not None:
+            target_agent._prefetched = True
+        else:
+            # Create new PathwayNodeAgent for target node (proper LiveKit pattern)
+            target_agent = PathwayNodeAgent(
+                node_config=target_node,
+                session_data=self.session_data,
+                chat_ctx=self.chat_ctx  # ✅ Preserve chat context in transition
+            )
         
         # Mark as transition for proper greeting handling
         target_agent._is_transition = True
         
-        logger.info(f"✅ Created new Agent for node: {target_node_id} ({target_node.get('name', 'Unknown')})")
+        logger.info(f"✅ {'Using prefetched' if getattr(target_agent, '_prefetched', False) else 'Created new'} Agent for node: {target_node_id} ({target_node.get('name', 'Unknown')})")
         return target_agent
 
+    def _app_user_id(self) -> str:
+        call_context = getattr(self.session_data, 'call_context', None)
+        return (call_context and call_context.user_id) or DEFAULT_APP_USER_ID
+
+    def _prefetch_target(self, target_node: Dict[str, Any]):
+        """Build the agent of a node this one can transition to, and start resolving its app credentials"""
+        target_node_id = target_node.get('id')
+        if target_node_id is None or target_node_id == self.node_config.get('id') or target_node_id in self._prefetched_agents:
+            return
+        self._prefetched_agents[target_node_id] = PathwayNodeAgent(
+            node_config=target_node,
+            session_data=self.session_data,
+        )
+        if target_node.get('type') == 'app_action':
+            app_name = _app_action_name(target_node)
+            if app_name:
+                self.session_data.prefetch_app_credentials(app_name, self._app_user_id())
+
+    def _start_prefetch(self):
+        if TRANSITION_PREFETCH_ENABLED and self._prefetch_task is None:
+            self._prefetch_task = asyncio.create_task(self._prefetch_transitions())
+
+    async def _prefetch_transitions(self):
+        """Speculatively build the agents of every outgoing edge of this node"""
+        started = time.perf_counter()
+        for edge in self.session_data.graph.outgoing_edges(self.node_config.get('id')):
+            target_node = self.session_data.graph.node(edge.get('target'))
+            if not target_node:
+                continue
+            try:
+                self._prefetch_target(target_node)
+            except Exception as e:
+                logger.debug(f"Could not prefetch agent for {edge.get('target')}: {e}")
+            # One agent at a time: the audio pipeline runs between them
+            await asyncio.sleep(0)
+        logger.debug(f"Prefetched {len(self._prefetched_agents)} transition agents for {self.node_config.get('id')} in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    async def _get_app_access_token(self, app_name: str, user_id: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Cached access token (prefetched during the previous node), else loaded now"""
+        return await resolve_app_access_token(app_name, user_id)
+
     async def _say_with_adaptation(self, text_or_stream, *, stage: Optional[str] = None, analysis_text: Optional[str] = None, allow_interruptions_default: bool = True):
         """Helper to apply voice adaptation before speaking."""
         try:
@@ -268,26 +318,24 @@ class PathwayNodeAgent(Agent):
             async for frame in Agent.default.tts_node(self, text, model_settings):
                 if first_ts is None:
                     first_ts = _time.time()
-                    logger.info(f"📈 TTS TTFB: {first_ts - start_ts:.3f}s")
+                    logger.info(f"📈 TTS TTFB: {first_ts - start_ts:.3f}s", extra=METRIC_LOG)
+                    # Next nodes' agents are built while this utterance plays
+                    self._start_prefetch()
                 yield frame
         finally:
             end_ts = _time.time()
             total = end_ts - start_ts
-            logger.info(f"📈 TTS total synthesis time: {total:.3f}s (stage={stage})")
+            logger.info(f"📈 TTS total synthesis time: {total:.3f}s (stage={stage})", extra=METRIC_LOG)
 
             # Emit structured metrics event
             try:
-                job_ctx = get_job_context()
-                room_name = getattr(job_ctx.room, 'name', None)
-                metadata = {}
-                if job_ctx and job_ctx.job and job_ctx.job.metadata:
-                    try:
-                        metadata = json.loads(job_ctx.job.metadata)
-                    except Exception:
-                        metadata = {}
-                call_id = metadata.get('supabase_call_id') or metadata.get('call_id')
-                agent_id = metadata.get('agent_id')
-                pathway_execution_id = metadata.get('pathway_execution_id')
+                call_context = self.session_data.call_context
+                if call_context is None:
+                    call_context = self.session_data.call_context = CallContext.from_job(get_job_context())
+                call_id = call_context.call_id
+                room_name = call_context.room_name
+                agent_id = call_context.agent_id
+                pathway_execution_id = call_context.pathway_execution_id
                 node_id = self.session_data.current_node_id
 
                 metrics = {
@@ -308,13 +356,9 @@ class PathwayNodeAgent(Agent):
                     },
                 }
 
-                # Try to emit via pathway integration helper if available
-                try:
-                    from agent_pathway_integration import handle_call_event
-                    if call_id:
-                        await handle_call_event("utterance_metrics", str(call_id), metrics)
-                except Exception as e:
-                    logger.debug(f"Metrics emit fallback (no handle_call_event): {e}; metrics={metrics}")
+                if call_id:
+                    emit_telemetry("utterance_metrics", call_id, metrics, room_name=room_name, agent_id=agent_id,
+                                   pathway_execution_id=pathway_execution_id, node_id=node_id)
             except Exception as e:
                 logger.debug(f"Failed to build/emit metrics: {e}")
             
@@ -334,25 +378,21 @@ class PathwayNodeAgent(Agent):
             async for chunk in Agent.default.llm_node(self, chat_ctx, tools, model_settings):
                 if first_ts is None:
                     first_ts = _time.time()
-                    logger.info(f"📈 LLM TTFB: {first_ts - start_ts:.3f}s (stage={stage})")
+                    logger.info(f"📈 LLM TTFB: {first_ts - start_ts:.3f}s (stage={stage})", extra=METRIC_LOG)
                 yield chunk
         finally:
             end_ts = _time.time()
             total = end_ts - start_ts
-            logger.info(f"📈 LLM total latency: {total:.3f}s (stage={stage})")
+            logger.info(f"📈 LLM total latency: {total:.3f}s (stage={stage})", extra=METRIC_LOG)
             # Emit metrics
             try:
-                job_ctx = get_job_context()
-                room_name = getattr(job_ctx.room, 'name', None)
-                metadata = {}
-                if job_ctx and job_ctx.job and job_ctx.job.metadata:
-                    try:
-                        metadata = json.loads(job_ctx.job.metadata)
-                    except Exception:
-                        metadata = {}
-                call_id = metadata.get('supabase_call_id') or metadata.get('call_id')
-                agent_id = metadata.get('agent_id')
-                pathway_execution_id = metadata.get('pathway_execution_id')
+                call_context = self.session_data.call_context
+                if call_context is None:
+                    call_context = self.session_data.call_context = CallContext.from_job(get_job_context())
+                call_id = call_context.call_id
+                room_name = call_context.room_name
+                agent_id = call_context.agent_id
+                pathway_execution_id = call_context.pathway_execution_id
                 node_id = self.session_data.current_node_id
 
                 metrics = {
@@ -366,12 +406,9 @@ class PathwayNodeAgent(Agent):
                     "llm_ttfb_ms": int(((first_ts or end_ts) - start_ts) * 1000),
                     "llm_total_ms": int(total * 1000),
                 }
-                try:
-                    from agent_pathway_integration import handle_call_event
-                    if call_id:
-                        await handle_call_event("llm_metrics", str(call_id), metrics)
-                except Exception as e:
-                    logger.debug(f"Metrics emit fallback (no handle_call_event): {e}; metrics={metrics}")
+                if call_id:
+                    emit_telemetry("llm_metrics", call_id, metrics, room_name=room_name, agent_id=agent_id,
+                                   pathway_execution_id=pathway_execution_id, node_id=node_id)
             except Exception as e:
                 logger.debug(f"Failed to build/emit LLM metrics: {e}")
 
@@ -384,81 +421,10 @@ class PathwayNodeAgent(Agent):
 
     def _build_instructions(self) -> str:
         """
-        Build comprehensive instructions for this pathway node that guide the LLM
-        on both the conversation content and when to transition to other nodes.
+        Instructions of this pathway node (content and when to transition to other
+        nodes), rendered once per compiled pathway and shared across calls.
         """
-        base_instructions = []
-        
-        # 1. Add node-specific prompt/instructions
-        # Try to get prompt from config.prompt (main format) or directly from prompt (test format)
-        node_prompt = (self.node_config.get('config', {}).get('prompt', '') or 
-                       self.node_config.get('prompt', ''))
-        if node_prompt:
-            base_instructions.append(f"CONVERSATION ROLE: {node_prompt}")
-        
-        # 2. Add context about current pathway position
-        node_name = self.node_config.get('name', 'Unknown Node')
-        node_id = self.node_config.get('id', 'unknown')
-        base_instructions.append(f"CURRENT NODE: You are currently in '{node_name}' (ID: {node_id})")
-        
-        # 3. ✅ ADD DYNAMIC TRANSITION RULES
-        base_instructions.extend([
-            "",
-            "🔥 TRANSITION INSTRUCTIONS:",
-            "- Use make_transition(target_node_name) to move to another part of the conversation",
-            "- Pass the NAME of the target node (not the ID)",
-            "- Listen to user intent to determine when and where to transition",
-            ""
-        ])
-        
-        # 4. Add available transition targets based on pathway edges
-        current_node_id = self.node_config.get('id')
-        all_edges = self.pathway_config.get('edges', [])
-        outgoing_edges = [edge for edge in all_edges if edge.get('source') == current_node_id]
-        
-        if outgoing_edges:
-            base_instructions.append("🎯 AVAILABLE DESTINATIONS:")
-            for edge in outgoing_edges:
-                condition = edge.get('condition', 'default')
-                target_id = edge.get('target')
-                target_node = next((n for n in self.pathway_config.get('nodes', []) if n.get('id') == target_id), None)
-                if target_node:
-                    target_name = target_node.get('name', target_id)
-                    target_type = target_node.get('type', 'conversation')
-                    
-                    if target_type == 'app_action':
-                        base_instructions.append(f"  🔧 make_transition('{target_name}') → When: {condition}")
-                    elif target_type == 'condition':
-                        base_instructions.append(f"  🔀 make_transition('{target_name}') → When: {condition}")
-                    else:
-                        base_instructions.append(f"  💬 make_transition('{target_name}') → When: {condition}")
-                        
-                        # Add specific trigger guidance for app actions
-                        if 'app_action' in target_id.lower() or 'calendar' in target_name.lower():
-                            base_instructions.append(f"    ⚡ TRIGGER WORDS: Oui, Ok, D'accord, Parfait, Ça marche, C'est bon → IMMEDIATE transition!")
-                        
-                        # Add specific trigger guidance for common appointment words
-                        if 'schedule' in target_name.lower() or 'appointment' in target_name.lower() or 'rdv' in target_name.lower():
-                            base_instructions.append(f"    📅 APPOINTMENT TRIGGERS: Any acceptance of date/time → IMMEDIATE transition!")
-        
-        # 5. Add tool execution priority
-        if 'schedule' in node_name.lower() or 'appointment' in node_name.lower() or 'callback' in node_name.lower():
-            base_instructions.extend([
-                "",
-                "🚨 MANDATORY APPOINTMENT SCHEDULING SEQUENCE:",
-                "1. FIRST: Collect appointment details (date, time, duration, purpose)",
-                "2. SECOND: Confirm details with user",  
-                "3. When user confirms appointment details, use the appropriate dynamic transition",
-                "4. Follow the pathway flow as configured in the system",
-                "",
-                "🎯 DYNAMIC TRANSITIONS:",
-                "• All transition functions are automatically generated from pathway configuration",
-                "• Use the transition functions that appear in your available tools list",
-                "• Follow the pathway edges as defined in the configuration",
-                ""
-            ])
-        
-        return "\n".join(base_instructions)
+        return self.session_data.graph.instructions(self.node_config)
     
     # 🔥 DYNAMIC TRANSITION SYSTEM: Transition functions are now auto-generated from pathway config
     # The hardcoded functions below are kept for backward compatibility with legacy pathways
@@ -491,7 +457,8 @@ class PathwayNodeAgent(Agent):
             # Update the session userdata with the proper object
             self.session.userdata = session_data
         
-        session_data.current_node_id = self.node_config.get('id')
+        session_data.record_node(self.node_config.get('id'), {"node_type": self.node_config.get('type')})
+        self._record_transition_gap(session_data)
         
         # Apply per-session/per-agent voice adaptation overrides if present
         try:
@@ -531,9 +498,7 @@ class PathwayNodeAgent(Agent):
                 
                 # Update session data with action results
                 session_data = self.session.userdata
-                if not hasattr(session_data, 'collected_data'):
-                    session_data.collected_data = {}
-                session_data.collected_data[f'app_action_{self.node_config.get("id")}'] = result
+                session_data.record_collected_data(f'app_action_{self.node_config.get("id")}', result)
                 
                 # Respond to user about the action completion
                 if result.get('status') == 'success':
@@ -643,10 +608,30 @@ class PathwayNodeAgent(Agent):
         # ✅ PROPER LIVEKIT PATTERN: Wait for user input, don't force generate_reply
         logger.info(f"🤖 Node ready for conversation: {self.node_config.get('id')} (waiting for user input)")
 
+    def _record_transition_gap(self, session_data: PathwaySessionData):
+        """Time from the end of the previous node's utterance to this node taking over"""
+        started_at = getattr(session_data, 'transition_started_at', None)
+        if started_at is None:
+            return
+        session_data.transition_started_at = None
+        gap_ms = round((time.perf_counter() - started_at) * 1000, 1)
+        prefetched = getattr(self, '_prefetched', False)
+        node_id = self.node_config.get('id')
+        logger.info(f"⏱️ Transition gap to {node_id}: {gap_ms}ms (prefetched={prefetched})")
+        call_context = session_data.call_context
+        if call_context and call_context.call_id:
+            emit_telemetry("pathway_transition", call_context.call_id, {
+                "to_node_id": node_id,
+                "node_type": self.node_config.get('type'),
+                "gap_ms": gap_ms,
+                "prefetched": prefetched,
+            }, **call_context.telemetry_fields(), node_id=node_id)
+
     async def _handle_pending_transition(self):
         """Process any pending transitions after TTS completes."""
         if hasattr(self, '_pending_transition') and self._pending_transition:
             logger.info(f"🔄 Processing pending transition to: {self._pending_transition.get('name')}")
+            self.session_data.transition_started_at = time.perf_counter()
             
             # Create the target agent
             target_agent = self._create_target_agent(self._pending_transition.get('id'))
@@ -656,6 +641,16 @@ class PathwayNodeAgent(Agent):
             
             # Try multiple ways to access the LiveKit session for agent handoff
             try:
+                if getattr(target_agent, '_prefetched', False):
+                    # ✅ Preserve chat context in transition
+                    await target_agent.update_chat_ctx(self.chat_ctx)
+                
+                # Method 0: LiveKit session of this agent
+                if target_agent is not self and hasattr(self.session, 'update_agent'):
+                    self.session.update_agent(target_agent)
+                    logger.info("✅ Transition handed off via agent session")
+                    return True
+                
                 # Method 1: Try via agent context
                 if hasattr(self, 'ctx') and hasattr(self.ctx, 'session'):
                     await self.ctx.session.set_agent(target_agent)
@@ -696,142 +691,11 @@ class PathwayNodeAgent(Agent):
             from datetime import datetime, timedelta
             
             # Get user's OAuth connection for the app
-            session_data = self.session.userdata
-            user_id = getattr(session_data, 'user_id', 'b55837c4-270f-4f1f-8023-7ab09ee5f44d')  # Default to test user
-            
-            # Query user's app connection
-            logger.info(f"🔍 Looking for {app_name} connection for user {user_id}")
-            connections_response = supabase_service_client.table("user_app_connections").select("*").eq("user_id", user_id).execute()
-            
-            if not connections_response.data:
-                logger.warning(f"❌ No OAuth connections found for user {user_id}")
-                return {
-                    "status": "error",
-                    "error": "No OAuth connection found. Please connect your Google Calendar first.",
-                    "user_message": "I need you to connect your Google Calendar first before I can schedule appointments."
-                }
-            
-            # Find Google Calendar connection
-            calendar_connection = None
-            for conn in connections_response.data:
-                app_integration_response = supabase_service_client.table("app_integrations").select("*").eq("id", conn["app_integration_id"]).execute()
-                if app_integration_response.data and app_integration_response.data[0]["name"] == "google_calendar":
-                    calendar_connection = conn
-                    break
-            
-            if not calendar_connection:
-                logger.warning(f"❌ No Google Calendar connection found for user {user_id}")
-                return {
-                    "status": "error",
-                    "error": "Google Calendar not connected",
-                    "user_message": "I need you to connect your Google Calendar first before I can schedule appointments."
-                }
+            user_id = self._app_user_id()
             
-            logger.info(f"✅ Found Google Calendar connection: {calendar_connection['id']}")
-            
-            # Decrypt OAuth credentials
-            try:
-                encrypted_credentials = calendar_connection["credentials"]
-                logger.info(f"🔐 Attempting to decrypt OAuth credentials")
-                
-                access_token = None
-                
-                # Method 1: Use the proper crypto_utils function if available
-                if crypto_utils_available:
-                    try:
-                        oauth_data = decrypt_credentials(encrypted_credentials)
-                        access_token = oauth_data.get("access_token")
-                        if access_token:
-                            logger.info(f"✅ Successfully decrypted credentials using crypto_utils")
-                        else:
-                            logger.warning("⚠️ crypto_utils decrypted but no access_token found")
-                    except Exception as crypto_error:
-                        logger.warning(f"⚠️ crypto_utils decryption failed: {crypto_error}")
-                
-                # Fallback methods if crypto_utils failed or unavailable
-                if not access_token:
-                    logger.info("Trying fallback decryption methods...")
-                    
-                    # Method 2: Try base64 decoding (common format)
-                try:
-                    import base64
-                    decoded_data = base64.b64decode(encrypted_credentials)
-                    oauth_data = json.loads(decoded_data.decode())
-                    access_token = oauth_data.get("access_token")
-                    logger.info(f"✅ Successfully decoded credentials using base64")
-                except:
-                    pass
-                
-                    # Method 3: Try Fernet decryption if base64 failed
-                if not access_token and cryptography_available:
-                    try:
-                        # Get encryption key for decrypting OAuth tokens (same pattern as crypto_utils.py)
-                        encryption_key_str = os.getenv('INTEGRATION_ENCRYPTION_KEY', 'your-32-byte-base64-encoded-key==')
-                        # Convert string to bytes properly (don't double-encode!)
-                        encryption_key_bytes = encryption_key_str.encode() if isinstance(encryption_key_str, str) else encryption_key_str
-                        f = Fernet(encryption_key_bytes)
-                        
-                        # Try direct Fernet decryption
-                        decrypted_data = f.decrypt(encrypted_credentials.encode())
-                        oauth_data = json.loads(decrypted_data.decode())
-                        access_token = oauth_data.get("access_token")
-                        logger.info(f"✅ Successfully decrypted credentials using Fernet")
-                    except Exception as fernet_error:
-                        logger.debug(f"Fernet direct decryption failed: {fernet_error}")
-                        
-                        # Try Fernet decryption on base64-decoded data (our discovered format)
-                        try:
-                            decoded_creds = base64.b64decode(encrypted_credentials)
-                            decrypted_data = f.decrypt(decoded_creds)
-                            oauth_data = json.loads(decrypted_data.decode())
-                            access_token = oauth_data.get("access_token")
-                            logger.info(f"✅ Successfully decrypted credentials using Fernet on base64-decoded data")
-                        except Exception as fernet_b64_error:
-                            logger.debug(f"Fernet on base64 decryption failed: {fernet_b64_error}")
-                            pass
-                    
-                    # Method 4: Try direct JSON parsing (if stored as plain JSON)
-                if not access_token:
-                    try:
-                        oauth_data = json.loads(encrypted_credentials)
-                        access_token = oauth_data.get("access_token")
-                        logger.info(f"✅ Successfully parsed credentials as direct JSON")
-                    except:
-                        pass
-                
-                    # Method 5: Try alternative encryption keys (for key rotation scenarios)
-                    if not access_token and cryptography_available:
-                        try:
-                            # Try the other key we discovered in the diagnostic
-                            alt_key_str = 'wLwYSfmXhP29kuL5FU1l5S8iamcAHTAHj4UenDylIdw='
-                            # Convert string to bytes properly (don't double-encode!)
-                            alt_key_bytes = alt_key_str.encode() if isinstance(alt_key_str, str) else alt_key_str
-                            f_alt = Fernet(alt_key_bytes)
-                            
-                            # Try with base64-decoded data first (our discovered format)
-                            decoded_creds = base64.b64decode(encrypted_credentials)
-                            decrypted_data = f_alt.decrypt(decoded_creds)
-                            oauth_data = json.loads(decrypted_data.decode())
-                            access_token = oauth_data.get("access_token")
-                            logger.info(f"✅ Successfully decrypted credentials using alternative key")
-                        except Exception as alt_key_error:
-                            logger.debug(f"Alternative key decryption failed: {alt_key_error}")
-                        pass
-                
-                if not access_token:
-                        logger.error("❌ Could not extract access_token from any decryption method")
-                        logger.error(f"   Credential format: {len(encrypted_credentials)} chars, starts with: {encrypted_credentials[:50]}...")
-                        raise Exception("Could not extract access_token from any decryption method")
-                    
-                logger.info(f"🔐 Successfully extracted access token")
-                
-            except Exception as e:
-                logger.error(f"❌ Failed to decrypt OAuth credentials: {e}")
-                return {
-                    "status": "error",
-                    "error": "Failed to access Google Calendar credentials",
-                    "user_message": "There was an issue accessing your Google Calendar. Please reconnect your account."
-                }
+            access_token, error = await self._get_app_access_token(app_name, user_id)
+            if error:
+                return error
             
             # Execute specific app action
             if app_name == "google_calendar" and action_type == "create_event":
@@ -856,28 +720,27 @@ class PathwayNodeAgent(Agent):
         """
         Create a Google Calendar event using the Calendar API
         """
-        import aiohttp
         from datetime import datetime, timedelta
         import json
         
         logger.info(f"📅 Creating Google Calendar event with parameters: {parameters}")
         
         try:
-            # Use single aiohttp session for both API calls
+            # Use the shared aiohttp session for both API calls
+            session = get_aiohttp_session()
             headers = {
                 "Authorization": f"Bearer {access_token}",
                 "Content-Type": "application/json"
             }
             
             # First, get the user's Google Calendar timezone setting 
-            async with aiohttp.ClientSession() as session:
-                calendar_response = await session.get(
-                    "https://www.googleapis.com/calendar/v3/calendars/primary",
-                    headers=headers
-                )
+            async with session.get(
+                "https://www.googleapis.com/calendar/v3/calendars/primary",
+                headers=headers
+            ) as calendar_response:
                 calendar_data = await calendar_response.json()
-                user_timezone = calendar_data.get("timeZone", "UTC")
-                logger.info(f"🌍 Using user's Google Calendar timezone: {user_timezone}")
+            user_timezone = calendar_data.get("timeZone", "UTC")
+            logger.info(f"🌍 Using user's Google Calendar timezone: {user_timezone}")
                 
             # Prepare event data with smart defaults
             session_data = self.session.userdata
@@ -982,10 +845,9 @@ class PathwayNodeAgent(Agent):
         
         try:
             current_node_id = self.node_config.get('id')
-            all_edges = self.pathway_config.get('edges', [])
             
             # Find outgoing edges from current app_action node
-            outgoing_edges = [edge for edge in all_edges if edge.get('source') == current_node_id]
+            outgoing_edges = self.session_data.graph.outgoing_edges(current_node_id)
             
             if outgoing_edges:
                 # Take the first available edge (app_action nodes typically have one exit)
@@ -1000,12 +862,11 @@ class PathwayNodeAgent(Agent):
                 logger.info(f"🎯 Auto-transitioning to: {target_node_id}")
                 
                 # Find target node
-                all_nodes = self.pathway_config.get('nodes', [])
-                target_node = next((node for node in all_nodes if node.get('id') == target_node_id), None)
+                target_node = self.session_data.graph.node(target_node_id)
                 
                 if target_node:
                     # Update current node tracking
-                    self.session_data.current_node_id = target_node_id
+                    self.session_data.record_node(target_node_id, {"node_type": target_node.get('type'), "auto": True})
                     
                     # Pre-create target agent if it doesn't exist (for future transitions)
                     if target_node_id not in self.session_data.agent_instances:
@@ -1167,7 +1028,8 @@ Generate a natural, personalized goodbye message (keep it under 50 words):"""
         Following LiveKit workflow patterns.
         """
         logger.info(f"👋 Exiting pathway node: {self.node_config.get('id')}")
+        if self._prefetch_task is not None and not self._prefetch_task.done():
+            self._prefetch_task.cancel()
+        self._prefetched_agents.clear()
         
-        # Future: Save session data to database
-        # session_data: PathwaySessionData = self.session.userdata
-        # await session_data.save_to_database(supabase_client, pathway_execution_id)
+        # The session state is written by session_data.state_buffer (no database call here)
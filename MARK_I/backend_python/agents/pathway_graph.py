@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import difflib
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from config_cache import config_cache
+except ImportError:
+    from api.config_cache import config_cache
+
+# Minimum similarity of a fuzzy node-name match (same threshold as before the index)
+FUZZY_MATCH_THRESHOLD = 0.6
+# Resolved node names remembered per pathway (the LLM repeats the same few names)
+RESOLVE_CACHE_SIZE = 256
+
+
+def normalize_name(name: Optional[str]) -> str:
+    return (name or "").lower().strip()
+
+
+class PathwayGraph:
+    """Pathway config compiled once per pathway version (see compile_pathway).
+
+    Nodes by id and by normalized name, outgoing edges per node, a fuzzy name
+    index (a SequenceMatcher per node name with its tables built once) and the
+    rendered node instructions, so lookups during a call do not scan the
+    config. Lookups return the config's own node and edge dicts, in config
+    order; they are shared by the calls of the process and must not be mutated.
+    """
+
+    def __init__(self, pathway_config: Optional[Dict[str, Any]]):
+        self.config = pathway_config
+        config = pathway_config or {}
+        self.nodes: List[Dict[str, Any]] = list(config.get("nodes", []) or [])
+        self.edges: List[Dict[str, Any]] = list(config.get("edges", []) or [])
+
+        self.nodes_by_id: Dict[Any, Dict[str, Any]] = {}
+        self.nodes_by_name: Dict[str, Dict[str, Any]] = {}
+        for node in self.nodes:
+            # First node wins, as with the former linear scans
+            self.nodes_by_id.setdefault(node.get("id"), node)
+            self.nodes_by_name.setdefault(normalize_name(node.get("name", "")), node)
+
+        self.outgoing: Dict[Any, List[Dict[str, Any]]] = {}
+        for edge in self.edges:
+            self.outgoing.setdefault(edge.get("source"), []).append(edge)
+
+        # SequenceMatcher caches its analysis of the second sequence: the node name
+        self._fuzzy_index: List[Tuple[str, difflib.SequenceMatcher, Dict[str, Any]]] = []
+        for node in self.nodes:
+            node_name = normalize_name(node.get("name", ""))
+            self._fuzzy_index.append((node_name, difflib.SequenceMatcher(None, "", node_name), node))
+
+        self._resolved: Dict[str, Tuple[Optional[Dict[str, Any]], str, float]] = {}
+        self._next_conversation: Dict[Any, Optional[str]] = {}
+        self._instructions: Dict[Any, str] = {}
+
+    def node(self, node_id: Any) -> Optional[Dict[str, Any]]:
+        return self.nodes_by_id.get(node_id)
+
+    def nodes_of_type(self, node_type: str) -> List[Dict[str, Any]]:
+        return [node for node in self.nodes if node.get("type") == node_type]
+
+    def outgoing_edges(self, node_id: Any) -> List[Dict[str, Any]]:
+        return self.outgoing.get(node_id, [])
+
+    def next_conversation_node(self, node_id: Any) -> Optional[str]:
+        """First conversation node after a node, directly or through a condition node"""
+        if node_id in self._next_conversation:
+            return self._next_conversation[node_id]
+        result = None
+        for edge in self.outgoing_edges(node_id):
+            target_id = edge.get("target")
+            target = self.node(target_id)
+            if not target:
+                continue
+            if target.get("type") == "conversation":
+                result = target_id
+                break
+            if target.get("type") == "condition":
+                result = next(
+                    (condition_edge.get("target") for condition_edge in self.outgoing_edges(target_id)
+                     if (self.node(condition_edge.get("target")) or {}).get("type") == "conversation"),
+                    None,
+                )
+                if result:
+                    break
+        self._next_conversation[node_id] = result
+        return result
+
+    def instructions(self, node_config: Dict[str, Any]) -> str:
+        """Instructions of a node, rendered once per compiled pathway"""
+        node_id = node_config.get("id")
+        own_node = self.nodes_by_id.get(node_id)
+        if own_node is not node_config and own_node != node_config:
+            # Not a node of this pathway (e.g. a node config built on the fly)
+            return render_node_instructions(node_config, self)
+        instructions = self._instructions.get(node_id)
+        if instructions is None:
+            instructions = render_node_instructions(node_config, self)
+            self._instructions[node_id] = instructions
+        return instructions
+
+    def resolve_name(self, target_name: str) -> Tuple[Optional[Dict[str, Any]], str, float]:
+        """Node named like target_name: (node, "exact"|"fuzzy"|"partial"|"none", score)"""
+        target = normalize_name(target_name)
+        resolved = self._resolved.get(target)
+        if resolved is None:
+            resolved = self._resolve(target)
+            if len(self._resolved) >= RESOLVE_CACHE_SIZE:
+                self._resolved.pop(next(iter(self._resolved)))
+            self._resolved[target] = resolved
+        return resolved
+
+    def _resolve(self, target: str) -> Tuple[Optional[Dict[str, Any]], str, float]:
+        node = self.nodes_by_name.get(target)
+        if node is not None:
+            return node, "exact", 1.0
+
+        best_match = None
+        best_score = FUZZY_MATCH_THRESHOLD
+        for _, matcher, candidate in self._fuzzy_index:
+            matcher.set_seq1(target)
+            # Upper bounds first: ratio() only for names that could beat the best score
+            if matcher.real_quick_ratio() <= best_score or matcher.quick_ratio() <= best_score:
+                continue
+            score = matcher.ratio()
+            if score > best_score:
+                best_score = score
+                best_match = candidate
+        if best_match is not None:
+            return best_match, "fuzzy", best_score
+
+        for node_name, _, candidate in self._fuzzy_index:
+            if target in node_name or node_name in target:
+                return candidate, "partial", 0.0
+        return None, "none", 0.0
+
+
+def _config_digest(pathway_config: Optional[Dict[str, Any]]) -> str:
+    return hashlib.sha1(json.dumps(pathway_config, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def compile_pathway(
+    pathway_config: Optional[Dict[str, Any]],
+    pathway_id: Optional[str] = None,
+    version: Optional[str] = None,
+) -> PathwayGraph:
+    """Compiled graph of a pathway, shared by the calls of the process.
+
+    Cached in the config cache per (pathway_id, version), version being the
+    pathway's updated_at or else a digest of its config; dropped with the
+    pathway's other entries when it is invalidated. Graphs of pathways without
+    an id are compiled per session.
+    """
+    if not pathway_id:
+        return PathwayGraph(pathway_config)
+    key = ("pathway", pathway_id, "compiled", version or _config_digest(pathway_config))
+    return config_cache.get_or_build(key, lambda: PathwayGraph(pathway_config))
+
+
+def render_node_instructions(node_config: Dict[str, Any], graph: PathwayGraph) -> str:
+    """
+    Build comprehensive instructions for a pathway node that guide the LLM
+    on both the conversation content and when to transition to other nodes.
+    """
+    base_instructions = []
+    
+    # 1. Add node-specific prompt/instructions
+    # Try to get prompt from config.prompt (main format) or directly from prompt (test format)
+    node_prompt = (node_config.get('config', {}).get('prompt', '') or 
+                   node_config.get('prompt', ''))
+    if node_prompt:
+        base_instructions.append(f"CONVERSATION ROLE: {node_prompt}")
+    
+    # 2. Add context about current pathway position
+    node_name = node_config.get('name', 'Unknown Node')
+    node_id = node_config.get('id', 'unknown')
+    base_instructions.append(f"CURRENT NODE: You are currently in '{node_name}' (ID: {node_id})")
+    
+    # 3. ✅ ADD DYNAMIC TRANSITION RULES
+    base_instructions.extend([
+        "",
+        "🔥 TRANSITION INSTRUCTIONS:",
+        "- Use make_transition(target_node_name) to move to another part of the conversation",
+        "- Pass the NAME of the target node (not the ID)",
+        "- Listen to user intent to determine when and where to transition",
+        ""
+    ])
+    
+    # 4. Add available transition targets based on pathway edges
+    outgoing_edges = graph.outgoing_edges(node_config.get('id'))
+    
+    if outgoing_edges:
+        base_instructions.append("🎯 AVAILABLE DESTINATIONS:")
+        for edge in outgoing_edges:
+            condition = edge.get('condition', 'default')
+            target_id = edge.get('target')
+            target_node = graph.node(target_id)
+            if target_node:
+                target_name = target_node.get('name', target_id)
+                target_type = target_node.get('type', 'conversation')
+                
+                if target_type == 'app_action':
+                    base_instructions.append(f"  🔧 make_transition('{target_name}') → When: {condition}")
+                elif target_type == 'condition':
+                    base_instructions.append(f"  🔀 make_transition('{target_name}') → When: {condition}")
+                else:
+                    base_instructions.append(f"  💬 make_transition('{target_name}') → When: {condition}")
+                    
+                    # Add specific trigger guidance for app actions
+                    if 'app_action' in target_id.lower() or 'calendar' in target_name.lower():
+                        base_instructions.append("    ⚡ TRIGGER WORDS: Oui, Ok, D'accord, Parfait, Ça marche, C'est bon → IMMEDIATE transition!")
+                    
+                    # Add specific trigger guidance for common appointment words
+                    if 'schedule' in target_name.lower() or 'appointment' in target_name.lower() or 'rdv' in target_name.lower():
+                        base_instructions.append("    📅 APPOINTMENT TRIGGERS: Any acceptance of date/time → IMMEDIATE transition!")
+    
+    # 5. Add tool execution priority
+    if 'schedule' in node_name.lower() or 'appointment' in node_name.lower() or 'callback' in node_name.lower():
+        base_instructions.extend([
+            "",
+            "🚨 MANDATORY APPOINTMENT SCHEDULING SEQUENCE:",
+            "1. FIRST: Collect appointment details (date, time, duration, purpose)",
+            "2. SECOND: Confirm details with user",  
+            "3. When user confirms appointment details, use the appropriate dynamic transition",
+            "4. Follow the pathway flow as configured in the system",
+            "",
+            "🎯 DYNAMIC TRANSITIONS:",
+            "• All transition functions are automatically generated from pathway configuration",
+            "• Use the transition functions that appear in your available tools list",
+            "• Follow the pathway edges as defined in the configuration",
+            ""
+        ])
+    
+    return "\n".join(base_instructions)
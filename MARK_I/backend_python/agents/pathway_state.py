@@ -0,0 +1,174 @@
+"""
+Pathway session state write-behind
+
+The node agents change the pathway state of a call (current node, collected
+variables) on the conversation path. PathwayStateBuffer, owned by the
+session's PathwaySessionData, only records those changes in memory and
+returns; they are written in the background:
+
+- on node transition (right after the new node takes over)
+- every PATHWAY_STATE_FLUSH_INTERVAL_SECONDS while something is pending
+- at job shutdown (close()), which then completes the pathway execution
+
+Changes made between two flushes are coalesced: one variables event with the
+merged updates and one calls row update with the latest node and variables.
+
+Ordering of a flush: the transitions and variables are first appended to the
+execution's event log (pathway_events, the record of the execution) and
+written, then the calls row snapshot (current_pathway_node_id,
+pathway_variables) is updated. Changes that could not be queued stay pending
+here; queued events that were not written yet stay in the event log, which
+retries them, and the snapshot waits for the next flush. close() completes
+(and compacts) the execution only once every event is written; otherwise the
+execution is left running with its events in the log.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from agent_pathway_integration import complete_pathway_execution
+from db_async import update_call
+from pathway_events import NODE_TRANSITION, VARIABLES_UPDATED, append_event, flush_events
+
+logger = logging.getLogger(__name__)
+
+PATHWAY_STATE_FLUSH_INTERVAL_SECONDS = float(os.getenv("PATHWAY_STATE_FLUSH_INTERVAL_SECONDS", "5"))
+# Final flushes attempted at job shutdown before giving up on completing the execution
+PATHWAY_STATE_CLOSE_ATTEMPTS = 3
+PATHWAY_STATE_CLOSE_RETRY_DELAY_SECONDS = 0.5
+
+
+class PathwayStateBuffer:
+    """Pending pathway state of one call and its flusher task"""
+    def __init__(
+        self,
+        execution_id: str,
+        call_id: Optional[str] = None,
+        current_node_id: Optional[str] = None,
+        variables: Optional[Dict[str, Any]] = None,
+    ):
+        self.execution_id = str(execution_id)
+        self.call_id = str(call_id) if call_id else None
+        self.current_node_id = current_node_id
+        # Every variable recorded during the call (the calls row snapshot)
+        self.variables: Dict[str, Any] = dict(variables) if isinstance(variables, dict) else {}
+        # Changes not appended to the event log yet
+        self._transitions: List[Dict[str, Any]] = []
+        self._variable_updates: Dict[str, Any] = {}
+        self._snapshot_dirty = False
+        self.flushes = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._timer: Optional[asyncio.Task] = None
+        self._closed = False
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._transitions or self._variable_updates or self._snapshot_dirty)
+
+    def record_node(self, node_id: Optional[str], result: Optional[Dict[str, Any]] = None):
+        """Current node changed; flushed right away in the background"""
+        if not node_id or node_id == self.current_node_id:
+            return
+        self._transitions.append({"from_node": self.current_node_id, "to_node": node_id, "result": result or {}})
+        self.current_node_id = node_id
+        self._snapshot_dirty = True
+        self.request_flush()
+
+    def record_variables(self, updates: Dict[str, Any]):
+        """Variables collected; written by the next flush"""
+        if not updates:
+            return
+        self.variables.update(updates)
+        self._variable_updates.update(updates)
+        self._snapshot_dirty = True
+
+    def start(self):
+        """Start the periodic flush (in the job's event loop)"""
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._run_timer())
+
+    def request_flush(self):
+        """Flush in the background unless a flush is already scheduled"""
+        if self._closed or (self._flush_task is not None and not self._flush_task.done()):
+            return
+        try:
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+        except RuntimeError:
+            # No event loop (state set outside the job): the timer or close() writes it
+            pass
+
+    async def _run_timer(self):
+        while not self._closed:
+            await asyncio.sleep(PATHWAY_STATE_FLUSH_INTERVAL_SECONDS)
+            if self.pending:
+                await self.flush()
+
+    def _queue_events(self) -> bool:
+        """Move the pending changes to the event log, in order; False if some could not be queued"""
+        while self._transitions:
+            transition = self._transitions[0]
+            if not append_event(self.execution_id, NODE_TRANSITION, node_id=transition["to_node"], payload=transition["result"]):
+                return False
+            self._transitions.pop(0)
+        if self._variable_updates:
+            if not append_event(self.execution_id, VARIABLES_UPDATED, variables=self._variable_updates):
+                return False
+            self._variable_updates = {}
+        return True
+
+    async def flush(self) -> bool:
+        """Write the pending changes to the event log, then update the calls row snapshot.
+        Returns True once every change is written to the event log.
+        """
+        async with self._flush_lock:
+            if not self.pending:
+                return True
+            self._snapshot_dirty = False
+            try:
+                if not self._queue_events() or not await flush_events():
+                    # Queued events are retried by the event log; the snapshot follows them
+                    self._snapshot_dirty = True
+                    return False
+            except asyncio.CancelledError:
+                self._snapshot_dirty = True
+                raise
+            try:
+                if self.call_id:
+                    await update_call(self.call_id, {
+                        "current_pathway_node_id": self.current_node_id,
+                        "pathway_variables": dict(self.variables),
+                    })
+                self.flushes += 1
+            except asyncio.CancelledError:
+                self._snapshot_dirty = True
+                raise
+            except Exception as e:
+                # The events are written; only the snapshot is written again
+                self._snapshot_dirty = True
+                logger.warning(f"Could not write pathway state of execution {self.execution_id}: {e}")
+            return True
+
+    async def close(self, completion_reason: str = "call_ended"):
+        """Final flush, then mark the execution completed (job shutdown)"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._timer is not None:
+            self._timer.cancel()
+        # A flush interrupted by the cancellation leaves its snapshot pending for the final one
+        await asyncio.gather(*(task for task in (self._timer, self._flush_task) if task is not None), return_exceptions=True)
+        for attempt in range(1, PATHWAY_STATE_CLOSE_ATTEMPTS + 1):
+            if await self.flush():
+                break
+            if attempt < PATHWAY_STATE_CLOSE_ATTEMPTS:
+                await asyncio.sleep(PATHWAY_STATE_CLOSE_RETRY_DELAY_SECONDS * attempt)
+        else:
+            # Completing now would compact the execution without the missing events
+            logger.error(f"❌ Pathway events of execution {self.execution_id} not written: execution left running")
+            return
+        # Compacts the events into the execution row before the status changes (never raises)
+        await complete_pathway_execution(self.execution_id, completion_reason)
+        logger.info(f"💾 Pathway state of execution {self.execution_id} written ({self.flushes} flushes)")
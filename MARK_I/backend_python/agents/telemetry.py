@@ -0,0 +1,178 @@
+"""
+Call telemetry queue
+
+Utterance, LLM and turn metrics are produced on the speech path (tts_node,
+llm_node, metrics_collected). emit() only appends the event to a bounded
+in-memory queue of the worker process and returns; a background flusher
+batch-inserts the queue into call_telemetry_events
+(api/sql/call_telemetry_events.sql).
+
+- emit() never awaits, never raises and never blocks: when the queue is full
+  (the database is slow or down) new events are dropped and counted
+- the flusher writes up to TELEMETRY_BATCH_SIZE events per insert, at least
+  every TELEMETRY_FLUSH_INTERVAL_SECONDS; a failed batch is dropped and counted
+- flush() drains the queue at job shutdown
+- telemetry_stats(): enqueued, inserted, dropped and failed counters
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from db_async import db_execute, get_async_db
+
+logger = logging.getLogger(__name__)
+
+TELEMETRY_ENABLED = os.getenv("CALL_TELEMETRY_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+TELEMETRY_TABLE = "call_telemetry_events"
+# Events kept in memory while the flusher catches up; newer events are dropped beyond this
+TELEMETRY_QUEUE_SIZE = int(os.getenv("CALL_TELEMETRY_QUEUE_SIZE", "5000"))
+TELEMETRY_BATCH_SIZE = 200
+TELEMETRY_FLUSH_INTERVAL_SECONDS = 1.0
+TELEMETRY_INSERT_TIMEOUT_SECONDS = 5.0
+# Time given to flush() at job shutdown
+TELEMETRY_SHUTDOWN_TIMEOUT_SECONDS = 3.0
+
+
+def _uuid_or_none(value: Any) -> Optional[str]:
+    if not value:
+        return None
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return None
+
+
+class TelemetryQueue:
+    """Bounded event queue and its flusher task, bound to one event loop"""
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=TELEMETRY_QUEUE_SIZE)
+        self.enqueued = 0
+        self.inserted = 0
+        self.dropped = 0
+        self.failed_batches = 0
+        self.failed_events = 0
+        self._flusher: Optional[asyncio.Task] = None
+
+    def put(self, event: Dict[str, Any]):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"📉 Telemetry queue full: {self.dropped} events dropped so far")
+            return
+        self.enqueued += 1
+        if self._flusher is None or self._flusher.done():
+            self._flusher = self.loop.create_task(self._run())
+
+    def _take_batch(self, limit: int = TELEMETRY_BATCH_SIZE) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _insert(self, batch: List[Dict[str, Any]]):
+        try:
+            await db_execute(get_async_db().table(TELEMETRY_TABLE).insert(batch), timeout=TELEMETRY_INSERT_TIMEOUT_SECONDS)
+            self.inserted += len(batch)
+        except Exception as e:
+            self.failed_batches += 1
+            self.failed_events += len(batch)
+            logger.warning(f"Could not insert {len(batch)} telemetry events: {e}")
+
+    async def _run(self):
+        """Flush batches until the queue stays empty for a flush interval"""
+        while True:
+            try:
+                first = await asyncio.wait_for(self.queue.get(), timeout=TELEMETRY_FLUSH_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                return
+            # Let a burst accumulate into one insert
+            if self.queue.qsize() < TELEMETRY_BATCH_SIZE - 1:
+                await asyncio.sleep(TELEMETRY_FLUSH_INTERVAL_SECONDS)
+            await self._insert([first, *self._take_batch(TELEMETRY_BATCH_SIZE - 1)])
+
+    async def flush(self):
+        while not self.queue.empty():
+            await self._insert(self._take_batch())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self.queue.qsize(),
+            "enqueued": self.enqueued,
+            "inserted": self.inserted,
+            "dropped": self.dropped,
+            "failed_batches": self.failed_batches,
+            "failed_events": self.failed_events,
+        }
+
+
+_queue: Optional[TelemetryQueue] = None
+
+
+def _get_queue() -> Optional[TelemetryQueue]:
+    global _queue
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    if _queue is None or _queue.loop is not loop:
+        _queue = TelemetryQueue(loop)
+    return _queue
+
+
+def emit(
+    event_type: str,
+    call_id: Any,
+    payload: Dict[str, Any],
+    *,
+    room_name: Optional[str] = None,
+    agent_id: Any = None,
+    pathway_execution_id: Any = None,
+    node_id: Optional[str] = None,
+):
+    """Queue a metrics event for the database. Returns immediately; never raises."""
+    if not TELEMETRY_ENABLED:
+        return
+    try:
+        queue = _get_queue()
+        if queue is None:
+            return
+        queue.put({
+            "event_type": event_type,
+            "call_id": _uuid_or_none(call_id),
+            "room_name": room_name,
+            "agent_id": int(agent_id) if str(agent_id or "").isdigit() else None,
+            "pathway_execution_id": _uuid_or_none(pathway_execution_id),
+            "node_id": node_id,
+            "payload": payload,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        })
+    except Exception as e:
+        logger.debug(f"Telemetry event {event_type} not queued: {e}")
+
+
+async def flush(timeout: float = TELEMETRY_SHUTDOWN_TIMEOUT_SECONDS):
+    """Insert the queued events now (job shutdown), giving up after `timeout`"""
+    queue = _get_queue()
+    if queue is None:
+        return
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(queue.flush(), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Telemetry flush timed out after {timeout}s ({queue.queue.qsize()} events left)")
+    logger.info(f"📊 Telemetry flushed in {time.perf_counter() - started:.3f}s: {queue.stats()}")
+
+
+def telemetry_stats() -> Dict[str, Any]:
+    return _queue.stats() if _queue is not None else {}
@@ -0,0 +1,12 @@
+"""
+The worker imports its own modules and the api modules flat, as the worker
+process does (agents/ and api/ on sys.path).
+"""
+
+import os
+import sys
+
+backend_path = os.path.join(os.path.dirname(__file__), "..", "..")
+for path in (os.path.join(backend_path, "agents"), os.path.join(backend_path, "api")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
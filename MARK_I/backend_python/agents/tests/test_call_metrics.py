@@ -0,0 +1,44 @@
+"""Streaming latency percentiles of a call"""
+
+import random
+
+import pytest
+
+from call_metrics import LatencySeries, P2Quantile
+
+
+def exact_quantile(values, quantile):
+    ordered = sorted(values)
+    return ordered[int(quantile * (len(ordered) - 1))]
+
+
+@pytest.mark.parametrize("quantile", [0.5, 0.9, 0.99])
+def test_p2_estimate_is_close_to_the_exact_quantile(quantile):
+    generator = random.Random(7)
+    values = [generator.lognormvariate(-1, 0.5) for _ in range(5000)]
+    estimator = P2Quantile(quantile)
+    for value in values:
+        estimator.add(value)
+    exact = exact_quantile(values, quantile)
+    assert estimator.value() == pytest.approx(exact, rel=0.05)
+    # Constant memory: five markers whatever the number of samples
+    assert len(estimator.heights) == 5 and len(estimator.initial) == 5
+
+
+def test_p2_with_fewer_than_five_samples_uses_them_directly():
+    estimator = P2Quantile(0.5)
+    assert estimator.value() is None
+    for value in (0.3, 0.1, 0.2):
+        estimator.add(value)
+    assert estimator.value() == 0.2
+
+
+def test_latency_series_ignores_missing_and_negative_values():
+    series = LatencySeries()
+    for value in (0.2, None, -1, 0.4):
+        series.add(value)
+    summary = series.summary()
+    assert summary["count"] == 2
+    assert summary["mean"] == pytest.approx(0.3)
+    assert summary["max"] == 0.4
+    assert LatencySeries().summary() == {"count": 0}
@@ -0,0 +1,52 @@
+"""Node lookups of a compiled pathway"""
+
+from pathway_graph import PathwayGraph
+
+PATHWAY = {
+    "nodes": [
+        {"id": "n1", "name": "Greeting", "type": "conversation"},
+        {"id": "n2", "name": "Qualify Budget", "type": "conversation"},
+        {"id": "n3", "name": "Check Budget", "type": "condition"},
+        {"id": "n4", "name": "Book Appointment", "type": "conversation"},
+        {"id": "n5", "name": "Greeting", "type": "conversation"},
+    ],
+    "edges": [
+        {"source": "n1", "target": "n3"},
+        {"source": "n3", "target": "n4"},
+        {"source": "n2", "target": "n4"},
+    ],
+}
+
+
+def test_exact_match_ignores_case_and_spaces_and_keeps_the_first_node():
+    node, match, score = PathwayGraph(PATHWAY).resolve_name("  greeting ")
+    assert (node["id"], match, score) == ("n1", "exact", 1.0)
+
+
+def test_fuzzy_match_picks_the_closest_name():
+    node, match, score = PathwayGraph(PATHWAY).resolve_name("Book Apointment")
+    assert (node["id"], match) == ("n4", "fuzzy")
+    assert 0.6 < score < 1.0
+
+
+def test_partial_match_when_no_name_is_close_enough():
+    node, match, _ = PathwayGraph(PATHWAY).resolve_name("book")
+    assert (node["id"], match) == ("n4", "partial")
+
+
+def test_unknown_name():
+    assert PathwayGraph(PATHWAY).resolve_name("transfer to a human") == (None, "none", 0.0)
+
+
+def test_resolved_names_are_remembered():
+    graph = PathwayGraph(PATHWAY)
+    first = graph.resolve_name("Book Apointment")
+    graph._fuzzy_index.clear()
+    assert graph.resolve_name("book apointment") == first
+
+
+def test_next_conversation_node_goes_through_conditions():
+    graph = PathwayGraph(PATHWAY)
+    assert graph.next_conversation_node("n1") == "n4"
+    assert graph.next_conversation_node("n2") == "n4"
+    assert graph.next_conversation_node("n4") is None
@@ -0,0 +1,128 @@
+"""Write-behind of the pathway state: nothing is completed before its events are written"""
+
+import asyncio
+
+import pytest
+
+import pathway_state
+from pathway_state import PathwayStateBuffer
+
+
+class FakeEventLog:
+    """append_event/flush_events of pathway_events; queue_full and write_failures make them fail"""
+    def __init__(self):
+        self.queued = []
+        self.written = []
+        self.queue_full = False
+        self.write_failures = 0
+        self.snapshots = []
+        self.completed = []
+
+    def install(self, monkeypatch):
+        def append_event(execution_id, event_type, **fields):
+            if self.queue_full:
+                return False
+            self.queued.append((event_type, fields))
+            return True
+
+        async def flush_events():
+            if self.write_failures:
+                self.write_failures -= 1
+                return False
+            self.written.extend(self.queued)
+            self.queued = []
+            return True
+
+        async def update_call(call_id, data):
+            self.snapshots.append(data)
+
+        async def complete_pathway_execution(execution_id, completion_reason):
+            assert not self.queued, "execution completed before its events were written"
+            self.completed.append(completion_reason)
+
+        monkeypatch.setattr(pathway_state, "append_event", append_event)
+        monkeypatch.setattr(pathway_state, "flush_events", flush_events)
+        monkeypatch.setattr(pathway_state, "update_call", update_call)
+        monkeypatch.setattr(pathway_state, "complete_pathway_execution", complete_pathway_execution)
+
+
+@pytest.fixture
+def events(monkeypatch):
+    fake = FakeEventLog()
+    fake.install(monkeypatch)
+    monkeypatch.setattr(pathway_state, "PATHWAY_STATE_CLOSE_RETRY_DELAY_SECONDS", 0.001)
+    return fake
+
+
+def make_buffer():
+    state = PathwayStateBuffer("exec-1", call_id="call-1", current_node_id="start")
+    state.record_node("qualify", {"reason": "greeted"})
+    state.record_variables({"budget": 5000})
+    return state
+
+
+def test_flush_writes_events_then_the_snapshot(events):
+    async def scenario():
+        state = make_buffer()
+        assert await state.flush() is True
+        return state
+
+    state = asyncio.run(scenario())
+    assert [event_type for event_type, _ in events.written] == [pathway_state.NODE_TRANSITION, pathway_state.VARIABLES_UPDATED]
+    assert events.snapshots == [{"current_pathway_node_id": "qualify", "pathway_variables": {"budget": 5000}}]
+    assert not state.pending
+
+
+def test_changes_not_queued_stay_pending(events):
+    events.queue_full = True
+
+    async def scenario():
+        state = make_buffer()
+        assert await state.flush() is False
+        assert state.pending and state._transitions and state._variable_updates
+        assert events.snapshots == []
+
+        events.queue_full = False
+        assert await state.flush() is True
+        return state
+
+    state = asyncio.run(scenario())
+    assert len(events.written) == 2
+    assert not state.pending
+
+
+def test_unwritten_events_keep_the_snapshot_pending(events):
+    events.write_failures = 1
+
+    async def scenario():
+        state = make_buffer()
+        assert await state.flush() is False
+        assert state.pending
+        assert events.snapshots == []
+        assert await state.flush() is True
+
+    asyncio.run(scenario())
+    assert len(events.snapshots) == 1
+
+
+def test_close_retries_before_completing_the_execution(events):
+    events.write_failures = 2
+
+    async def scenario():
+        state = make_buffer()
+        await state.close("call_ended")
+
+    asyncio.run(scenario())
+    assert events.completed == ["call_ended"]
+    assert len(events.written) == 2
+
+
+def test_close_leaves_the_execution_running_when_events_are_not_written(events):
+    events.write_failures = 100
+
+    async def scenario():
+        state = make_buffer()
+        await state.close("call_ended")
+
+    asyncio.run(scenario())
+    assert events.completed == []
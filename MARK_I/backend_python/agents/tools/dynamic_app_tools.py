@@ -12,7 +12,12 @@ from datetime import datetime
 
 from livekit.agents import function_tool, RunContext
 from livekit.agents.llm import ChatContext
-import httpx
+
+try:
+    from api.http_clients import get_http_client
+except ImportError:
+    # LiveKit worker adds api/ to sys.path
+    from http_clients import get_http_client
 
 logger = logging.getLogger("dynamic-app-tools")
 
@@ -33,7 +38,7 @@ class DynamicAppToolFactory:
         """Load app schemas from backend via n8n integration"""
         try:
             # Get user's connected apps via n8n integration
-            response = await httpx.AsyncClient().get(
+            response = await get_http_client(self.backend_api_url).get(
                 f"{self.backend_api_url}/integrations/n8n/user-apps",
                 headers={"Authorization": f"Bearer {self.user_id}"}
             )
@@ -254,7 +259,7 @@ class DynamicAppToolFactory:
         
         try:
             # Call n8n backend API to execute app action
-            response = await httpx.AsyncClient().post(
+            response = await get_http_client(self.backend_api_url).post(
                 f"{self.backend_api_url}/integrations/n8n/execute-action",
                 json={
                     "user_id": self.user_id,
@@ -0,0 +1,169 @@
+"""
+LiveKit worker resources
+
+Models and clients loaded once per worker process by the `prewarm_fnc` and
+kept in `proc.userdata`, so every job the process runs reuses them instead of
+rebuilding them before its greeting:
+
+- Silero VAD (ONNX model load, hundreds of milliseconds)
+- an OpenAI client with a keep-alive connection pool for the LLM plugin
+- an aiohttp session for the Deepgram/Cartesia/ElevenLabs plugins, created
+  on the first job because it belongs to the job event loop
+
+CallTimeline logs the setup stages of a job (time of each milestone and
+duration of each, possibly concurrent, lookup) and its time to first audio,
+with whether the process was prewarmed. Set WORKER_PREWARM_ENABLED=false to
+measure the per-job loading baseline.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Dict, Optional, TypeVar
+
+import aiohttp
+import httpx
+from livekit.agents import JobProcess
+from livekit.plugins import silero
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+PREWARM_ENABLED = os.getenv("WORKER_PREWARM_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+
+# Same pool settings as the LiveKit OpenAI plugin's own client
+OPENAI_MAX_CONNECTIONS = 50
+OPENAI_KEEPALIVE_EXPIRY_SECONDS = 120.0
+
+VAD_KEY = "vad"
+OPENAI_CLIENT_KEY = "openai_client"
+HTTP_SESSION_KEY = "http_session"
+PREWARMED_KEY = "prewarmed"
+
+
+def prewarm(proc: JobProcess):
+    """prewarm_fnc of the worker: load the models and clients shared by the process's jobs"""
+    if not PREWARM_ENABLED:
+        logger.info("Worker prewarm disabled (WORKER_PREWARM_ENABLED=false)")
+        return
+
+    started = time.perf_counter()
+    proc.userdata[VAD_KEY] = silero.VAD.load()
+    vad_seconds = time.perf_counter() - started
+
+    try:
+        from openai import AsyncClient as OpenAIAsyncClient
+        proc.userdata[OPENAI_CLIENT_KEY] = OpenAIAsyncClient(
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                timeout=httpx.Timeout(connect=15.0, read=5.0, write=5.0, pool=5.0),
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+                    keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY_SECONDS,
+                ),
+            ),
+        )
+    except Exception as e:
+        # The LLM plugin falls back to a client of its own
+        logger.warning(f"Could not create the shared OpenAI client: {e}")
+
+    proc.userdata[PREWARMED_KEY] = True
+    logger.info(f"🔥 Worker process prewarmed in {time.perf_counter() - started:.3f}s (Silero VAD: {vad_seconds:.3f}s)")
+
+
+def is_prewarmed(proc: JobProcess) -> bool:
+    return bool(proc.userdata.get(PREWARMED_KEY))
+
+
+def get_vad(proc: JobProcess):
+    """Silero VAD of the process, loaded now if the process was not prewarmed"""
+    vad = proc.userdata.get(VAD_KEY)
+    if vad is None:
+        vad = silero.VAD.load()
+        if PREWARM_ENABLED:
+            proc.userdata[VAD_KEY] = vad
+    return vad
+
+
+def get_openai_client(proc: JobProcess):
+    """Shared OpenAI client for openai.LLM(client=...), or None to let the plugin create one"""
+    return proc.userdata.get(OPENAI_CLIENT_KEY)
+
+
+def get_http_session(proc: JobProcess) -> Optional[aiohttp.ClientSession]:
+    """aiohttp session shared by the jobs of the process, for the plugins' http_session=.
+
+    None when prewarm is disabled (plugins then use the per-job session).
+    Must be called from the job event loop.
+    """
+    if not PREWARM_ENABLED:
+        return None
+    loop = asyncio.get_running_loop()
+    session: Optional[aiohttp.ClientSession] = proc.userdata.get(HTTP_SESSION_KEY)
+    if session is None or session.closed or proc.userdata.get(f"{HTTP_SESSION_KEY}_loop") is not loop:
+        session = aiohttp.ClientSession()
+        proc.userdata[HTTP_SESSION_KEY] = session
+        proc.userdata[f"{HTTP_SESSION_KEY}_loop"] = loop
+    return session
+
+
+def prewarm_plugins(*plugins: Any):
+    """Open the plugins' streaming connections now (e.g. while the phone rings)"""
+    for plugin in plugins:
+        prewarm_fnc = getattr(plugin, "prewarm", None)
+        if plugin is None or prewarm_fnc is None:
+            continue
+        try:
+            prewarm_fnc()
+        except Exception as e:
+            logger.debug(f"Could not prewarm {type(plugin).__name__}: {e}")
+
+
+class CallTimeline:
+    """Setup stages of one job, up to the agent's first audio"""
+    def __init__(self, proc: JobProcess):
+        self.prewarmed = is_prewarmed(proc)
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.durations: Dict[str, float] = {}
+        self.first_audio_logged = False
+
+    def mark(self, stage: str):
+        """Record that a stage ended now"""
+        self.stages[stage] = time.perf_counter() - self.started
+
+    async def timed(self, stage: str, awaitable: Awaitable[T]) -> T:
+        """Await a setup step and record how long it took"""
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.durations[stage] = time.perf_counter() - started
+
+    def watch_first_audio(self, session):
+        """Log the time to first audio when the session's agent starts speaking"""
+        @session.on("agent_state_changed")
+        def _on_agent_state_changed(ev):
+            if self.first_audio_logged or getattr(ev, "new_state", None) != "speaking":
+                return
+            self.first_audio_logged = True
+            self.mark("first_audio")
+            self.log_summary()
+
+    def log_summary(self):
+        total = self.stages.get("first_audio", time.perf_counter() - self.started)
+        since_answer = ""
+        if "call_answered" in self.stages and "first_audio" in self.stages:
+            since_answer = f", {self.stages['first_audio'] - self.stages['call_answered']:.3f}s after answer"
+        stages = ", ".join(f"{stage}={seconds:.3f}s" for stage, seconds in self.stages.items())
+        durations = ", ".join(f"{stage}={seconds:.3f}s" for stage, seconds in self.durations.items())
+        logger.info(f"⏱️ Time to first audio: {total:.3f}s{since_answer} (prewarmed={self.prewarmed}) [{stages}] setup steps: [{durations}]")
+
+    def log_setup(self):
+        """Log the setup breakdown so far (the session is about to start)"""
+        durations = ", ".join(f"{stage}={seconds:.3f}s" for stage, seconds in self.durations.items())
+        logger.info(f"⏱️ Call setup: {time.perf_counter() - self.started:.3f}s - steps: [{durations}]")
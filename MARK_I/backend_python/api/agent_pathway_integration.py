@@ -6,8 +6,21 @@ import json
 from typing import Dict, Any, Optional
 from datetime import datetime, timezone
 
-# Import database client
-from db_client import supabase_service_client
+# Async database access (the worker imports this module with api/ on sys.path)
+try:
+    from api.db_async import (
+        fetch_one, get_async_db, get_agent, insert_pathway_execution, update_call,
+        list_running_pathway_executions, update_pathway_execution
+    )
+    from api.config_cache import cached
+    from api.pathway_events import NODE_TRANSITION, VARIABLES_UPDATED, append_event, compact_execution
+except ImportError:
+    from db_async import (
+        fetch_one, get_async_db, get_agent, insert_pathway_execution, update_call,
+        list_running_pathway_executions, update_pathway_execution
+    )
+    from config_cache import cached
+    from pathway_events import NODE_TRANSITION, VARIABLES_UPDATED, append_event, compact_execution
 
 logger = logging.getLogger(__name__)
 
@@ -27,30 +40,31 @@ async def auto_start_pathway_for_new_call(call_id: str, agent_id: int, session_m
         logger.info(f"Checking for default pathway for agent {agent_id} and call {call_id}")
         
         # Get agent details to check for default pathway
-        agent_response = supabase_service_client.table("agents").select(
-            "id, name, default_pathway_id"
-        ).eq("id", agent_id).single().execute()
+        agent_data = await cached(
+            ("agent", agent_id, "default_pathway"),
+            lambda: get_agent(agent_id, columns="id, name, default_pathway_id"),
+        )
         
-        if not agent_response.data:
+        if not agent_data:
             logger.warning(f"Agent {agent_id} not found")
             return None
         
-        agent_data = agent_response.data
         default_pathway_id = agent_data.get("default_pathway_id")
         
         if not default_pathway_id:
             logger.info(f"Agent {agent_id} has no default pathway assigned")
             return None
         
-        # Load pathway configuration
-        pathway_response = supabase_service_client.table("pathways").select("*").eq("id", default_pathway_id).single().execute()
+        # Load pathway configuration (cached rows are shared: read only)
+        pathway_data = await cached(
+            ("pathway", default_pathway_id, "row"),
+            lambda: fetch_one(get_async_db().table("pathways").select("*").eq("id", default_pathway_id)),
+        )
         
-        if not pathway_response.data:
+        if not pathway_data:
             logger.warning(f"Default pathway {default_pathway_id} not found for agent {agent_id}")
             return None
         
-        pathway_data = pathway_response.data
-        
         # Check if pathway is active
         if pathway_data.get("status") != "active":
             logger.info(f"Pathway {default_pathway_id} is not active (status: {pathway_data.get('status')})")
@@ -114,9 +128,9 @@ async def create_pathway_execution(
         }
         
         # Insert into pathway_executions table
-        response = supabase_service_client.table("pathway_executions").insert(execution_data).execute()
+        inserted = await insert_pathway_execution(execution_data)
         
-        if response.data:
+        if inserted:
             logger.info(f"Created pathway execution record: {execution_id}")
             
             # Update call record with pathway execution info
@@ -139,9 +153,9 @@ async def link_call_to_pathway_execution(call_id: str, execution_id: str, curren
             "current_pathway_node_id": current_node
         }
         
-        response = supabase_service_client.table("calls").update(update_data).eq("id", call_id).execute()
+        updated = await update_call(call_id, update_data)
         
-        if response.data:
+        if updated:
             logger.info(f"Linked call {call_id} to pathway execution {execution_id}")
         else:
             logger.warning(f"Failed to link call {call_id} to pathway execution")
@@ -162,13 +176,13 @@ async def handle_call_event(event_type: str, call_id: str, event_data: Dict[str,
         logger.debug(f"Handling call event: {event_type} for call {call_id}")
         
         # Get pathway execution for this call
-        execution_response = supabase_service_client.table("pathway_executions").select("*").eq("call_id", call_id).eq("status", "running").execute()
+        running_executions = await list_running_pathway_executions(call_id)
         
-        if not execution_response.data:
+        if not running_executions:
             logger.debug(f"No active pathway execution found for call {call_id}")
             return
         
-        execution_data = execution_response.data[0]
+        execution_data = running_executions[0]
         execution_id = execution_data["id"]
         
         # Handle different event types
@@ -187,75 +201,36 @@ async def handle_call_event(event_type: str, call_id: str, event_data: Dict[str,
 async def complete_pathway_execution(execution_id: str, completion_reason: str = "completed"):
     """Mark a pathway execution as completed"""
     try:
+        # Fold the call's transitions and variable updates into the execution row
+        await compact_execution(execution_id)
+        
         update_data = {
             "status": "completed",
             "completed_at": datetime.now(timezone.utc).isoformat()
         }
         
-        response = supabase_service_client.table("pathway_executions").update(update_data).eq("id", execution_id).execute()
+        updated = await update_pathway_execution(execution_id, update_data)
         
-        if response.data:
+        if updated:
             logger.info(f"Completed pathway execution {execution_id} (reason: {completion_reason})")
         
     except Exception as e:
         logger.error(f"Error completing pathway execution {execution_id}: {e}")
 
 async def update_pathway_variables(execution_id: str, new_variables: Dict[str, Any]):
-    """Update pathway variables for an execution"""
-    try:
-        # Get current variables
-        execution_response = supabase_service_client.table("pathway_executions").select("variables").eq("id", execution_id).single().execute()
-        
-        if execution_response.data:
-            current_variables = execution_response.data.get("variables", {})
-            current_variables.update(new_variables)
-            
-            # Update in database
-            response = supabase_service_client.table("pathway_executions").update({
-                "variables": current_variables,
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }).eq("id", execution_id).execute()
-            
-            if response.data:
-                logger.debug(f"Updated pathway variables for execution {execution_id}")
-        
-    except Exception as e:
-        logger.error(f"Error updating pathway variables for execution {execution_id}: {e}")
+    """Update pathway variables for an execution (appended as an event, see pathway_events)"""
+    append_event(execution_id, VARIABLES_UPDATED, variables=new_variables)
+    logger.debug(f"Queued pathway variables update for execution {execution_id}")
 
 async def log_node_transition(execution_id: str, transition_data: Dict[str, Any]):
-    """Log a node transition in the pathway execution"""
-    try:
-        # Get current execution trace
-        execution_response = supabase_service_client.table("pathway_executions").select("execution_trace, current_node_id").eq("id", execution_id).single().execute()
-        
-        if execution_response.data:
-            current_trace = execution_response.data.get("execution_trace", [])
-            
-            # Add new transition to trace
-            transition_entry = {
-                "from_node": execution_response.data.get("current_node_id"),
-                "to_node": transition_data.get("to_node"),
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "result": transition_data.get("result", {}),
-                "action": "node_transition"
-            }
-            
-            current_trace.append(transition_entry)
-            
-            # Update in database
-            update_data = {
-                "execution_trace": current_trace,
-                "current_node_id": transition_data.get("to_node"),
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }
-            
-            response = supabase_service_client.table("pathway_executions").update(update_data).eq("id", execution_id).execute()
-            
-            if response.data:
-                logger.debug(f"Logged node transition for execution {execution_id}")
-        
-    except Exception as e:
-        logger.error(f"Error logging node transition for execution {execution_id}: {e}")
+    """Log a node transition in the pathway execution (appended as an event, see pathway_events)"""
+    append_event(
+        execution_id,
+        NODE_TRANSITION,
+        node_id=transition_data.get("to_node"),
+        payload=transition_data.get("result", {}),
+    )
+    logger.debug(f"Queued node transition for execution {execution_id}")
 
 def get_agent_pathway_manager():
     """
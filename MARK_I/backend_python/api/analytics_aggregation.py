@@ -0,0 +1,225 @@
+"""
+Call analytics aggregation
+
+Aggregates calls per agent, campaign, region, day and hour for the analytics
+endpoints without pulling every call row into the API:
+- Unfiltered windows are read from the call rollups (api/analytics_rollups.py)
+  when they hold every call of the window (not before the backfill)
+- Postgres path: the `analytics_call_aggregates` RPC (api/sql/analytics_call_aggregates.sql)
+  returns only the grouped counts, sums and duration percentiles
+- Python fallback (RPC not deployed or failing): calls are streamed page by page
+  with only the needed columns and folded into the same shape in a single pass;
+  durations go into a per-second histogram, so memory does not grow with the calls
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from api.analytics_rollups import count_window_calls, get_rollup_aggregates
+from api.db_async import db_execute, get_async_db, iter_keyset_pages
+
+logger = logging.getLogger(__name__)
+
+AGGREGATES_RPC_NAME = "analytics_call_aggregates"
+# After the RPC fails, use the Python fallback for this long before trying it again
+RPC_RETRY_AFTER_SECONDS = 600
+# Rows fetched per page by the Python fallback
+FALLBACK_PAGE_SIZE = 1000
+
+SUCCESS_STATUSES = ("completed", "ended")
+FAILED_STATUSES = ("failed", "busy", "no_answer")
+# A completed call must last longer than this to count as successful for agents/regions
+QUALIFIED_CALL_MIN_DURATION = 30
+# Durations are counted per second up to this; longer calls share the last bucket
+DURATION_HISTOGRAM_MAX_SECONDS = 4 * 60 * 60
+
+# Kept in sync with the CASE expression of the SQL function
+US_AREA_CODE_REGIONS = {
+    "212": "New York, NY", "213": "Los Angeles, CA", "312": "Chicago, IL",
+    "415": "San Francisco, CA", "617": "Boston, MA", "702": "Las Vegas, NV",
+    "305": "Miami, FL", "206": "Seattle, WA", "713": "Houston, TX",
+    "404": "Atlanta, GA", "214": "Dallas, TX", "602": "Phoenix, AZ"
+}
+COUNTRY_PREFIX_REGIONS = [
+    ("+33", "France"), ("+44", "United Kingdom"), ("+49", "Germany"), ("+34", "Spain"),
+    ("+39", "Italy"), ("+61", "Australia"), ("+81", "Japan")
+]
+
+_rpc_unavailable_until = 0.0
+_rollups_unavailable_until = 0.0
+
+
+def classify_region(phone_number: Optional[str]) -> str:
+    """Region of an E.164 number (US/CA numbers are split by major area code)"""
+    phone_number = phone_number or ""
+    if phone_number.startswith("+1"):
+        if len(phone_number) >= 5:
+            area_code = phone_number[2:5]
+            return US_AREA_CODE_REGIONS.get(area_code, f"US/CA ({area_code})")
+        return "US/CA"
+    for prefix, region in COUNTRY_PREFIX_REGIONS:
+        if phone_number.startswith(prefix):
+            return region
+    return "Other"
+
+
+def _value_at_rank(histogram: Dict[int, int], rank: int) -> int:
+    """Value of the rank-th (0-based) smallest sample of a histogram"""
+    seen = 0
+    for value in sorted(histogram):
+        seen += histogram[value]
+        if seen > rank:
+            return value
+    return max(histogram)
+
+
+def _percentile(histogram: Dict[int, int], percentile: float) -> float:
+    """Continuous percentile of a value -> count histogram (same as Postgres percentile_cont)"""
+    total = sum(histogram.values())
+    if not total:
+        return 0.0
+    position = (total - 1) * percentile
+    lower = int(position)
+    lower_value = _value_at_rank(histogram, lower)
+    upper_value = _value_at_rank(histogram, min(lower + 1, total - 1))
+    return lower_value + (upper_value - lower_value) * (position - lower)
+
+
+def _new_group() -> Dict[str, int]:
+    return {"total_calls": 0, "successful_calls": 0, "qualified_calls": 0, "failed_calls": 0, "total_duration": 0}
+
+
+class CallAggregator:
+    """Single-pass fold of call rows into the RPC's result shape"""
+
+    def __init__(self):
+        self.totals = _new_group()
+        self.by_agent: Dict[Any, Dict[str, int]] = {}
+        self.by_campaign: Dict[Any, Dict[str, int]] = {}
+        self.by_region: Dict[str, Dict[str, int]] = {}
+        self.by_day: Dict[str, Dict[str, int]] = {}
+        self.by_hour: Dict[int, Dict[str, int]] = {}
+        # duration (seconds) -> calls, at most DURATION_HISTOGRAM_MAX_SECONDS + 1 entries
+        self._durations: Counter = Counter()
+
+    def add(self, call: Dict[str, Any]):
+        status = (call.get("status") or "").lower()
+        duration = int(call.get("call_duration") or 0)
+        successful = status in SUCCESS_STATUSES
+        counts = {
+            "total_calls": 1,
+            "successful_calls": 1 if successful else 0,
+            "qualified_calls": 1 if successful and duration > QUALIFIED_CALL_MIN_DURATION else 0,
+            "failed_calls": 1 if status in FAILED_STATUSES else 0,
+            "total_duration": duration,
+        }
+
+        created_at = call.get("created_at") or ""
+        groups = [
+            self.totals,
+            self.by_region.setdefault(classify_region(call.get("phone_number_e164")), _new_group()),
+        ]
+        if call.get("agent_id") is not None:
+            groups.append(self.by_agent.setdefault(call["agent_id"], _new_group()))
+        if call.get("batch_campaign_id"):
+            groups.append(self.by_campaign.setdefault(call["batch_campaign_id"], _new_group()))
+        if len(created_at) >= 13:
+            groups.append(self.by_day.setdefault(created_at[:10], _new_group()))
+            try:
+                groups.append(self.by_hour.setdefault(int(created_at[11:13]), _new_group()))
+            except ValueError:
+                pass
+
+        for group in groups:
+            for key, value in counts.items():
+                group[key] += value
+        self._durations[min(max(duration, 0), DURATION_HISTOGRAM_MAX_SECONDS)] += 1
+
+    def result(self) -> Dict[str, Any]:
+        durations = self._durations
+        totals = dict(self.totals)
+        totals.update({
+            "duration_p50": _percentile(durations, 0.5),
+            "duration_p90": _percentile(durations, 0.9),
+            "duration_p95": _percentile(durations, 0.95),
+        })
+        return {
+            "totals": totals,
+            "by_agent": [{"agent_id": key, **value} for key, value in self.by_agent.items()],
+            "by_campaign": [{"batch_campaign_id": key, **value} for key, value in self.by_campaign.items()],
+            "by_region": [{"region": key, **value} for key, value in self.by_region.items()],
+            "by_day": [{"day": key, **value} for key, value in self.by_day.items()],
+            "by_hour": [{"hour": key, **value} for key, value in self.by_hour.items()],
+        }
+
+
+def _apply_call_filters(query, user_id: str, start: datetime, end: datetime, campaign_id: Optional[str], agent_id: Optional[int]):
+    query = query.eq("user_id", user_id).gte("created_at", start.isoformat()).lte("created_at", end.isoformat())
+    if campaign_id:
+        query = query.eq("batch_campaign_id", campaign_id)
+    if agent_id:
+        query = query.eq("agent_id", agent_id)
+    return query
+
+
+async def _aggregate_in_python(user_id: str, start: datetime, end: datetime, campaign_id: Optional[str], agent_id: Optional[int]) -> Dict[str, Any]:
+    """Stream the window's calls by (created_at, id) and fold them in one pass"""
+    aggregator = CallAggregator()
+    columns = "id, status, call_duration, phone_number_e164, created_at, agent_id, batch_campaign_id"
+
+    def build_query():
+        return _apply_call_filters(get_async_db().table("calls").select(columns), user_id, start, end, campaign_id, agent_id)
+
+    async for rows in iter_keyset_pages(build_query, page_size=FALLBACK_PAGE_SIZE):
+        for row in rows:
+            aggregator.add(row)
+
+    return aggregator.result()
+
+
+async def get_call_aggregates(
+    user_id: str,
+    start: datetime,
+    end: datetime,
+    campaign_id: Optional[str] = None,
+    agent_id: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Grouped call aggregates of a user over [start, end]"""
+    global _rpc_unavailable_until, _rollups_unavailable_until
+
+    # Rollups are kept per user, agent, campaign and region, not per combination of filters
+    if not campaign_id and not agent_id and time.monotonic() >= _rollups_unavailable_until:
+        try:
+            aggregates, call_count = await asyncio.gather(
+                get_rollup_aggregates(user_id, start, end),
+                count_window_calls(user_id, start, end),
+            )
+            rolled_up = aggregates["totals"]["total_calls"]
+            if rolled_up == call_count:
+                return aggregates
+            # Not backfilled yet, or refreshes were missed: the rollups would undercount
+            logger.info(f"Call rollups of user {user_id} hold {rolled_up}/{call_count} calls of the window, aggregating calls")
+        except Exception as e:
+            logger.warning(f"Call rollups unavailable, aggregating calls for {RPC_RETRY_AFTER_SECONDS}s: {e}")
+            _rollups_unavailable_until = time.monotonic() + RPC_RETRY_AFTER_SECONDS
+
+    if time.monotonic() >= _rpc_unavailable_until:
+        try:
+            response = await db_execute(get_async_db().rpc(AGGREGATES_RPC_NAME, {
+                "p_user_id": user_id,
+                "p_start": start.isoformat(),
+                "p_end": end.isoformat(),
+                "p_campaign_id": campaign_id,
+                "p_agent_id": agent_id,
+            }))
+            if response.data:
+                return response.data
+        except Exception as e:
+            logger.warning(f"{AGGREGATES_RPC_NAME} RPC unavailable, using Python aggregation for {RPC_RETRY_AFTER_SECONDS}s: {e}")
+            _rpc_unavailable_until = time.monotonic() + RPC_RETRY_AFTER_SECONDS
+
+    return await _aggregate_in_python(user_id, start, end, campaign_id, agent_id)
@@ -0,0 +1,275 @@
+"""
+Call analytics rollups
+
+Hourly and daily buckets of call counts, outcomes and durations per user,
+agent, campaign and region (table `call_rollups`, api/sql/call_rollups.sql).
+Dashboards read these buckets instead of recounting `calls`, so their cost
+grows with the number of buckets, not the number of calls.
+
+- Maintained by the calls_refresh_rollups trigger: every insert, delete or
+  status/duration change of a call, from any writer (API, worker, webhooks),
+  refreshes that call's contribution to its buckets in the same transaction
+- fetch_rollups() / fetch_window_rollups(): read buckets
+- count_window_calls(): calls the buckets of a window should hold, to tell
+  rollups that are not backfilled (or missed refreshes) from complete ones
+- Backfill of existing calls:
+    python -m api.analytics_rollups [--user-id <uuid>] [--since 2024-01-01]
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from api.db_async import db_execute, get_async_db, offset_query
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_TABLE = "call_rollups"
+REFRESH_RPC_NAME = "refresh_call_rollups"
+# Buckets fetched per request (PostgREST caps responses at 1000 rows)
+ROLLUP_PAGE_SIZE = 1000
+# Calls refreshed per RPC by the backfill
+BACKFILL_BATCH_SIZE = 500
+
+# Additive counters of a bucket
+COUNTER_COLUMNS = (
+    "total_calls", "completed_calls", "connected_calls", "voicemail_calls", "calling_calls",
+    "busy_calls", "no_answer_calls", "timeout_calls", "failed_calls", "timed_calls", "total_duration",
+    "duration_le_10", "duration_le_30", "duration_le_60", "duration_le_120", "duration_le_300", "duration_gt_300",
+)
+# Upper bound (seconds) of each duration histogram column, used for approximate percentiles
+DURATION_HISTOGRAM = (
+    ("duration_le_10", 0, 10), ("duration_le_30", 10, 30), ("duration_le_60", 30, 60),
+    ("duration_le_120", 60, 120), ("duration_le_300", 120, 300), ("duration_gt_300", 300, 600),
+)
+
+# Coarse country used by the campaign endpoints, from a call_region() label
+_CAMPAIGN_COUNTRIES = {"France": "France", "United Kingdom": "UK"}
+
+
+def empty_counters() -> Dict[str, int]:
+    return {column: 0 for column in COUNTER_COLUMNS}
+
+
+def sum_counters(rows: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    totals = empty_counters()
+    for row in rows:
+        for column in COUNTER_COLUMNS:
+            totals[column] += row.get(column) or 0
+    return totals
+
+
+def group_counters(rows: Iterable[Dict[str, Any]], key) -> Dict[Any, Dict[str, int]]:
+    """Sum bucket counters by key(row)"""
+    groups: Dict[Any, Dict[str, int]] = {}
+    for row in rows:
+        group = groups.setdefault(key(row), empty_counters())
+        for column in COUNTER_COLUMNS:
+            group[column] += row.get(column) or 0
+    return groups
+
+
+def unfinished_short_calls(counters: Dict[str, int]) -> int:
+    """Completed calls of 5s or less (counted as no answer by the campaign views)"""
+    return counters["completed_calls"] - counters["connected_calls"] - counters["voicemail_calls"]
+
+
+def other_failed_calls(counters: Dict[str, int]) -> int:
+    """Calls that are neither completed, busy, unanswered nor timed out"""
+    return (counters["total_calls"] - counters["completed_calls"] - counters["busy_calls"]
+            - counters["no_answer_calls"] - counters["timeout_calls"])
+
+
+def duration_percentile(counters: Dict[str, int], percentile: float) -> float:
+    """Approximate duration percentile from the bucket histogram"""
+    total = sum(counters[column] for column, _, _ in DURATION_HISTOGRAM)
+    if total <= 0:
+        return 0.0
+    rank = percentile * total
+    seen = 0
+    for column, lower, upper in DURATION_HISTOGRAM:
+        count = counters[column]
+        if count and seen + count >= rank:
+            return lower + (upper - lower) * (rank - seen) / count
+        seen += count
+    return float(DURATION_HISTOGRAM[-1][2])
+
+
+def campaign_country(region: str) -> str:
+    if region.startswith("US/CA") or "," in region:
+        # US area code regions are "<City>, <State>"
+        return "US/CA"
+    return _CAMPAIGN_COUNTRIES.get(region, "Other")
+
+
+def _start_of_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _start_of_day(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+async def fetch_rollups(
+    user_id: str,
+    scope: str,
+    granularity: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    scope_ids: Optional[List[str]] = None,
+    scope_id_prefix: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Buckets of one scope whose start is in [start, end)"""
+    columns = "scope_id, bucket_start, " + ", ".join(COUNTER_COLUMNS)
+    rows: List[Dict[str, Any]] = []
+    offset = 0
+    while True:
+        query = (
+            get_async_db().table(ROLLUP_TABLE).select(columns)
+            .eq("user_id", user_id).eq("scope", scope).eq("granularity", granularity)
+        )
+        if start is not None:
+            query = query.gte("bucket_start", start.isoformat())
+        if end is not None:
+            query = query.lt("bucket_start", end.isoformat())
+        if scope_ids is not None:
+            query = query.in_("scope_id", scope_ids)
+        if scope_id_prefix is not None:
+            query = query.like("scope_id", f"{scope_id_prefix}*")
+        query.params = query.params.add("order", "bucket_start,scope_id")
+        response = await db_execute(offset_query(query.limit(ROLLUP_PAGE_SIZE), offset))
+        page = response.data or []
+        rows.extend(page)
+        if len(page) < ROLLUP_PAGE_SIZE:
+            return rows
+        offset += ROLLUP_PAGE_SIZE
+
+
+def _end_of_bucket(value: datetime, granularity: str) -> datetime:
+    """End of the bucket containing value (value itself when it starts a bucket)"""
+    start = _start_of_hour(value) if granularity == "hour" else _start_of_day(value)
+    if start == value:
+        return value
+    return start + (timedelta(hours=1) if granularity == "hour" else timedelta(days=1))
+
+
+def window_bounds(start: datetime, end: datetime) -> Tuple[datetime, datetime]:
+    """[start, end) actually covered by the buckets of fetch_window_rollups(start, end)"""
+    first_midnight = _start_of_day(start) + timedelta(days=1)
+    if first_midnight <= end:
+        return _start_of_hour(start), _end_of_bucket(end, "day")
+    return _start_of_hour(start), _end_of_bucket(end, "hour")
+
+
+async def count_window_calls(user_id: str, start: datetime, end: datetime) -> int:
+    """Calls of a user in the window covered by fetch_window_rollups(start, end)"""
+    window_start, window_end = window_bounds(start, end)
+    response = await db_execute(
+        get_async_db().table("calls").select("id", count="exact")
+        .eq("user_id", user_id).gte("created_at", window_start.isoformat()).lt("created_at", window_end.isoformat())
+        .limit(1)
+    )
+    return response.count or 0
+
+
+async def fetch_window_rollups(
+    user_id: str,
+    scope: str,
+    start: datetime,
+    end: datetime,
+    scope_ids: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    """Buckets covering [start, end] to the hour: hourly buckets for the first
+    (partial) day, daily buckets from the next midnight on."""
+    first_midnight = _start_of_day(start) + timedelta(days=1)
+    hourly, daily = await asyncio.gather(
+        fetch_rollups(user_id, scope, "hour", _start_of_hour(start), min(first_midnight, end), scope_ids=scope_ids),
+        fetch_rollups(user_id, scope, "day", first_midnight, end, scope_ids=scope_ids) if first_midnight <= end else _no_rows(),
+    )
+    return hourly + daily
+
+
+async def _no_rows() -> List[Dict[str, Any]]:
+    return []
+
+
+def _aggregate_group(counters: Dict[str, int]) -> Dict[str, int]:
+    """Bucket counters in the group shape of analytics_aggregation.get_call_aggregates()"""
+    return {
+        "total_calls": counters["total_calls"],
+        "successful_calls": counters["completed_calls"],
+        "qualified_calls": counters["connected_calls"],
+        "failed_calls": counters["failed_calls"] + counters["busy_calls"] + counters["no_answer_calls"],
+        "total_duration": counters["total_duration"],
+    }
+
+
+async def get_rollup_aggregates(user_id: str, start: datetime, end: datetime) -> Dict[str, Any]:
+    """Unfiltered call aggregates of a user over [start, end], read from the rollups"""
+    user_rows, agent_rows, campaign_rows, region_rows, hourly_rows = await asyncio.gather(
+        fetch_window_rollups(user_id, "user", start, end),
+        fetch_window_rollups(user_id, "agent", start, end),
+        fetch_window_rollups(user_id, "campaign", start, end),
+        fetch_window_rollups(user_id, "region", start, end),
+        fetch_rollups(user_id, "user", "hour", _start_of_hour(start), end),
+    )
+    totals_counters = sum_counters(user_rows)
+    totals = _aggregate_group(totals_counters)
+    totals.update({
+        "duration_p50": duration_percentile(totals_counters, 0.5),
+        "duration_p90": duration_percentile(totals_counters, 0.9),
+        "duration_p95": duration_percentile(totals_counters, 0.95),
+    })
+
+    def _groups(rows, key, name):
+        return [{name: group_key, **_aggregate_group(counters)} for group_key, counters in group_counters(rows, key).items()]
+
+    return {
+        "totals": totals,
+        "by_agent": _groups(agent_rows, lambda row: int(row["scope_id"]), "agent_id"),
+        "by_campaign": _groups(campaign_rows, lambda row: row["scope_id"], "batch_campaign_id"),
+        "by_region": _groups(region_rows, lambda row: row["scope_id"], "region"),
+        "by_day": _groups(user_rows, lambda row: row["bucket_start"][:10], "day"),
+        "by_hour": _groups(hourly_rows, lambda row: int(row["bucket_start"][11:13]), "hour"),
+    }
+
+
+async def backfill_call_rollups(user_id: Optional[str] = None, since: Optional[datetime] = None) -> int:
+    """Refresh the rollups of every existing call (safe to re-run)"""
+    refreshed = 0
+    last_id: Optional[str] = None
+    while True:
+        query = get_async_db().table("calls").select("id")
+        if user_id:
+            query = query.eq("user_id", user_id)
+        if since:
+            query = query.gte("created_at", since.isoformat())
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        response = await db_execute(query.order("id").limit(BACKFILL_BATCH_SIZE))
+        call_ids = [row["id"] for row in response.data or []]
+        if not call_ids:
+            break
+        changed = await db_execute(get_async_db().rpc(REFRESH_RPC_NAME, {"p_call_ids": call_ids}), timeout=60.0)
+        refreshed += len(call_ids)
+        logger.info(f"Rollup backfill: {refreshed} calls processed ({changed.data} changed in last batch)")
+        last_id = call_ids[-1]
+    return refreshed
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Backfill the call analytics rollups from existing calls")
+    parser.add_argument("--user-id", help="Only backfill this user's calls")
+    parser.add_argument("--since", help="Only backfill calls created on or after this date (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    since = datetime.fromisoformat(args.since).replace(tzinfo=timezone.utc) if args.since else None
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    total = asyncio.run(backfill_call_rollups(user_id=args.user_id, since=since))
+    logger.info(f"✅ Rollup backfill complete: {total} calls")
+
+
+if __name__ == "__main__":
+    _main()
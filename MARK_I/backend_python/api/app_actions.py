@@ -2,11 +2,11 @@
 App action handlers for executing integrations within pathways
 """
 import asyncio
-import aiohttp
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, List
 from .oauth_utils import get_user_connection_with_valid_creds, make_authenticated_request
 from .db_client import get_supabase_anon_client
+from .http_clients import get_aiohttp_session
 import json
 
 class AppActionError(Exception):
@@ -366,14 +366,14 @@ async def zapier_trigger_webhook(action_data: Dict[str, Any]) -> Dict[str, Any]:
         **action_data.get("data", {})
     }
     
-    async with aiohttp.ClientSession() as session:
-        async with session.post(webhook_url, json=payload) as response:
-            if response.status >= 400:
-                error_text = await response.text()
-                raise AppActionError(f"Zapier webhook failed: {error_text}", "zapier", "trigger_webhook")
-            
-            response_data = await response.json() if response.headers.get('content-type', '').startswith('application/json') else {"status": "triggered"}
-            
+    session = get_aiohttp_session()
+    async with session.post(webhook_url, json=payload) as response:
+        if response.status >= 400:
+            error_text = await response.text()
+            raise AppActionError(f"Zapier webhook failed: {error_text}", "zapier", "trigger_webhook")
+        
+        response_data = await response.json() if response.headers.get('content-type', '').startswith('application/json') else {"status": "triggered"}
+        
     return {
         "webhook_url": webhook_url,
         "status_code": response.status,
@@ -0,0 +1,308 @@
+"""
+App connection resolver
+
+Resolves the OAuth access token of a user's app connection for in-call app
+actions (pathway app_action nodes):
+
+- one query: user_app_connections joined with app_integrations, filtered on
+  the app name (instead of one app_integrations query per connection)
+- decrypted credentials are cached in memory per (user, app) until shortly
+  before the token expires (CONNECTION_CACHE_TTL_SECONDS at most, so
+  reconnections and revocations are picked up)
+- tokens expiring within CONNECTION_REFRESH_AHEAD_SECONDS are refreshed in the
+  background while the cached token is still served; an expired token is
+  refreshed before it is returned
+- concurrent lookups of the same connection share one database query
+
+An app action booked during a call costs one cache lookup once the
+connection was prefetched (prefetch()) while the previous node was speaking.
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from api.db_async import Row, fetch_one, get_async_db
+except ImportError:
+    # Imported as a top-level module (LiveKit worker adds api/ to sys.path)
+    from db_async import Row, fetch_one, get_async_db
+
+try:
+    from api.crypto_utils import decrypt_credentials
+    crypto_utils_available = True
+except ImportError:
+    try:
+        from crypto_utils import decrypt_credentials
+        crypto_utils_available = True
+    except ImportError:
+        crypto_utils_available = False
+
+try:
+    from cryptography.fernet import Fernet
+    cryptography_available = True
+except ImportError:
+    cryptography_available = False
+
+logger = logging.getLogger(__name__)
+
+CONNECTION_CACHE_TTL_SECONDS = float(os.getenv("APP_CONNECTION_CACHE_TTL_SECONDS", "600"))
+CONNECTION_CACHE_MAX_ENTRIES = 256
+# A cached token is not served within this margin of its expiry
+CONNECTION_EXPIRY_MARGIN_SECONDS = 60
+# Tokens expiring sooner than this are refreshed in the background
+CONNECTION_REFRESH_AHEAD_SECONDS = float(os.getenv("APP_CONNECTION_REFRESH_AHEAD_SECONDS", "600"))
+
+CONNECTION_COLUMNS = "id, user_id, credentials, connection_status, updated_at, app_integrations!inner(name, display_name)"
+
+NOT_CONNECTED = {
+    "status": "error",
+    "error": "Google Calendar not connected",
+    "user_message": "I need you to connect your Google Calendar first before I can schedule appointments."
+}
+CREDENTIALS_UNREADABLE = {
+    "status": "error",
+    "error": "Failed to access Google Calendar credentials",
+    "user_message": "There was an issue accessing your Google Calendar. Please reconnect your account."
+}
+
+
+def _decrypt_fernet(key: str, encrypted_credentials: str) -> Dict[str, Any]:
+    f = Fernet(key.encode())
+    try:
+        decrypted_data = f.decrypt(base64.b64decode(encrypted_credentials))
+    except Exception:
+        decrypted_data = f.decrypt(encrypted_credentials.encode())
+    return json.loads(decrypted_data.decode())
+
+
+def decode_connection_credentials(encrypted_credentials: str) -> Dict[str, Any]:
+    """
+    OAuth credentials of a connection (access_token, refresh_token, expires_at...).
+    Tries the crypto_utils format first, then the legacy storage formats.
+    """
+    attempts = []
+    if crypto_utils_available:
+        attempts.append(("crypto_utils", lambda: decrypt_credentials(encrypted_credentials)))
+    attempts.append(("base64", lambda: json.loads(base64.b64decode(encrypted_credentials).decode())))
+    if cryptography_available:
+        encryption_key = os.getenv('INTEGRATION_ENCRYPTION_KEY', 'your-32-byte-base64-encoded-key==')
+        attempts.append(("fernet", lambda: _decrypt_fernet(encryption_key, encrypted_credentials)))
+    attempts.append(("json", lambda: json.loads(encrypted_credentials)))
+    if cryptography_available:
+        # Key used before the last rotation
+        attempts.append(("fernet_previous_key", lambda: _decrypt_fernet('wLwYSfmXhP29kuL5FU1l5S8iamcAHTAHj4UenDylIdw=', encrypted_credentials)))
+
+    for method, decode in attempts:
+        try:
+            oauth_data = decode()
+        except Exception as e:
+            logger.debug(f"Credential decoding with {method} failed: {e}")
+            continue
+        if isinstance(oauth_data, dict) and oauth_data.get("access_token"):
+            logger.debug(f"Decoded connection credentials with {method}")
+            return oauth_data
+    raise ValueError(f"Could not extract access_token from any decryption method ({len(encrypted_credentials or '')} chars)")
+
+
+def _expiry_timestamp(credentials: Dict[str, Any]) -> Optional[float]:
+    """expires_at of the credentials as a UNIX timestamp (naive timestamps are UTC)"""
+    expires_at = credentials.get("expires_at")
+    if not expires_at:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(expires_at).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+@dataclass
+class CachedConnection:
+    """Decrypted credentials of one connection"""
+    connection: Row
+    credentials: Dict[str, Any]
+    expires_at: Optional[float]
+    loaded_at: float = field(default_factory=time.time)
+
+    @property
+    def access_token(self) -> str:
+        return self.credentials["access_token"]
+
+    def usable(self, now: float) -> bool:
+        if now - self.loaded_at > CONNECTION_CACHE_TTL_SECONDS:
+            return False
+        return self.expires_at is None or now < self.expires_at - CONNECTION_EXPIRY_MARGIN_SECONDS
+
+    def refresh_due(self, now: float) -> bool:
+        return (
+            self.expires_at is not None
+            and bool(self.credentials.get("refresh_token"))
+            and now >= self.expires_at - CONNECTION_REFRESH_AHEAD_SECONDS
+        )
+
+
+class AppConnectionResolver:
+    """Per-process cache of decrypted app connection credentials"""
+    def __init__(self, max_entries: int = CONNECTION_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple[str, str], CachedConnection]" = OrderedDict()
+        # Lookups and refreshes in progress, per (user, app)
+        self._loading: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def _cached(self, key: Tuple[str, str]) -> Optional[CachedConnection]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        now = time.time()
+        if not entry.usable(now):
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        if entry.refresh_due(now):
+            self._refresh_in_background(key, entry)
+        return entry
+
+    def _store(self, key: Tuple[str, str], entry: CachedConnection):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            now = time.time()
+            for stale_key in [k for k, e in self.entries.items() if not e.usable(now)]:
+                del self.entries[stale_key]
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    async def _load(self, key: Tuple[str, str]) -> CachedConnection:
+        """Connection of the user for the app (one joined query), refreshed if its token expired"""
+        user_id, app_name = key
+        connection = await fetch_one(
+            get_async_db().table("user_app_connections").select(CONNECTION_COLUMNS)
+            .eq("user_id", user_id).eq("app_integrations.name", app_name).order("updated_at", desc=True)
+        )
+        if not connection:
+            raise LookupError(f"No {app_name} connection for user {user_id}")
+        credentials = decode_connection_credentials(connection["credentials"])
+        entry = CachedConnection(connection, credentials, _expiry_timestamp(credentials))
+        if entry.expires_at is not None and not entry.usable(time.time()) and credentials.get("refresh_token"):
+            entry = await self._refresh(entry)
+        self._store(key, entry)
+        if entry.refresh_due(time.time()):
+            self._refresh_in_background(key, entry)
+        return entry
+
+    async def _refresh(self, entry: CachedConnection) -> CachedConnection:
+        try:
+            from api.oauth_utils import refresh_oauth_token
+        except ImportError:
+            from oauth_utils import refresh_oauth_token
+        try:
+            credentials = await refresh_oauth_token(entry.connection)
+        except Exception:
+            self.refresh_failures += 1
+            raise
+        self.refreshes += 1
+        return CachedConnection(entry.connection, credentials, _expiry_timestamp(credentials))
+
+    def _refresh_in_background(self, key: Tuple[str, str], entry: CachedConnection):
+        connection_id = str(entry.connection.get("id"))
+        task = self._refreshing.get(connection_id)
+        if task is not None and not task.done():
+            return
+
+        async def refresh():
+            try:
+                refreshed = await self._refresh(entry)
+            except Exception as e:
+                logger.warning(f"⚠️ Background refresh of {key[1]} connection {connection_id} failed: {e}")
+                return
+            if self.entries.get(key) is entry:
+                self._store(key, refreshed)
+            logger.info(f"🔄 Refreshed {key[1]} token of connection {connection_id} ahead of expiry")
+
+        try:
+            self._refreshing[connection_id] = asyncio.get_running_loop().create_task(refresh())
+        except RuntimeError:
+            pass
+
+    def _start_load(self, key: Tuple[str, str]) -> asyncio.Task:
+        loop = asyncio.get_running_loop()
+        task = self._loading.get(key)
+        if task is None or task.done() or task.get_loop() is not loop:
+            self.misses += 1
+            task = loop.create_task(self._load(key))
+            task.add_done_callback(lambda t: self._loading.pop(key, None) if self._loading.get(key) is t else None)
+            # A prefetch that is never awaited must not report an unretrieved exception
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._loading[key] = task
+        return task
+
+    def prefetch(self, app_name: str, user_id: str):
+        """Start loading a connection ahead of its app action"""
+        key = (str(user_id), app_name)
+        if self._cached(key) is None:
+            self._start_load(key)
+
+    async def get_access_token(self, app_name: str, user_id: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """(access_token, None), or (None, error result of the app action)"""
+        key = (str(user_id), app_name)
+        entry = self._cached(key)
+        if entry is not None:
+            self.hits += 1
+            return entry.access_token, None
+        try:
+            entry = await asyncio.shield(self._start_load(key))
+        except LookupError as e:
+            logger.warning(f"❌ {e}")
+            return None, dict(NOT_CONNECTED)
+        except Exception as e:
+            logger.error(f"❌ Failed to load {app_name} credentials for user {user_id}: {e}")
+            return None, dict(CREDENTIALS_UNREADABLE)
+        logger.info(f"✅ Loaded {app_name} connection {entry.connection.get('id')} for user {user_id}")
+        return entry.access_token, None
+
+    def invalidate(self, user_id: str, app_name: Optional[str] = None):
+        for key in [k for k in self.entries if k[0] == str(user_id) and (app_name is None or k[1] == app_name)]:
+            del self.entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+        }
+
+
+_resolver = AppConnectionResolver()
+
+
+def prefetch_app_connection(app_name: str, user_id: str):
+    _resolver.prefetch(app_name, user_id)
+
+
+async def resolve_app_access_token(app_name: str, user_id: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    return await _resolver.get_access_token(app_name, user_id)
+
+
+def invalidate_app_connection(user_id: str, app_name: Optional[str] = None):
+    _resolver.invalidate(user_id, app_name)
+
+
+def app_connection_stats() -> Dict[str, Any]:
+    return _resolver.stats()
@@ -5,22 +5,35 @@ Batch Campaign Routes for handling bulk calling operations.
 import asyncio
 import csv
 import io
-import json
 import logging
 import uuid
 from datetime import datetime, timezone, timedelta
 from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, HTTPException, status, Header, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, BackgroundTasks, Response
 from pydantic import BaseModel, Field, validator
 from supabase import create_client
 from gotrue.errors import AuthApiError
 
 from api.config import BaseModel as ConfigBaseModel
 from api.db_client import supabase_service_client
+from api.db_async import db_execute, get_async_db, get_agent, get_call, get_batch_call_item, update_batch_call_item
+from api.analytics_rollups import (
+    campaign_country, fetch_rollups, group_counters, other_failed_calls, sum_counters, unfinished_short_calls
+)
+from api.pagination import fetch_page, split_filter
+from api.supabase_auth import get_authenticated_user_id
+from api.call_dispatch import AgentCallContext, resolve_agent_call_context, dispatch_agent_call
+from api.campaign_dialer import (
+    DIALER_RETRY_DELAY_SECONDS, start_campaign_dialer, stop_campaign_dialer, notify_call_item_finished, get_campaign_dialer_stats
+)
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/batch-campaigns", tags=["batch_campaigns"])
 
+# "calling" status write of a dispatched call item
+CALL_ITEM_STATUS_WRITE_ATTEMPTS = 3
+CALL_ITEM_STATUS_RETRY_DELAY_SECONDS = 0.5
+
 # ===== Pydantic Models =====
 
 from typing import ClassVar
@@ -163,6 +176,14 @@ async def verify_user_access_to_campaign(campaign_id: str, user_id: str) -> Dict
         logger.error(f"Error verifying campaign access: {e}")
         raise HTTPException(status_code=500, detail="Failed to verify campaign access")
 
+async def count_campaign_items(campaign_id: str, **filters: Any) -> int:
+    """Number of call items of a campaign matching column=value filters, without fetching them"""
+    query = get_async_db().table("batch_call_items").select("id", count="exact").eq("batch_campaign_id", campaign_id)
+    for column, value in filters.items():
+        query = query.eq(column, value)
+    response = await db_execute(query.limit(1))
+    return response.count or 0
+
 async def verify_agent_belongs_to_user(agent_id: int, user_id: str) -> Dict[str, Any]:
     """Verify agent belongs to user and return agent data"""
     try:
@@ -300,7 +321,11 @@ async def mark_campaign_completed(campaign_id: str):
         logger.error(f"Error marking campaign {campaign_id} as completed: {e}")
 
 async def execute_batch_campaign(campaign_id: str) -> bool:
-    """Execute a batch campaign by creating individual LiveKit call jobs"""
+    """Start the dialer engine for a batch campaign.
+
+    The dialer keeps `concurrency_limit` calls in flight and refills a slot every
+    time a call reaches a terminal state, until no pending call items are left.
+    """
     try:
         # Get campaign details
         campaign_response = supabase_service_client.table("batch_campaigns").select("*").eq("id", campaign_id).single().execute()
@@ -312,150 +337,35 @@ async def execute_batch_campaign(campaign_id: str) -> bool:
         campaign = campaign_response.data
         
         # Get agent details
-        agent_response = supabase_service_client.table("agents").select("*").eq("id", campaign["agent_id"]).single().execute()
+        agent = await get_agent(campaign["agent_id"])
         
-        if not agent_response.data:
+        if not agent:
             logger.error(f"Agent {campaign['agent_id']} not found for campaign {campaign_id}")
             return False
         
-        agent = agent_response.data
-        
-        # Get pending call items for this campaign
-        items_response = supabase_service_client.table("batch_call_items").select("*").eq("batch_campaign_id", campaign_id).eq("status", "pending").execute()
+        # Make sure there is something to dial
+        items_response = supabase_service_client.table("batch_call_items").select("id").eq("batch_campaign_id", campaign_id).eq("status", "pending").limit(1).execute()
         
-        call_items = items_response.data or []
-        
-        if not call_items:
+        if not items_response.data:
             logger.warning(f"No pending call items found for campaign {campaign_id}")
             return True
         
+        # Resolve agent, caller ID and SIP trunk once for the whole campaign
+        call_context = await resolve_agent_call_context(campaign["agent_id"], agent_config=agent)
+        
         # Update campaign status to running
         supabase_service_client.table("batch_campaigns").update({
             "status": "running",
             "started_at": datetime.now(timezone.utc).isoformat()
         }).eq("id", campaign_id).execute()
         
-        logger.info(f"Starting execution of campaign {campaign_id} with {len(call_items)} call items")
+        async def dial_item(item: Dict[str, Any]) -> bool:
+            return await dial_batch_call_item(campaign, item, call_context)
         
-        # Create LiveKit call jobs for each call item (respecting concurrency limit)
-        from livekit.api import LiveKitAPI, CreateRoomRequest
-        import os
-        
-        livekit_api = LiveKitAPI(
-            url=os.getenv("LIVEKIT_URL"),
-            api_key=os.getenv("LIVEKIT_API_KEY"),
-            api_secret=os.getenv("LIVEKIT_API_SECRET")
-        )
-        
-        # Process calls with concurrency limit
         concurrency_limit = campaign.get("concurrency_limit", 3)
-        active_calls = 0
+        start_campaign_dialer(campaign_id, concurrency_limit, dial_item)
         
-        for item in call_items[:concurrency_limit]:  # Start with first batch
-            try:
-                # Create room for this call
-                room_name = f"batch-call-{item['id']}"
-                
-                room_request = CreateRoomRequest(
-                    name=room_name,
-                    empty_timeout=300,  # 5 minutes
-                    departure_timeout=60  # 1 minute
-                )
-                
-                room = await livekit_api.room.create_room(room_request)
-                
-                # Create call record in database
-                call_data = {
-                    "user_id": campaign["user_id"],
-                    "agent_id": campaign["agent_id"],
-                    "phone_number_e164": item["phone_number_e164"],
-                    "contact_name": item.get("contact_name"),
-                    "status": "calling",
-                    "room_name": room_name,
-                    "call_type": "outbound_batch",
-                    "batch_campaign_id": campaign_id,
-                    "batch_call_item_id": item["id"]
-                }
-                
-                call_response = supabase_service_client.table("calls").insert(call_data).execute()
-                
-                if call_response.data:
-                    call_id = call_response.data[0]["id"]
-                    
-                    # Update call item status
-                    supabase_service_client.table("batch_call_items").update({
-                        "status": "calling",
-                        "call_id": str(call_id),
-                        "attempts": 1,
-                        "last_attempt_at": datetime.now(timezone.utc).isoformat()
-                    }).eq("id", item["id"]).execute()
-                    
-                    # Dispatch agent to the room with batch context
-                    job_metadata = {
-                        "agent_id": str(campaign["agent_id"]),
-                        "phone_number": item["phone_number_e164"],
-                        "contact_name": item.get("contact_name", ""),
-                        "custom_data": item.get("custom_data", {}),
-                        "batch_campaign_id": campaign_id,
-                        "batch_call_item_id": item["id"],
-                        "supabase_call_id": str(call_id)
-                    }
-                    
-                    # Create a dispatch call job for the LiveKit worker
-                    # This creates a SIP outbound call through the existing agent system
-                    import httpx
-                    try:
-                        backend_url = os.getenv("BACKEND_API_URL", "http://localhost:8000")
-                        agent_call_payload = {
-                            "agent_id": campaign["agent_id"],
-                            "phoneNumber": item["phone_number_e164"],
-                            "lastName": item.get("contact_name", ""),
-                            # Include batch context so the call gets linked properly
-                            "batch_campaign_id": campaign_id,
-                            "batch_call_item_id": item["id"]
-                        }
-                        
-                        async with httpx.AsyncClient() as client:
-                            call_response = await client.post(
-                                f"{backend_url}/agents/call",
-                                json=agent_call_payload,
-                                timeout=30.0
-                            )
-                            
-                        if call_response.status_code == 200:
-                            logger.info(f"Successfully dispatched agent call for {item['phone_number_e164']}")
-                        else:
-                            logger.error(f"Failed to dispatch agent call: {call_response.status_code} - {call_response.text}")
-                            
-                    except Exception as dispatch_error:
-                        logger.error(f"Error dispatching agent call: {dispatch_error}")
-                        # Continue with room metadata update as fallback
-                        try:
-                            await livekit_api.room.update_room_metadata(
-                                room=room_name,
-                                metadata=json.dumps(job_metadata)
-                            )
-                        except Exception as metadata_error:
-                            logger.error(f"Fallback room metadata update failed: {metadata_error}")
-                    
-                    logger.info(f"Created call job for {item['phone_number_e164']} in room {room_name}")
-                    active_calls += 1
-                    
-                else:
-                    logger.error(f"Failed to create call record for item {item['id']}")
-                    
-            except Exception as e:
-                logger.error(f"Error creating call job for item {item['id']}: {e}")
-                
-                # Mark call item as failed
-                supabase_service_client.table("batch_call_items").update({
-                    "status": "failed",
-                    "error_message": str(e),
-                    "attempts": 1,
-                    "last_attempt_at": datetime.now(timezone.utc).isoformat()
-                }).eq("id", item["id"]).execute()
-        
-        logger.info(f"Started {active_calls} calls for campaign {campaign_id}")
+        logger.info(f"Started dialer for campaign {campaign_id} with concurrency limit {concurrency_limit}")
         return True
         
     except Exception as e:
@@ -472,6 +382,57 @@ async def execute_batch_campaign(campaign_id: str) -> bool:
             
         return False
 
+async def dial_batch_call_item(campaign: Dict[str, Any], item: Dict[str, Any], call_context: AgentCallContext) -> bool:
+    """Dispatch the agent call for a single call item. Returns True if the call was dispatched."""
+    campaign_id = campaign["id"]
+    attempts = max(item.get("attempts") or 0, 1)
+    
+    try:
+        result = await dispatch_agent_call(
+            call_context,
+            phone_number=item["phone_number_e164"],
+            contact_name=item.get("contact_name"),
+            batch_campaign_id=campaign_id,
+            batch_call_item_id=item["id"],
+            call_log_extra={
+                "phone_number_e164": item["phone_number_e164"],
+                "contact_name": item.get("contact_name"),
+                "call_type": "outbound_batch"
+            }
+        )
+    except Exception as e:
+        logger.error(f"Error creating call job for item {item['id']}: {e}")
+        
+        # Mark call item as failed
+        try:
+            await update_batch_call_item(item["id"], {
+                "status": "failed",
+                "error_message": str(e),
+                "attempts": attempts,
+                "last_attempt_at": datetime.now(timezone.utc).isoformat()
+            })
+        except Exception as update_error:
+            logger.error(f"Could not mark call item {item['id']} as failed: {update_error}")
+        return False
+    
+    # The call is live from here: it keeps its dialer slot even if the status write fails
+    for attempt in range(1, CALL_ITEM_STATUS_WRITE_ATTEMPTS + 1):
+        try:
+            await update_batch_call_item(item["id"], {
+                "status": "calling",
+                "call_id": result.supabase_call_id,
+                "attempts": attempts,
+                "last_attempt_at": datetime.now(timezone.utc).isoformat()
+            })
+            break
+        except Exception as e:
+            logger.warning(f"Could not mark call item {item['id']} as calling (attempt {attempt}/{CALL_ITEM_STATUS_WRITE_ATTEMPTS}): {e}")
+            if attempt < CALL_ITEM_STATUS_WRITE_ATTEMPTS:
+                await asyncio.sleep(CALL_ITEM_STATUS_RETRY_DELAY_SECONDS * attempt)
+    
+    logger.info(f"Dispatched call {result.supabase_call_id} for {item['phone_number_e164']} (campaign {campaign_id})")
+    return True
+
 # Scheduled campaigns functionality removed for simplicity
 
 def parse_csv_content(csv_content: str) -> CSVUploadResponse:
@@ -572,22 +533,10 @@ def parse_csv_content(csv_content: str) -> CSVUploadResponse:
 @router.post("/", response_model=BatchCampaignResponse, status_code=status.HTTP_201_CREATED)
 async def create_batch_campaign(
     request: BatchCampaignCreateRequest,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Create a new batch campaign"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
     try:
-        # Verify token
-        user_response = supabase_service_client.auth.get_user(token)
-        if not user_response.user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user_id = user_response.user.id
-        
         # Verify agent belongs to user
         await verify_agent_belongs_to_user(request.agent_id, user_id)
         
@@ -623,36 +572,29 @@ async def create_batch_campaign(
 
 @router.get("/", response_model=List[BatchCampaignResponse])
 async def list_batch_campaigns(
-    authorization: str = Header(None, alias="Authorization"),
+    response: Response,
+    user_id: str = Depends(get_authenticated_user_id),
     status_filter: Optional[str] = None,
     limit: int = 50,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    agent_id: Optional[int] = None
 ):
-    """List user's batch campaigns"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
+    """List user's batch campaigns, most recent first (next page cursor in X-Next-Cursor)"""
     try:
-        # Verify token
-        user_response = supabase_service_client.auth.get_user(token)
-        if not user_response.user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user_id = user_response.user.id
-        
         # Build query
-        query = supabase_service_client.table("batch_campaigns").select("*").eq("user_id", user_id)
+        query = get_async_db().table("batch_campaigns").select("*", count="estimated").eq("user_id", user_id)
         
-        if status_filter:
-            query = query.eq("status", status_filter)
+        statuses = split_filter(status_filter)
+        if statuses:
+            query = query.in_("status", statuses)
+        if agent_id is not None:
+            query = query.eq("agent_id", agent_id)
         
-        query = query.order("created_at", desc=True).range(offset, offset + limit - 1)
+        page = await fetch_page(query, limit, cursor, sort_column="created_at", descending=True, offset=offset)
+        page.apply_headers(response)
         
-        response = query.execute()
-        
-        campaigns = [BatchCampaignResponse(**campaign) for campaign in response.data or []]
+        campaigns = [BatchCampaignResponse(**campaign) for campaign in page.rows]
         
         logger.info(f"Retrieved {len(campaigns)} campaigns for user {user_id}")
         return campaigns
@@ -666,22 +608,10 @@ async def list_batch_campaigns(
 @router.get("/{campaign_id}", response_model=BatchCampaignResponse)
 async def get_batch_campaign(
     campaign_id: str,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Get specific batch campaign details"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
     try:
-        # Verify token
-        user_response = supabase_service_client.auth.get_user(token)
-        if not user_response.user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user_id = user_response.user.id
-        
         # Get campaign and verify access
         campaign_data = await verify_user_access_to_campaign(campaign_id, user_id)
         
@@ -697,22 +627,10 @@ async def get_batch_campaign(
 async def update_batch_campaign(
     campaign_id: str,
     request: BatchCampaignUpdateRequest,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Update batch campaign"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
     try:
-        # Verify token
-        user_response = supabase_service_client.auth.get_user(token)
-        if not user_response.user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user_id = user_response.user.id
-        
         # Verify access to campaign
         campaign_data = await verify_user_access_to_campaign(campaign_id, user_id)
         
@@ -749,22 +667,10 @@ async def update_batch_campaign(
 @router.delete("/{campaign_id}")
 async def delete_batch_campaign(
     campaign_id: str,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Delete batch campaign"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
     try:
-        # Verify token
-        user_response = supabase_service_client.auth.get_user(token)
-        if not user_response.user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user_id = user_response.user.id
-        
         # Verify access to campaign
         campaign_data = await verify_user_access_to_campaign(campaign_id, user_id)
         
@@ -791,22 +697,10 @@ async def delete_batch_campaign(
 @router.post("/{campaign_id}/start")
 async def start_batch_campaign(
     campaign_id: str,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Manually start a batch campaign"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
     try:
-        # Verify token
-        user_response = supabase_service_client.auth.get_user(token)
-        if not user_response.user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user_id = user_response.user.id
-        
         # Verify access to campaign
         campaign_data = await verify_user_access_to_campaign(campaign_id, user_id)
         
@@ -843,22 +737,10 @@ async def start_batch_campaign(
 async def schedule_batch_campaign(
     campaign_id: str,
     request: BatchCampaignScheduleRequest,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Schedule a batch campaign to start at a specific time"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
     try:
-        # Verify token
-        user_response = supabase_service_client.auth.get_user(token)
-        if not user_response.user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user_id = user_response.user.id
-        
         # Verify access to campaign
         campaign_data = await verify_user_access_to_campaign(campaign_id, user_id)
         
@@ -900,22 +782,10 @@ async def schedule_batch_campaign(
 @router.post("/{campaign_id}/complete")
 async def complete_batch_campaign(
     campaign_id: str,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Manually mark a batch campaign as completed"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
     try:
-        # Verify token
-        user_response = supabase_service_client.auth.get_user(token)
-        if not user_response.user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user_id = user_response.user.id
-        
         # Verify access to campaign
         campaign_data = await verify_user_access_to_campaign(campaign_id, user_id)
         
@@ -929,8 +799,9 @@ async def complete_batch_campaign(
                 detail=f"Cannot complete campaign with status '{current_status}'. Campaign must be running or failed."
             )
         
-        # Mark campaign as completed
+        # Mark campaign as completed and stop dialing the remaining numbers
         await mark_campaign_completed(campaign_id)
+        stop_campaign_dialer(campaign_id)
         
         logger.info(f"Manually completed batch campaign {campaign_id}")
         
@@ -947,12 +818,9 @@ async def complete_batch_campaign(
 @router.post("/upload-csv", response_model=CSVUploadResponse)
 async def upload_csv(
     file: UploadFile = File(...),
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Upload and validate CSV file for batch campaign"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-    
     # Validate file type
     if not file.filename or not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="File must be a CSV")
@@ -978,22 +846,10 @@ async def upload_csv(
 async def add_call_items_to_campaign(
     campaign_id: str,
     items: List[BatchCallItemCreateRequest],
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Add call items to a batch campaign"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
     try:
-        # Verify token
-        user_response = supabase_service_client.auth.get_user(token)
-        if not user_response.user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user_id = user_response.user.id
-        
         # Verify access to campaign
         campaign_data = await verify_user_access_to_campaign(campaign_id, user_id)
         
@@ -1031,37 +887,18 @@ async def add_call_items_to_campaign(
 @router.get("/{campaign_id}/progress", response_model=CampaignProgressResponse)
 async def get_campaign_progress(
     campaign_id: str,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Get real-time progress and analytics of a batch campaign"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
     try:
-        # Verify token
-        try:
-            user_response = supabase_service_client.auth.get_user(token)
-            if not user_response.user:
-                raise HTTPException(status_code=401, detail="Invalid token")
-        except Exception as auth_error:
-            logger.debug(f"Auth error for token: {auth_error}")
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user_id = user_response.user.id
-        
         # Verify access to campaign
         campaign_data = await verify_user_access_to_campaign(campaign_id, user_id)
         
-        # Get call items status breakdown
-        items_response = supabase_service_client.table("batch_call_items").select("status").eq("batch_campaign_id", campaign_id).execute()
-        
-        # Count statuses
-        status_counts = {}
-        for item in items_response.data or []:
-            status = item.get("status", "pending")
-            status_counts[status] = status_counts.get(status, 0) + 1
+        # Get call items status breakdown (counts only)
+        status_counts = dict(zip(
+            ("pending", "retrying", "calling"),
+            await asyncio.gather(*(count_campaign_items(campaign_id, status=item_status) for item_status in ("pending", "retrying", "calling")))
+        ))
         
         total_numbers = campaign_data.get("total_numbers", 0)
         completed_calls = campaign_data.get("completed_calls", 0)
@@ -1085,68 +922,38 @@ async def get_campaign_progress(
         
         # ===== MVP ANALYTICS ENHANCEMENT =====
         
-        # Get detailed call analytics from the calls table
-        # Fix column names - use the correct ones from the database
-        calls_response = supabase_service_client.table("calls").select(
-            "id, status, call_duration, phone_number_e164, created_at, initiated_at, answered_at, ended_at"
-        ).eq("batch_campaign_id", campaign_id).execute()
-        
-        calls_data = calls_response.data or []
+        # Call analytics come from the campaign's rollup buckets
+        hourly_rollups, region_rollups = await asyncio.gather(
+            fetch_rollups(user_id, "campaign", "hour", scope_ids=[campaign_id]),
+            fetch_rollups(user_id, "campaign_region", "day", scope_id_prefix=f"{campaign_id}:"),
+        )
+        totals = sum_counters(hourly_rollups)
         
-        # Calculate call outcomes
+        # Calculate call outcomes (completed calls over 30 seconds likely reached humans,
+        # short ones might be voicemail)
         call_outcomes = {
-            "connected": 0,
-            "voicemail": 0,
-            "no_answer": 0,
-            "busy": 0,
-            "failed": 0
+            "connected": totals["connected_calls"],
+            "voicemail": totals["voicemail_calls"],
+            "no_answer": unfinished_short_calls(totals) + totals["no_answer_calls"] + totals["timeout_calls"],
+            "busy": totals["busy_calls"],
+            "failed": other_failed_calls(totals)
         }
         
-        total_call_duration = 0
-        valid_durations = []
-        peak_hours = {}
-        
-        for call in calls_data:
-            # Map call statuses to outcomes
-            status = (call.get("status") or "failed").lower()
-            duration = call.get("call_duration", 0) or 0
-            
-            if status in ["completed", "ended"]:
-                if duration > 30:  # Calls over 30 seconds likely reached humans
-                    call_outcomes["connected"] += 1
-                elif duration > 5:  # Short calls might be voicemail
-                    call_outcomes["voicemail"] += 1
-                else:
-                    call_outcomes["no_answer"] += 1
-            elif status in ["busy"]:
-                call_outcomes["busy"] += 1
-            elif status in ["no_answer", "timeout"]:
-                call_outcomes["no_answer"] += 1
-            else:
-                call_outcomes["failed"] += 1
-            
-            # Track call durations
-            if duration > 0:
-                total_call_duration += duration
-                valid_durations.append(duration)
-            
-            # Track peak response hours
-            if call.get("initiated_at") and status in ["completed", "ended"]:
-                try:
-                    initiated_at = datetime.fromisoformat(call["initiated_at"].replace('Z', '+00:00'))
-                    hour = initiated_at.hour
-                    peak_hours[hour] = peak_hours.get(hour, 0) + 1
-                except:
-                    pass
+        total_call_duration = totals["total_duration"]
         
         # Calculate response rate (calls that reached humans)
         connected_calls = call_outcomes["connected"]
         response_rate = (connected_calls / total_numbers * 100) if total_numbers > 0 else 0
         
         # Calculate average call duration
-        avg_call_duration = sum(valid_durations) / len(valid_durations) if valid_durations else 0
+        avg_call_duration = total_call_duration / totals["timed_calls"] if totals["timed_calls"] else 0
         
         # Find peak response hours (top 3)
+        peak_hours = {}
+        for bucket in hourly_rollups:
+            if bucket["completed_calls"] > 0:
+                hour = int(bucket["bucket_start"][11:13])
+                peak_hours[hour] = peak_hours.get(hour, 0) + bucket["completed_calls"]
         peak_response_hours = []
         if peak_hours:
             sorted_hours = sorted(peak_hours.items(), key=lambda x: x[1], reverse=True)[:3]
@@ -1154,23 +961,12 @@ async def get_campaign_progress(
         
         # Geographic performance (simplified - by country code)
         geographic_performance = {}
-        for call in calls_data:
-            phone_number = call.get("phone_number_e164", "") or ""
-            if phone_number.startswith("+1"):
-                country = "US/CA"
-            elif phone_number.startswith("+33"):
-                country = "France"
-            elif phone_number.startswith("+44"):
-                country = "UK"
-            else:
-                country = "Other"
-            
+        for region, counters in group_counters(region_rollups, lambda row: row["scope_id"].split(":", 1)[1]).items():
+            country = campaign_country(region)
             if country not in geographic_performance:
                 geographic_performance[country] = {"total": 0, "connected": 0}
-            
-            geographic_performance[country]["total"] += 1
-            if (call.get("status") or "").lower() in ["completed", "ended"] and (call.get("call_duration", 0) or 0) > 30:
-                geographic_performance[country]["connected"] += 1
+            geographic_performance[country]["total"] += counters["total_calls"]
+            geographic_performance[country]["connected"] += counters["connected_calls"]
         
         return CampaignProgressResponse(
             campaign_id=campaign_id,
@@ -1199,45 +995,56 @@ async def get_campaign_progress(
         logger.error(f"Error getting campaign progress {campaign_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to get campaign progress")
 
-@router.get("/{campaign_id}/analytics", response_model=Dict[str, Any])
-async def get_campaign_analytics(
+@router.get("/{campaign_id}/dialer-stats", response_model=Dict[str, Any])
+async def get_campaign_dialer_throughput(
     campaign_id: str,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
-    """Get detailed analytics for a completed or running batch campaign"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
+    """Get live dialer throughput (active slots, calls/minute) for a running campaign"""
     try:
-        # Verify token
-        try:
-            user_response = supabase_service_client.auth.get_user(token)
-            if not user_response.user:
-                raise HTTPException(status_code=401, detail="Invalid token")
-        except Exception as auth_error:
-            logger.debug(f"Auth error for token: {auth_error}")
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user_id = user_response.user.id
-        
         # Verify access to campaign
         campaign_data = await verify_user_access_to_campaign(campaign_id, user_id)
         
-        # Get all calls for this campaign
-        calls_response = supabase_service_client.table("calls").select(
-            "id, status, call_duration, phone_number_e164, created_at, initiated_at, answered_at, ended_at, call_control_id"
-        ).eq("batch_campaign_id", campaign_id).execute()
+        dialer_stats = get_campaign_dialer_stats(campaign_id)
+        if dialer_stats is None:
+            return {
+                "campaign_id": campaign_id,
+                "running": False,
+                "status": campaign_data.get("status"),
+                "concurrency_limit": campaign_data.get("concurrency_limit", 3)
+            }
         
-        calls_data = calls_response.data or []
+        dialer_stats["status"] = campaign_data.get("status")
+        return dialer_stats
         
-        # Get call items for additional context
-        items_response = supabase_service_client.table("batch_call_items").select(
-            "id, phone_number_e164, contact_name, status, attempts, last_attempt_at, completed_at, error_message"
-        ).eq("batch_campaign_id", campaign_id).execute()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting dialer stats for campaign {campaign_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get dialer stats")
+
+@router.get("/{campaign_id}/analytics", response_model=Dict[str, Any])
+async def get_campaign_analytics(
+    campaign_id: str,
+    user_id: str = Depends(get_authenticated_user_id)
+):
+    """Get detailed analytics for a completed or running batch campaign"""
+    try:
+        # Verify access to campaign
+        campaign_data = await verify_user_access_to_campaign(campaign_id, user_id)
         
-        items_data = items_response.data or []
+        # Call counts come from the campaign's rollup buckets, item counts from count queries
+        hourly_rollups, region_rollups, total_numbers, single_attempt_numbers, retry_items_response = await asyncio.gather(
+            fetch_rollups(user_id, "campaign", "hour", scope_ids=[campaign_id]),
+            fetch_rollups(user_id, "campaign_region", "day", scope_id_prefix=f"{campaign_id}:"),
+            count_campaign_items(campaign_id),
+            count_campaign_items(campaign_id, attempts=1),
+            # Only items that needed retries are fetched
+            db_execute(get_async_db().table("batch_call_items").select("attempts, status")
+                       .eq("batch_campaign_id", campaign_id).gt("attempts", 1)),
+        )
+        totals = sum_counters(hourly_rollups)
+        retry_items = retry_items_response.data or []
         
         # Detailed Analytics Calculations
         analytics = {
@@ -1245,8 +1052,8 @@ async def get_campaign_analytics(
                 "campaign_id": campaign_id,
                 "campaign_name": campaign_data.get("name", "Unknown"),
                 "status": campaign_data.get("status", "draft"),
-                "total_numbers": len(items_data),
-                "total_calls_made": len(calls_data),
+                "total_numbers": total_numbers,
+                "total_calls_made": totals["total_calls"],
                 "created_at": campaign_data.get("created_at"),
                 "started_at": campaign_data.get("started_at"),
                 "completed_at": campaign_data.get("completed_at")
@@ -1260,13 +1067,14 @@ async def get_campaign_analytics(
                 "avg_attempts_per_number": 0.0
             },
             
+            # Completed calls over 30s are likely human conversations, 6-30s likely voicemail
             "call_outcomes": {
-                "connected_human": 0,
-                "reached_voicemail": 0,
-                "no_answer": 0,
-                "busy_signal": 0,
-                "failed_calls": 0,
-                "still_calling": 0
+                "connected_human": totals["connected_calls"],
+                "reached_voicemail": totals["voicemail_calls"],
+                "no_answer": unfinished_short_calls(totals) + totals["no_answer_calls"] + totals["timeout_calls"],
+                "busy_signal": totals["busy_calls"],
+                "failed_calls": other_failed_calls(totals) - totals["calling_calls"],
+                "still_calling": totals["calling_calls"]
             },
             
             "time_analysis": {
@@ -1284,113 +1092,45 @@ async def get_campaign_analytics(
             }
         }
         
-        # Process calls data
-        total_duration = 0
-        connected_calls = 0
-        completed_calls = len([c for c in calls_data if c.get("status", "").lower() in ["completed", "ended"]])
+        connected_calls = totals["connected_calls"]
+        completed_calls = totals["completed_calls"]
         
-        for call in calls_data:
-            status = (call.get("status") or "failed").lower()
-            duration = call.get("call_duration", 0) or 0
-            total_duration += duration
-            
-            # Categorize call outcomes
-            if status in ["completed", "ended"]:
-                if duration > 30:  # Likely human conversation
-                    analytics["call_outcomes"]["connected_human"] += 1
-                    connected_calls += 1
-                elif duration > 5:  # Likely voicemail
-                    analytics["call_outcomes"]["reached_voicemail"] += 1
-                else:
-                    analytics["call_outcomes"]["no_answer"] += 1
-            elif status == "busy":
-                analytics["call_outcomes"]["busy_signal"] += 1
-            elif status == "calling":
-                analytics["call_outcomes"]["still_calling"] += 1
-            elif status in ["no_answer", "timeout"]:
-                analytics["call_outcomes"]["no_answer"] += 1
-            else:
-                analytics["call_outcomes"]["failed_calls"] += 1
-            
-            # Time analysis
-            if call.get("initiated_at"):
-                try:
-                    initiated_at = datetime.fromisoformat(call["initiated_at"].replace('Z', '+00:00'))
-                    hour = initiated_at.hour
-                    date = initiated_at.date().isoformat()
-                    
-                    # Peak hours
-                    hour_key = f"{hour:02d}:00-{hour+1:02d}:00"
-                    analytics["time_analysis"]["peak_hours"][hour_key] = analytics["time_analysis"]["peak_hours"].get(hour_key, 0) + 1
-                    
-                    # Daily breakdown
-                    analytics["time_analysis"]["daily_breakdown"][date] = analytics["time_analysis"]["daily_breakdown"].get(date, 0) + 1
-                    
-                    # Average duration by hour
-                    if hour_key not in analytics["time_analysis"]["avg_call_duration_by_hour"]:
-                        analytics["time_analysis"]["avg_call_duration_by_hour"][hour_key] = []
-                    if duration > 0:
-                        analytics["time_analysis"]["avg_call_duration_by_hour"][hour_key].append(duration)
-                except:
-                    pass
-            
-            # Geographic analysis
-            phone_number = call.get("phone_number_e164", "") or ""
-            if phone_number.startswith("+1"):
-                country = "US/CA"
-            elif phone_number.startswith("+33"):
-                country = "France"
-            elif phone_number.startswith("+44"):
-                country = "UK"
-            else:
-                country = "Other"
-            
-            if country not in analytics["geographic_breakdown"]:
-                analytics["geographic_breakdown"][country] = {
-                    "total_calls": 0,
-                    "connected": 0,
-                    "avg_duration": 0.0,
-                    "durations": []
-                }
-            
-            analytics["geographic_breakdown"][country]["total_calls"] += 1
-            if status in ["completed", "ended"] and duration > 30:
-                analytics["geographic_breakdown"][country]["connected"] += 1
-            if duration > 0:
-                analytics["geographic_breakdown"][country]["durations"].append(duration)
+        # Time analysis
+        for hour, counters in sorted(group_counters(hourly_rollups, lambda row: int(row["bucket_start"][11:13])).items()):
+            hour_key = f"{hour:02d}:00-{hour+1:02d}:00"
+            analytics["time_analysis"]["peak_hours"][hour_key] = counters["total_calls"]
+            analytics["time_analysis"]["avg_call_duration_by_hour"][hour_key] = (
+                round(counters["total_duration"] / counters["timed_calls"], 2) if counters["timed_calls"] else 0.0
+            )
+        for date, counters in sorted(group_counters(hourly_rollups, lambda row: row["bucket_start"][:10]).items()):
+            analytics["time_analysis"]["daily_breakdown"][date] = counters["total_calls"]
+        
+        # Geographic analysis
+        country_counters = group_counters(region_rollups, lambda row: campaign_country(row["scope_id"].split(":", 1)[1]))
+        for country, counters in country_counters.items():
+            analytics["geographic_breakdown"][country] = {
+                "total_calls": counters["total_calls"],
+                "connected": counters["connected_calls"],
+                "avg_duration": round(counters["total_duration"] / counters["timed_calls"], 2) if counters["timed_calls"] else 0.0
+            }
         
         # Calculate performance metrics
-        total_numbers = len(items_data)
-        total_calls = len(calls_data)
+        total_calls = totals["total_calls"]
         
         if total_numbers > 0:
             analytics["performance_metrics"]["connection_rate"] = round((connected_calls / total_numbers) * 100, 2)
             analytics["performance_metrics"]["completion_rate"] = round((completed_calls / total_numbers) * 100, 2)
         
         if total_calls > 0:
-            analytics["performance_metrics"]["avg_call_duration"] = round(total_duration / total_calls, 2)
+            analytics["performance_metrics"]["avg_call_duration"] = round(totals["total_duration"] / total_calls, 2)
             analytics["performance_metrics"]["answer_rate"] = round(((connected_calls + analytics["call_outcomes"]["reached_voicemail"]) / total_calls) * 100, 2)
         
         # Calculate average attempts
-        total_attempts = sum(item.get("attempts", 1) for item in items_data)
+        total_attempts = single_attempt_numbers + sum(item.get("attempts", 1) for item in retry_items)
         if total_numbers > 0:
             analytics["performance_metrics"]["avg_attempts_per_number"] = round(total_attempts / total_numbers, 2)
         
-        # Calculate average durations by hour
-        for hour_key, durations in analytics["time_analysis"]["avg_call_duration_by_hour"].items():
-            if durations:
-                analytics["time_analysis"]["avg_call_duration_by_hour"][hour_key] = round(sum(durations) / len(durations), 2)
-            else:
-                analytics["time_analysis"]["avg_call_duration_by_hour"][hour_key] = 0.0
-        
-        # Calculate geographic averages
-        for country_data in analytics["geographic_breakdown"].values():
-            if country_data["durations"]:
-                country_data["avg_duration"] = round(sum(country_data["durations"]) / len(country_data["durations"]), 2)
-            del country_data["durations"]  # Remove raw data from response
-        
         # Retry analysis
-        retry_items = [item for item in items_data if item.get("attempts", 1) > 1]
         analytics["retry_analysis"]["numbers_requiring_retries"] = len(retry_items)
         
         if retry_items:
@@ -1411,45 +1151,35 @@ async def get_campaign_analytics(
 @router.get("/{campaign_id}/items", response_model=List[BatchCallItemResponse])
 async def get_campaign_call_items(
     campaign_id: str,
-    authorization: str = Header(None, alias="Authorization"),
+    response: Response,
+    user_id: str = Depends(get_authenticated_user_id),
     status_filter: Optional[str] = None,
     limit: int = 100,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    min_attempts: Optional[int] = None
 ):
-    """Get call items for a batch campaign"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
+    """Get call items for a batch campaign in dialing order (next page cursor in X-Next-Cursor)"""
     try:
-        # Verify token
-        try:
-            user_response = supabase_service_client.auth.get_user(token)
-            if not user_response.user:
-                raise HTTPException(status_code=401, detail="Invalid token")
-        except Exception as auth_error:
-            logger.debug(f"Auth error for token: {auth_error}")
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user_id = user_response.user.id
-        
         # Verify access to campaign
         await verify_user_access_to_campaign(campaign_id, user_id)
         
         # Build query for call items
-        query = supabase_service_client.table("batch_call_items").select(
-            "id, batch_campaign_id, phone_number_e164, contact_name, custom_data, status, call_id, attempts, last_attempt_at, completed_at, error_message, created_at, updated_at"
+        query = get_async_db().table("batch_call_items").select(
+            "id, batch_campaign_id, phone_number_e164, contact_name, custom_data, status, call_id, attempts, last_attempt_at, completed_at, error_message, created_at, updated_at",
+            count="estimated"
         ).eq("batch_campaign_id", campaign_id)
         
-        if status_filter:
-            query = query.eq("status", status_filter)
+        statuses = split_filter(status_filter)
+        if statuses:
+            query = query.in_("status", statuses)
+        if min_attempts is not None:
+            query = query.gte("attempts", min_attempts)
         
-        query = query.order("created_at", desc=False).range(offset, offset + limit - 1)
+        page = await fetch_page(query, limit, cursor, sort_column="created_at", descending=False, offset=offset)
+        page.apply_headers(response)
         
-        response = query.execute()
-        
-        call_items = [BatchCallItemResponse(**item) for item in response.data or []]
+        call_items = [BatchCallItemResponse(**item) for item in page.rows]
         
         logger.info(f"Retrieved {len(call_items)} call items for campaign {campaign_id}")
         return call_items
@@ -1462,12 +1192,9 @@ async def get_campaign_call_items(
 
 @router.post("/check-completions")
 async def trigger_campaign_completion_check(
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Manually trigger completion check for all running campaigns (for troubleshooting)"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-    
     try:
         await check_and_complete_finished_campaigns()
         return {"message": "Campaign completion check triggered successfully"}
@@ -1480,15 +1207,12 @@ async def update_batch_call_item_from_call_status(call_id: str, call_status: str
     """Update batch call item status based on call completion"""
     try:
         # Get the call to find the associated batch call item
-        call_response = supabase_service_client.table("calls").select(
-            "id, batch_call_item_id, batch_campaign_id, status, call_duration"
-        ).eq("id", call_id).single().execute()
+        call_data = await get_call(call_id, columns="id, batch_call_item_id, batch_campaign_id, status, call_duration")
         
-        if not call_response.data:
+        if not call_data:
             logger.debug(f"Call {call_id} not found or not a batch call")
             return
         
-        call_data = call_response.data
         batch_call_item_id = call_data.get("batch_call_item_id")
         batch_campaign_id = call_data.get("batch_campaign_id")
         
@@ -1514,34 +1238,36 @@ async def update_batch_call_item_from_call_status(call_id: str, call_status: str
         # If the call failed, we might want to retry
         if item_status == "failed":
             # Get current attempts
-            item_response = supabase_service_client.table("batch_call_items").select(
-                "attempts, batch_campaign_id"
-            ).eq("id", batch_call_item_id).single().execute()
+            item_data = await get_batch_call_item(batch_call_item_id, columns="attempts, batch_campaign_id")
             
-            if item_response.data:
-                current_attempts = item_response.data.get("attempts", 1)
+            if item_data:
+                current_attempts = item_data.get("attempts", 1)
                 
                 # Get campaign retry settings
-                campaign_response = supabase_service_client.table("batch_campaigns").select(
-                    "retry_failed, max_retries"
-                ).eq("id", batch_campaign_id).single().execute()
+                campaign_response = await db_execute(
+                    get_async_db().table("batch_campaigns").select("retry_failed, max_retries").eq("id", batch_campaign_id).limit(1)
+                )
                 
                 if campaign_response.data:
-                    retry_failed = campaign_response.data.get("retry_failed", False)
-                    max_retries = campaign_response.data.get("max_retries", 2)
+                    retry_failed = campaign_response.data[0].get("retry_failed", False)
+                    max_retries = campaign_response.data[0].get("max_retries", 2)
                     
                     if retry_failed and current_attempts < max_retries + 1:
-                        # Set to retry instead of failed
+                        # Set to retry instead of failed, after the dialer's retry delay
                         item_status = "pending"  # Will be retried
                         update_data["status"] = "pending"
                         update_data["attempts"] = current_attempts + 1
+                        update_data["next_attempt_at"] = (datetime.now(timezone.utc) + timedelta(seconds=DIALER_RETRY_DELAY_SECONDS)).isoformat()
                         del update_data["completed_at"]  # Don't mark as completed if retrying
         
         # Update the batch call item
-        supabase_service_client.table("batch_call_items").update(update_data).eq("id", batch_call_item_id).execute()
+        await update_batch_call_item(batch_call_item_id, update_data)
         
         logger.info(f"Updated batch call item {batch_call_item_id} to status '{item_status}' for call {call_id}")
         
+        # The call is over (or queued for retry): let the dialer refill its slot
+        notify_call_item_finished(batch_campaign_id, batch_call_item_id)
+        
         # Trigger a check to see if the campaign should be completed
         if item_status in ["completed", "failed"]:
             await check_specific_campaign_completion(batch_campaign_id)
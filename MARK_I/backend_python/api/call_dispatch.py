@@ -0,0 +1,270 @@
+"""
+Call Dispatch Service
+
+Reusable in-process dispatch of outbound agent calls. Used by the
+/agents/call endpoint and directly by the batch campaign dialer, so
+campaigns no longer loop back over HTTP to their own API.
+
+Flow:
+- resolve_agent_call_context(): load the agent, its caller ID and SIP trunk once
+- dispatch_agent_call(): create the `calls` row, auto-start the pathway and
+  dispatch the LiveKit agent job for one phone number
+"""
+
+import logging
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from api.realtime_feed import publish_call_update
+from api.db_async import db_execute, get_async_db, get_agent, insert_call, update_call
+from services.livekit_client import LiveKitServiceError, create_agent_dispatch
+
+logger = logging.getLogger(__name__)
+
+# Name the outbound worker registers with
+OUTBOUND_AGENT_NAME = "outbound-caller"
+
+
+class CallDispatchError(Exception):
+    """Raised when an agent call cannot be dispatched"""
+    def __init__(self, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class AgentCallContext:
+    """Everything needed to dial with an agent, resolved once per agent"""
+    agent_id: int
+    agent_config: Dict[str, Any]
+    sip_trunk_id: str
+    caller_id_number: Optional[str] = None
+    ai_models: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def user_id(self) -> Optional[str]:
+        return self.agent_config.get("user_id")
+
+    @property
+    def agent_name(self) -> str:
+        return self.agent_config.get("name", f"Agent {self.agent_id}")
+
+
+@dataclass
+class DispatchResult:
+    """Outcome of a successful dispatch"""
+    supabase_call_id: str
+    dispatch_id: str
+    room_name: str
+    pathway_execution_id: Optional[str] = None
+
+
+async def resolve_agent_call_context(agent_id: int, agent_config: Optional[Dict[str, Any]] = None) -> AgentCallContext:
+    """Load an agent, its assigned phone number and SIP trunk.
+
+    Pass `agent_config` when the agent row has already been fetched to skip that query.
+    """
+    if agent_config is None:
+        logger.info(f"Attempting to fetch config for agent_id {agent_id} from Supabase.")
+        try:
+            agent_config = await get_agent(agent_id)
+        except Exception as e:
+            logger.error(f"Error fetching agent config for {agent_id} from Supabase: {e}", exc_info=True)
+            raise CallDispatchError(f"Could not fetch agent config: {str(e)}")
+
+        if not agent_config:
+            logger.error(f"Agent config not found in Supabase for agent_id {agent_id}.")
+            raise CallDispatchError(f"Agent with ID {agent_id} not found.", status_code=404)
+
+    # --- Caller ID and LiveKit SIP trunk of the phone number assigned to the agent ---
+    caller_id_number = None
+    sip_trunk_id_from_phone_number = None
+    phone_numbers_id = agent_config.get("phone_numbers_id")
+
+    if phone_numbers_id:
+        try:
+            pn_response = await db_execute(
+                get_async_db().table("phone_numbers").select("phone_number_e164, livekit_sip_trunk_id").eq("id", phone_numbers_id).limit(1)
+            )
+            if pn_response.data:
+                caller_id_number = pn_response.data[0].get("phone_number_e164")
+                sip_trunk_id_from_phone_number = pn_response.data[0].get("livekit_sip_trunk_id")
+            else:
+                logger.warning(f"Phone number details not found in Supabase for phone_numbers_id {phone_numbers_id} (assigned to agent {agent_id}).")
+        except Exception as e:
+            # Fall back to the trunk set directly on the agent
+            logger.error(f"Error fetching phone number details for phone_numbers_id {phone_numbers_id} from Supabase: {e}", exc_info=True)
+    else:
+        logger.info(f"Agent {agent_id} does not have a phone_numbers_id assigned. Caller ID and specific trunk from phone_numbers table will not be used.")
+
+    # Trunk of the agent's assigned number wins over agents.sip_trunk_id
+    sip_trunk_id = sip_trunk_id_from_phone_number or agent_config.get("sip_trunk_id")
+    if not sip_trunk_id:
+        logger.error(f"CRITICAL: No SIP Trunk ID could be determined for agent {agent_id}. Searched agent's assigned phone_number and agent record.")
+        raise CallDispatchError("SIP trunk ID is not configured for this agent.")
+
+    ai_models = {
+        "vad": {"provider": agent_config.get("vad_provider", "silero")},
+        "stt": {
+            "provider": agent_config.get("stt_provider", "deepgram"),
+            "language": agent_config.get("stt_language", "fr"),
+            "model_name": agent_config.get("stt_model", "nova-2")
+        },
+        "tts": {
+            "provider": "dynamic",  # Will be determined by voice lookup
+            "model_name": agent_config.get("tts_model", "sonic-2-2025-03-07"),
+            "voice_id": agent_config.get("tts_voice", "65b25c5d-ff07-4687-a04c-da2f43ef6fa9")  # Default Natasha (French)
+        },
+        "llm": {
+            "provider": agent_config.get("llm_provider", "openai"),
+            "model_name": agent_config.get("llm_model", "gpt-4o-mini"),
+            "temperature": agent_config.get("llm_temperature", 0.5)
+        }
+    }
+
+    logger.info(f"Resolved call context for agent {agent_id}: trunk {sip_trunk_id}, caller ID {caller_id_number}")
+    return AgentCallContext(
+        agent_id=agent_id,
+        agent_config=agent_config,
+        sip_trunk_id=sip_trunk_id,
+        caller_id_number=caller_id_number,
+        ai_models=ai_models,
+    )
+
+
+def build_agent_job_metadata(
+    context: AgentCallContext,
+    phone_number: str,
+    supabase_call_id: str,
+    auth_token: Optional[str] = None,
+    pathway_execution_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Metadata handed to the LiveKit outbound worker"""
+    agent_config = context.agent_config
+    return {
+        "phoneNumber": phone_number,
+        "agent_id_requested": context.agent_id,
+        "agent_id": context.agent_id,
+        "system_prompt": agent_config.get("system_prompt", "Default prompt: Please handle the call."),
+        "ai_models": context.ai_models,
+        "agentName": context.agent_name,
+        "supabase_call_id": str(supabase_call_id),
+        # Execution auto-started with the call log, so the worker does not start another
+        "pathway_execution_id": pathway_execution_id,
+        "initial_greeting": agent_config.get("initial_greeting", "Bonjour, ceci est un test de Pam."),
+        "sip_trunk_id": context.sip_trunk_id,
+        "agent_caller_id_number": context.caller_id_number,
+        # PAM tier and advanced settings
+        "pam_tier": agent_config.get("pam_tier", "core"),
+        "wait_for_greeting": agent_config.get("wait_for_greeting", False),
+        "interruption_threshold": agent_config.get("interruption_threshold", 100),
+        "transfer_to": agent_config.get("transfer_to"),
+        "voicemail_detection": agent_config.get("voicemail_detection", False),
+        "voicemail_hangup_immediately": agent_config.get("voicemail_hangup_immediately", False),
+        "voicemail_message": agent_config.get("voicemail_message"),
+        # JWT token for backend API calls made by the agent
+        "auth_token": auth_token,
+        "user_id": context.user_id
+    }
+
+
+async def _mark_call_failed(supabase_call_id: str):
+    """Don't leave an 'initiating' call log behind when the dispatch itself failed"""
+    try:
+        failed_call = await update_call(supabase_call_id, {"status": "failed"})
+    except Exception as e:
+        logger.error(f"Could not mark call {supabase_call_id} as failed: {e}")
+        return
+    publish_call_update(failed_call)
+
+
+async def dispatch_agent_call(
+    context: AgentCallContext,
+    phone_number: str,
+    contact_name: Optional[str] = None,
+    auth_token: Optional[str] = None,
+    batch_campaign_id: Optional[str] = None,
+    batch_call_item_id: Optional[str] = None,
+    call_log_extra: Optional[Dict[str, Any]] = None,
+) -> DispatchResult:
+    """Create the call log, auto-start the agent's pathway and dispatch the LiveKit job.
+
+    Raises CallDispatchError if the call log cannot be created or the dispatch fails.
+    """
+    agent_id = context.agent_id
+
+    # The room name is chosen up front so it can be stored with the call log
+    room_name = f"call-{uuid.uuid4().hex[:12]}"
+
+    # --- Create the Supabase call log BEFORE the LiveKit job ---
+    call_log_payload = {
+        "agent_id": agent_id,
+        "room_name": room_name,
+        "to_phone_number": phone_number,
+        "status": "initiating",
+        "livekit_outbound_trunk_id": context.sip_trunk_id,
+        "user_id": context.user_id,
+        "from_phone_number": context.caller_id_number
+    }
+    if batch_campaign_id:
+        call_log_payload["batch_campaign_id"] = batch_campaign_id
+    if batch_call_item_id:
+        call_log_payload["batch_call_item_id"] = batch_call_item_id
+    if call_log_extra:
+        call_log_payload.update(call_log_extra)
+
+    try:
+        call_log = await insert_call(call_log_payload)
+    except Exception as log_e:
+        logger.error(f"Error occurred while trying to log call to Supabase 'calls' table: {log_e}", exc_info=True)
+        raise CallDispatchError(f"Could not create call log in Supabase database: {str(log_e)}")
+
+    if not call_log or not call_log.get("id"):
+        logger.error("Failed to log call to Supabase 'calls' table or get ID back.")
+        raise CallDispatchError("Could not create call log in Supabase database (no ID returned).")
+
+    supabase_call_id = str(call_log["id"])
+    logger.info(f"Successfully logged call initiation to Supabase 'calls' table. Supabase Call ID: {supabase_call_id}")
+    publish_call_update(call_log)
+
+    # --- Auto-start pathway if agent has default pathway assigned ---
+    execution_id = None
+    try:
+        from api.agent_pathway_integration import auto_start_pathway_for_new_call
+
+        session_metadata = {
+            "phone_number": phone_number,
+            "contact_name": contact_name,
+            "agent_name": context.agent_name,
+            "call_id": supabase_call_id,
+            "batch_campaign_id": batch_campaign_id,
+            "batch_call_item_id": batch_call_item_id
+        }
+        execution_id = await auto_start_pathway_for_new_call(
+            call_id=supabase_call_id,
+            agent_id=agent_id,
+            session_metadata=session_metadata
+        )
+        if execution_id:
+            logger.info(f"✅ Auto-started pathway execution {execution_id} for call {supabase_call_id}")
+    except Exception as pathway_error:
+        # Don't fail the call if pathway auto-start fails
+        logger.error(f"Failed to auto-start pathway for call {supabase_call_id}: {pathway_error}")
+
+    # --- Dispatch the LiveKit job ---
+    metadata = build_agent_job_metadata(context, phone_number, supabase_call_id, auth_token, execution_id)
+    try:
+        logger.info(f"Dispatching LiveKit job for agent {agent_id} to {phone_number} (call {supabase_call_id})")
+        dispatch = await create_agent_dispatch(OUTBOUND_AGENT_NAME, metadata=metadata, room_name=room_name)
+    except LiveKitServiceError as e:
+        logger.error(f"Failed to create LiveKit dispatch for agent {agent_id}: {e}")
+        await _mark_call_failed(supabase_call_id)
+        raise CallDispatchError(f"Failed to initiate call: {e}")
+
+    return DispatchResult(
+        supabase_call_id=supabase_call_id,
+        dispatch_id=dispatch["dispatch_id"],
+        room_name=dispatch["room_name"],
+        pathway_execution_id=execution_id,
+    )
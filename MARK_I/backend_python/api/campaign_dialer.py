@@ -0,0 +1,297 @@
+"""
+Campaign dialer engine for batch campaigns.
+
+Each running campaign gets one CampaignDialer that pulls pending
+batch_call_items from Supabase page by page and keeps exactly
+`concurrency_limit` calls in flight. A slot is refilled as soon as
+update_batch_call_item_from_call_status reports that a call reached a
+terminal state (or was put back to pending for a retry).
+
+A retried item is dialed again once its next_attempt_at has passed
+(DIALER_RETRY_DELAY_SECONDS after the failure). The dialer finishes only
+when a successful query finds no pending item at all; database errors are
+retried with backoff.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from api.db_async import count_pending_batch_call_items, db_execute, get_async_db, list_pending_batch_call_items
+
+logger = logging.getLogger(__name__)
+
+# Number of pending items fetched per Supabase round-trip
+DIALER_PAGE_SIZE = 100
+# A call that never reports a terminal status gives its slot back after this delay
+DIALER_SLOT_TIMEOUT_SECONDS = 15 * 60
+# How often the dialer wakes up to look for retries / stale slots when idle
+DIALER_IDLE_POLL_SECONDS = 15
+# Window used for the "current" calls/minute figure
+THROUGHPUT_WINDOW_SECONDS = 60
+# Delay before a failed call item put back to pending is dialed again
+DIALER_RETRY_DELAY_SECONDS = 2 * 60
+# Wait after a failed database query, doubled on each consecutive failure
+DIALER_ERROR_BACKOFF_SECONDS = 1
+DIALER_MAX_ERROR_BACKOFF_SECONDS = 60
+
+# Outcomes of a buffer refill
+REFILLED = "refilled"  # items to dial were buffered
+WAITING = "waiting"    # pending items are waiting for their retry delay
+DRAINED = "drained"    # no pending item left (or the campaign is no longer running)
+FAILED = "failed"      # the query failed; nothing is known about pending items
+
+# Coroutine dialing one call item, returns True if the call was dispatched
+DialFunction = Callable[[Dict[str, Any]], Awaitable[bool]]
+
+
+class CampaignDialer:
+    """Sliding-window dialer keeping `concurrency_limit` calls active for one campaign"""
+
+    def __init__(self, campaign_id: str, concurrency_limit: int, dial_fn: DialFunction, page_size: int = DIALER_PAGE_SIZE):
+        self.campaign_id = campaign_id
+        self.concurrency_limit = max(1, int(concurrency_limit or 1))
+        self.page_size = page_size
+        self._dial_fn = dial_fn
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._slot_released: Optional[asyncio.Event] = None
+        self._stopped = False
+
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._in_flight: Dict[str, float] = {}  # batch_call_item_id -> monotonic dispatch time
+        self._consecutive_errors = 0
+
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.dispatched_count = 0
+        self.finished_count = 0
+        self.dispatch_failures = 0
+        self.timed_out_slots = 0
+        self._recent_dispatches: Deque[float] = deque()
+
+    # ----- Lifecycle -----
+
+    def start(self) -> asyncio.Task:
+        """Start the dialer loop on the current event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._slot_released = asyncio.Event()
+        self.started_at = datetime.now(timezone.utc)
+        self._task = self._loop.create_task(self._run(), name=f"campaign-dialer-{self.campaign_id}")
+        return self._task
+
+    def stop(self):
+        """Ask the dialer to stop dialing new numbers (in-flight calls are left alone)"""
+        self._stopped = True
+        self._wake()
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def is_stopping(self) -> bool:
+        """Stop requested: the loop exits once its current database call or dispatch returns"""
+        return self._stopped
+
+    # ----- Slot management -----
+
+    def release_slot(self, batch_call_item_id: str):
+        """Free the slot held by a call item. Safe to call from any thread or event loop."""
+        if self._loop is None or self._loop.is_closed():
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is self._loop:
+            self._on_slot_released(str(batch_call_item_id))
+        else:
+            self._loop.call_soon_threadsafe(self._on_slot_released, str(batch_call_item_id))
+
+    def _on_slot_released(self, batch_call_item_id: str):
+        if self._in_flight.pop(batch_call_item_id, None) is not None:
+            self.finished_count += 1
+            logger.debug(f"Campaign {self.campaign_id}: slot released by item {batch_call_item_id} ({len(self._in_flight)}/{self.concurrency_limit} active)")
+        self._wake()
+
+    def _wake(self):
+        if self._slot_released is not None:
+            self._slot_released.set()
+
+    def _reclaim_stale_slots(self):
+        """Give back slots held by calls that never reported a terminal status"""
+        now = time.monotonic()
+        stale_items = [item_id for item_id, started in self._in_flight.items() if now - started > DIALER_SLOT_TIMEOUT_SECONDS]
+        for item_id in stale_items:
+            logger.warning(f"Campaign {self.campaign_id}: item {item_id} did not report a final status after {DIALER_SLOT_TIMEOUT_SECONDS}s, reclaiming its slot")
+            self._in_flight.pop(item_id, None)
+            self.timed_out_slots += 1
+
+    # ----- Main loop -----
+
+    async def _run(self):
+        logger.info(f"Campaign dialer started for {self.campaign_id} (concurrency {self.concurrency_limit})")
+        try:
+            while not self._stopped:
+                self._reclaim_stale_slots()
+
+                # Fill every free slot
+                refill = None
+                while not self._stopped and len(self._in_flight) < self.concurrency_limit:
+                    if not self._buffer:
+                        refill = await self._refill_buffer()
+                        if refill != REFILLED:
+                            break
+                    await self._dispatch(self._buffer.popleft())
+
+                if self._stopped:
+                    break
+
+                if refill == DRAINED and not self._in_flight:
+                    # Retries are written back as pending before the slot is released,
+                    # so no pending item with nothing in flight means the campaign is drained
+                    logger.info(f"Campaign {self.campaign_id}: no pending items left, dialer finished")
+                    break
+
+                # Wait until a call finishes (or poll for retries / stale slots, or back off after an error)
+                self._slot_released.clear()
+                try:
+                    await asyncio.wait_for(self._slot_released.wait(), timeout=self._wait_timeout(refill))
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            logger.info(f"Campaign dialer for {self.campaign_id} cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"Campaign dialer for {self.campaign_id} crashed: {e}", exc_info=True)
+        finally:
+            self.finished_at = datetime.now(timezone.utc)
+            if _active_dialers.get(self.campaign_id) is self:
+                _active_dialers.pop(self.campaign_id, None)
+            logger.info(f"Campaign dialer stopped for {self.campaign_id}: {self.stats()}")
+
+    def _wait_timeout(self, refill: Optional[str]) -> float:
+        if refill == FAILED:
+            return min(DIALER_ERROR_BACKOFF_SECONDS * 2 ** (self._consecutive_errors - 1), DIALER_MAX_ERROR_BACKOFF_SECONDS)
+        return DIALER_IDLE_POLL_SECONDS
+
+    async def _refill_buffer(self) -> str:
+        """Fetch the next page of pending items that are due; returns REFILLED, WAITING, DRAINED or FAILED"""
+        try:
+            campaign_response = await db_execute(
+                get_async_db().table("batch_campaigns").select("status").eq("id", self.campaign_id).limit(1)
+            )
+            if not campaign_response.data or campaign_response.data[0].get("status") != "running":
+                logger.info(f"Campaign {self.campaign_id} is no longer running, stopping dialer")
+                self._stopped = True
+                return DRAINED
+
+            due_at = datetime.now(timezone.utc).isoformat()
+            pending_items = await list_pending_batch_call_items(self.campaign_id, self.page_size, due_at=due_at)
+            for item in pending_items:
+                if str(item["id"]) not in self._in_flight:
+                    self._buffer.append(item)
+            # Nothing due: retries may still be waiting for their delay
+            waiting = not self._buffer and await count_pending_batch_call_items(self.campaign_id) > 0
+        except Exception as e:
+            self._consecutive_errors += 1
+            logger.error(f"Campaign {self.campaign_id}: failed to fetch pending items (attempt {self._consecutive_errors}): {e}")
+            return FAILED
+
+        self._consecutive_errors = 0
+        if self._buffer:
+            return REFILLED
+        return WAITING if waiting else DRAINED
+
+    async def _dispatch(self, item: Dict[str, Any]):
+        item_id = str(item["id"])
+        self._in_flight[item_id] = time.monotonic()
+        try:
+            dispatched = await self._dial_fn(item)
+        except Exception as e:
+            logger.error(f"Campaign {self.campaign_id}: error dialing item {item_id}: {e}")
+            dispatched = False
+
+        if dispatched:
+            self.dispatched_count += 1
+            now = time.monotonic()
+            self._recent_dispatches.append(now)
+            while self._recent_dispatches and now - self._recent_dispatches[0] > THROUGHPUT_WINDOW_SECONDS:
+                self._recent_dispatches.popleft()
+        else:
+            self.dispatch_failures += 1
+            self._in_flight.pop(item_id, None)
+
+    # ----- Stats -----
+
+    def stats(self) -> Dict[str, Any]:
+        """Throughput statistics for this dialer"""
+        now = time.monotonic()
+        recent = [t for t in self._recent_dispatches if now - t <= THROUGHPUT_WINDOW_SECONDS]
+
+        elapsed_minutes = 0.0
+        if self.started_at:
+            end = self.finished_at or datetime.now(timezone.utc)
+            elapsed_minutes = (end - self.started_at).total_seconds() / 60
+
+        return {
+            "campaign_id": self.campaign_id,
+            "running": self.is_running,
+            "concurrency_limit": self.concurrency_limit,
+            "active_calls": len(self._in_flight),
+            "buffered_items": len(self._buffer),
+            "dispatched_calls": self.dispatched_count,
+            "finished_calls": self.finished_count,
+            "dispatch_failures": self.dispatch_failures,
+            "timed_out_slots": self.timed_out_slots,
+            "calls_per_minute_current": round(len(recent) * 60 / THROUGHPUT_WINDOW_SECONDS, 2),
+            "calls_per_minute_average": round(self.dispatched_count / elapsed_minutes, 2) if elapsed_minutes > 0 else 0.0,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+# ===== Registry of running dialers (one per campaign, per process) =====
+
+_active_dialers: Dict[str, CampaignDialer] = {}
+
+
+def start_campaign_dialer(campaign_id: str, concurrency_limit: int, dial_fn: DialFunction) -> CampaignDialer:
+    """Start a dialer for a campaign, or return the one already running"""
+    existing = _active_dialers.get(campaign_id)
+    # A stopping dialer (campaign paused, then resumed before it exited) is replaced;
+    # it only unregisters itself, so it leaves the new one in place
+    if existing and existing.is_running and not existing.is_stopping:
+        logger.info(f"Campaign dialer already running for {campaign_id}")
+        return existing
+
+    dialer = CampaignDialer(campaign_id, concurrency_limit, dial_fn)
+    _active_dialers[campaign_id] = dialer
+    dialer.start()
+    return dialer
+
+
+def stop_campaign_dialer(campaign_id: str):
+    """Stop dialing new numbers for a campaign"""
+    dialer = _active_dialers.get(campaign_id)
+    if dialer:
+        dialer.stop()
+
+
+def notify_call_item_finished(campaign_id: str, batch_call_item_id: str):
+    """Called when a campaign call reaches a terminal state so its slot can be refilled"""
+    dialer = _active_dialers.get(str(campaign_id))
+    if dialer:
+        dialer.release_slot(batch_call_item_id)
+
+
+def get_campaign_dialer_stats(campaign_id: str) -> Optional[Dict[str, Any]]:
+    """Throughput stats of the dialer running for a campaign, if any"""
+    dialer = _active_dialers.get(campaign_id)
+    return dialer.stats() if dialer else None
@@ -7,7 +7,6 @@ from pydantic import BaseModel as PydanticBaseModel
 # from typing import Optional # Optional not used after Xano removal
 from pathlib import Path
 from dotenv import load_dotenv
-from fastapi import HTTPException, status
 
 # Logger spécifique pour le chargement des .env et la configuration
 logger_config = logging.getLogger(__name__ + ".config_loader") 
@@ -47,37 +46,10 @@ class BaseModel(PydanticBaseModel):
 
 # Utility function for getting user ID from authorization token
 def get_user_id_from_token(authorization: str) -> str:
-    """Extract user ID from authorization token"""
-    from .db_client import supabase_service_client
-    
-    logger_config.info(f"[AUTH DEBUG] get_user_id_from_token called")
-    logger_config.info(f"[AUTH DEBUG] authorization parameter: {authorization[:50] if authorization else 'None'}...")
-    
-    if not authorization or not authorization.startswith("Bearer "):
-        logger_config.warning(f"[AUTH DEBUG] Invalid authorization header format")
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    logger_config.info(f"[AUTH DEBUG] Extracted token length: {len(token)}")
-    logger_config.info(f"[AUTH DEBUG] Token parts count: {len(token.split('.'))}")
-    logger_config.info(f"[AUTH DEBUG] Token first 50 chars: {token[:50]}...")
-    
-    try:
-        # Verify token with Supabase using service client
-        logger_config.info(f"[AUTH DEBUG] Attempting to verify token with Supabase...")
-        user_response = supabase_service_client.auth.get_user(token)
-        
-        if not user_response.user:
-            logger_config.warning(f"[AUTH DEBUG] Supabase returned no user for token")
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        
-        logger_config.info(f"[AUTH DEBUG] Successfully verified user: {user_response.user.id}")
-        return user_response.user.id
-        
-    except Exception as e:
-        logger_config.error(f"[AUTH DEBUG] Error validating token: {e}")
-        logger_config.error(f"[AUTH DEBUG] Exception type: {type(e).__name__}")
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    """Extract user ID from authorization token (verified locally, see supabase_auth)"""
+    from .supabase_auth import get_bearer_token, verify_access_token
+
+    return verify_access_token(get_bearer_token(authorization)).id
 
 # Example: If you wanted to make Supabase URL/keys available via this config
 # SUPABASE_URL = os.getenv("SUPABASE_URL")
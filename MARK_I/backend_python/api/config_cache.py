@@ -0,0 +1,264 @@
+"""
+Configuration cache
+
+Agents, voices, pathways and phone-number routing change rarely but were
+re-read from Supabase by every call. cached() keeps them in a bounded LRU
+cache with a TTL, local to the process (LiveKit job process or API):
+
+- concurrent misses on the same key share a single query (single-flight)
+- entries expire after CONFIG_CACHE_TTL_SECONDS
+- the API publishes invalidations when it changes a row
+  (publish_invalidation), workers apply them before serving a hit (at most
+  one poll every CONFIG_CACHE_POLL_SECONDS)
+- cache_stats(): hits, misses, loads shared with an in-flight query, evictions
+
+Keys are tuples starting with (kind, id), e.g. ("agent", 12, "ai_models");
+invalidating ("agent", 12) drops every entry of agent 12 and the entries of
+the kinds derived from agents (see DEPENDENT_KINDS). Invalidations go through
+the config_cache_invalidations table (api/sql/config_cache_invalidations.sql)
+because the API and the workers run in different processes and hosts.
+
+Usage:
+    voice = await cached(("voice", voice_id), lambda: fetch_one(...))
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+try:
+    from api.db_async import db_execute, get_async_db
+    from api.db_client import supabase_service_client
+except ImportError:
+    # Imported as a top-level module (LiveKit worker adds api/ to sys.path)
+    from db_async import db_execute, get_async_db
+    from db_client import supabase_service_client
+
+logger = logging.getLogger(__name__)
+
+CONFIG_CACHE_MAX_ENTRIES = int(os.getenv("CONFIG_CACHE_MAX_ENTRIES", "1000"))
+CONFIG_CACHE_TTL_SECONDS = float(os.getenv("CONFIG_CACHE_TTL_SECONDS", "300"))
+# Maximum delay before an invalidation published by the API is seen by a worker
+CONFIG_CACHE_POLL_SECONDS = float(os.getenv("CONFIG_CACHE_POLL_SECONDS", "5"))
+# More pending invalidations than this clears the whole cache
+INVALIDATION_BATCH_SIZE = 500
+
+INVALIDATIONS_TABLE = "config_cache_invalidations"
+# Invalidation key meaning "every entry of the kind"
+ALL_KEYS = "*"
+
+# Entries built from rows of another kind, dropped with it
+# (phone-number routing entries embed the agent assigned to the number)
+DEPENDENT_KINDS = {
+    "agent": ("phone_number",),
+}
+
+CacheKey = Tuple[Hashable, ...]
+
+
+class ConfigCache:
+    """Bounded LRU cache with a TTL per entry"""
+    def __init__(self, max_entries: int = CONFIG_CACHE_MAX_ENTRIES, ttl_seconds: float = CONFIG_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()
+        # The API also reads it from scheduler threads
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared_loads = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: CacheKey) -> Tuple[bool, Any]:
+        """(found, value) of a fresh entry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key: CacheKey, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_build(self, key: CacheKey, build: Callable[[], Any]) -> Any:
+        """Value of `key`, built now with `build()` on a miss (for values computed locally, without I/O)"""
+        found, value = self.get(key)
+        if found:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = build()
+        self.set(key, value)
+        return value
+
+    def invalidate(self, kind: str, key: Any = ALL_KEYS) -> int:
+        """Drop the entries of one row (or of every row) of a kind and of its dependent kinds"""
+        kinds = (kind, *DEPENDENT_KINDS.get(kind, ()))
+        with self._lock:
+            dropped = [
+                cache_key for cache_key in self._entries
+                if cache_key[0] in kinds and (
+                    key == ALL_KEYS or cache_key[0] != kind or str(cache_key[1]) == str(key)
+                )
+            ]
+            for cache_key in dropped:
+                del self._entries[cache_key]
+            self.invalidations += 1
+        return len(dropped)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared_loads": self.shared_loads,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+config_cache = ConfigCache()
+
+# In-flight loads per event loop (futures belong to the loop that awaits them)
+_inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[CacheKey, asyncio.Future]]" = weakref.WeakKeyDictionary()
+_polls: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Future]" = weakref.WeakKeyDictionary()
+_last_poll = 0.0
+_last_invalidation_id: Optional[int] = None
+
+
+async def _poll_invalidations():
+    """Apply the invalidations published since the last poll"""
+    global _last_poll, _last_invalidation_id
+    _last_poll = time.monotonic()
+    table = get_async_db().table(INVALIDATIONS_TABLE)
+    if _last_invalidation_id is None:
+        # Nothing cached predates this process: start after the latest invalidation
+        response = await db_execute(table.select("id").order("id", desc=True).limit(1))
+        _last_invalidation_id = response.data[0]["id"] if response.data else 0
+        return
+
+    response = await db_execute(
+        table.select("id, kind, key").gt("id", _last_invalidation_id).order("id").limit(INVALIDATION_BATCH_SIZE)
+    )
+    rows = response.data or []
+    if not rows:
+        return
+    if len(rows) >= INVALIDATION_BATCH_SIZE:
+        config_cache.clear()
+        logger.info(f"🧹 Config cache cleared ({len(rows)}+ pending invalidations)")
+        latest = await db_execute(table.select("id").order("id", desc=True).limit(1))
+        _last_invalidation_id = latest.data[0]["id"] if latest.data else rows[-1]["id"]
+        return
+    for row in rows:
+        dropped = config_cache.invalidate(row["kind"], row.get("key") or ALL_KEYS)
+        logger.info(f"🧹 Config cache invalidation {row['kind']}/{row.get('key')}: {dropped} entries dropped")
+    _last_invalidation_id = rows[-1]["id"]
+
+
+async def _check_invalidations():
+    """Poll the invalidations at most once per CONFIG_CACHE_POLL_SECONDS (one poll in flight per loop)"""
+    if time.monotonic() - _last_poll < CONFIG_CACHE_POLL_SECONDS:
+        return
+    loop = asyncio.get_running_loop()
+    poll = _polls.get(loop)
+    if poll is None:
+        poll = loop.create_task(_poll_invalidations())
+        _polls[loop] = poll
+        poll.add_done_callback(lambda _: _polls.pop(loop, None))
+    try:
+        await asyncio.shield(poll)
+    except Exception as e:
+        # Entries still expire with their TTL
+        logger.warning(f"Could not poll config cache invalidations: {e}")
+
+
+async def cached(key: CacheKey, load: Callable[[], Awaitable[Any]], cache_none: bool = True) -> Any:
+    """Value of `key`, loaded with `load()` on a miss.
+
+    Concurrent misses on the same key await the same load. Exceptions are not
+    cached; None results are unless cache_none is False.
+    """
+    await _check_invalidations()
+    found, value = config_cache.get(key)
+    if found:
+        config_cache.hits += 1
+        return value
+
+    loop = asyncio.get_running_loop()
+    loads = _inflight.setdefault(loop, {})
+    pending = loads.get(key)
+    if pending is not None:
+        config_cache.shared_loads += 1
+        return await asyncio.shield(pending)
+
+    config_cache.misses += 1
+    future = loop.create_future()
+    loads[key] = future
+    try:
+        value = await load()
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Retrieved here so an unawaited failure is not reported as never retrieved
+        future.exception()
+        raise
+    else:
+        if value is not None or cache_none:
+            config_cache.set(key, value)
+        future.set_result(value)
+        return value
+    finally:
+        loads.pop(key, None)
+
+
+def invalidate_local(kind: str, key: Any = ALL_KEYS) -> int:
+    """Drop entries of this process only"""
+    return config_cache.invalidate(kind, key)
+
+
+def publish_invalidation(kind: str, key: Any = ALL_KEYS):
+    """Invalidate a row (or every row with ALL_KEYS) of a kind in every process. Never raises.
+
+    Kinds: "agent" (agent id), "voice" (provider voice id, the cartesia_voice_id
+    column), "pathway" (pathway id), "phone_number" (E.164 number).
+    """
+    invalidate_local(kind, key)
+    try:
+        if not supabase_service_client:
+            return
+        supabase_service_client.table(INVALIDATIONS_TABLE).insert({"kind": kind, "key": str(key)}).execute()
+        logger.info(f"🧹 Published config cache invalidation {kind}/{key}")
+    except Exception as e:
+        logger.warning(f"Could not publish config cache invalidation {kind}/{key}: {e}")
+
+
+def cache_stats() -> Dict[str, Any]:
+    return config_cache.stats()
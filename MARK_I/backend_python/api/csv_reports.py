@@ -1,17 +1,24 @@
 """
 CSV Reports Service for PAM Analytics Export
 Uses Supabase MCP to generate comprehensive call and campaign reports
+
+Reports are streamed: calls are fetched page by page (keyset on created_at, id),
+formatted into CSV chunks as they arrive and sent with a StreamingResponse,
+optionally gzip-compressed, so any report size runs in constant memory.
 """
 
 import csv
 import io
 import logging
+import zlib
 from datetime import datetime, timezone, timedelta
-from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, HTTPException, Header, Response
+from typing import AsyncIterator, Iterable, List, Optional, Dict, Any
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from api.db_client import supabase_service_client
+from api.db_async import db_execute, get_async_db, iter_keyset_pages
+from api.supabase_auth import get_authenticated_user_id
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/reports", tags=["csv_reports"])
@@ -24,21 +31,43 @@ class ReportGenerationRequest(BaseModel):
     campaign_id: Optional[str] = None
     agent_id: Optional[int] = None
     format: str = "csv"  # "csv", "excel" (future)
+    gzip: bool = False  # Download as .csv.gz
 
-def escape_csv_field(field: Any) -> str:
-    """Escape CSV field to handle commas, quotes, and newlines"""
-    if field is None:
-        return ""
-    
-    field_str = str(field)
-    
-    # If field contains comma, quote, or newline, wrap in quotes and escape quotes
-    if ',' in field_str or '"' in field_str or '\n' in field_str or '\r' in field_str:
-        # Escape quotes by doubling them
-        field_str = field_str.replace('"', '""')
-        return f'"{field_str}"'
-    
-    return field_str
+def csv_chunk(rows: Iterable[List[Any]]) -> str:
+    """Serialize rows into one CSV text chunk"""
+    output = io.StringIO()
+    csv.writer(output).writerows(rows)
+    return output.getvalue()
+
+async def gzip_chunks(chunks: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    """Gzip-compress a stream of text chunks on the fly.
+    The gzip trailer is only written once the whole stream was read: an error
+    raised by `chunks` propagates and leaves the file truncated (unreadable).
+    """
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk.encode("utf-8"))
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+async def _encode_chunks(chunks: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    async for chunk in chunks:
+        yield chunk.encode("utf-8")
+
+def streaming_csv_response(chunks: AsyncIterator[str], filename: str, gzip: bool = False) -> StreamingResponse:
+    """Download response for a stream of CSV text chunks"""
+    if gzip:
+        return StreamingResponse(
+            gzip_chunks(chunks),
+            media_type="application/gzip",
+            headers={"Content-Disposition": f"attachment; filename={filename}.gz"}
+        )
+    return StreamingResponse(
+        _encode_chunks(chunks),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
 
 def format_duration(seconds: Optional[int]) -> str:
     """Format duration in seconds to human readable format"""
@@ -128,25 +157,77 @@ def get_date_range_filter(time_filter: str, start_date: Optional[str], end_date:
     
     return start, end
 
-async def generate_calls_report(user_id: str, request: ReportGenerationRequest) -> str:
-    """Generate detailed calls report using Supabase MCP"""
+CALLS_REPORT_HEADERS = [
+    "Call ID", "Status", "Call Outcome", "Duration (MM:SS)", "Duration (Seconds)",
+    "Phone Number", "Contact Name", "Geographic Region", "Agent Name", "Agent ID",
+    "Campaign Name", "Campaign ID", "Call Type", "From Number",
+    "To Number", "Created At", "Initiated At", "Answered At", "Ended At",
+    "Date", "Time", "Day of Week", "Hour of Day", "Ended Reason"
+]
+
+def format_calls_report_row(call: Dict[str, Any]) -> List[Any]:
+    """One CSV row of the calls report"""
+    # Extract nested data safely
+    agent_name = ""
+    if call.get("agents"):
+        agent_name = call["agents"].get("name", "")
+    
+    campaign_name = ""
+    campaign_id = call.get("batch_campaign_id", "")
+    if call.get("batch_campaigns"):
+        campaign_name = call["batch_campaigns"].get("name", "")
+    
+    # Format timestamps
+    created_at = call.get("created_at", "")
+    if created_at:
+        try:
+            created_dt = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+            date_str = created_dt.strftime("%Y-%m-%d")
+            time_str = created_dt.strftime("%H:%M:%S")
+            day_of_week = created_dt.strftime("%A")
+            hour_of_day = created_dt.strftime("%H:00")
+        except:
+            date_str = time_str = day_of_week = hour_of_day = ""
+    else:
+        date_str = time_str = day_of_week = hour_of_day = ""
+    
+    duration = call.get("call_duration")
+    phone_number = call.get("phone_number_e164", "") or call.get("to_phone_number", "")
+    
+    # csv.writer does the quoting
+    return [
+        call.get("id", ""),
+        call.get("status", ""),
+        get_call_outcome(call.get("status", ""), duration),
+        format_duration(duration),
+        duration or 0,
+        phone_number,
+        call.get("contact_name", ""),
+        get_geographic_region(phone_number),
+        agent_name,
+        call.get("agent_id", ""),
+        campaign_name,
+        campaign_id,
+        call.get("call_type", ""),
+        call.get("from_phone_number", ""),
+        call.get("to_phone_number", ""),
+        created_at,
+        call.get("initiated_at", ""),
+        call.get("answered_at", ""),
+        call.get("ended_at", ""),
+        date_str,
+        time_str,
+        day_of_week,
+        hour_of_day,
+        call.get("ended_reason", "")
+    ]
+
+async def generate_calls_report(user_id: str, request: ReportGenerationRequest) -> AsyncIterator[str]:
+    """Stream the detailed calls report as CSV chunks, newest calls first"""
     start_date, end_date = get_date_range_filter(request.time_filter, request.start_date, request.end_date)
     
-    try:
-        # Build query conditions
-        query_conditions = [f"user_id.eq.{user_id}"]
-        
-        if start_date:
-            query_conditions.append(f"created_at.gte.{start_date}")
-        if end_date:
-            query_conditions.append(f"created_at.lte.{end_date}")
-        if request.campaign_id and request.campaign_id != "all":
-            query_conditions.append(f"batch_campaign_id.eq.{request.campaign_id}")
-        if request.agent_id and request.agent_id != "all":
-            query_conditions.append(f"agent_id.eq.{request.agent_id}")
-        
-        # Use Supabase client to get calls data
-        result = supabase_service_client.table("calls").select("""
+    def build_query():
+        query = get_async_db().table("calls").select("""
             id, status, call_duration, phone_number_e164, contact_name, created_at, 
             initiated_at, answered_at, ended_at, call_direction, call_type, ended_reason,
             from_phone_number, to_phone_number, call_control_id, telnyx_call_session_id,
@@ -157,102 +238,36 @@ async def generate_calls_report(user_id: str, request: ReportGenerationRequest)
         """).eq("user_id", user_id)
         
         if start_date:
-            result = result.gte("created_at", start_date)
+            query = query.gte("created_at", start_date)
         if end_date:
-            result = result.lte("created_at", end_date)
+            query = query.lte("created_at", end_date)
         if request.campaign_id and request.campaign_id != "all":
-            result = result.eq("batch_campaign_id", request.campaign_id)
+            query = query.eq("batch_campaign_id", request.campaign_id)
         if request.agent_id and request.agent_id != "all":
-            result = result.eq("agent_id", request.agent_id)
-            
-        result = result.order("created_at", desc=True).limit(10000)
-        response = result.execute()
-        calls_data = response.data or []
-        
-    except Exception as e:
-        logger.error(f"Error fetching calls data: {e}")
-        calls_data = []
+            query = query.eq("agent_id", request.agent_id)
+        return query
     
-    # Generate CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write headers
-    headers = [
-        "Call ID", "Status", "Call Outcome", "Duration (MM:SS)", "Duration (Seconds)",
-        "Phone Number", "Contact Name", "Geographic Region", "Agent Name", "Agent ID",
-        "Campaign Name", "Campaign ID", "Call Type", "From Number",
-        "To Number", "Created At", "Initiated At", "Answered At", "Ended At",
-        "Date", "Time", "Day of Week", "Hour of Day", "Ended Reason"
-    ]
-    writer.writerow(headers)
+    yield csv_chunk([CALLS_REPORT_HEADERS])
     
-    # Write data rows
-    for call in calls_data:
-        # Extract nested data safely
-        agent_name = ""
-        if call.get("agents"):
-            agent_name = call["agents"].get("name", "")
-        
-        campaign_name = ""
-        campaign_id = call.get("batch_campaign_id", "")
-        if call.get("batch_campaigns"):
-            campaign_name = call["batch_campaigns"].get("name", "")
-        
-        # Format timestamps
-        created_at = call.get("created_at", "")
-        if created_at:
-            try:
-                created_dt = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                date_str = created_dt.strftime("%Y-%m-%d")
-                time_str = created_dt.strftime("%H:%M:%S")
-                day_of_week = created_dt.strftime("%A")
-                hour_of_day = created_dt.strftime("%H:00")
-            except:
-                date_str = time_str = day_of_week = hour_of_day = ""
-        else:
-            date_str = time_str = day_of_week = hour_of_day = ""
-        
-        duration = call.get("call_duration")
-        phone_number = call.get("phone_number_e164", "") or call.get("to_phone_number", "")
-        
-        row = [
-            escape_csv_field(call.get("id", "")),
-            escape_csv_field(call.get("status", "")),
-            escape_csv_field(get_call_outcome(call.get("status", ""), duration)),
-            escape_csv_field(format_duration(duration)),
-            escape_csv_field(duration or 0),
-            escape_csv_field(phone_number),
-            escape_csv_field(call.get("contact_name", "")),
-            escape_csv_field(get_geographic_region(phone_number)),
-            escape_csv_field(agent_name),
-            escape_csv_field(call.get("agent_id", "")),
-            escape_csv_field(campaign_name),
-            escape_csv_field(campaign_id),
-            escape_csv_field(call.get("call_type", "")),
-            escape_csv_field(call.get("from_phone_number", "")),
-            escape_csv_field(call.get("to_phone_number", "")),
-            escape_csv_field(created_at),
-            escape_csv_field(call.get("initiated_at", "")),
-            escape_csv_field(call.get("answered_at", "")),
-            escape_csv_field(call.get("ended_at", "")),
-            escape_csv_field(date_str),
-            escape_csv_field(time_str),
-            escape_csv_field(day_of_week),
-            escape_csv_field(hour_of_day),
-            escape_csv_field(call.get("ended_reason", ""))
-        ]
-        writer.writerow(row)
+    exported = 0
+    try:
+        async for calls_page in iter_keyset_pages(build_query, descending=True):
+            yield csv_chunk(format_calls_report_row(call) for call in calls_page)
+            exported += len(calls_page)
+    except Exception as e:
+        # Headers are already sent: raising aborts the chunked response, so the download fails instead of looking complete
+        logger.error(f"Error streaming calls report for user {user_id} after {exported} calls: {e}")
+        raise
     
-    return output.getvalue()
+    logger.info(f"Calls report streamed for user {user_id}: {exported} calls")
 
-async def generate_campaigns_report(user_id: str, request: ReportGenerationRequest) -> str:
-    """Generate campaigns performance report"""
+async def generate_campaigns_report(user_id: str, request: ReportGenerationRequest) -> AsyncIterator[str]:
+    """Generate campaigns performance report (CSV chunks)"""
     start_date, end_date = get_date_range_filter(request.time_filter, request.start_date, request.end_date)
     
     try:
         # Get campaigns data
-        query = supabase_service_client.postgrest.from_("batch_campaigns").select("""
+        query = get_async_db().table("batch_campaigns").select("""
             id, name, description, status, total_numbers, completed_calls, successful_calls, 
             failed_calls, concurrency_limit, retry_failed, max_retries, scheduled_at, 
             started_at, completed_at, created_at, updated_at,
@@ -268,18 +283,15 @@ async def generate_campaigns_report(user_id: str, request: ReportGenerationReque
             query = query.eq("id", request.campaign_id)
         
         query = query.order("created_at", desc=True)
-        response = query.execute()
+        response = await db_execute(query)
         campaigns_data = response.data or []
         
     except Exception as e:
+        # Fails the download rather than sending an empty report (or an incomplete comprehensive one)
         logger.error(f"Error fetching campaigns data: {e}")
-        campaigns_data = []
+        raise
     
     # Generate CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write headers
     headers = [
         "Campaign ID", "Campaign Name", "Description", "Status", "Agent Name", "Agent ID",
         "Total Numbers", "Completed Calls", "Successful Calls", "Failed Calls",
@@ -287,9 +299,10 @@ async def generate_campaigns_report(user_id: str, request: ReportGenerationReque
         "Max Retries", "Created At", "Scheduled At", "Started At", "Completed At",
         "Duration (Hours)", "Calls per Hour", "User Name", "User Email"
     ]
-    writer.writerow(headers)
+    yield csv_chunk([headers])
     
     # Write data rows
+    rows = []
     for campaign in campaigns_data:
         # Extract nested data
         agent_name = ""
@@ -331,109 +344,86 @@ async def generate_campaigns_report(user_id: str, request: ReportGenerationReque
                 pass
         
         row = [
-            escape_csv_field(campaign.get("id", "")),
-            escape_csv_field(campaign.get("name", "")),
-            escape_csv_field(campaign.get("description", "")),
-            escape_csv_field(campaign.get("status", "")),
-            escape_csv_field(agent_name),
-            escape_csv_field(agent_id),
-            escape_csv_field(total_numbers),
-            escape_csv_field(completed_calls),
-            escape_csv_field(successful_calls),
-            escape_csv_field(failed_calls),
-            escape_csv_field(round(success_rate, 2)),
-            escape_csv_field(round(completion_rate, 2)),
-            escape_csv_field(campaign.get("concurrency_limit", "")),
-            escape_csv_field(campaign.get("retry_failed", "")),
-            escape_csv_field(campaign.get("max_retries", "")),
-            escape_csv_field(campaign.get("created_at", "")),
-            escape_csv_field(campaign.get("scheduled_at", "")),
-            escape_csv_field(campaign.get("started_at", "")),
-            escape_csv_field(campaign.get("completed_at", "")),
-            escape_csv_field(round(duration_hours, 2)),
-            escape_csv_field(round(calls_per_hour, 2)),
-            escape_csv_field(user_name),
-            escape_csv_field(user_email)
+            campaign.get("id", ""),
+            campaign.get("name", ""),
+            campaign.get("description", ""),
+            campaign.get("status", ""),
+            agent_name,
+            agent_id,
+            total_numbers,
+            completed_calls,
+            successful_calls,
+            failed_calls,
+            round(success_rate, 2),
+            round(completion_rate, 2),
+            campaign.get("concurrency_limit", ""),
+            campaign.get("retry_failed", ""),
+            campaign.get("max_retries", ""),
+            campaign.get("created_at", ""),
+            campaign.get("scheduled_at", ""),
+            campaign.get("started_at", ""),
+            campaign.get("completed_at", ""),
+            round(duration_hours, 2),
+            round(calls_per_hour, 2),
+            user_name,
+            user_email
         ]
-        writer.writerow(row)
+        rows.append(row)
     
-    return output.getvalue()
+    yield csv_chunk(rows)
 
-async def generate_comprehensive_report(user_id: str, request: ReportGenerationRequest) -> str:
-    """Generate comprehensive report with all data"""
-    start_date, end_date = get_date_range_filter(request.time_filter, request.start_date, request.end_date)
-    
-    # Generate all individual reports
-    calls_csv = await generate_calls_report(user_id, request)
-    campaigns_csv = await generate_campaigns_report(user_id, request)
-    
-    # Combine into a comprehensive report with sections
-    output = io.StringIO()
-    
+async def generate_comprehensive_report(user_id: str, request: ReportGenerationRequest) -> AsyncIterator[str]:
+    """Generate comprehensive report with all data, one section after the other"""
     # Add report header
-    output.write("PAM Analytics Comprehensive Report\n")
-    output.write(f"Generated on: {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}\n")
-    output.write(f"Time Filter: {request.time_filter}\n")
+    header_lines = [
+        "PAM Analytics Comprehensive Report",
+        f"Generated on: {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}",
+        f"Time Filter: {request.time_filter}"
+    ]
     if request.start_date:
-        output.write(f"Start Date: {request.start_date}\n")
+        header_lines.append(f"Start Date: {request.start_date}")
     if request.end_date:
-        output.write(f"End Date: {request.end_date}\n")
+        header_lines.append(f"End Date: {request.end_date}")
     if request.campaign_id and request.campaign_id != "all":
-        output.write(f"Campaign ID: {request.campaign_id}\n")
+        header_lines.append(f"Campaign ID: {request.campaign_id}")
     if request.agent_id and request.agent_id != "all":
-        output.write(f"Agent ID: {request.agent_id}\n")
-    output.write("\n")
+        header_lines.append(f"Agent ID: {request.agent_id}")
+    yield "\n".join(header_lines) + "\n\n"
     
     # Add calls section
-    output.write("=== CALLS REPORT ===\n")
-    output.write(calls_csv)
-    output.write("\n\n")
+    yield "=== CALLS REPORT ===\n"
+    async for chunk in generate_calls_report(user_id, request):
+        yield chunk
+    yield "\n\n"
     
     # Add campaigns section
-    output.write("=== CAMPAIGNS REPORT ===\n")
-    output.write(campaigns_csv)
-    output.write("\n")
-    
-    return output.getvalue()
+    yield "=== CAMPAIGNS REPORT ===\n"
+    async for chunk in generate_campaigns_report(user_id, request):
+        yield chunk
+    yield "\n"
 
 @router.post("/generate")
 async def generate_report(
     request: ReportGenerationRequest,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Generate and download CSV report"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
     try:
-        # Verify token
-        user_response = supabase_service_client.auth.get_user(token)
-        if not user_response.user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user_id = user_response.user.id
-        
-        # Generate the appropriate report
+        # Generate the appropriate report (streamed while it is being generated)
         if request.report_type == "calls":
-            csv_content = await generate_calls_report(user_id, request)
+            csv_chunks = generate_calls_report(user_id, request)
             filename = f"pam_calls_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
         elif request.report_type == "campaigns":
-            csv_content = await generate_campaigns_report(user_id, request)
+            csv_chunks = generate_campaigns_report(user_id, request)
             filename = f"pam_campaigns_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
         elif request.report_type == "comprehensive":
-            csv_content = await generate_comprehensive_report(user_id, request)
+            csv_chunks = generate_comprehensive_report(user_id, request)
             filename = f"pam_comprehensive_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
         else:
             raise HTTPException(status_code=400, detail="Invalid report type")
         
         # Return CSV as downloadable response
-        return Response(
-            content=csv_content,
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+        return streaming_csv_response(csv_chunks, filename, gzip=request.gzip)
         
     except HTTPException:
         raise
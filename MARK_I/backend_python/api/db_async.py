@@ -0,0 +1,294 @@
+"""
+Async Supabase (PostgREST) data access
+
+`supabase_service_client` is synchronous: every `.execute()` blocks the event
+loop it runs on, so one slow query stalls every other request (and every live
+voice session in the worker). This module provides:
+
+- get_async_db(): an async PostgREST client on a pooled HTTP/2 connection,
+  one per event loop (API loop, scheduler threads, worker job loop)
+- db_execute(): runs a query builder with a per-query timeout and a cap on
+  concurrent queries per loop
+- iter_keyset_pages(): streams large result sets page by page
+- typed helpers for the hot tables: calls, agents, batch_call_items, pathway_executions
+
+Usage:
+    response = await db_execute(get_async_db().table("calls").select("id").eq("user_id", user_id))
+    call = await get_call(call_id)
+"""
+
+import asyncio
+import logging
+import weakref
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
+from postgrest import AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+
+try:
+    from api.db_client import SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
+except ImportError:
+    # Imported as a top-level module (LiveKit worker adds api/ to sys.path)
+    from db_client import SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
+
+try:
+    import h2  # noqa: F401 - enables HTTP/2 in httpx
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Connection pool per event loop
+DB_POOL_MAX_CONNECTIONS = 50
+DB_POOL_MAX_KEEPALIVE = 20
+# Queries allowed in flight at once per event loop, the rest wait for a slot
+DB_MAX_CONCURRENT_QUERIES = 20
+# Default timeout of one query, including the wait for a slot
+DB_QUERY_TIMEOUT_SECONDS = 10.0
+DB_CONNECT_TIMEOUT_SECONDS = 5.0
+# Rows per page of iter_keyset_pages() (PostgREST caps responses at 1000 rows)
+KEYSET_PAGE_SIZE = 1000
+
+# A row as returned by PostgREST
+Row = Dict[str, Any]
+
+
+class DatabaseTimeoutError(Exception):
+    """Raised when a query does not complete within its timeout"""
+    def __init__(self, message: str, timeout: float):
+        super().__init__(message)
+        self.timeout = timeout
+
+
+class _PooledPostgrestClient(AsyncPostgrestClient):
+    """AsyncPostgrestClient on a shared, bounded HTTP/2 connection pool"""
+
+    def create_session(self, base_url, headers, timeout, *args, **kwargs) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=httpx.Timeout(DB_QUERY_TIMEOUT_SECONDS, connect=DB_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(max_connections=DB_POOL_MAX_CONNECTIONS, max_keepalive_connections=DB_POOL_MAX_KEEPALIVE),
+            http2=_HTTP2_AVAILABLE,
+            follow_redirects=True,
+        )
+
+
+class _LoopDatabase:
+    """Client and concurrency limiter bound to one event loop"""
+    def __init__(self):
+        if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
+            raise ValueError("Supabase URL or service role key not configured for async client.")
+        headers = {
+            **DEFAULT_POSTGREST_CLIENT_HEADERS,
+            "apikey": SUPABASE_SERVICE_ROLE_KEY,
+            "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
+        }
+        self.client = _PooledPostgrestClient(f"{SUPABASE_URL.rstrip('/')}/rest/v1", headers=headers)
+        self.semaphore = asyncio.Semaphore(DB_MAX_CONCURRENT_QUERIES)
+
+
+# httpx connections belong to the loop that opened them, so each loop gets its own pool
+_loop_databases: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopDatabase]" = weakref.WeakKeyDictionary()
+
+
+def _get_loop_database() -> _LoopDatabase:
+    loop = asyncio.get_running_loop()
+    database = _loop_databases.get(loop)
+    if database is None:
+        database = _LoopDatabase()
+        _loop_databases[loop] = database
+        logger.info(f"Async Supabase client created (HTTP/2: {_HTTP2_AVAILABLE})")
+    return database
+
+
+def get_async_db() -> AsyncPostgrestClient:
+    """Async PostgREST client for the running event loop (service role)"""
+    return _get_loop_database().client
+
+
+async def db_execute(query, timeout: float = DB_QUERY_TIMEOUT_SECONDS):
+    """Execute a query builder from get_async_db() with a timeout and the per-loop concurrency cap"""
+    database = _get_loop_database()
+
+    async def _run():
+        async with database.semaphore:
+            return await query.execute()
+
+    try:
+        return await asyncio.wait_for(_run(), timeout=timeout)
+    except asyncio.TimeoutError:
+        raise DatabaseTimeoutError(f"Supabase query timed out after {timeout}s", timeout)
+
+
+async def close_async_db():
+    """Close the async client of the running event loop"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    database = _loop_databases.pop(loop, None)
+    if database is not None:
+        await database.client.aclose()
+
+
+async def fetch_one(query, timeout: float = DB_QUERY_TIMEOUT_SECONDS) -> Optional[Row]:
+    """First row of a select query, or None (replaces .maybe_single())"""
+    response = await db_execute(query.limit(1), timeout=timeout)
+    return response.data[0] if response.data else None
+
+
+def keyset_after(query, sort_column: str, last_sort_value: Any, last_id: Any, descending: bool = False):
+    """Filter a query to the rows after (last_sort_value, last_id) in (sort_column, id) order"""
+    operator = "lt" if descending else "gt"
+    if sort_column == "id":
+        return query.filter("id", operator, last_id)
+    # Raw `or` parameter: postgrest 0.11 (pinned) has no .or_()
+    query.params = query.params.add(
+        "or",
+        f'({sort_column}.{operator}."{last_sort_value}",'
+        f'and({sort_column}.eq."{last_sort_value}",id.{operator}."{last_id}"))'
+    )
+    return query
+
+
+def order_keyset(query, sort_column: str, descending: bool = False):
+    """Order a query by (sort_column, id) in a single `order` parameter"""
+    direction = ".desc" if descending else ""
+    order = f"{sort_column}{direction}" if sort_column == "id" else f"{sort_column}{direction},id{direction}"
+    query.params = query.params.add("order", order)
+    return query
+
+
+def offset_query(query, offset: int):
+    """Skip the first `offset` rows (postgrest 0.11 has no .offset() and its .range() end is exclusive)"""
+    if offset:
+        query.params = query.params.add("offset", str(offset))
+    return query
+
+
+async def iter_keyset_pages(
+    build_query: Callable[[], Any],
+    sort_column: str = "created_at",
+    descending: bool = False,
+    page_size: int = KEYSET_PAGE_SIZE,
+    timeout: float = DB_QUERY_TIMEOUT_SECONDS,
+) -> AsyncIterator[List[Row]]:
+    """Yield every row of a query page by page, ordered by (sort_column, id).
+
+    `build_query` returns a fresh filtered select (query builders are mutable);
+    the selected columns must include sort_column and id. Unlike offsets, each
+    page costs the same however deep the export goes.
+    """
+    last_sort_value: Optional[Any] = None
+    last_id: Optional[Any] = None
+
+    while True:
+        query = build_query()
+        if last_sort_value is not None:
+            query = keyset_after(query, sort_column, last_sort_value, last_id, descending)
+        query = order_keyset(query, sort_column, descending).limit(page_size)
+        response = await db_execute(query, timeout=timeout)
+        rows = response.data or []
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        last_sort_value, last_id = rows[-1][sort_column], rows[-1]["id"]
+
+
+async def _write(query, timeout: float = DB_QUERY_TIMEOUT_SECONDS) -> List[Row]:
+    response = await db_execute(query, timeout=timeout)
+    return response.data or []
+
+
+# ===== calls =====
+
+async def get_call(call_id: str, columns: str = "*") -> Optional[Row]:
+    return await fetch_one(get_async_db().table("calls").select(columns).eq("id", call_id))
+
+
+async def get_call_by_room(room_name: str, columns: str = "*") -> Optional[Row]:
+    return await fetch_one(get_async_db().table("calls").select(columns).eq("room_name", room_name))
+
+
+async def insert_call(payload: Row) -> Optional[Row]:
+    rows = await _write(get_async_db().table("calls").insert(payload))
+    return rows[0] if rows else None
+
+
+async def update_call(call_id: str, fields: Row) -> Optional[Row]:
+    rows = await _write(get_async_db().table("calls").update(fields).eq("id", call_id))
+    return rows[0] if rows else None
+
+
+async def update_calls_by_room(room_name: str, fields: Row) -> List[Row]:
+    return await _write(get_async_db().table("calls").update(fields).eq("room_name", room_name))
+
+
+# ===== agents =====
+
+async def get_agent(agent_id: int, columns: str = "*", user_id: Optional[str] = None) -> Optional[Row]:
+    query = get_async_db().table("agents").select(columns).eq("id", agent_id)
+    if user_id:
+        query = query.eq("user_id", user_id)
+    return await fetch_one(query)
+
+
+# ===== batch_call_items =====
+
+async def get_batch_call_item(item_id: str, columns: str = "*") -> Optional[Row]:
+    return await fetch_one(get_async_db().table("batch_call_items").select(columns).eq("id", item_id))
+
+
+async def list_pending_batch_call_items(campaign_id: str, limit: int, due_at: Optional[str] = None) -> List[Row]:
+    """Pending items of a campaign in dialing order; with `due_at`, only those whose retry delay is over"""
+    query = (
+        get_async_db().table("batch_call_items").select("*")
+        .eq("batch_campaign_id", campaign_id)
+        .eq("status", "pending")
+    )
+    if due_at is not None:
+        # Raw `or` parameter: postgrest 0.11 (pinned) has no .or_()
+        query.params = query.params.add("or", f'(next_attempt_at.is.null,next_attempt_at.lte."{due_at}")')
+    response = await db_execute(order_keyset(query, "created_at").limit(limit))
+    return response.data or []
+
+
+async def count_pending_batch_call_items(campaign_id: str) -> int:
+    """Pending items of a campaign, retries waiting for their delay included"""
+    response = await db_execute(
+        get_async_db().table("batch_call_items").select("id", count="exact")
+        .eq("batch_campaign_id", campaign_id).eq("status", "pending").limit(1)
+    )
+    return response.count or 0
+
+
+async def update_batch_call_item(item_id: str, fields: Row) -> Optional[Row]:
+    rows = await _write(get_async_db().table("batch_call_items").update(fields).eq("id", item_id))
+    return rows[0] if rows else None
+
+
+# ===== pathway_executions =====
+
+async def get_pathway_execution(execution_id: str, columns: str = "*") -> Optional[Row]:
+    return await fetch_one(get_async_db().table("pathway_executions").select(columns).eq("id", execution_id))
+
+
+async def list_running_pathway_executions(call_id: str, columns: str = "*") -> List[Row]:
+    response = await db_execute(
+        get_async_db().table("pathway_executions").select(columns).eq("call_id", call_id).eq("status", "running")
+    )
+    return response.data or []
+
+
+async def insert_pathway_execution(payload: Row) -> Optional[Row]:
+    rows = await _write(get_async_db().table("pathway_executions").insert(payload))
+    return rows[0] if rows else None
+
+
+async def update_pathway_execution(execution_id: str, fields: Row) -> Optional[Row]:
+    rows = await _write(get_async_db().table("pathway_executions").update(fields).eq("id", execution_id))
+    return rows[0] if rows else None
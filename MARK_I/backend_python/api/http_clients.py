@@ -0,0 +1,192 @@
+"""
+Shared HTTP clients
+
+Outbound calls to external services (Telnyx, LiveKit, TTS previews, OAuth
+providers, Zapier, n8n, app tools) reuse long-lived pooled clients instead of
+opening a client (and a TCP + TLS connection) per request:
+
+- get_http_client(url): httpx.AsyncClient of the URL's origin (scheme + host),
+  keep-alive, HTTP/2 when the h2 package is installed
+- get_aiohttp_session(): aiohttp.ClientSession for the aiohttp call sites
+  (its connector pools connections per host)
+
+Clients are bound to the event loop that created them (the API loop, the
+campaign scheduler thread's loop, a worker job's loop) and closed by
+close_http_clients() on that loop when it shuts down. Per-request timeouts are
+passed to the request itself.
+
+http_client_stats(): requests, server errors and pool usage per client of the
+running loop (GET /http/stats reads it on each loop of the API process).
+"""
+
+import asyncio
+import importlib.util
+import logging
+import weakref
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+import httpx
+
+# httpx speaks HTTP/2 with the h2 package (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+logger = logging.getLogger(__name__)
+
+HTTP_DEFAULT_TIMEOUT_SECONDS = 20.0
+HTTP_CONNECT_TIMEOUT_SECONDS = 5.0
+HTTP_MAX_CONNECTIONS_PER_HOST = 50
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+HTTP_KEEPALIVE_EXPIRY_SECONDS = 60.0
+AIOHTTP_MAX_CONNECTIONS = 200
+
+
+class _ClientCounters:
+    def __init__(self):
+        self.requests = 0
+        self.in_flight = 0
+        self.errors = 0
+
+
+class HttpClientRegistry:
+    """Pooled clients of one event loop"""
+    def __init__(self):
+        self.httpx_clients: Dict[str, httpx.AsyncClient] = {}
+        self.aiohttp_session: Optional[aiohttp.ClientSession] = None
+        self.counters: Dict[str, _ClientCounters] = {}
+
+    def _httpx_client(self, origin: str) -> httpx.AsyncClient:
+        client = self.httpx_clients.get(origin)
+        if client is not None and not client.is_closed:
+            return client
+        counters = self.counters.setdefault(origin, _ClientCounters())
+
+        async def on_request(request: httpx.Request):
+            counters.requests += 1
+
+        async def on_response(response: httpx.Response):
+            if response.status_code >= 500:
+                counters.errors += 1
+
+        client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(HTTP_DEFAULT_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+            event_hooks={"request": [on_request], "response": [on_response]},
+        )
+        self.httpx_clients[origin] = client
+        logger.info(f"Created pooled HTTP client for {origin} (http2={HTTP2_AVAILABLE})")
+        return client
+
+    def _aiohttp_session(self) -> aiohttp.ClientSession:
+        if self.aiohttp_session is None or self.aiohttp_session.closed:
+            counters = self.counters.setdefault("aiohttp", _ClientCounters())
+
+            async def on_request_start(session, context, params):
+                counters.requests += 1
+                counters.in_flight += 1
+
+            async def on_request_end(session, context, params):
+                counters.in_flight -= 1
+                if params.response.status >= 500:
+                    counters.errors += 1
+
+            async def on_request_exception(session, context, params):
+                counters.in_flight -= 1
+                counters.errors += 1
+
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_request_start.append(on_request_start)
+            trace_config.on_request_end.append(on_request_end)
+            trace_config.on_request_exception.append(on_request_exception)
+            self.aiohttp_session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=HTTP_DEFAULT_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+                connector=aiohttp.TCPConnector(
+                    limit=AIOHTTP_MAX_CONNECTIONS,
+                    limit_per_host=HTTP_MAX_CONNECTIONS_PER_HOST,
+                    keepalive_timeout=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+                ),
+                trace_configs=[trace_config],
+            )
+        return self.aiohttp_session
+
+    async def aclose(self):
+        clients, self.httpx_clients = list(self.httpx_clients.values()), {}
+        results = await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.debug(f"Error closing HTTP client: {result}")
+        if self.aiohttp_session is not None and not self.aiohttp_session.closed:
+            await self.aiohttp_session.close()
+        self.aiohttp_session = None
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {}
+        for name, counters in self.counters.items():
+            entry = {"requests": counters.requests, "errors": counters.errors}
+            if name == "aiohttp":
+                entry["in_flight"] = counters.in_flight
+                connector = self.aiohttp_session.connector if self.aiohttp_session is not None and not self.aiohttp_session.closed else None
+                if connector is not None:
+                    # Private connector attributes: reported when present
+                    entry["connections_in_use"] = len(getattr(connector, "_acquired", ()))
+                    entry["idle_connections"] = sum(len(conns) for conns in getattr(connector, "_conns", {}).values())
+                    entry["max_connections"] = connector.limit
+            else:
+                client = self.httpx_clients.get(name)
+                pool = getattr(getattr(client, "_transport", None), "_pool", None) if client is not None else None
+                connections = getattr(pool, "connections", None)
+                if connections is not None:
+                    idle = sum(1 for connection in connections if connection.is_idle())
+                    entry["connections_in_use"] = len(connections) - idle
+                    entry["idle_connections"] = idle
+                    entry["max_connections"] = HTTP_MAX_CONNECTIONS_PER_HOST
+            stats[name] = entry
+        return stats
+
+
+_registries: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, HttpClientRegistry]" = weakref.WeakKeyDictionary()
+
+
+def _get_registry() -> HttpClientRegistry:
+    loop = asyncio.get_running_loop()
+    registry = _registries.get(loop)
+    if registry is None:
+        registry = HttpClientRegistry()
+        _registries[loop] = registry
+    return registry
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def get_http_client(url: str) -> httpx.AsyncClient:
+    """Pooled httpx client of the URL's host for the running loop (do not close it)"""
+    return _get_registry()._httpx_client(_origin(url))
+
+
+def get_aiohttp_session() -> aiohttp.ClientSession:
+    """Pooled aiohttp session of the running loop (do not close it)"""
+    return _get_registry()._aiohttp_session()
+
+
+async def close_http_clients():
+    """Close the running loop's clients (application or job shutdown)"""
+    registry = _registries.pop(asyncio.get_running_loop(), None)
+    if registry is not None:
+        await registry.aclose()
+
+
+def http_client_stats() -> Dict[str, Any]:
+    try:
+        registry = _registries.get(asyncio.get_running_loop())
+    except RuntimeError:
+        return {}
+    return registry.stats() if registry is not None else {}
@@ -1,13 +1,13 @@
-from fastapi import APIRouter, HTTPException, Header, status, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, status, BackgroundTasks
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, HttpUrl, validator
 from datetime import datetime, timedelta
 import os
 import json
 import asyncio
-import aiohttp
 from .db_client import get_supabase_anon_client
-from .config import get_user_id_from_token
+from .http_clients import get_aiohttp_session
+from .supabase_auth import get_authenticated_user_id
 from .crypto_utils import decrypt_credentials, is_token_expired
 
 router = APIRouter()
@@ -134,12 +134,11 @@ async def list_app_integrations(
 
 @router.get("/connections", response_model=List[UserAppConnectionResponse])
 async def list_user_connections(
-    authorization: str = Header(None, alias="Authorization"),
+    user_id: str = Depends(get_authenticated_user_id),
     status_filter: Optional[str] = None
 ):
     """Get user's app connections with real-time token expiration checking"""
     try:
-        user_id = get_user_id_from_token(authorization)
         # Use service client for admin access to join with app_integrations
         from .db_client import supabase_service_client
         supabase = supabase_service_client
@@ -231,11 +230,10 @@ async def list_user_connections(
 @router.post("/oauth/initiate", response_model=OAuthInitiateResponse)
 async def initiate_oauth_flow(
     request: OAuthInitiateRequest,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Initiate OAuth flow for app connection"""
     try:
-        user_id = get_user_id_from_token(authorization)
         app_name = request.app_name.lower()
         
         # Validate app is supported
@@ -398,16 +396,16 @@ async def oauth_callback(
             "client_secret": oauth_config["client_secret"]
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(oauth_config["token_url"], data=token_data) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"Failed to exchange OAuth code: {error_text}"
-                    )
-                    
-                token_response = await response.json()
+        session = get_aiohttp_session()
+        async with session.post(oauth_config["token_url"], data=token_data) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Failed to exchange OAuth code: {error_text}"
+                )
+
+            token_response = await response.json()
                 
         # Prepare credentials for storage
         credentials = {
@@ -516,12 +514,10 @@ async def oauth_callback(
 @router.post("/connections/{connection_id}/test", response_model=ConnectionTestResponse)
 async def test_connection(
     connection_id: str,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Test an app connection to verify it's working"""
     try:
-        user_id = get_user_id_from_token(authorization)
-        
         # Get connection details
         from .oauth_utils import get_user_connection_with_valid_creds
         connection, credentials = await get_user_connection_with_valid_creds(connection_id, user_id)
@@ -564,11 +560,10 @@ async def test_connection(
 @router.delete("/connections/{connection_id}")
 async def delete_connection(
     connection_id: str,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Delete an app connection"""
     try:
-        user_id = get_user_id_from_token(authorization)
         supabase = get_supabase_anon_client()
         
         # Verify connection belongs to user
@@ -604,40 +599,40 @@ async def test_hubspot_connection(credentials: dict) -> dict:
     """Test HubSpot connection"""
     headers = {"Authorization": f"Bearer {credentials['access_token']}"}
     
-    async with aiohttp.ClientSession() as session:
-        async with session.get("https://api.hubapi.com/crm/v3/objects/contacts?limit=1", headers=headers) as response:
-            if response.status == 200:
-                data = await response.json()
-                return {"contacts_accessible": True, "total_contacts": data.get("total", 0)}
-            else:
-                error_text = await response.text()
-                raise Exception(f"HubSpot API error: {error_text}")
+    session = get_aiohttp_session()
+    async with session.get("https://api.hubapi.com/crm/v3/objects/contacts?limit=1", headers=headers) as response:
+        if response.status == 200:
+            data = await response.json()
+            return {"contacts_accessible": True, "total_contacts": data.get("total", 0)}
+        else:
+            error_text = await response.text()
+            raise Exception(f"HubSpot API error: {error_text}")
 
 async def test_google_calendar_connection(credentials: dict) -> dict:
     """Test Google Calendar connection"""
     headers = {"Authorization": f"Bearer {credentials['access_token']}"}
     
-    async with aiohttp.ClientSession() as session:
-        async with session.get("https://www.googleapis.com/calendar/v3/calendars/primary", headers=headers) as response:
-            if response.status == 200:
-                data = await response.json()
-                return {"calendar_accessible": True, "calendar_id": data.get("id")}
-            else:
-                error_text = await response.text()
-                raise Exception(f"Google Calendar API error: {error_text}")
+    session = get_aiohttp_session()
+    async with session.get("https://www.googleapis.com/calendar/v3/calendars/primary", headers=headers) as response:
+        if response.status == 200:
+            data = await response.json()
+            return {"calendar_accessible": True, "calendar_id": data.get("id")}
+        else:
+            error_text = await response.text()
+            raise Exception(f"Google Calendar API error: {error_text}")
 
 async def test_slack_connection(credentials: dict) -> dict:
     """Test Slack connection"""
     headers = {"Authorization": f"Bearer {credentials['access_token']}"}
     
-    async with aiohttp.ClientSession() as session:
-        async with session.get("https://slack.com/api/auth.test", headers=headers) as response:
-            if response.status == 200:
-                data = await response.json()
-                if data.get("ok"):
-                    return {"user_id": data.get("user_id"), "team": data.get("team")}
-                else:
-                    raise Exception(f"Slack API error: {data.get('error')}")
+    session = get_aiohttp_session()
+    async with session.get("https://slack.com/api/auth.test", headers=headers) as response:
+        if response.status == 200:
+            data = await response.json()
+            if data.get("ok"):
+                return {"user_id": data.get("user_id"), "team": data.get("team")}
             else:
-                error_text = await response.text()
-                raise Exception(f"Slack API error: {error_text}") 
\ No newline at end of file
+                raise Exception(f"Slack API error: {data.get('error')}")
+        else:
+            error_text = await response.text()
+            raise Exception(f"Slack API error: {error_text}") 
\ No newline at end of file
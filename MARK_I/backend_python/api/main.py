@@ -4,8 +4,6 @@ import json
 import logging
 import os
 import random
-import re
-import subprocess
 import uuid
 import httpx
 from datetime import datetime, timezone, timedelta
@@ -39,18 +37,39 @@ print(f"[MAIN.PY DEBUG] SUPABASE_URL at startup: {os.getenv('SUPABASE_URL')}")
 print(f"[MAIN.PY DEBUG] SUPABASE_ANON_KEY at startup: {'SET' if os.getenv('SUPABASE_ANON_KEY') else 'NOT SET'}")
 print(f"[MAIN.PY DEBUG] SUPABASE_SERVICE_ROLE_KEY at startup: {'SET' if os.getenv('SUPABASE_SERVICE_ROLE_KEY') else 'NOT SET'}")
 
-from fastapi import FastAPI, HTTPException, status, Header, Request, File, UploadFile, BackgroundTasks
+from fastapi import FastAPI, HTTPException, status, Header, Depends, Request, File, UploadFile, BackgroundTasks, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response, JSONResponse
+from fastapi.responses import Response, JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi.exceptions import RequestValidationError
 from pydantic import BaseModel, Field, validator
 from supabase import create_client
 
-from .config import BaseModel, get_user_id_from_token
+from .config import BaseModel
+from .supabase_auth import AuthenticatedUser, get_authenticated_user, get_authenticated_user_id, get_bearer_token, verify_access_token
 from .db_client import supabase_service_client, get_supabase_anon_client
+from .db_async import close_async_db, db_execute, get_async_db, iter_keyset_pages
+from .analytics_aggregation import get_call_aggregates
+from .analytics_rollups import fetch_rollups, sum_counters
+from .realtime_feed import (
+    campaign_counters,
+    minute_buckets as realtime_minute_buckets,
+    publish_call_update,
+    subscribe as realtime_subscribe,
+    unsubscribe as realtime_unsubscribe,
+)
+from .pagination import (
+    NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, fetch_page, project_row, select_columns, split_filter
+)
+from .config_cache import ALL_KEYS as ALL_CACHE_KEYS, cache_stats, publish_invalidation
+from .pathway_events import load_execution_state
+from .http_clients import close_http_clients, get_http_client, http_client_stats
+from .token_refresh import start_token_refresh, stop_token_refresh, token_refresh_stats
+from .call_dispatch import CallDispatchError, OUTBOUND_AGENT_NAME, resolve_agent_call_context, dispatch_agent_call
+from services.livekit_client import LiveKitServiceError, create_agent_dispatch, close_pooled_livekit_api, has_pooled_livekit_api
 from .telnyx_routes import router as telnyx_router
 from .batch_routes import router as batch_router
-from .csv_reports import router as csv_reports_router
+from .csv_reports import router as csv_reports_router, csv_chunk, format_duration, streaming_csv_response
 # from .webhook_tools_routes import router as webhook_tools_router  # Disabled - tools system removed
 from .pathway_routes import router as pathway_router
 from .integrations_routes import router as integrations_router
@@ -81,6 +100,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Paging metadata of the list endpoints, readable by the frontend
+    expose_headers=[NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER],
 )
 
 # Global exception handler to prevent backend crashes
@@ -154,6 +175,27 @@ app.include_router(users_router) # User management routes
 
 
 
+@app.on_event("shutdown")
+async def close_shared_clients():
+    """Close long-lived clients bound to the API event loop, then the scheduler thread's"""
+    await stop_token_refresh()
+    await close_loop_clients()
+    stop_scheduler_thread()
+    await asyncio.to_thread(scheduler_thread.join, SCHEDULER_STOP_TIMEOUT_SECONDS)
+
+
+async def close_loop_clients():
+    """Close the pooled clients bound to the running event loop"""
+    await close_http_clients()
+    await close_pooled_livekit_api()
+    await close_async_db()
+
+
+async def loop_client_stats() -> Dict[str, Any]:
+    """Pooled clients of the running event loop"""
+    return {"http_clients": http_client_stats(), "livekit_api_pooled": has_pooled_livekit_api()}
+
+
 # ===== Background Scheduler for Batch Campaigns =====
 import threading
 import time
@@ -176,55 +218,69 @@ async def run_campaign_scheduler():
         # Check every 60 seconds
         await asyncio.sleep(60)
 
+# How long API shutdown waits for the scheduler thread to close its clients
+SCHEDULER_STOP_TIMEOUT_SECONDS = 10
+# Event loop and task of the scheduler thread while it runs
+_scheduler_loop: Optional[asyncio.AbstractEventLoop] = None
+_scheduler_task: Optional[asyncio.Task] = None
+
 def run_scheduler_thread():
-    """Run the scheduler in a new event loop"""
+    """Run the scheduler in a new event loop; its pooled clients are closed when it stops"""
+    global _scheduler_loop, _scheduler_task
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
+    _scheduler_task = loop.create_task(run_campaign_scheduler())
+    _scheduler_loop = loop
     try:
-        loop.run_until_complete(run_campaign_scheduler())
+        loop.run_until_complete(_scheduler_task)
+    except asyncio.CancelledError:
+        logger.info("Batch campaign scheduler stopped")
     except Exception as e:
         logger.error(f"Scheduler thread error: {e}")
     finally:
+        _scheduler_loop = None
+        try:
+            loop.run_until_complete(close_loop_clients())
+        except Exception as e:
+            logger.error(f"Error closing scheduler clients: {e}")
         loop.close()
 
+def stop_scheduler_thread():
+    """Cancel the scheduler task from another thread (API shutdown)"""
+    loop, task = _scheduler_loop, _scheduler_task
+    if loop is None or task is None:
+        return
+    try:
+        loop.call_soon_threadsafe(task.cancel)
+    except RuntimeError:
+        # The loop already closed
+        pass
+
+async def scheduler_client_stats() -> Dict[str, Any]:
+    """Pooled clients of the scheduler thread's loop, read on that loop"""
+    loop = _scheduler_loop
+    if loop is None:
+        return {}
+    try:
+        future = asyncio.run_coroutine_threadsafe(loop_client_stats(), loop)
+    except RuntimeError:
+        return {}
+    return await asyncio.wait_for(asyncio.wrap_future(future), timeout=5)
+
 # Start the scheduler in a background thread
 scheduler_thread = threading.Thread(target=run_scheduler_thread, daemon=True)
 scheduler_thread.start()
 logger.info("Batch campaign scheduler started")
 
-async def run_token_refresh_scheduler():
-    """Background task to check and refresh expiring OAuth tokens"""
-    logger.info("Starting OAuth token refresh scheduler background task")
-    
-    while True:
-        try:
-            # Import here to avoid circular imports
-            from .oauth_utils import check_and_refresh_expiring_tokens
-            
-            # Run the token refresh check
-            await check_and_refresh_expiring_tokens()
-            
-        except Exception as e:
-            logger.error(f"Error in token refresh scheduler: {e}")
-        
-        # Check every 30 minutes (1800 seconds)
-        await asyncio.sleep(1800)
-
-def run_token_refresh_thread():
-    """Run the token refresh scheduler in a new event loop"""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        loop.run_until_complete(run_token_refresh_scheduler())
-    except Exception as e:
-        logger.error(f"Token refresh scheduler thread error: {e}")
-    finally:
-        loop.close()
+# ===== OAuth token refresh engine (runs on the API event loop) =====
+@app.on_event("startup")
+async def start_token_refresh_engine():
+    start_token_refresh()
 
-# Start the token refresh scheduler in a background thread
-token_refresh_thread = threading.Thread(target=run_token_refresh_thread, daemon=True)
-token_refresh_thread.start()
-logger.info("OAuth token refresh scheduler started")
+@app.get("/integrations/token-refresh/stats")
+async def get_token_refresh_stats(user_id: str = Depends(get_authenticated_user_id)):
+    """Queue and counters of the OAuth token refresh engine"""
+    return token_refresh_stats()
 
 
 
@@ -301,29 +357,6 @@ class TelnyxWebhook(BaseModel):
     data: dict
     meta: dict
 
-# --- Helper function to parse lk output ---
-def parse_lk_dispatch_output(output: str) -> tuple[str | None, str | None]:
-    """Tries to parse room name and job ID from lk dispatch output."""
-    room_name = None
-    job_id = None
-    
-    room_match = re.search(r'room:"([^"]+)"', output)
-    if room_match:
-        room_name = room_match.group(1)
-        
-    # Note: 'lk dispatch create' might not directly output the 'job_id' easily parsable.
-    # It often outputs a 'dispatch_id' or just the room name. Let's focus on room name.
-    # job_id_match = re.search(r"id: (JB_\S+)", output) # Example if job ID format is JB_...
-    # if job_id_match:
-    #     job_id = job_id_match.group(1)
-        
-    # Often, the room name itself contains the job/dispatch ID for dispatch-created rooms
-    if room_name and room_name.startswith("RM_"): # Default LiveKit room prefix
-         pass # Room name is usually sufficient reference initially
-
-    logger.info(f"Parsed from lk output - Room: {room_name}") # Removed Job ID for now
-    return room_name, job_id # Job ID might be None
-
 # --- API Endpoints ---
 @app.post("/call")
 async def initiate_call(request: CallRequest):
@@ -426,57 +459,15 @@ async def initiate_call(request: CallRequest):
         "supabase_call_id": str(supabase_call_id) # Pass the generated Supabase call ID to the agent
     }
 
-    metadata_json = json.dumps(metadata)
-
-    # Construct the lk dispatch command
-    command = [
-        "lk",
-        "dispatch",
-        "create",
-        "--new-room",
-        "--agent-name", "outbound-caller", # Ensure this matches your agent name
-        "--metadata", metadata_json
-    ]
-
     try:
-        # Execute the command
-        logger.info(f"Executing command: {' '.join(command)}")
-        # --- Début Modification Subprocess ---
-        # Passer explicitement l'environnement actuel au sous-processus
-        process_env = os.environ.copy()
-        result = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            check=True,
-            shell=False, # Utiliser shell=False (plus sûr)
-            env=process_env # Passer l'environnement
-        )
-        # --- Fin Modification Subprocess ---
-
-        logger.info(f"lk dispatch command output: {result.stdout}")
-        logger.info(f"lk dispatch command stderr: {result.stderr}")
-
-        # Check for specific success indicators
-        if "Dispatch created" not in result.stdout and "id: " not in result.stdout: # Check pour l'ID aussi
-             logger.warning("Dispatch command executed but success message/ID not found in output.")
-             # Peut-être vérifier le code de retour si check=True n'est pas suffisant
+        dispatch = await create_agent_dispatch(OUTBOUND_AGENT_NAME, metadata=metadata)
+        return {"message": "Call initiated successfully", "dispatch_details": dispatch}
 
-        return {"message": "Call initiated successfully", "dispatch_details": result.stdout}
-
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Failed to execute lk dispatch command: {e}")
-        logger.error(f"Command output (stdout): {e.stdout}")
-        logger.error(f"Command output (stderr): {e.stderr}")
+    except LiveKitServiceError as e:
+        logger.error(f"Failed to create LiveKit dispatch: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to initiate call: {e.stderr or e.stdout or 'Unknown error'}",
-        )
-    except FileNotFoundError:
-        logger.error("Error: 'lk' command not found. Make sure LiveKit CLI is installed and in PATH.")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="'lk' command not found. Server configuration issue."
+            detail=f"Failed to initiate call: {e}",
         )
     except Exception as e:
         logger.exception("An unexpected error occurred") # Log the full traceback
@@ -491,273 +482,39 @@ async def initiate_agent_call(request: AgentCallRequest, authorization: str | No
     agent_id = request.agent_id
     logger.info(f"Received call request for agent_id {agent_id} to number {request.phoneNumber}")
 
-    # Extract JWT token from Authorization header
-    xano_token = None
+    # Extract JWT token from Authorization header (passed to the agent for backend API calls)
+    auth_token = None
     if authorization and authorization.startswith("Bearer "):
-        xano_token = authorization.replace("Bearer ", "")
-        logger.info(f"✅ JWT token extracted successfully (length: {len(xano_token)})")
+        auth_token = authorization.replace("Bearer ", "")
+        logger.info(f"✅ JWT token extracted successfully (length: {len(auth_token)})")
     else:
         logger.warning(f"❌ No valid JWT token found in Authorization header")
 
-    # Xano token is no longer used for fetching agent config from Supabase.
-    # But we now pass it to the agent for backend API calls
-
-    # --- Étape 1: Récupérer la configuration de l'agent depuis Supabase ---
-    agent_config = None
-    logger.info(f"Attempting to fetch config for agent_id {agent_id} from Supabase.")
-
     try:
-        # Assuming agent_id in the request corresponds to 'id' in your Supabase 'agents' table
-        # And user_id in agents table links to users(id) which is auth.users(id)
-        # select_query = "*, users!inner(id)" # Example if you needed to join with users table
-        select_query = "*" 
-        
-        agent_response = supabase_service_client.table("agents").select(select_query).eq("id", agent_id).single().execute()
-        
-        if agent_response.data:
-            agent_config = agent_response.data
-            logger.info(f"Configuration de l'agent {agent_id} récupérée depuis Supabase: {agent_config}")
-        else:
-            logger.error(f"Agent config not found in Supabase for agent_id {agent_id}. Response: {agent_response.error or 'No data'}")
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Agent with ID {agent_id} not found.")
-    except Exception as e: 
-        logger.error(f"Error fetching agent config for {agent_id} from Supabase: {e}", exc_info=True)
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Could not fetch agent config: {str(e)}")
-
-    if not agent_config: # Should be caught by the exception above, but as a safeguard
-         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to load agent configuration.")
-
-    # --- Récupérer le numéro de téléphone de l'agent (Caller ID) et son LiveKit SIP Trunk ID depuis Supabase ---
-    agent_caller_id_number = None
-    sip_trunk_id_from_phone_number_config = None # Explicitly for the number assigned to agent
-    phone_numbers_id = agent_config.get("phone_numbers_id") # This is the PK of the phone_numbers record assigned to the agent
-
-    if phone_numbers_id: 
-        try:
-            logger.info(f"Attempting to fetch phone number details for phone_numbers_id {phone_numbers_id} (assigned to agent {agent_id}) from Supabase.")
-            # Select phone_number_e164 and livekit_sip_trunk_id
-            pn_response = supabase_service_client.table("phone_numbers").select("phone_number_e164, livekit_sip_trunk_id").eq("id", phone_numbers_id).single().execute()
-            
-            if pn_response.data:
-                phone_number_details = pn_response.data
-                agent_caller_id_number = phone_number_details.get("phone_number_e164")
-                sip_trunk_id_from_phone_number_config = phone_number_details.get("livekit_sip_trunk_id")
-                
-                if agent_caller_id_number:
-                    logger.info(f"Agent Caller ID from Supabase phone_numbers record {phone_numbers_id}: {agent_caller_id_number}")
-                else:
-                    logger.warning(f"phone_number_e164 not found in Supabase phone_numbers record {phone_numbers_id} for agent {agent_id}.")
-
-                if sip_trunk_id_from_phone_number_config:
-                    logger.info(f"LiveKit SIP Trunk ID from Supabase phone_numbers record {phone_numbers_id}: {sip_trunk_id_from_phone_number_config}")
-                else:
-                    logger.warning(f"livekit_sip_trunk_id not found in Supabase phone_numbers record {phone_numbers_id} for agent {agent_id}.")
-            else:
-                logger.warning(f"Phone number details not found in Supabase for phone_numbers_id {phone_numbers_id} (assigned to agent {agent_id}). Response: {pn_response.error or 'No data'}")
-        except Exception as e:
-            logger.error(f"Error fetching phone number details for phone_numbers_id {phone_numbers_id} from Supabase: {e}", exc_info=True)
-            # Not raising HTTPException here to allow fallback logic for caller ID / trunk ID
-    else:
-        logger.info(f"Agent {agent_id} does not have a phone_numbers_id assigned in their agent config. Caller ID and specific trunk from phone_numbers table will not be used.")
-
-    # --- Extraire les valeurs de la config agent (avec des valeurs par défaut) ---
-    system_prompt_from_config = agent_config.get("system_prompt", "Default prompt: Please handle the call.")
-    stt_language_from_config = agent_config.get("stt_language", "fr")
-    tts_voice_id_from_config = agent_config.get("tts_voice", "65b25c5d-ff07-4687-a04c-da2f43ef6fa9") # Default Natasha (French)
-    agent_name_from_config = agent_config.get("name", f"Agent {agent_id}")
-    initial_greeting_from_config = agent_config.get("initial_greeting", "Bonjour, ceci est un test de Pam.")
-    sip_trunk_id_directly_on_agent = agent_config.get("sip_trunk_id") # This is agents.sip_trunk_id
-
-    logger.info(f"Extracted from Agent Config - Prompt: '{system_prompt_from_config}', Lang: '{stt_language_from_config}', Voice: '{tts_voice_id_from_config}', Greeting: '{initial_greeting_from_config}'")
-    logger.info(f"SIP Trunk ID directly on agent record (agents.sip_trunk_id): {sip_trunk_id_directly_on_agent}")
-
-    # Extract VAD provider from agent config
-    vad_provider_from_config = agent_config.get("vad_provider", "silero")
-    
-    # Extract PAM tier and advanced settings
-    pam_tier = agent_config.get("pam_tier", "core")
-    wait_for_greeting = agent_config.get("wait_for_greeting", False)
-    llm_temperature = agent_config.get("llm_temperature", 0.5)
-    interruption_threshold = agent_config.get("interruption_threshold", 100)
-    
-    # Extract call handling settings
-    transfer_to = agent_config.get("transfer_to")
-    voicemail_detection = agent_config.get("voicemail_detection", False)
-    voicemail_hangup_immediately = agent_config.get("voicemail_hangup_immediately", False)
-    voicemail_message = agent_config.get("voicemail_message")
-    
-    logger.info(f"PAM Tier: {pam_tier}, Wait for Greeting: {wait_for_greeting}, Temperature: {llm_temperature}, Interruption Threshold: {interruption_threshold}")
-    logger.info(f"Call Handling - Transfer To: {transfer_to}, Voicemail Detection: {voicemail_detection}, Hangup Immediately: {voicemail_hangup_immediately}, Custom Message: {'Set' if voicemail_message else 'Not set'}")
-
-    ai_models_metadata = {
-        "vad": {"provider": vad_provider_from_config},
-        "stt": {
-            "provider": agent_config.get("stt_provider", "deepgram"), 
-            "language": stt_language_from_config, 
-            "model_name": agent_config.get("stt_model", "nova-2")
-        },
-        "tts": {
-            "provider": "dynamic",  # Will be determined by voice lookup
-            "model_name": agent_config.get("tts_model", "sonic-2-2025-03-07"), 
-            "voice_id": tts_voice_id_from_config
-        },
-        "llm": {
-            "provider": agent_config.get("llm_provider", "openai"), 
-            "model_name": agent_config.get("llm_model", "gpt-4o-mini"),
-            "temperature": llm_temperature  # Pass temperature to LLM config
-        }
-    }
-
-    # --- Déterminer le SIP Trunk ID final ---
-    final_sip_trunk_id = None
-    source_of_sip_trunk_id = "Unknown"
-
-    if sip_trunk_id_from_phone_number_config: # Highest priority: trunk from agent's assigned number
-        final_sip_trunk_id = sip_trunk_id_from_phone_number_config
-        source_of_sip_trunk_id = f"phone_numbers table (record id {phone_numbers_id} assigned to agent)"
-    elif sip_trunk_id_directly_on_agent: # Second priority: trunk ID set directly on the agent record
-        final_sip_trunk_id = sip_trunk_id_directly_on_agent
-        source_of_sip_trunk_id = "agents table (agents.sip_trunk_id field)"
-    
-    if not final_sip_trunk_id:
-        logger.error(f"CRITICAL: No SIP Trunk ID could be determined for agent {agent_id}. Searched agent's assigned phone_number and agent record.")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="SIP trunk ID is not configured for this agent.")
-    
-    logger.info(f"Final SIP Trunk ID to be used for the call: {final_sip_trunk_id} (Source: {source_of_sip_trunk_id})")
-
-    # --- Créer le log d'appel Supabase AVANT le job LiveKit ---
-    call_log_payload_supabase = {
-        "agent_id": agent_id,
-        "to_phone_number": request.phoneNumber,
-        "status": "initiating",
-        "livekit_outbound_trunk_id": final_sip_trunk_id,
-        "user_id": agent_config.get("user_id"), 
-        "from_phone_number": agent_caller_id_number if agent_caller_id_number else None
-    }
-    
-    # Add batch campaign context if provided
-    if request.batch_campaign_id:
-        call_log_payload_supabase["batch_campaign_id"] = request.batch_campaign_id
-        logger.info(f"Call will be linked to batch campaign: {request.batch_campaign_id}")
-        
-    if request.batch_call_item_id:
-        call_log_payload_supabase["batch_call_item_id"] = request.batch_call_item_id
-        logger.info(f"Call will be linked to batch call item: {request.batch_call_item_id}")
-    
-    supabase_call_id = None
-    try:
-        logger.info(f"Attempting to insert call log into Supabase 'calls' table: {call_log_payload_supabase}")
-        call_log_response = supabase_service_client.table("calls").insert(call_log_payload_supabase).execute()
-        if call_log_response.data and len(call_log_response.data) > 0:
-            supabase_call_id = call_log_response.data[0].get("id")
-            logger.info(f"Successfully logged call initiation to Supabase 'calls' table. Supabase Call ID: {supabase_call_id}")
-        else:
-            logger.error(f"Failed to log call to Supabase 'calls' table or get ID back. Response: {call_log_response.error or 'No data'}")
-            # This is critical, so raise an error
-            raise HTTPException(status_code=500, detail="Could not create call log in Supabase database (no ID returned).")
-    except Exception as log_e:
-        logger.error(f"Error occurred while trying to log call to Supabase 'calls' table: {log_e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Could not create call log in Supabase database: {str(log_e)}")
-
-    if not supabase_call_id: # Should be caught by exceptions above, but as a safeguard
-        raise HTTPException(status_code=500, detail="Could not create call log in Supabase database (ID is null).")
-
-    # --- Auto-start pathway if agent has default pathway assigned ---
-    try:
-        from api.agent_pathway_integration import auto_start_pathway_for_new_call
-        
-        # Prepare session metadata for pathway execution
-        session_metadata = {
-            "phone_number": request.phoneNumber,
-            "contact_name": request.lastName,
-            "agent_name": agent_name_from_config,
-            "call_id": str(supabase_call_id),
-            "batch_campaign_id": request.batch_campaign_id,
-            "batch_call_item_id": request.batch_call_item_id
-        }
-        
-        # Attempt to auto-start pathway (non-blocking)
-        execution_id = await auto_start_pathway_for_new_call(
-            call_id=str(supabase_call_id),
-            agent_id=agent_id,
-            session_metadata=session_metadata
-        )
-        
-        if execution_id:
-            logger.info(f"✅ Auto-started pathway execution {execution_id} for call {supabase_call_id}")
-        else:
-            logger.info(f"No pathway auto-started for call {supabase_call_id} (agent has no default pathway or pathway inactive)")
-            
-    except Exception as pathway_error:
-        # Don't fail the call if pathway auto-start fails
-        logger.error(f"Failed to auto-start pathway for call {supabase_call_id}: {pathway_error}")
-
-    # --- Préparer les métadonnées pour LiveKit ---
-    metadata = {
-        "phoneNumber": request.phoneNumber,
-        "agent_id_requested": agent_id,
-        "agent_id": agent_id,
-        "system_prompt": system_prompt_from_config,
-        "ai_models": ai_models_metadata,
-        "agentName": agent_name_from_config,
-        "supabase_call_id": str(supabase_call_id), # Pass the new Supabase call ID
-        "initial_greeting": initial_greeting_from_config,
-        "sip_trunk_id": final_sip_trunk_id,
-        "agent_caller_id_number": agent_caller_id_number if agent_caller_id_number else None,
-        # PAM tier and advanced settings
-        "pam_tier": pam_tier,
-        "wait_for_greeting": wait_for_greeting,
-        "interruption_threshold": interruption_threshold,
-        "transfer_to": transfer_to,
-        "voicemail_detection": voicemail_detection,
-        "voicemail_hangup_immediately": voicemail_hangup_immediately,
-        "voicemail_message": voicemail_message,
-        # ✅ ADD JWT TOKEN FOR BACKEND API CALLS
-        "auth_token": xano_token,
-        "user_id": agent_config.get("user_id")
-    }
-    logger.info(f"Métadonnées finales envoyées au job LiveKit: {metadata}")
-    metadata_json = json.dumps(metadata)
-
-    # --- Créer le job LiveKit ---
-    command = [
-        "lk", "dispatch", "create",
-        "--new-room",
-        "--agent-name", "outbound-caller",
-        "--metadata", metadata_json
-    ]
-    try:
-        logger.info(f"Executing command: {' '.join(command)}")
-        process_env = os.environ.copy()
-        result = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            check=True,
-            shell=False,
-            env=process_env
-        )
-        logger.info(f"lk dispatch command output: {result.stdout}")
-        logger.info(f"lk dispatch command stderr: {result.stderr}")
-        lk_room_name, lk_job_id = parse_lk_dispatch_output(result.stdout)
-        return {"message": f"Call for agent {agent_id} initiated successfully", "dispatch_details": result.stdout}
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Failed to execute lk dispatch command for agent {agent_id}: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to initiate call: {e.stderr or e.stdout or 'Unknown error'}",
-        )
-    except FileNotFoundError:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="'lk' command not found. Server configuration issue."
+        call_context = await resolve_agent_call_context(agent_id)
+        result = await dispatch_agent_call(
+            call_context,
+            phone_number=request.phoneNumber,
+            contact_name=request.lastName,
+            auth_token=auth_token,
+            batch_campaign_id=request.batch_campaign_id,
+            batch_call_item_id=request.batch_call_item_id
         )
+    except CallDispatchError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
+        logger.exception(f"Unexpected error initiating call for agent {agent_id}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An unexpected error occurred: {str(e)}",
         )
 
+    return {
+        "message": f"Call for agent {agent_id} initiated successfully",
+        "dispatch_details": {"dispatch_id": result.dispatch_id, "room_name": result.room_name},
+        "supabase_call_id": result.supabase_call_id
+    }
+
 @app.patch("/calls/room/{room_name}/status")
 async def update_call_status_by_room(
     room_name: str,
@@ -810,6 +567,7 @@ async def update_call_status_by_room(
         
         if update_response.data and len(update_response.data) > 0:
             logger.info(f"Infos pour Supabase Call ID {supabase_call_id_value} (room {room_name}) mises à jour dans Supabase: {update_response.data[0]}")
+            publish_call_update(update_response.data[0])
             
             # Update batch call item status if this is a batch campaign call
             if status_update.new_status:
@@ -1051,6 +809,7 @@ async def telnyx_webhook(webhook: TelnyxWebhook):
                     final_update_response = supabase_service_client.table("calls").update(update_data_for_supabase).eq("id", supabase_call_id_to_update).execute()
                     if final_update_response.data:
                         logger.info(f"Webhook '{event_type}': Enregistrement Supabase 'calls' ID {supabase_call_id_to_update} mis à jour: {final_update_response.data[0]}")
+                        publish_call_update(final_update_response.data[0])
                     elif final_update_response.error:
                         logger.error(f"Webhook '{event_type}': Erreur Supabase MAJ 'calls' ID {supabase_call_id_to_update}: {final_update_response.error.message}")
                     # Consider case where update doesn't return data but also no error (e.g. record not found by eq)
@@ -1245,20 +1004,9 @@ async def refresh_token(request: TokenRefreshRequest):
 
 # Endpoint to get current user (equivalent to /auth/me)
 @app.get("/auth/me")
-async def get_current_user(authorization: str = Header(None, alias="Authorization")):
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
+async def get_current_user(user: AuthenticatedUser = Depends(get_authenticated_user)):
     try:
-        # Verify token with Supabase using service client
-        user_response = supabase_service_client.auth.get_user(token)
-        
-        if not user_response.user:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        
-        auth_user_id = user_response.user.id
+        auth_user_id = user.id
         
         # Get user profile from public.users using service client
         try:
@@ -1267,8 +1015,8 @@ async def get_current_user(authorization: str = Header(None, alias="Authorizatio
                 # If no profile exists, create a basic one
                 user_profile = {
                     "id": str(auth_user_id),
-                    "email": user_response.user.email,
-                    "name": user_response.user.email.split('@')[0] if user_response.user.email else "User"
+                    "email": user.email,
+                    "name": user.email.split('@')[0] if user.email else "User"
                 }
             else:
                 user_profile = user_profile_response.data
@@ -1276,8 +1024,8 @@ async def get_current_user(authorization: str = Header(None, alias="Authorizatio
             logger.warning(f"Error fetching user profile for {auth_user_id}: {profile_e}")
             user_profile = {
                 "id": str(auth_user_id),
-                "email": user_response.user.email,
-                "name": user_response.user.email.split('@')[0] if user_response.user.email else "User"
+                "email": user.email,
+                "name": user.email.split('@')[0] if user.email else "User"
             }
         
         return user_profile
@@ -1417,21 +1165,9 @@ class AgentCreateRequest(BaseModel):
 
 
 @app.post("/agents", status_code=status.HTTP_201_CREATED)
-async def create_agent(request: AgentCreateRequest, authorization: str = Header(None, alias="Authorization")):
+async def create_agent(request: AgentCreateRequest, user_id: str = Depends(get_authenticated_user_id)):
     """Create a new agent for the authenticated user"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
     try:
-        # Verify token with Supabase and get user_id
-        user_response = supabase_service_client.auth.get_user(token)
-        
-        if not user_response.user:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        
-        user_id = user_response.user.id
         logger.info(f"Received request to create agent: {request.name} for user {user_id}")
 
         agent_payload = {
@@ -1491,33 +1227,78 @@ async def create_agent(request: AgentCreateRequest, authorization: str = Header(
 def read_root():
     return {"message": "API is running"}
 
-@app.get("/agents")
-async def get_agents(authorization: str = Header(None, alias="Authorization")):
-    """
-    Get a list of all agents for the authenticated user, including their phone numbers.
-    """
-    try:
-        user_id = get_user_id_from_token(authorization)
-        logger.info(f"Fetching agents for user_id: {user_id}")
+@app.get("/cache/stats")
+async def get_cache_stats(user_id: str = Depends(get_authenticated_user_id)):
+    """Hit/miss counters of the API process's configuration cache (workers log theirs per call)"""
+    return cache_stats()
+
+@app.get("/http/stats")
+async def get_http_client_stats(user_id: str = Depends(get_authenticated_user_id)):
+    """Requests and connection pool usage of the API process's shared outbound clients,
+    per event loop (the API loop and the campaign scheduler thread's loop)"""
+    return {"api": await loop_client_stats(), "scheduler": await scheduler_client_stats()}
 
-        response = supabase_service_client.table("agents").select(
-             """
-            *,
+AGENT_PHONE_NUMBER_EMBED = """
             phone_numbers!agents_phone_numbers_id_fkey!left (
                 id,
                 phone_number_e164,
                 status
             )
             """
-        ).eq("user_id", user_id).execute()
+# Output fields of /agents built from the phone number embed
+AGENT_PHONE_NUMBER_FIELDS = {"phone_number": (AGENT_PHONE_NUMBER_EMBED,), "phone_number_status": (AGENT_PHONE_NUMBER_EMBED,)}
 
-        if not response.data:
+CALL_LIST_FIELDS = (
+    "id", "created_at", "agent_id", "agent_name", "user_id", "from_phone_number", "to_phone_number", "status",
+    "livekit_room_name", "livekit_outbound_trunk_id", "call_duration", "initiated_at", "answered_at", "ended_at",
+    "ended_reason", "provider", "call_control_id", "livekit_participant_identity",
+)
+# agent_name is derived from agent_id
+CALL_LIST_SOURCES = {"agent_name": ("agent_id",)}
+
+PHONE_NUMBER_LIST_FIELDS = (
+    "id", "created_at", "updated_at", "users_id", "phone_number_e164", "provider", "status", "friendly_name",
+    "telnyx_number_id", "telnyx_connection_id", "livekit_sip_trunk_id", "telnyx_call_control_application_id",
+    "telnyx_outbound_voice_profile_id", "telnyx_credential_connection_id", "telnyx_sip_username",
+    "telnyx_sip_password_clear", "user_telnyx_api_key",
+)
+# updated_at is not in the schema, created_at is returned in its place
+PHONE_NUMBER_LIST_SOURCES = {"updated_at": ("created_at",)}
+
+
+@app.get("/agents")
+async def get_agents(
+    response: Response,
+    user_id: str = Depends(get_authenticated_user_id),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+):
+    """
+    Get the agents of the authenticated user, including their phone numbers.
+    Ordered by id; with `limit` or `cursor` a page is returned and the next
+    page's cursor is in the X-Next-Cursor header.
+    """
+    try:
+        logger.info(f"Fetching agents for user_id: {user_id}")
+
+        columns = select_columns(fields, sources=AGENT_PHONE_NUMBER_FIELDS, default=f"*, {AGENT_PHONE_NUMBER_EMBED}")
+        query = get_async_db().table("agents").select(columns, count="estimated").eq("user_id", user_id)
+        statuses = split_filter(status_filter)
+        if statuses:
+            query = query.in_("status", statuses)
+
+        page = await fetch_page(query, limit, cursor, sort_column="id", descending=False)
+        page.apply_headers(response)
+
+        if not page.rows:
             logger.info(f"No agents found for user {user_id}")
             return []
         
         # Process agents to flatten the phone number details
         processed_agents = []
-        for agent in response.data:
+        for agent in page.rows:
             phone_info = agent.get('phone_numbers')
             if phone_info and isinstance(phone_info, dict):
                 agent['phone_number'] = phone_info.get('phone_number_e164')
@@ -1530,7 +1311,7 @@ async def get_agents(authorization: str = Header(None, alias="Authorization")):
             if 'phone_numbers' in agent:
                 del agent['phone_numbers']
             
-            processed_agents.append(agent)
+            processed_agents.append(project_row(agent, fields))
 
         logger.info(f"Successfully retrieved {len(processed_agents)} agents for user {user_id}")
         return processed_agents
@@ -1543,31 +1324,49 @@ async def get_agents(authorization: str = Header(None, alias="Authorization")):
         raise HTTPException(status_code=500, detail="An unexpected error occurred while fetching agents.")
 
 @app.get("/calls")
-async def get_calls(authorization: str = Header(None, alias="Authorization")):
-    """Get all calls for the authenticated user"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
+async def get_calls(
+    response: Response,
+    user_id: str = Depends(get_authenticated_user_id),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    agent_id: Optional[int] = None,
+    campaign_id: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+):
+    """Get the calls of the authenticated user, most recent first.
+
+    Filters: status (comma-separated), agent_id, campaign_id, start_date/end_date
+    (ISO dates on created_at). With `limit` or `cursor` a page is returned and
+    the next page's cursor is in the X-Next-Cursor header.
+    """
     try:
-        # Verify token with Supabase
-        user_response = supabase_service_client.auth.get_user(token)
-        
-        if not user_response.user:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        
-        user_id = user_response.user.id
         logger.info(f"Fetching calls for user: {user_id}")
         
-        # Get all calls for this user, ordered by created_at desc (most recent first)
-        calls_response = supabase_service_client.table("calls").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
+        columns = select_columns(fields, CALL_LIST_FIELDS, required=("id", "created_at"), sources=CALL_LIST_SOURCES)
+        query = get_async_db().table("calls").select(columns, count="estimated").eq("user_id", user_id)
+        statuses = split_filter(status_filter)
+        if statuses:
+            query = query.in_("status", statuses)
+        if agent_id is not None:
+            query = query.eq("agent_id", agent_id)
+        if campaign_id:
+            query = query.eq("batch_campaign_id", campaign_id)
+        if start_date:
+            query = query.gte("created_at", start_date)
+        if end_date:
+            query = query.lte("created_at", end_date)
+
+        page = await fetch_page(query, limit, cursor, sort_column="created_at", descending=True)
+        page.apply_headers(response)
         
-        if not calls_response.data:
+        if not page.rows:
             logger.info(f"No calls found for user {user_id}")
             return []
         
-        calls = calls_response.data
+        calls = page.rows
         logger.info(f"Found {len(calls)} calls for user {user_id}")
         
         # Process calls to match frontend expectations
@@ -1593,40 +1392,43 @@ async def get_calls(authorization: str = Header(None, alias="Authorization")):
                 "call_control_id": call.get("call_control_id"),
                 "livekit_participant_identity": call.get("livekit_participant_identity")
             }
-            processed_calls.append(processed_call)
+            processed_calls.append(project_row(processed_call, fields))
         
         return processed_calls
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching calls: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch calls")
 
 @app.get("/phone_numbers")
-async def get_phone_numbers(authorization: str = Header(None, alias="Authorization")):
-    """Get all phone numbers for the authenticated user"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
+async def get_phone_numbers(
+    response: Response,
+    user_id: str = Depends(get_authenticated_user_id),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+):
+    """Get the phone numbers of the authenticated user, most recent first (paged with `limit` or `cursor`)"""
     try:
-        # Verify token with Supabase
-        user_response = supabase_service_client.auth.get_user(token)
-        
-        if not user_response.user:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        
-        user_id = user_response.user.id
         logger.info(f"Fetching phone numbers for user: {user_id}")
         
-        # Get all phone numbers for this user, ordered by created_at desc (most recent first)
-        phone_numbers_response = supabase_service_client.table("phone_numbers").select("*").eq("users_id", user_id).order("created_at", desc=True).execute()
+        columns = select_columns(fields, PHONE_NUMBER_LIST_FIELDS, required=("id", "created_at"), sources=PHONE_NUMBER_LIST_SOURCES)
+        query = get_async_db().table("phone_numbers").select(columns, count="estimated").eq("users_id", user_id)
+        statuses = split_filter(status_filter)
+        if statuses:
+            query = query.in_("status", statuses)
+
+        page = await fetch_page(query, limit, cursor, sort_column="created_at", descending=True)
+        page.apply_headers(response)
         
-        if not phone_numbers_response.data:
+        if not page.rows:
             logger.info(f"No phone numbers found for user {user_id}")
             return []
         
-        phone_numbers = phone_numbers_response.data
+        phone_numbers = page.rows
         logger.info(f"Found {len(phone_numbers)} phone numbers for user {user_id}")
         
         # Process phone numbers to match frontend expectations (PamPhoneNumber type)
@@ -1651,30 +1453,21 @@ async def get_phone_numbers(authorization: str = Header(None, alias="Authorizati
                 "telnyx_sip_password_clear": phone_number.get("telnyx_sip_password_clear"),
                 "user_telnyx_api_key": phone_number.get("user_telnyx_api_key")
             }
-            processed_phone_numbers.append(processed_phone_number)
+            processed_phone_numbers.append(project_row(processed_phone_number, fields))
         
         return processed_phone_numbers
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching phone numbers: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch phone numbers")
 
 @app.get("/settings")
-async def get_user_settings(authorization: str = Header(None, alias="Authorization")):
+async def get_user_settings(user: AuthenticatedUser = Depends(get_authenticated_user)):
     """Get user settings/preferences"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
     try:
-        # Verify token with Supabase
-        user_response = supabase_service_client.auth.get_user(token)
-        
-        if not user_response.user:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        
-        user_id = user_response.user.id
+        user_id = user.id
         logger.info(f"Fetching settings for user: {user_id}")
         
         # Get user profile from public.users with settings
@@ -1684,8 +1477,8 @@ async def get_user_settings(authorization: str = Header(None, alias="Authorizati
             # If no profile exists, return default settings
             default_settings = {
                 "id": str(user_id),
-                "email": user_response.user.email,
-                "name": user_response.user.email.split('@')[0] if user_response.user.email else "User",
+                "email": user.email,
+                "name": user.email.split('@')[0] if user.email else "User",
                 "company": "",
                 "timezone": "UTC",
                 "language": "en",
@@ -1701,7 +1494,7 @@ async def get_user_settings(authorization: str = Header(None, alias="Authorizati
         # Process settings to match frontend expectations
         settings = {
             "id": user_profile.get("id"),
-            "email": user_profile.get("email", user_response.user.email),
+            "email": user_profile.get("email", user.email),
             "name": user_profile.get("name", "User"),
             "company": user_profile.get("company", ""),
             "timezone": user_profile.get("timezone", "UTC"),
@@ -1731,21 +1524,10 @@ class UserSettingsUpdateRequest(BaseModel):
     twoFactorAuth: Optional[bool] = None
 
 @app.patch("/settings")
-async def update_user_settings(request: UserSettingsUpdateRequest, authorization: str = Header(None, alias="Authorization")):
+async def update_user_settings(request: UserSettingsUpdateRequest, user: AuthenticatedUser = Depends(get_authenticated_user)):
     """Update user settings/preferences"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
     try:
-        # Verify token with Supabase
-        user_response = supabase_service_client.auth.get_user(token)
-        
-        if not user_response.user:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        
-        user_id = user_response.user.id
+        user_id = user.id
         logger.info(f"Updating settings for user: {user_id}")
         
         # Build update payload with only provided fields
@@ -1774,8 +1556,8 @@ async def update_user_settings(request: UserSettingsUpdateRequest, authorization
             # Create user profile if it doesn't exist
             create_payload = {
                 "id": str(user_id),
-                "email": user_response.user.email,
-                "name": update_payload.get("name", user_response.user.email.split('@')[0] if user_response.user.email else "User")
+                "email": user.email,
+                "name": update_payload.get("name", user.email.split('@')[0] if user.email else "User")
             }
             create_payload.update(update_payload)
             
@@ -1820,11 +1602,9 @@ async def update_user_settings(request: UserSettingsUpdateRequest, authorization
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to update user settings")
 
 @app.delete("/agents/{agent_id}")
-async def delete_agent(agent_id: int, authorization: str = Header(None, alias="Authorization")):
+async def delete_agent(agent_id: int, user_id: str = Depends(get_authenticated_user_id)):
     """Delete an agent"""
     try:
-        user_id = get_user_id_from_token(authorization)
-        
         # Verify the agent belongs to the user before deleting
         agent_response = supabase_service_client.table("agents").select("id").eq("id", agent_id).eq("user_id", user_id).single().execute()
         if not agent_response.data:
@@ -1837,6 +1617,7 @@ async def delete_agent(agent_id: int, authorization: str = Header(None, alias="A
             raise HTTPException(status_code=500, detail="Failed to delete agent")
             
         logger.info(f"Deleted agent {agent_id} for user {user_id}")
+        publish_invalidation("agent", agent_id)
         return {"message": "Agent deleted successfully"}
         
     except HTTPException:
@@ -1846,13 +1627,12 @@ async def delete_agent(agent_id: int, authorization: str = Header(None, alias="A
         raise HTTPException(status_code=500, detail="Failed to delete agent")
 
 @app.get("/agents/{agent_id}")
-async def get_agent(agent_id: int, authorization: str = Header(None, alias="Authorization")):
+async def get_agent(agent_id: int, user_id: str = Depends(get_authenticated_user_id)):
     """
     Get a single agent by ID for the authenticated user.
     This function now uses a two-step fetch to avoid ambiguous join issues.
     """
     try:
-        user_id = get_user_id_from_token(authorization)
         logger.info(f"Step 1: Fetching agent {agent_id} for user {user_id}")
 
         # Step 1: Fetch the core agent data without any joins
@@ -1921,21 +1701,9 @@ class AgentUpdateRequest(BaseModel):
 
 
 @app.patch("/agents/{agent_id}")
-async def update_agent(agent_id: int, request: AgentUpdateRequest, authorization: str = Header(None, alias="Authorization")):
+async def update_agent(agent_id: int, request: AgentUpdateRequest, user_id: str = Depends(get_authenticated_user_id)):
     """Update a specific agent by ID"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
     try:
-        # Verify token with Supabase
-        user_response = supabase_service_client.auth.get_user(token)
-        
-        if not user_response.user:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        
-        user_id = user_response.user.id
         logger.info(f"Updating agent {agent_id} for user: {user_id}")
         
         # First, check if the agent exists and belongs to this user
@@ -1962,6 +1730,7 @@ async def update_agent(agent_id: int, request: AgentUpdateRequest, authorization
         
         updated_agent = update_response.data[0]
         logger.info(f"Successfully updated agent {agent_id} for user {user_id}")
+        publish_invalidation("agent", agent_id)
         
         # Process updated agent to match frontend expectations  
         processed_agent = {
@@ -2010,21 +1779,8 @@ if __name__ == "__main__":
 
 # Dashboard Statistics Endpoints
 @app.get("/dashboard/stats")
-async def get_dashboard_stats(authorization: str = Header(None, alias="Authorization")):
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
+async def get_dashboard_stats(user_id: str = Depends(get_authenticated_user_id)):
     try:
-        # Verify token with Supabase Auth using anon client
-        anon_client = get_supabase_anon_client()
-        user_response = anon_client.auth.get_user(token)
-        
-        if not user_response.user:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        
-        user_id = user_response.user.id
         logger.info(f"Dashboard stats requested by user: {user_id}")
         
         # Get user's agents count with error handling
@@ -2043,21 +1799,15 @@ async def get_dashboard_stats(authorization: str = Header(None, alias="Authoriza
             logger.error(f"Error fetching active agents count: {e}")
             active_agents = 0
         
-        # Get total calls count for user with error handling
+        # Get total and last-30-days calls counts from the daily rollups with error handling
         try:
-            calls_response = supabase_service_client.table("calls").select("id", count="exact").eq("user_id", user_id).execute()
-            total_calls = calls_response.count if calls_response.count is not None else 0
+            thirty_days_ago = datetime.now(timezone.utc) - timedelta(days=30)
+            daily_rollups = await fetch_rollups(user_id, "user", "day")
+            total_calls = sum(bucket["total_calls"] for bucket in daily_rollups)
+            recent_calls = sum(bucket["total_calls"] for bucket in daily_rollups if bucket["bucket_start"] >= thirty_days_ago.date().isoformat())
         except Exception as e:
-            logger.error(f"Error fetching calls count: {e}")
+            logger.error(f"Error fetching calls rollups: {e}")
             total_calls = 0
-        
-        # Get calls from last 30 days to calculate change with error handling
-        try:
-            thirty_days_ago = (datetime.utcnow() - timedelta(days=30)).isoformat()
-            recent_calls_response = supabase_service_client.table("calls").select("id", count="exact").eq("user_id", user_id).gte("created_at", thirty_days_ago).execute()
-            recent_calls = recent_calls_response.count if recent_calls_response.count is not None else 0
-        except Exception as e:
-            logger.error(f"Error fetching recent calls count: {e}")
             recent_calls = 0
         
         # Calculate calls change percentage (simplified)
@@ -2229,22 +1979,9 @@ async def get_voices(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch voices")
 
 @app.post("/voices", response_model=VoiceResponse, status_code=status.HTTP_201_CREATED)
-async def create_voice(request: VoiceCreateRequest, authorization: str = Header(None, alias="Authorization")):
+async def create_voice(request: VoiceCreateRequest, user_id: str = Depends(get_authenticated_user_id)):
     """Create a new voice (admin functionality)"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
     try:
-        # Verify token with Supabase
-        user_response = supabase_service_client.auth.get_user(token)
-        
-        if not user_response.user:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        
-        user_id = user_response.user.id
-        
         # Check if voice with same cartesia_voice_id already exists
         existing_voice = supabase_service_client.table("voices").select("cartesia_voice_id").eq("cartesia_voice_id", request.cartesia_voice_id).execute()
         
@@ -2265,6 +2002,8 @@ async def create_voice(request: VoiceCreateRequest, authorization: str = Header(
         
         voice_data = response.data[0]
         logger.info(f"Created voice: {voice_data['name']} ({voice_data['cartesia_voice_id']})")
+        # Workers may have cached the voice as not found
+        publish_invalidation("voice", voice_data["cartesia_voice_id"])
         
         # Return created voice
         return VoiceResponse(
@@ -2325,22 +2064,9 @@ async def get_voice(voice_id: str):
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch voice")
 
 @app.patch("/voices/{voice_id}", response_model=VoiceResponse)
-async def update_voice(voice_id: str, request: VoiceUpdateRequest, authorization: str = Header(None, alias="Authorization")):
+async def update_voice(voice_id: str, request: VoiceUpdateRequest, user_id: str = Depends(get_authenticated_user_id)):
     """Update a voice (admin functionality)"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
     try:
-        # Verify token with Supabase
-        user_response = supabase_service_client.auth.get_user(token)
-        
-        if not user_response.user:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        
-        user_id = user_response.user.id
-        
         # Check if voice exists
         existing_voice = supabase_service_client.table("voices").select("*").eq("id", voice_id).single().execute()
         
@@ -2367,6 +2093,9 @@ async def update_voice(voice_id: str, request: VoiceUpdateRequest, authorization
         
         voice_data = response.data[0]
         logger.info(f"Updated voice: {voice_data['name']} ({voice_id})")
+        for cartesia_voice_id in {existing_voice.data.get("cartesia_voice_id"), voice_data.get("cartesia_voice_id")}:
+            if cartesia_voice_id:
+                publish_invalidation("voice", cartesia_voice_id)
         
         return VoiceResponse(
             id=voice_data["id"],
@@ -2392,25 +2121,11 @@ async def update_voice(voice_id: str, request: VoiceUpdateRequest, authorization
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to update voice")
 
 @app.delete("/voices/{voice_id}")
-async def delete_voice(voice_id: str, authorization: str = Header(None, alias="Authorization")):
+async def delete_voice(voice_id: str, user_id: str = Depends(get_authenticated_user_id)):
     """
     Delete a voice by ID
     """
     try:
-        # Validate user token
-        if not authorization or not authorization.startswith("Bearer "):
-            raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-        
-        token = authorization.replace("Bearer ", "")
-        
-        # Verify token with Supabase
-        user_response = supabase_service_client.auth.get_user(token)
-        
-        if not user_response.user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user_id = user_response.user.id
-        
         # Delete the voice from Supabase
         response = supabase_service_client.table("voices").delete().eq("id", voice_id).execute()
         
@@ -2418,6 +2133,7 @@ async def delete_voice(voice_id: str, authorization: str = Header(None, alias="A
             raise HTTPException(status_code=404, detail="Voice not found")
         
         logger.info(f"Voice {voice_id} deleted successfully")
+        publish_invalidation("voice", response.data[0].get("cartesia_voice_id") or ALL_CACHE_KEYS)
         return {"message": "Voice deleted successfully"}
         
     except HTTPException:
@@ -2528,24 +2244,23 @@ async def generate_cartesia_preview(voice_data: dict, sample_text: str, voice_na
         "language": language_code
     }
     
-    # Call Cartesia TTS API
-    async with httpx.AsyncClient() as client:
-        response = await client.post(tts_url, json=payload, headers=headers)
-        
-        if response.status_code != 200:
-            logger.error(f"Cartesia TTS API error for voice {voice_name}: {response.status_code} - {response.text}")
-            raise HTTPException(status_code=response.status_code, detail=f"Failed to generate voice preview: {response.text}")
-        
-        # Return the audio content with proper headers
-        return Response(
-            content=response.content,
-            media_type="audio/mpeg",
-            headers={
-                "Content-Type": "audio/mpeg",
-                "Cache-Control": "public, max-age=1800",  # Cache for 30 minutes
-                "Content-Disposition": f'inline; filename="{voice_name}_preview.mp3"'
-            }
-        )
+    # Call Cartesia TTS API (pooled client: no new TLS handshake per preview)
+    response = await get_http_client(tts_url).post(tts_url, json=payload, headers=headers)
+    
+    if response.status_code != 200:
+        logger.error(f"Cartesia TTS API error for voice {voice_name}: {response.status_code} - {response.text}")
+        raise HTTPException(status_code=response.status_code, detail=f"Failed to generate voice preview: {response.text}")
+    
+    # Return the audio content with proper headers
+    return Response(
+        content=response.content,
+        media_type="audio/mpeg",
+        headers={
+            "Content-Type": "audio/mpeg",
+            "Cache-Control": "public, max-age=1800",  # Cache for 30 minutes
+            "Content-Disposition": f'inline; filename="{voice_name}_preview.mp3"'
+        }
+    )
 
 
 async def generate_elevenlabs_preview(voice_data: dict, sample_text: str, voice_name: str):
@@ -2583,24 +2298,23 @@ async def generate_elevenlabs_preview(voice_data: dict, sample_text: str, voice_
         }
     }
     
-    # Call ElevenLabs TTS API
-    async with httpx.AsyncClient() as client:
-        response = await client.post(tts_url, json=payload, headers=headers)
-        
-        if response.status_code != 200:
-            logger.error(f"ElevenLabs TTS API error for voice {voice_name}: {response.status_code} - {response.text}")
-            raise HTTPException(status_code=response.status_code, detail=f"Failed to generate voice preview: {response.text}")
-        
-        # Return the audio content with proper headers
-        return Response(
-            content=response.content,
-            media_type="audio/mpeg",
-            headers={
-                "Content-Type": "audio/mpeg",
-                "Cache-Control": "public, max-age=1800",  # Cache for 30 minutes
-                "Content-Disposition": f'inline; filename="{voice_name}_preview.mp3"'
-            }
-        )
+    # Call ElevenLabs TTS API (pooled client: no new TLS handshake per preview)
+    response = await get_http_client(tts_url).post(tts_url, json=payload, headers=headers)
+    
+    if response.status_code != 200:
+        logger.error(f"ElevenLabs TTS API error for voice {voice_name}: {response.status_code} - {response.text}")
+        raise HTTPException(status_code=response.status_code, detail=f"Failed to generate voice preview: {response.text}")
+    
+    # Return the audio content with proper headers
+    return Response(
+        content=response.content,
+        media_type="audio/mpeg",
+        headers={
+            "Content-Type": "audio/mpeg",
+            "Cache-Control": "public, max-age=1800",  # Cache for 30 minutes
+            "Content-Disposition": f'inline; filename="{voice_name}_preview.mp3"'
+        }
+    )
 
 @app.post("/fix-database")
 async def fix_database_columns():
@@ -2697,20 +2411,15 @@ async def debug_dashboard_stats(authorization: str = Header(None, alias="Authori
         debug_info["step"] = "token_extraction"
         debug_info["token_length"] = len(token)
         
-        # Try to get user with anon client
+        # Verify the token the same way the real endpoints do
         try:
-            anon_client = get_supabase_anon_client()
-            debug_info["step"] = "anon_client_created"
-            
-            user_response = anon_client.auth.get_user(token)
-            debug_info["step"] = "user_fetched"
-            debug_info["user_id"] = user_response.user.id if user_response.user else None
-            
-            if not user_response.user:
-                debug_info["error"] = "Invalid token - no user found"
+            try:
+                user_id = (await run_in_threadpool(verify_access_token, token)).id
+            except HTTPException as auth_error:
+                debug_info["error"] = f"Invalid token - no user found ({auth_error.detail})"
                 return {"debug": debug_info, "success": False}
-            
-            user_id = user_response.user.id
+            debug_info["step"] = "user_fetched"
+            debug_info["user_id"] = user_id
             
             # Try simple database queries
             debug_info["step"] = "database_queries"
@@ -2752,7 +2461,7 @@ from api.batch_routes import update_batch_call_item_from_call_status
 # Global Analytics endpoint
 @app.get("/analytics/global")
 async def get_global_analytics(
-    authorization: str = Header(None, alias="Authorization"),
+    user_id: str = Depends(get_authenticated_user_id),
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     time_filter: str = "30d",
@@ -2760,19 +2469,7 @@ async def get_global_analytics(
     agent_id: Optional[int] = None
 ):
     """Get global analytics data across all calls, campaigns, and agents with optional filters"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
     try:
-        # Verify token
-        user_response = supabase_service_client.auth.get_user(token)
-        if not user_response.user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user_id = user_response.user.id
-        
         # Calculate date range
         end_date_dt = datetime.now(timezone.utc)
         if time_filter == "7d":
@@ -2786,121 +2483,45 @@ async def get_global_analytics(
         period_length = end_date_dt - start_date_dt
         previous_start = start_date_dt - period_length
         
-        # Build base query filters
-        base_filters = [f"user_id=eq.{user_id}"]
-        base_filters.append(f"created_at=gte.{start_date_dt.isoformat()}")
-        base_filters.append(f"created_at=lte.{end_date_dt.isoformat()}")
-        
-        if campaign_id:
-            base_filters.append(f"batch_campaign_id=eq.{campaign_id}")
-        if agent_id:
-            base_filters.append(f"agent_id=eq.{agent_id}")
-        
-        # Get calls data with enhanced fields
-        calls_query = "&".join(base_filters)
-        calls_response = supabase_service_client.table("calls").select(
-            "id, status, call_duration, phone_number_e164, created_at, initiated_at, answered_at, ended_at, agent_id, batch_campaign_id"
-        ).eq("user_id", user_id).gte("created_at", start_date_dt.isoformat()).lte("created_at", end_date_dt.isoformat())
-        
-        if campaign_id:
-            calls_response = calls_response.eq("batch_campaign_id", campaign_id)
-        if agent_id:
-            calls_response = calls_response.eq("agent_id", agent_id)
-            
-        calls_response = calls_response.execute()
-        calls_data = calls_response.data or []
-        
-        # Get agents data
-        agents_response = supabase_service_client.table("agents").select(
-            "id, name, status"
-        ).eq("user_id", user_id).execute()
+        # Aggregates are computed in Postgres (or in one streamed pass), no call rows are loaded here
+        aggregates, previous_aggregates, agents_response, campaigns_response = await asyncio.gather(
+            get_call_aggregates(user_id, start_date_dt, end_date_dt, campaign_id=campaign_id, agent_id=agent_id),
+            # Previous period is compared unfiltered
+            get_call_aggregates(user_id, previous_start, start_date_dt),
+            db_execute(get_async_db().table("agents").select("id, name, status").eq("user_id", user_id)),
+            db_execute(get_async_db().table("batch_campaigns").select(
+                "id, name, status, total_numbers, completed_calls, successful_calls, failed_calls, created_at"
+            ).eq("user_id", user_id)),
+        )
         agents_data = agents_response.data or []
-        
-        # Get campaigns data with enhanced metrics
-        campaigns_response = supabase_service_client.table("batch_campaigns").select(
-            "id, name, status, total_numbers, completed_calls, successful_calls, failed_calls, created_at"
-        ).eq("user_id", user_id).execute()
         campaigns_data = campaigns_response.data or []
-        
-        # Get previous period calls for comparison
-        previous_calls_response = supabase_service_client.table("calls").select(
-            "id, status, call_duration"
-        ).eq("user_id", user_id).gte("created_at", previous_start.isoformat()).lte("created_at", start_date_dt.isoformat()).execute()
-        previous_calls_data = previous_calls_response.data or []
+        totals = aggregates["totals"]
+        previous_totals = previous_aggregates["totals"]
         
         # ===== PHASE 1 ENHANCEMENTS =====
         
-        # 1. Geographic Performance Analysis
+        # 1. Geographic Performance Analysis (successful = completed and longer than 30s)
         geographic_data = {}
-        for call in calls_data:
-            phone_number = call.get("phone_number_e164", "") or ""
-            
-            # Enhanced geographic detection
-            if phone_number.startswith("+1"):
-                # US/Canada - extract area code for more granular analysis
-                if len(phone_number) >= 5:
-                    area_code = phone_number[2:5]
-                    # Map some major area codes to cities/regions
-                    area_code_map = {
-                        "212": "New York, NY", "213": "Los Angeles, CA", "312": "Chicago, IL",
-                        "415": "San Francisco, CA", "617": "Boston, MA", "702": "Las Vegas, NV",
-                        "305": "Miami, FL", "206": "Seattle, WA", "713": "Houston, TX",
-                        "404": "Atlanta, GA", "214": "Dallas, TX", "602": "Phoenix, AZ"
-                    }
-                    region = area_code_map.get(area_code, f"US/CA ({area_code})")
-                else:
-                    region = "US/CA"
-            elif phone_number.startswith("+33"):
-                region = "France"
-            elif phone_number.startswith("+44"):
-                region = "United Kingdom"
-            elif phone_number.startswith("+49"):
-                region = "Germany"
-            elif phone_number.startswith("+34"):
-                region = "Spain"
-            elif phone_number.startswith("+39"):
-                region = "Italy"
-            elif phone_number.startswith("+61"):
-                region = "Australia"
-            elif phone_number.startswith("+81"):
-                region = "Japan"
-            else:
-                region = "Other"
-            
-            if region not in geographic_data:
-                geographic_data[region] = {
-                    "total_calls": 0,
-                    "successful_calls": 0,
-                    "total_duration": 0,
-                    "avg_duration": 0
-                }
-            
-            geographic_data[region]["total_calls"] += 1
-            
-            call_duration = call.get("call_duration") or 0
-            if call.get("status", "").lower() in ["completed", "ended"] and call_duration > 30:
-                geographic_data[region]["successful_calls"] += 1
-            
-            geographic_data[region]["total_duration"] += call_duration
-        
-        # Calculate averages for geographic data
-        for region_data in geographic_data.values():
-            if region_data["total_calls"] > 0:
-                region_data["success_rate"] = round((region_data["successful_calls"] / region_data["total_calls"]) * 100, 2)
-                region_data["avg_duration"] = round(region_data["total_duration"] / region_data["total_calls"], 2)
-            else:
-                region_data["success_rate"] = 0
-                region_data["avg_duration"] = 0
+        for region_row in aggregates["by_region"]:
+            region_total = region_row["total_calls"]
+            geographic_data[region_row["region"]] = {
+                "total_calls": region_total,
+                "successful_calls": region_row["qualified_calls"],
+                "total_duration": region_row["total_duration"],
+                "avg_duration": round(region_row["total_duration"] / region_total, 2) if region_total > 0 else 0,
+                "success_rate": round((region_row["qualified_calls"] / region_total) * 100, 2) if region_total > 0 else 0
+            }
         
         # 2. Enhanced Agent Performance Comparison
+        agent_stats = {row["agent_id"]: row for row in aggregates["by_agent"]}
         agent_performance_data = []
         for agent in agents_data:
-            agent_calls = [call for call in calls_data if call.get("agent_id") == agent["id"]]
+            stats = agent_stats.get(agent["id"], {})
             
-            total_calls = len(agent_calls)
-            successful_calls = len([call for call in agent_calls if call.get("status", "").lower() in ["completed", "ended"] and (call.get("call_duration") or 0) > 30])
+            total_calls = stats.get("total_calls", 0)
+            successful_calls = stats.get("qualified_calls", 0)
             
-            total_duration = sum(int(call.get("call_duration") or 0) for call in agent_calls)
+            total_duration = stats.get("total_duration", 0)
             avg_duration = total_duration / total_calls if total_calls > 0 else 0
             
             # Calculate performance metrics
@@ -2938,18 +2559,18 @@ async def get_global_analytics(
         agent_performance_data.sort(key=lambda x: x["performance_score"], reverse=True)
         
         # Calculate basic metrics (existing logic)
-        total_calls = len(calls_data)
-        completed_calls = len([call for call in calls_data if call.get("status", "").lower() in ["completed", "ended"]])
-        failed_calls = len([call for call in calls_data if call.get("status", "").lower() in ["failed", "busy", "no_answer"]])
+        total_calls = totals["total_calls"]
+        completed_calls = totals["successful_calls"]
+        failed_calls = totals["failed_calls"]
         
-        total_duration = sum(int(call.get("call_duration") or 0) for call in calls_data)
+        total_duration = totals["total_duration"]
         avg_duration = total_duration / total_calls if total_calls > 0 else 0
         
         success_rate = (completed_calls / total_calls * 100) if total_calls > 0 else 0
         
         # Previous period comparison
-        prev_total_calls = len(previous_calls_data)
-        prev_completed_calls = len([call for call in previous_calls_data if call.get("status", "").lower() in ["completed", "ended"]])
+        prev_total_calls = previous_totals["total_calls"]
+        prev_completed_calls = previous_totals["successful_calls"]
         
         def calc_change(current, previous):
             if previous == 0:
@@ -2961,23 +2582,25 @@ async def get_global_analytics(
             return "up" if current >= previous else "down"
         
         # Time series data for charts
+        day_stats = {row["day"]: row for row in aggregates["by_day"]}
         time_series_data = []
-        date_range = []
         current_date = start_date_dt.date()
         while current_date <= end_date_dt.date():
-            date_range.append(current_date)
-            current_date += timedelta(days=1)
-        
-        for date in date_range:
-            day_calls = [call for call in calls_data if call.get("created_at", "").startswith(str(date))]
-            day_successful = len([call for call in day_calls if call.get("status", "").lower() in ["completed", "ended"]])
-            day_failed = len(day_calls) - day_successful
+            stats = day_stats.get(str(current_date), {})
+            day_total = stats.get("total_calls", 0)
+            day_successful = stats.get("successful_calls", 0)
             time_series_data.append({
-                "date": str(date),
-                "calls": len(day_calls),
+                "date": str(current_date),
+                "calls": day_total,
                 "successful": day_successful,
-                "failed": day_failed
+                "failed": day_total - day_successful
             })
+            current_date += timedelta(days=1)
+        
+        hourly_distribution = sorted(
+            ({"hour": row["hour"], "calls": row["total_calls"], "successful": row["successful_calls"]} for row in aggregates["by_hour"]),
+            key=lambda x: x["hour"]
+        )
         
         return {
             "time_range": {
@@ -2994,9 +2617,13 @@ async def get_global_analytics(
                 "successful_calls_trend": calc_trend(completed_calls, prev_completed_calls),
                 "failed_calls": failed_calls,
                 "success_rate": round(success_rate, 2),
-                "avg_duration": round(avg_duration, 2)
+                "avg_duration": round(avg_duration, 2),
+                "duration_p50": round(totals.get("duration_p50") or 0, 2),
+                "duration_p90": round(totals.get("duration_p90") or 0, 2),
+                "duration_p95": round(totals.get("duration_p95") or 0, 2)
             },
             "time_series": time_series_data,
+            "hourly_distribution": hourly_distribution,
             "available_campaigns": [
                 {
                     "campaignId": camp["id"],
@@ -3030,28 +2657,17 @@ async def get_global_analytics(
 # CSV Export endpoint for detailed call data
 @app.get("/analytics/export")
 async def export_analytics_csv(
-    authorization: str = Header(None, alias="Authorization"),
+    user_id: str = Depends(get_authenticated_user_id),
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     time_filter: str = "30d",
     campaign_id: Optional[str] = None,
     agent_id: Optional[int] = None,
-    format: str = "csv"
+    format: str = "csv",
+    gzip: bool = False
 ):
-    """Export detailed call analytics data as CSV"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
+    """Export detailed call analytics data as CSV (streamed, optionally gzip-compressed)"""
     try:
-        # Verify token
-        user_response = supabase_service_client.auth.get_user(token)
-        if not user_response.user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user_id = user_response.user.id
-        
         # Calculate date range (same logic as analytics endpoint)
         end_date_dt = datetime.now(timezone.utc)
         if time_filter == "24h":
@@ -3063,40 +2679,27 @@ async def export_analytics_csv(
         else:  # 30d default
             start_date_dt = end_date_dt - timedelta(days=30)
         
-        # Get detailed call data with all relevant fields
-        calls_query = supabase_service_client.table("calls").select(
-            "id, status, call_duration, phone_number_e164, created_at, initiated_at, answered_at, ended_at, agent_id, batch_campaign_id, room_name, telnyx_call_control_id"
-        ).eq("user_id", user_id).gte("created_at", start_date_dt.isoformat()).lte("created_at", end_date_dt.isoformat())
-        
-        if campaign_id:
-            calls_query = calls_query.eq("batch_campaign_id", campaign_id)
-        if agent_id:
-            calls_query = calls_query.eq("agent_id", agent_id)
+        # Detailed call data with all relevant fields, fetched page by page while streaming
+        def build_calls_query():
+            calls_query = get_async_db().table("calls").select(
+                "id, status, call_duration, phone_number_e164, created_at, initiated_at, answered_at, ended_at, agent_id, batch_campaign_id, room_name, telnyx_call_control_id"
+            ).eq("user_id", user_id).gte("created_at", start_date_dt.isoformat()).lte("created_at", end_date_dt.isoformat())
             
-        calls_response = calls_query.execute()
-        calls_data = calls_response.data or []
+            if campaign_id:
+                calls_query = calls_query.eq("batch_campaign_id", campaign_id)
+            if agent_id:
+                calls_query = calls_query.eq("agent_id", agent_id)
+            return calls_query
         
-        # Get agents data for names
-        agents_response = supabase_service_client.table("agents").select(
-            "id, name"
-        ).eq("user_id", user_id).execute()
+        # Get agents and campaigns data for names
+        agents_response, campaigns_response = await asyncio.gather(
+            db_execute(get_async_db().table("agents").select("id, name").eq("user_id", user_id)),
+            db_execute(get_async_db().table("batch_campaigns").select("id, name").eq("user_id", user_id)),
+        )
         agents_data = {agent["id"]: agent["name"] for agent in agents_response.data or []}
-        
-        # Get campaigns data for names
-        campaigns_response = supabase_service_client.table("batch_campaigns").select(
-            "id, name"
-        ).eq("user_id", user_id).execute()
         campaigns_data = {campaign["id"]: campaign["name"] for campaign in campaigns_response.data or []}
         
         # Helper functions for CSV generation
-        def format_duration(seconds):
-            if not seconds:
-                return "00:00:00"
-            hours = seconds // 3600
-            minutes = (seconds % 3600) // 60
-            seconds = seconds % 60
-            return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-        
         def get_geographic_region(phone_number):
             if not phone_number:
                 return "Unknown"
@@ -3140,19 +2743,6 @@ async def export_analytics_csv(
             else:
                 return "Unknown"
         
-        def escape_csv_field(field):
-            if field is None:
-                return ""
-            field_str = str(field)
-            if '"' in field_str:
-                field_str = field_str.replace('"', '""')
-            if ',' in field_str or '"' in field_str or '\n' in field_str:
-                field_str = f'"{field_str}"'
-            return field_str
-        
-        # Generate CSV content
-        csv_lines = []
-        
         # CSV Headers
         headers = [
             "Call ID", "Date", "Time", "Phone Number", "Agent Name", "Agent ID", 
@@ -3161,10 +2751,9 @@ async def export_analytics_csv(
             "Day of Week", "Hour of Day", "Answer Time (seconds)", "Setup Time (seconds)",
             "Room Name", "Telnyx Call ID", "Created At", "Initiated At", "Answered At", "Ended At"
         ]
-        csv_lines.append(",".join(escape_csv_field(h) for h in headers))
         
         # CSV Data Rows
-        for call in calls_data:
+        def format_call_row(call):
             created_at = call.get("created_at", "")
             initiated_at = call.get("initiated_at", "")
             answered_at = call.get("answered_at", "")
@@ -3220,9 +2809,19 @@ async def export_analytics_csv(
                 ended_at
             ]
             
-            csv_lines.append(",".join(escape_csv_field(field) for field in row))
+            return row
         
-        csv_content = "\n".join(csv_lines)
+        async def csv_chunks():
+            yield csv_chunk([headers])
+            exported = 0
+            try:
+                async for calls_page in iter_keyset_pages(build_calls_query):
+                    yield csv_chunk(format_call_row(call) for call in calls_page)
+                    exported += len(calls_page)
+            except Exception as e:
+                # Headers are already sent: raising aborts the chunked response, so the download fails instead of looking complete
+                logger.error(f"Error streaming analytics export for user {user_id} after {exported} calls: {e}")
+                raise
         
         # Generate filename with timestamp and filters
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -3237,13 +2836,8 @@ async def export_analytics_csv(
             
         filename = "_".join(filename_parts) + ".csv"
         
-        # Return CSV with proper headers
-        from fastapi.responses import Response
-        return Response(
-            content=csv_content,
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+        # Stream CSV with proper headers
+        return streaming_csv_response(csv_chunks(), filename, gzip=gzip)
         
     except HTTPException:
         raise
@@ -3254,23 +2848,11 @@ async def export_analytics_csv(
 # Advanced Analytics with Telnyx Call Control Data
 @app.get("/analytics/telnyx-call-tracking")
 async def get_telnyx_call_tracking_data(
-    authorization: str = Header(None, alias="Authorization"),
+    user_id: str = Depends(get_authenticated_user_id),
     time_filter: str = "30d"
 ):
     """Get enhanced call tracking analytics using Telnyx Call Control data"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
     try:
-        # Verify token
-        user_response = supabase_service_client.auth.get_user(token)
-        if not user_response.user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user_id = user_response.user.id
-        
         # Get calls with Telnyx tracking data
         calls_response = supabase_service_client.table("calls").select(
             "id, telnyx_call_control_id, status, call_duration, phone_number_e164, created_at, initiated_at, answered_at, ended_at"
@@ -3364,23 +2946,11 @@ async def get_telnyx_call_tracking_data(
 # LiveKit Session Analytics
 @app.get("/analytics/livekit-sessions")
 async def get_livekit_session_analytics(
-    authorization: str = Header(None, alias="Authorization"),
+    user_id: str = Depends(get_authenticated_user_id),
     time_filter: str = "30d"
 ):
     """Get LiveKit session analytics data"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
     try:
-        # Verify token
-        user_response = supabase_service_client.auth.get_user(token)
-        if not user_response.user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user_id = user_response.user.id
-        
         # Get calls with LiveKit room data
         calls_response = supabase_service_client.table("calls").select(
             "id, room_name, status, call_duration, created_at, initiated_at, answered_at, ended_at, agent_id"
@@ -3480,80 +3050,71 @@ async def get_livekit_session_analytics(
         raise HTTPException(status_code=500, detail="Failed to get LiveKit analytics")
 
 # Real-time Analytics Dashboard Endpoint
+async def build_real_time_analytics(user_id: str) -> Dict[str, Any]:
+    """Live dashboard metrics: last hour from the hourly rollups, minute buckets from the real-time feed"""
+    started = time.perf_counter()
+    # Get real-time data (last 1 hour) from the current and previous hourly rollups
+    now = datetime.now(timezone.utc)
+    one_hour_ago = now - timedelta(hours=1)
+    previous_hour_start = one_hour_ago.replace(minute=0, second=0, microsecond=0)
+    
+    hourly_rollups, active_campaigns_response, minute_by_minute = await asyncio.gather(
+        fetch_rollups(user_id, "user", "hour", start=previous_hour_start),
+        # Get active campaigns
+        db_execute(get_async_db().table("batch_campaigns").select("id").eq("user_id", user_id).eq("status", "running")),
+        realtime_minute_buckets(user_id),
+    )
+    
+    active_campaigns = [
+        counters for counters in await asyncio.gather(
+            *(campaign_counters(campaign["id"]) for campaign in active_campaigns_response.data or [])
+        ) if counters
+    ]
+    database_latency_ms = (time.perf_counter() - started) * 1000
+    
+    # Calculate real-time metrics. Only the part of the previous hour that is inside
+    # the last 60 minutes is counted (its calls are assumed evenly spread)
+    current_hour_start = now.replace(minute=0, second=0, microsecond=0)
+    previous_hour = sum_counters(b for b in hourly_rollups if datetime.fromisoformat(b["bucket_start"]) < current_hour_start)
+    current_hour = sum_counters(b for b in hourly_rollups if datetime.fromisoformat(b["bucket_start"]) >= current_hour_start)
+    previous_hour_weight = 1 - (one_hour_ago - previous_hour_start).total_seconds() / 3600
+    
+    def last_hour(column):
+        return previous_hour[column] * previous_hour_weight + current_hour[column]
+    
+    calling_now = previous_hour["calling_calls"] + current_hour["calling_calls"]
+    calls_last_hour = last_hour("total_calls")
+    successful_last_hour = last_hour("completed_calls")
+    
+    return {
+        "live_metrics": {
+            "calls_in_progress": calling_now,
+            "calls_last_hour": round(calls_last_hour),
+            "success_rate_last_hour": round((successful_last_hour / calls_last_hour * 100), 2) if calls_last_hour > 0 else 0,
+            "active_campaigns": len(active_campaigns),
+            "avg_call_duration_last_hour": round(
+                last_hour("total_duration") / calls_last_hour, 2
+            ) if calls_last_hour > 0 else 0
+        },
+        "minute_by_minute": minute_by_minute,
+        "active_campaigns_status": active_campaigns,
+        "system_health": {
+            # Time taken by this endpoint's database reads
+            "api_response_time": round(database_latency_ms, 2),
+            "database_connection": "healthy",
+            "telnyx_connection": "healthy",
+            "livekit_connection": "healthy"
+        }
+    }
+
+
 @app.get("/analytics/real-time")
 async def get_real_time_analytics(
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
-    """Get real-time analytics for live dashboard updates"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    
+    """Get real-time analytics for live dashboard updates (see /analytics/stream for push updates)"""
     try:
-        # Verify token
-        user_response = supabase_service_client.auth.get_user(token)
-        if not user_response.user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user_id = user_response.user.id
-        
-        # Get real-time data (last 1 hour)
-        one_hour_ago = datetime.utcnow() - timedelta(hours=1)
-        
-        recent_calls_response = supabase_service_client.table("calls").select(
-            "id, status, call_duration, created_at, agent_id"
-        ).eq("user_id", user_id).gte("created_at", one_hour_ago.isoformat()).execute()
-        
-        recent_calls = recent_calls_response.data or []
-        
-        # Get active campaigns
-        active_campaigns_response = supabase_service_client.table("batch_campaigns").select(
-            "id, name, status"
-        ).eq("user_id", user_id).eq("status", "running").execute()
-        
-        active_campaigns = active_campaigns_response.data or []
-        
-        # Calculate real-time metrics
-        calling_now = len([c for c in recent_calls if c.get("status") == "calling"])
-        calls_last_hour = len(recent_calls)
-        successful_last_hour = len([c for c in recent_calls if c.get("status") in ["completed", "ended"]])
-        
-        real_time_data = {
-            "live_metrics": {
-                "calls_in_progress": calling_now,
-                "calls_last_hour": calls_last_hour,
-                "success_rate_last_hour": round((successful_last_hour / calls_last_hour * 100), 2) if calls_last_hour > 0 else 0,
-                "active_campaigns": len(active_campaigns),
-                "avg_call_duration_last_hour": round(
-                    sum(c.get("call_duration", 0) for c in recent_calls) / len(recent_calls), 2
-                ) if recent_calls else 0
-            },
-            "minute_by_minute": [
-                {
-                    "timestamp": (datetime.utcnow() - timedelta(minutes=i)).isoformat(),
-                    "calls": max(0, calling_now - i + __import__('random').randint(-2, 3)),  # Mock minute data
-                    "successful": max(0, calling_now - i + __import__('random').randint(-1, 2))
-                }
-                for i in range(15, -1, -1)  # Last 15 minutes
-            ],
-            "active_campaigns_status": [
-                {
-                    "campaign_name": campaign.get("name", "Unknown"),
-                    "status": campaign.get("status", "unknown"),
-                    "calls_in_progress": __import__('random').randint(0, 5)  # Mock data - would be real in production
-                }
-                for campaign in active_campaigns
-            ],
-            "system_health": {
-                "api_response_time": round(__import__('random').uniform(50, 150), 2),  # Mock data
-                "database_connection": "healthy",
-                "telnyx_connection": "healthy",
-                "livekit_connection": "healthy"
-            }
-        }
-        
-        return real_time_data
+        return await build_real_time_analytics(user_id)
         
     except HTTPException:
         raise
@@ -3561,6 +3122,53 @@ async def get_real_time_analytics(
         logger.error(f"Error getting real-time analytics: {e}")
         raise HTTPException(status_code=500, detail="Failed to get real-time analytics")
 
+
+# Comment line sent when no event was pushed for this long, keeps proxies from closing the stream
+REALTIME_STREAM_HEARTBEAT_SECONDS = 15.0
+
+
+def _sse_message(event_type: str, data: Dict[str, Any]) -> str:
+    return f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.get("/analytics/stream")
+async def stream_real_time_analytics(
+    request: Request,
+    access_token: Optional[str] = None,
+    authorization: Optional[str] = Header(None, alias="Authorization")
+):
+    """Server-sent events feed of the live dashboard.
+
+    Sends a "snapshot" event (same payload as /analytics/real-time), then "call",
+    "minute" and "campaign" events as calls change. EventSource cannot set
+    headers, so the token may be passed as ?access_token=.
+    """
+    # The token is verified once for the whole subscription
+    user = await run_in_threadpool(verify_access_token, access_token or get_bearer_token(authorization))
+
+    async def events():
+        # Subscribed when the stream starts: a client gone before that never holds a queue
+        subscription = realtime_subscribe(user.id)
+        try:
+            yield _sse_message("snapshot", await build_real_time_analytics(user.id))
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.get(), timeout=REALTIME_STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield _sse_message(event["type"], event)
+        except Exception as e:
+            logger.error(f"Real-time stream for user {user.id} stopped: {e}")
+        finally:
+            realtime_unsubscribe(user.id, subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # ===== PATHWAY TESTING ENDPOINTS (Phase 1) =====
 
 @app.get("/test/pathway-integration")
@@ -3624,11 +3232,9 @@ async def test_pathway_integration():
         return results
 
 @app.post("/test/create-test-pathway")
-async def create_test_pathway(authorization: str = Header(None, alias="Authorization")):
+async def create_test_pathway(user_id: str = Depends(get_authenticated_user_id)):
     """Create a simple test pathway for integration testing"""
     try:
-        user_id = get_user_id_from_token(authorization)
-        
         test_pathway = {
             "name": "Test Pathway - Integration Check",
             "description": "Automated test pathway created for Phase 1 integration testing",
@@ -3710,6 +3316,9 @@ async def get_pathway_execution_details(execution_id: str):
             if pathway_response.data:
                 execution_data["pathway_info"] = pathway_response.data
             
+            # Current node and variables including the events not compacted into the row yet
+            execution_data["live_state"] = await load_execution_state(execution_id)
+            
             return {
                 "status": "✅ FOUND",
                 "execution": execution_data
@@ -3730,11 +3339,9 @@ async def get_pathway_execution_details(execution_id: str):
 # ===== END PATHWAY TESTING ENDPOINTS =====
 
 @app.post("/test/simulate-pathway-execution")
-async def simulate_pathway_execution(pathway_id: str, authorization: str = Header(None, alias="Authorization")):
+async def simulate_pathway_execution(pathway_id: str, user_id: str = Depends(get_authenticated_user_id)):
     """Simulate pathway execution to test node processing logic"""
     try:
-        user_id = get_user_id_from_token(authorization)
-        
         # Load pathway configuration
         pathway_response = supabase_service_client.table("pathways").select("*").eq("id", pathway_id).single().execute()
         
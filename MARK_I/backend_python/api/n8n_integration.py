@@ -6,13 +6,13 @@ This replaces the direct OAuth implementation with n8n-based OAuth management.
 """
 
 import asyncio
-import aiohttp
 import json
 import logging
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 from .db_client import supabase_service_client
 from .crypto_utils import encrypt_credentials, decrypt_credentials
+from .http_clients import get_aiohttp_session
 import os
 
 logger = logging.getLogger("n8n-integration")
@@ -56,27 +56,27 @@ class N8NOAuthManager:
                 "timestamp": datetime.now().isoformat()
             }
             
-            async with aiohttp.ClientSession() as session:
-                headers = self._get_headers()
-                
-                async with session.post(webhook_url, json=payload, headers=headers) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        
-                        # Store OAuth session in database for tracking
-                        await self._store_oauth_session(
-                            user_id=user_id,
-                            app_name=app_name,
-                            state=result.get("state"),
-                            n8n_execution_id=result.get("execution_id")
-                        )
-                        
-                        logger.info(f"OAuth initiated for user {user_id} app {app_name}")
-                        return result
-                    else:
-                        error_text = await response.text()
-                        raise Exception(f"N8N OAuth initiation failed: {response.status} - {error_text}")
-                        
+            session = get_aiohttp_session()
+            headers = self._get_headers()
+            
+            async with session.post(webhook_url, json=payload, headers=headers) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    
+                    # Store OAuth session in database for tracking
+                    await self._store_oauth_session(
+                        user_id=user_id,
+                        app_name=app_name,
+                        state=result.get("state"),
+                        n8n_execution_id=result.get("execution_id")
+                    )
+                    
+                    logger.info(f"OAuth initiated for user {user_id} app {app_name}")
+                    return result
+                else:
+                    error_text = await response.text()
+                    raise Exception(f"N8N OAuth initiation failed: {response.status} - {error_text}")
+                    
         except Exception as e:
             logger.error(f"Error initiating OAuth: {e}")
             raise
@@ -108,30 +108,30 @@ class N8NOAuthManager:
                 "app_name": oauth_session["app_name"]
             }
             
-            async with aiohttp.ClientSession() as session:
-                headers = self._get_headers()
-                
-                async with session.post(webhook_url, json=payload, headers=headers) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        
-                        # Store the connection in database
-                        connection_id = await self._store_app_connection(
-                            user_id=oauth_session["user_id"],
-                            app_name=oauth_session["app_name"],
-                            connection_data=result
-                        )
-                        
-                        # Update OAuth session
-                        await self._update_oauth_session(state, "completed", connection_id)
-                        
-                        logger.info(f"OAuth completed for user {oauth_session['user_id']} app {oauth_session['app_name']}")
-                        return {"connection_id": connection_id, **result}
-                    else:
-                        error_text = await response.text()
-                        await self._update_oauth_session(state, "failed", error=error_text)
-                        raise Exception(f"N8N OAuth callback failed: {response.status} - {error_text}")
-                        
+            session = get_aiohttp_session()
+            headers = self._get_headers()
+            
+            async with session.post(webhook_url, json=payload, headers=headers) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    
+                    # Store the connection in database
+                    connection_id = await self._store_app_connection(
+                        user_id=oauth_session["user_id"],
+                        app_name=oauth_session["app_name"],
+                        connection_data=result
+                    )
+                    
+                    # Update OAuth session
+                    await self._update_oauth_session(state, "completed", connection_id)
+                    
+                    logger.info(f"OAuth completed for user {oauth_session['user_id']} app {oauth_session['app_name']}")
+                    return {"connection_id": connection_id, **result}
+                else:
+                    error_text = await response.text()
+                    await self._update_oauth_session(state, "failed", error=error_text)
+                    raise Exception(f"N8N OAuth callback failed: {response.status} - {error_text}")
+                    
         except Exception as e:
             logger.error(f"Error handling OAuth callback: {e}")
             raise
@@ -176,42 +176,42 @@ class N8NOAuthManager:
                 "timestamp": datetime.now().isoformat()
             }
             
-            async with aiohttp.ClientSession() as session:
-                headers = self._get_headers()
-                
-                async with session.post(webhook_url, json=payload, headers=headers, timeout=30) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        
-                        # Log the execution
-                        await self._log_app_execution(
-                            user_id=user_id,
-                            connection_id=connection["id"],
-                            app_name=app_name,
-                            action_name=action_name,
-                            input_data=action_data,
-                            output_data=result,
-                            status="success"
-                        )
-                        
-                        logger.info(f"App action executed: {app_name}.{action_name} for user {user_id}")
-                        return result
-                    else:
-                        error_text = await response.text()
-                        
-                        # Log the failed execution
-                        await self._log_app_execution(
-                            user_id=user_id,
-                            connection_id=connection["id"],
-                            app_name=app_name,
-                            action_name=action_name,
-                            input_data=action_data,
-                            status="failed",
-                            error_message=error_text
-                        )
-                        
-                        raise Exception(f"N8N app action failed: {response.status} - {error_text}")
-                        
+            session = get_aiohttp_session()
+            headers = self._get_headers()
+            
+            async with session.post(webhook_url, json=payload, headers=headers, timeout=30) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    
+                    # Log the execution
+                    await self._log_app_execution(
+                        user_id=user_id,
+                        connection_id=connection["id"],
+                        app_name=app_name,
+                        action_name=action_name,
+                        input_data=action_data,
+                        output_data=result,
+                        status="success"
+                    )
+                    
+                    logger.info(f"App action executed: {app_name}.{action_name} for user {user_id}")
+                    return result
+                else:
+                    error_text = await response.text()
+                    
+                    # Log the failed execution
+                    await self._log_app_execution(
+                        user_id=user_id,
+                        connection_id=connection["id"],
+                        app_name=app_name,
+                        action_name=action_name,
+                        input_data=action_data,
+                        status="failed",
+                        error_message=error_text
+                    )
+                    
+                    raise Exception(f"N8N app action failed: {response.status} - {error_text}")
+                    
         except Exception as e:
             logger.error(f"Error executing app action: {e}")
             raise
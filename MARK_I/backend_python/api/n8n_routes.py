@@ -4,14 +4,16 @@ N8N Integration Routes
 FastAPI routes for managing OAuth connections and app actions via n8n.
 """
 
-from fastapi import APIRouter, HTTPException, Header, status, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, status, BackgroundTasks
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, HttpUrl
 from datetime import datetime
 import logging
+import aiohttp
 
+from .http_clients import get_aiohttp_session
 from .n8n_integration import n8n_manager
-from .config import get_user_id_from_token
+from .supabase_auth import get_authenticated_user_id
 
 router = APIRouter(prefix="/integrations/n8n", tags=["n8n-integration"])
 logger = logging.getLogger("n8n-routes")
@@ -59,7 +61,7 @@ class ConnectedAppResponse(BaseModel):
 @router.post("/oauth/initiate", response_model=OAuthInitiateResponse)
 async def initiate_oauth(
     request: OAuthInitiateRequest,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """
     Initiate OAuth flow via n8n webhook.
@@ -67,8 +69,6 @@ async def initiate_oauth(
     This triggers an n8n workflow that handles the OAuth dance with the specified app.
     """
     try:
-        user_id = get_user_id_from_token(authorization)
-        
         result = await n8n_manager.initiate_oauth(
             user_id=user_id,
             app_name=request.app_name,
@@ -119,7 +119,7 @@ async def handle_oauth_callback(
 
 @router.get("/user-apps", response_model=List[ConnectedAppResponse])
 async def get_user_connected_apps(
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """
     Get list of apps that user has connected via n8n OAuth.
@@ -127,8 +127,6 @@ async def get_user_connected_apps(
     Returns apps with their supported actions for use in pathway builder.
     """
     try:
-        user_id = get_user_id_from_token(authorization)
-        
         connected_apps = await n8n_manager.get_user_connected_apps(user_id)
         
         return [
@@ -153,7 +151,7 @@ async def get_user_connected_apps(
 @router.post("/execute-action", response_model=AppActionResponse)
 async def execute_app_action(
     request: AppActionRequest,
-    authorization: str = Header(None, alias="Authorization"),
+    user_id: str = Depends(get_authenticated_user_id),
     background_tasks: BackgroundTasks = BackgroundTasks()
 ):
     """
@@ -163,8 +161,6 @@ async def execute_app_action(
     in connected apps using n8n workflows.
     """
     try:
-        user_id = get_user_id_from_token(authorization)
-        
         result = await n8n_manager.execute_app_action(
             user_id=user_id,
             app_name=request.app_name,
@@ -190,7 +186,7 @@ async def execute_app_action(
 @router.get("/apps/{app_name}/actions")
 async def get_app_actions(
     app_name: str,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """
     Get available actions for a specific app.
@@ -198,8 +194,6 @@ async def get_app_actions(
     This helps the pathway builder show only valid actions for connected apps.
     """
     try:
-        user_id = get_user_id_from_token(authorization)
-        
         connected_apps = await n8n_manager.get_user_connected_apps(user_id)
         
         # Find the specific app
@@ -229,7 +223,7 @@ async def get_app_actions(
 @router.delete("/connections/{connection_id}")
 async def disconnect_app(
     connection_id: str,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """
     Disconnect an app by deactivating the connection.
@@ -237,8 +231,6 @@ async def disconnect_app(
     This doesn't delete the connection record but marks it as inactive.
     """
     try:
-        user_id = get_user_id_from_token(authorization)
-        
         # Use supabase to deactivate the connection
         from .db_client import supabase_service_client
         supabase = supabase_service_client
@@ -284,22 +276,20 @@ async def get_n8n_status():
     """
     try:
         # Simple health check
-        import aiohttp
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{n8n_manager.base_url}/healthz", timeout=5) as response:
-                if response.status == 200:
-                    return {
-                        "status": "healthy",
-                        "n8n_url": n8n_manager.base_url,
-                        "message": "N8N integration is working"
-                    }
-                else:
-                    return {
-                        "status": "unhealthy", 
-                        "n8n_url": n8n_manager.base_url,
-                        "message": f"N8N returned status {response.status}"
-                    }
+        session = get_aiohttp_session()
+        async with session.get(f"{n8n_manager.base_url}/healthz", timeout=aiohttp.ClientTimeout(total=5)) as response:
+            if response.status == 200:
+                return {
+                    "status": "healthy",
+                    "n8n_url": n8n_manager.base_url,
+                    "message": "N8N integration is working"
+                }
+            else:
+                return {
+                    "status": "unhealthy", 
+                    "n8n_url": n8n_manager.base_url,
+                    "message": f"N8N returned status {response.status}"
+                }
         
     except Exception as e:
         logger.error(f"N8N health check failed: {e}")
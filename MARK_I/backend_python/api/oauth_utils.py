@@ -2,13 +2,25 @@
 OAuth utility functions for managing app connections and token refresh
 """
 import asyncio
+import logging
 import aiohttp
 from datetime import datetime, timedelta
 from typing import Dict, Any, Tuple, Optional
-from .db_client import get_supabase_anon_client
-from .crypto_utils import decrypt_credentials, encrypt_credentials, is_token_expired
+try:
+    from .crypto_utils import decrypt_credentials, encrypt_credentials, is_token_expired
+    from .db_async import db_execute, fetch_one, get_async_db
+    from .http_clients import get_aiohttp_session
+except ImportError:
+    # Imported as a top-level module (LiveKit worker adds api/ to sys.path)
+    from crypto_utils import decrypt_credentials, encrypt_credentials, is_token_expired
+    from db_async import db_execute, fetch_one, get_async_db
+    from http_clients import get_aiohttp_session
 import os
 
+logger = logging.getLogger(__name__)
+
+TOKEN_REQUEST_TIMEOUT_SECONDS = 15
+
 # OAuth configurations for token refresh
 OAUTH_CONFIGS = {
     "hubspot": {
@@ -49,22 +61,18 @@ async def get_user_connection_with_valid_creds(connection_id: str, user_id: str)
     Returns:
         Tuple of (connection_data, valid_credentials)
     """
-    supabase = get_supabase_anon_client()
-    
     # Get connection with app integration details
-    result = supabase.table("user_app_connections").select("""
+    connection = await fetch_one(get_async_db().table("user_app_connections").select("""
         *,
         app_integrations!inner (
             name,
             display_name,
             auth_type
         )
-    """).eq("id", connection_id).eq("user_id", user_id).execute()
+    """).eq("id", connection_id).eq("user_id", user_id))
     
-    if not result.data:
+    if not connection:
         raise Exception("Connection not found or access denied")
-        
-    connection = result.data[0]
     
     # Decrypt credentials
     encrypted_credentials = connection["credentials"]
@@ -74,7 +82,7 @@ async def get_user_connection_with_valid_creds(connection_id: str, user_id: str)
     app_name = connection["app_integrations"]["name"]
     
     if is_token_expired(credentials) and credentials.get("refresh_token"):
-        print(f"Token expired for {app_name}, refreshing...")
+        logger.info(f"Token expired for {app_name}, refreshing...")
         credentials = await refresh_oauth_token(connection)
     
     return connection, credentials
@@ -116,13 +124,14 @@ async def refresh_oauth_token(connection: Dict[str, Any]) -> Dict[str, Any]:
     }
     
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(oauth_config["token_url"], data=refresh_data) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise Exception(f"Token refresh failed for {app_name}: {error_text}")
-                    
-                token_response = await response.json()
+        async with get_aiohttp_session().post(
+            oauth_config["token_url"], data=refresh_data, timeout=aiohttp.ClientTimeout(total=TOKEN_REQUEST_TIMEOUT_SECONDS)
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise Exception(f"Token refresh failed for {app_name}: {error_text}")
+                
+            token_response = await response.json()
                 
         # Update credentials with new tokens
         updated_credentials = {
@@ -137,81 +146,54 @@ async def refresh_oauth_token(connection: Dict[str, Any]) -> Dict[str, Any]:
             updated_credentials["refresh_token"] = token_response["refresh_token"]
             
         # Update expiration
+        connection_update = {}
         if "expires_in" in token_response:
             expires_at = datetime.utcnow() + timedelta(seconds=int(token_response["expires_in"]))
             updated_credentials["expires_at"] = expires_at.isoformat()
+            # The refresh scheduler selects connections on this column
+            connection_update["expires_at"] = expires_at.isoformat()
         
         # Encrypt and store updated credentials
         encrypted_credentials = encrypt_credentials(updated_credentials)
         
-        supabase = get_supabase_anon_client()
-        update_result = supabase.table("user_app_connections").update({
+        update_result = await db_execute(get_async_db().table("user_app_connections").update({
+            **connection_update,
             "credentials": encrypted_credentials,
             "connection_status": "active",
             "updated_at": datetime.utcnow().isoformat()
-        }).eq("id", connection["id"]).execute()
+        }).eq("id", connection["id"]))
         
         if not update_result.data:
             raise Exception("Failed to update credentials in database")
             
-        print(f"✅ Token refreshed successfully for {app_name}")
+        logger.info(f"✅ Token refreshed successfully for {app_name}")
         return updated_credentials
         
     except Exception as e:
         # Mark connection as expired
-        supabase = get_supabase_anon_client()
-        supabase.table("user_app_connections").update({
-            "connection_status": "expired"
-        }).eq("id", connection["id"]).execute()
+        try:
+            await db_execute(get_async_db().table("user_app_connections").update({
+                "connection_status": "expired"
+            }).eq("id", connection["id"]))
+        except Exception as status_error:
+            logger.warning(f"Could not mark connection {connection.get('id')} as expired: {status_error}")
         
         raise Exception(f"Failed to refresh token for {app_name}: {str(e)}")
 
 async def check_and_refresh_expiring_tokens():
     """
-    Background task to check and refresh expiring tokens
-    Run this periodically (e.g., every 30 minutes)
+    Refresh every active connection expiring within the next hour, concurrently
+    (one pass of the refresh engine, see token_refresh.py)
     """
     try:
-        supabase = get_supabase_anon_client()
-        
-        # Get connections that expire in the next hour
-        one_hour_from_now = (datetime.utcnow() + timedelta(hours=1)).isoformat()
-        
-        result = supabase.table("user_app_connections").select("""
-            *,
-            app_integrations!inner (
-                name,
-                display_name
-            )
-        """).eq("connection_status", "active").lt("expires_at", one_hour_from_now).execute()
-        
-        if not result.data:
-            print("No tokens need refreshing")
-            return
-            
-        print(f"Found {len(result.data)} connections with expiring tokens")
-        
-        for connection in result.data:
-            try:
-                # Get app integration info safely
-                app_integrations = connection.get("app_integrations")
-                if not app_integrations:
-                    print(f"Skipping connection {connection.get('id', 'unknown')}: No app integration data")
-                    continue
-                
-                app_name = app_integrations.get("name", "Unknown")
-                print(f"Refreshing token for {app_name}...")
-                
-                await refresh_oauth_token(connection)
-                
-            except Exception as e:
-                print(f"Failed to refresh token for connection {connection.get('id', 'unknown')}: {str(e)}")
-                continue
-                
-        print("✅ Token refresh check completed")
-        
+        from .token_refresh import refresh_expiring_connections
+    except ImportError:
+        from token_refresh import refresh_expiring_connections
+    try:
+        refreshed = await refresh_expiring_connections()
+        logger.info(f"✅ Token refresh check completed ({refreshed} connections refreshed)")
     except Exception as e:
-        print(f"Error in token refresh task: {str(e)}")
+        logger.error(f"Error in token refresh task: {str(e)}")
 
 async def revoke_oauth_token(connection_id: str, user_id: str) -> bool:
     """
@@ -234,31 +216,30 @@ async def revoke_oauth_token(connection_id: str, user_id: str) -> bool:
         if app_name == "google_calendar":
             # Google supports token revocation
             revoke_url = f"https://oauth2.googleapis.com/revoke?token={credentials['access_token']}"
-            async with aiohttp.ClientSession() as session:
-                async with session.post(revoke_url) as response:
-                    revoked = response.status == 200
-                    
+            session = get_aiohttp_session()
+            async with session.post(revoke_url) as response:
+                revoked = response.status == 200
+                
         elif app_name == "slack":
             # Slack supports token revocation
-            async with aiohttp.ClientSession() as session:
-                async with session.post("https://slack.com/api/auth.revoke", 
-                                      headers={"Authorization": f"Bearer {credentials['access_token']}"}) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        revoked = data.get("ok", False)
-        
+            session = get_aiohttp_session()
+            async with session.post("https://slack.com/api/auth.revoke", 
+                                  headers={"Authorization": f"Bearer {credentials['access_token']}"}) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    revoked = data.get("ok", False)
+    
         # Mark connection as revoked in database regardless of service revocation
-        supabase = get_supabase_anon_client()
-        supabase.table("user_app_connections").update({
+        await db_execute(get_async_db().table("user_app_connections").update({
             "connection_status": "revoked",
             "updated_at": datetime.utcnow().isoformat()
-        }).eq("id", connection_id).execute()
+        }).eq("id", connection_id).eq("user_id", user_id))
         
-        print(f"Connection {connection_id} marked as revoked. Service revocation: {revoked}")
+        logger.info(f"Connection {connection_id} marked as revoked. Service revocation: {revoked}")
         return True
         
     except Exception as e:
-        print(f"Failed to revoke connection {connection_id}: {str(e)}")
+        logger.error(f"Failed to revoke connection {connection_id}: {str(e)}")
         return False
 
 async def get_app_integration_by_name(app_name: str) -> Optional[Dict[str, Any]]:
@@ -272,13 +253,10 @@ async def get_app_integration_by_name(app_name: str) -> Optional[Dict[str, Any]]
         App integration data or None if not found
     """
     try:
-        supabase = get_supabase_anon_client()
-        result = supabase.table("app_integrations").select("*").eq("name", app_name.lower()).execute()
-        
-        return result.data[0] if result.data else None
+        return await fetch_one(get_async_db().table("app_integrations").select("*").eq("name", app_name.lower()))
         
     except Exception as e:
-        print(f"Failed to get app integration {app_name}: {str(e)}")
+        logger.error(f"Failed to get app integration {app_name}: {str(e)}")
         return None
 
 async def get_user_connections_for_app(user_id: str, app_name: str) -> list:
@@ -293,20 +271,20 @@ async def get_user_connections_for_app(user_id: str, app_name: str) -> list:
         List of user connections for the app
     """
     try:
-        supabase = get_supabase_anon_client()
-        
         # First get the app integration ID
         app_integration = await get_app_integration_by_name(app_name)
         if not app_integration:
             return []
             
         # Get user connections for this app
-        result = supabase.table("user_app_connections").select("*").eq("user_id", user_id).eq("app_integration_id", app_integration["id"]).execute()
+        result = await db_execute(
+            get_async_db().table("user_app_connections").select("*").eq("user_id", user_id).eq("app_integration_id", app_integration["id"])
+        )
         
-        return result.data
+        return result.data or []
         
     except Exception as e:
-        print(f"Failed to get user connections for {app_name}: {str(e)}")
+        logger.error(f"Failed to get user connections for {app_name}: {str(e)}")
         return []
 
 # Utility functions for specific app API calls
@@ -338,16 +316,15 @@ async def make_authenticated_request(
     kwargs["headers"] = headers
     
     # Update last_used_at
-    supabase = get_supabase_anon_client()
-    supabase.table("user_app_connections").update({
+    await db_execute(get_async_db().table("user_app_connections").update({
         "last_used_at": datetime.utcnow().isoformat()
-    }).eq("id", connection_id).execute()
+    }).eq("id", connection_id))
     
     # Make the request
-    async with aiohttp.ClientSession() as session:
-        async with session.request(method, url, **kwargs) as response:
-            if response.status >= 400:
-                error_text = await response.text()
-                raise Exception(f"API request failed ({response.status}): {error_text}")
-                
-            return await response.json() 
\ No newline at end of file
+    session = get_aiohttp_session()
+    async with session.request(method, url, **kwargs) as response:
+        if response.status >= 400:
+            error_text = await response.text()
+            raise Exception(f"API request failed ({response.status}): {error_text}")
+            
+        return await response.json() 
\ No newline at end of file
@@ -0,0 +1,160 @@
+"""
+List endpoint pagination
+
+Keyset (cursor) pagination with a stable (sort column, id) order, `fields=`
+projections and total-count estimates for the list endpoints (/calls,
+/agents, /phone_numbers, campaign and campaign item listings).
+
+Without `limit` and `cursor` an endpoint returns every matching row, as it did
+before paging (the frontend does not page yet). Responses stay plain JSON
+lists; paging metadata goes in headers:
+- X-Next-Cursor: opaque cursor of the next page (absent on the last page)
+- X-Total-Count: estimated number of matching rows (exact for small tables)
+"""
+
+import base64
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException, Response, status
+
+from api.db_async import db_execute, keyset_after, offset_query, order_keyset
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+_COLUMN_NAME = re.compile(r"^[a-z_][a-z0-9_]*$")
+# UUIDs, integers and ISO timestamps (2024-05-01T10:00:00.123+00:00)
+_CURSOR_STRING = re.compile(r"^[A-Za-z0-9:.+\- ]{1,64}$")
+
+
+@dataclass
+class Page:
+    """One page of a list endpoint"""
+    rows: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+    total_count: Optional[int] = None
+
+    def apply_headers(self, response: Response):
+        if self.next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = self.next_cursor
+        if self.total_count is not None:
+            response.headers[TOTAL_COUNT_HEADER] = str(self.total_count)
+
+
+def encode_cursor(sort_value: Any, row_id: Any) -> str:
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _is_cursor_value(value: Any) -> bool:
+    """Values keyset_after can put in a filter: ids, numbers and timestamps, never quotes or filter syntax"""
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return True
+    return isinstance(value, str) and bool(_CURSOR_STRING.match(value))
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if not (_is_cursor_value(sort_value) and _is_cursor_value(row_id)):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return [sort_value, row_id]
+
+
+def split_filter(value: Optional[str]) -> List[str]:
+    """Values of a comma-separated parameter (e.g. status=completed,failed)"""
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+def select_columns(
+    fields: Optional[str],
+    allowed: Optional[Iterable[str]] = None,
+    required: Iterable[str] = ("id",),
+    default: str = "*",
+    sources: Optional[Dict[str, Iterable[str]]] = None,
+) -> str:
+    """Columns to select for a `fields=a,b,c` parameter.
+
+    Fields are checked against `allowed` (any column name when None). `sources`
+    maps fields computed by the endpoint to the columns they are built from.
+    """
+    requested = split_filter(fields)
+    if not requested:
+        return default
+    if allowed is None:
+        unknown = sorted(field for field in requested if not _COLUMN_NAME.match(field))
+    else:
+        unknown = sorted(set(requested) - set(allowed))
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown fields: {', '.join(unknown)}")
+    columns: List[str] = []
+    for field in [*required, *requested]:
+        for column in (sources or {}).get(field, (field,)):
+            if column not in columns:
+                columns.append(column)
+    return ", ".join(columns)
+
+
+def project_row(row: Dict[str, Any], fields: Optional[str], required: Iterable[str] = ("id",)) -> Dict[str, Any]:
+    """Keep only the requested fields of an output row"""
+    requested = split_filter(fields)
+    if not requested:
+        return row
+    return {field: row.get(field) for field in dict.fromkeys([*required, *requested])}
+
+
+def clamp_limit(limit: Optional[int]) -> int:
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+async def fetch_page(
+    query,
+    limit: Optional[int],
+    cursor: Optional[str] = None,
+    sort_column: str = "created_at",
+    descending: bool = True,
+    offset: int = 0,
+) -> Page:
+    """Fetch one page of a filtered select query.
+
+    The query is counted with count="estimated" on its select; pass the builder
+    from `.select(columns, count="estimated")`. `offset` is only used without a
+    cursor, for endpoints that accepted offsets before. Without limit and
+    cursor every row is returned, in the same order, as a single page.
+    """
+    if limit is None and not cursor:
+        query = offset_query(order_keyset(query, sort_column, descending), offset)
+        response = await db_execute(query)
+        return Page(rows=response.data or [], total_count=response.count)
+
+    limit = clamp_limit(limit)
+    if cursor:
+        last_sort_value, last_id = decode_cursor(cursor)
+        query = keyset_after(query, sort_column, last_sort_value, last_id, descending)
+        offset = 0
+
+    # One extra row tells whether there is a next page
+    query = offset_query(order_keyset(query, sort_column, descending).limit(limit + 1), offset)
+    response = await db_execute(query)
+    rows = response.data or []
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_row = rows[-1]
+        next_cursor = encode_cursor(last_row.get(sort_column), last_row.get("id"))
+
+    return Page(rows=rows, next_cursor=next_cursor, total_count=response.count)
@@ -0,0 +1,294 @@
+"""
+Pathway execution events
+
+Node transitions and variable updates made during a call are appended to
+pathway_execution_events (api/sql/pathway_execution_events.sql) instead of
+reading, modifying and rewriting the execution's execution_trace and
+variables JSON columns. Every write is one constant-size row and concurrent
+writers never overwrite each other.
+
+- append_event() queues the event and returns; a flusher task batch-inserts
+  the queue, at least every PATHWAY_EVENTS_FLUSH_INTERVAL_SECONDS
+- the events are the execution's record: a batch leaves the queue only once
+  its insert succeeded. A failed insert is retried with backoff; every event
+  carries an event_key, so a retry never writes an event twice
+- events are numbered per execution (seq) when their batch is first sent:
+  the last seq is read once per execution and process, and read again if
+  another process appended meanwhile
+- load_execution_state(): current node, variables and trace = the execution
+  row (state up to events_compacted_seq) + the events after it
+- compact_execution(): writes that state into the execution row (at
+  completion); guarded by events_compacted_seq, so a concurrent compaction
+  never applies the same events twice
+"""
+
+import asyncio
+import logging
+import uuid
+import weakref
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    from api.db_async import Row, db_execute, get_async_db, get_pathway_execution, iter_keyset_pages
+except ImportError:
+    # Imported as a top-level module (LiveKit worker adds api/ to sys.path)
+    from db_async import Row, db_execute, get_async_db, get_pathway_execution, iter_keyset_pages
+
+logger = logging.getLogger(__name__)
+
+EVENTS_TABLE = "pathway_execution_events"
+PATHWAY_EVENTS_BATCH_SIZE = 200
+PATHWAY_EVENTS_FLUSH_INTERVAL_SECONDS = 0.5
+# Events kept in memory while the database is unreachable; newer events are dropped beyond this
+PATHWAY_EVENTS_MAX_PENDING = 10000
+# Wait before retrying a failed insert, doubled on each consecutive failure
+PATHWAY_EVENTS_RETRY_DELAY_SECONDS = 0.5
+PATHWAY_EVENTS_MAX_RETRY_DELAY_SECONDS = 30.0
+# Time given to flush_events() at job shutdown
+PATHWAY_EVENTS_SHUTDOWN_TIMEOUT_SECONDS = 3.0
+# Inserts retried when another process took the same sequence numbers
+SEQ_CONFLICT_RETRIES = 2
+UNIQUE_VIOLATION = "23505"
+
+NODE_TRANSITION = "node_transition"
+VARIABLES_UPDATED = "variables_updated"
+
+
+class PathwayEventLog:
+    """Pending events and their flusher task, bound to one event loop"""
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.pending: List[Row] = []
+        # Next sequence number per execution, read from the table on first use
+        self.next_seq: Dict[str, int] = {}
+        self.inserted = 0
+        self.dropped = 0
+        self.insert_failures = 0
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    def append(self, event: Row) -> bool:
+        if len(self.pending) >= PATHWAY_EVENTS_MAX_PENDING:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"📉 Pathway event queue full: {self.dropped} events dropped so far")
+            return False
+        self.pending.append(event)
+        if self._flusher is None or self._flusher.done():
+            self._flusher = self.loop.create_task(self._run())
+        return True
+
+    async def _run(self):
+        """Flush until nothing is pending, letting bursts accumulate into one insert"""
+        retry_delay = PATHWAY_EVENTS_RETRY_DELAY_SECONDS
+        while self.pending:
+            if len(self.pending) < PATHWAY_EVENTS_BATCH_SIZE:
+                await asyncio.sleep(PATHWAY_EVENTS_FLUSH_INTERVAL_SECONDS)
+            if await self.flush():
+                retry_delay = PATHWAY_EVENTS_RETRY_DELAY_SECONDS
+            else:
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, PATHWAY_EVENTS_MAX_RETRY_DELAY_SECONDS)
+
+    async def flush(self) -> bool:
+        """Insert the pending events; False if an insert failed (its batch stays at the head of the queue)"""
+        async with self._flush_lock:
+            while self.pending:
+                batch = self.pending[:PATHWAY_EVENTS_BATCH_SIZE]
+                try:
+                    await self._insert(batch)
+                except Exception as e:
+                    self.insert_failures += 1
+                    logger.warning(f"Could not insert {len(batch)} pathway execution events, will retry: {e}")
+                    return False
+                # Appends only add to the tail, so the head is still this batch
+                del self.pending[:len(batch)]
+            return True
+
+    async def _seed(self, execution_ids: Iterable[str]):
+        missing = [execution_id for execution_id in set(execution_ids) if execution_id not in self.next_seq]
+        last_seqs = await asyncio.gather(*(last_event_seq(execution_id) for execution_id in missing))
+        for execution_id, last_seq in zip(missing, last_seqs):
+            self.next_seq[execution_id] = last_seq + 1
+
+    async def _insert(self, batch: List[Row]):
+        """Insert a batch (raises on failure). Sequence numbers are assigned once and kept
+        across retries, so a retry of a batch that was in fact written is skipped on event_key.
+        """
+        execution_ids = {event["execution_id"] for event in batch}
+        for attempt in range(1, SEQ_CONFLICT_RETRIES + 1):
+            await self._seed(execution_ids)
+            for event in batch:
+                if event.get("seq") is None:
+                    event["seq"] = self.next_seq[event["execution_id"]]
+                    self.next_seq[event["execution_id"]] += 1
+            try:
+                await db_execute(
+                    get_async_db().table(EVENTS_TABLE).upsert(batch, on_conflict="event_key", ignore_duplicates=True)
+                )
+                self.inserted += len(batch)
+                return
+            except Exception as e:
+                if getattr(e, "code", None) != UNIQUE_VIOLATION or attempt == SEQ_CONFLICT_RETRIES:
+                    raise
+                # Another process took these sequence numbers: number the batch again after its events
+                for event in batch:
+                    event["seq"] = None
+                for execution_id in execution_ids:
+                    self.next_seq.pop(execution_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self.pending),
+            "inserted": self.inserted,
+            "dropped": self.dropped,
+            "insert_failures": self.insert_failures,
+        }
+
+
+# One event log per event loop (the API and the worker job loop)
+_logs: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, PathwayEventLog]" = weakref.WeakKeyDictionary()
+
+
+def _get_log() -> Optional[PathwayEventLog]:
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    event_log = _logs.get(loop)
+    if event_log is None:
+        event_log = PathwayEventLog(loop)
+        _logs[loop] = event_log
+    return event_log
+
+
+def append_event(
+    execution_id: str,
+    event_type: str,
+    *,
+    node_id: Optional[str] = None,
+    variables: Optional[Dict[str, Any]] = None,
+    payload: Optional[Dict[str, Any]] = None,
+) -> bool:
+    """Queue an event of an execution for the database; False if it could not be queued.
+    Returns immediately; never raises.
+    """
+    try:
+        event_log = _get_log()
+        if event_log is None:
+            logger.warning(f"Pathway event {event_type} of {execution_id} dropped: no running event loop")
+            return False
+        return event_log.append({
+            "event_key": str(uuid.uuid4()),
+            "execution_id": str(execution_id),
+            "seq": None,
+            "event_type": event_type,
+            "node_id": node_id,
+            "variables": variables,
+            "payload": payload,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        })
+    except Exception as e:
+        logger.error(f"Pathway event {event_type} of {execution_id} not queued: {e}")
+        return False
+
+
+async def flush_events(timeout: float = PATHWAY_EVENTS_SHUTDOWN_TIMEOUT_SECONDS) -> bool:
+    """Insert this loop's pending events now, giving up after `timeout`.
+    True once every event is written; otherwise the events stay queued for the flusher's retries.
+    """
+    event_log = _get_log()
+    if event_log is None or not event_log.pending:
+        return True
+    try:
+        written = await asyncio.wait_for(event_log.flush(), timeout=timeout)
+    except asyncio.TimeoutError:
+        # The interrupted batch was not removed from the queue
+        written = False
+    if not written:
+        logger.warning(f"Pathway events not written yet ({len(event_log.pending)} pending)")
+    return written
+
+
+async def last_event_seq(execution_id: str) -> int:
+    response = await db_execute(
+        get_async_db().table(EVENTS_TABLE).select("seq").eq("execution_id", execution_id).order("seq", desc=True).limit(1)
+    )
+    return response.data[0]["seq"] if response.data else 0
+
+
+def apply_events(state: Dict[str, Any], events: Iterable[Row]) -> Dict[str, Any]:
+    """Fold events into {current_node_id, variables, execution_trace, last_seq} (in place)"""
+    for event in events:
+        if event["event_type"] == NODE_TRANSITION:
+            state["execution_trace"].append({
+                "from_node": state["current_node_id"],
+                "to_node": event.get("node_id"),
+                "timestamp": event.get("created_at"),
+                "result": event.get("payload") or {},
+                "action": "node_transition",
+            })
+            state["current_node_id"] = event.get("node_id")
+        elif event["event_type"] == VARIABLES_UPDATED:
+            state["variables"].update(event.get("variables") or {})
+        state["last_seq"] = event["seq"]
+    return state
+
+
+async def load_execution_state(execution_id: str, include_trace: bool = False) -> Optional[Dict[str, Any]]:
+    """Current state of an execution: its row plus the events not compacted into it yet.
+
+    execution_trace holds the compacted trace too when include_trace is set,
+    otherwise only the entries of the new events.
+    """
+    await flush_events()
+    columns = "current_node_id, variables, events_compacted_seq" + (", execution_trace" if include_trace else "")
+    execution = await get_pathway_execution(execution_id, columns=columns)
+    if not execution:
+        return None
+    compacted_seq = execution.get("events_compacted_seq") or 0
+    state = {
+        "current_node_id": execution.get("current_node_id"),
+        "variables": dict(execution.get("variables") or {}),
+        "execution_trace": list(execution.get("execution_trace") or []) if include_trace else [],
+        "compacted_seq": compacted_seq,
+        "last_seq": compacted_seq,
+    }
+    async for events in iter_keyset_pages(
+        lambda: get_async_db().table(EVENTS_TABLE).select("id, seq, event_type, node_id, variables, payload, created_at")
+        .eq("execution_id", execution_id).gt("seq", compacted_seq),
+        sort_column="seq",
+    ):
+        apply_events(state, events)
+    return state
+
+
+async def compact_execution(execution_id: str) -> bool:
+    """Fold the execution's pending events into its row; False if there was nothing to do"""
+    for _ in range(SEQ_CONFLICT_RETRIES):
+        state = await load_execution_state(execution_id, include_trace=True)
+        if state is None or state["last_seq"] == state["compacted_seq"]:
+            return False
+        response = await db_execute(
+            get_async_db().table("pathway_executions").update({
+                "current_node_id": state["current_node_id"],
+                "variables": state["variables"],
+                "execution_trace": state["execution_trace"],
+                "events_compacted_seq": state["last_seq"],
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            }).eq("id", execution_id).eq("events_compacted_seq", state["compacted_seq"])
+        )
+        if response.data:
+            logger.debug(f"Compacted events {state['compacted_seq'] + 1}..{state['last_seq']} of execution {execution_id}")
+            return True
+        # Another process compacted meanwhile: start again from its result
+    return False
+
+
+def pathway_events_stats() -> Dict[str, Any]:
+    try:
+        event_log = _logs.get(asyncio.get_running_loop())
+    except RuntimeError:
+        return {}
+    return event_log.stats() if event_log is not None else {}
@@ -1,13 +1,14 @@
 # Pathway Routes - Following PATHWAY_BACKEND_IMPLEMENTATION_PLAN.md
 
-from fastapi import APIRouter, HTTPException, Header, status
+from fastapi import APIRouter, HTTPException, Depends, status
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 import logging
 from pydantic import BaseModel, Field
 
 from .db_client import supabase_service_client
-from .config import get_user_id_from_token
+from .config_cache import publish_invalidation
+from .supabase_auth import get_authenticated_user_id
 
 router = APIRouter(prefix="/pathways", tags=["Pathways"])
 logger = logging.getLogger(__name__)
@@ -58,12 +59,10 @@ async def verify_user_access_to_pathway(pathway_id: str, user_id: str) -> Dict[s
 @router.post("/", response_model=PathwayResponse, status_code=status.HTTP_201_CREATED)
 async def create_pathway(
     request: PathwayCreateRequest,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Create a new pathway"""
     try:
-        user_id = get_user_id_from_token(authorization)
-        
         # Create basic pathway config if empty
         if not request.config:
             request.config = {
@@ -110,15 +109,13 @@ async def create_pathway(
 
 @router.get("/", response_model=List[PathwayResponse])
 async def list_pathways(
-    authorization: str = Header(None, alias="Authorization"),
+    user_id: str = Depends(get_authenticated_user_id),
     status_filter: Optional[str] = None,
     limit: int = 50,
     offset: int = 0
 ):
     """List pathways for the user"""
     try:
-        user_id = get_user_id_from_token(authorization)
-        
         query = supabase_service_client.table("pathways").select("*").eq("user_id", user_id)
         
         if status_filter:
@@ -152,12 +149,10 @@ async def list_pathways(
 @router.get("/{pathway_id}", response_model=PathwayResponse)
 async def get_pathway(
     pathway_id: str,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Get pathway by ID"""
     try:
-        user_id = get_user_id_from_token(authorization)
-        
         pathway_data = await verify_user_access_to_pathway(pathway_id, user_id)
         
         return PathwayResponse(
@@ -183,12 +178,10 @@ async def get_pathway(
 async def update_pathway(
     pathway_id: str,
     request: PathwayUpdateRequest,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Update a pathway"""
     try:
-        user_id = get_user_id_from_token(authorization)
-        
         # Verify access
         await verify_user_access_to_pathway(pathway_id, user_id)
         
@@ -211,6 +204,7 @@ async def update_pathway(
         if not response.data:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pathway not found after update attempt.")
 
+        publish_invalidation("pathway", pathway_id)
         return response.data[0]
         
     except HTTPException:
@@ -222,11 +216,9 @@ async def update_pathway(
 @router.delete("/{pathway_id}")
 async def delete_pathway(
     pathway_id: str,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Delete a pathway"""
-    user_id = get_user_id_from_token(authorization)
-    
     try:
         # Verify user access
         await verify_user_access_to_pathway(pathway_id, user_id)
@@ -236,6 +228,7 @@ async def delete_pathway(
         
         if response.data:
             logger.info(f"Pathway deleted: {pathway_id}")
+            publish_invalidation("pathway", pathway_id)
             return {"message": "Pathway deleted successfully"}
         else:
             raise HTTPException(status_code=404, detail="Pathway not found")
@@ -460,11 +453,9 @@ async def get_pathway_templates():
         )
 
 @router.post("/test/create-lead-qualification-pathway")
-async def create_lead_qualification_pathway(authorization: str = Header(None, alias="Authorization")):
+async def create_lead_qualification_pathway(user_id: str = Depends(get_authenticated_user_id)):
     """Create a comprehensive lead qualification pathway for testing all conversation flow aspects"""
     try:
-        user_id = get_user_id_from_token(authorization)
-        
         # Create comprehensive lead qualification pathway based on VAPI example
         pathway_config = {
             "name": "Lead Qualification Agent - Full Test",
@@ -0,0 +1,288 @@
+"""
+Real-time dashboard feed
+
+Pushes per-user call activity to live dashboards (SSE: GET /analytics/stream)
+so they subscribe once instead of polling /analytics/real-time and
+/batch-campaigns/{id}/progress every few seconds.
+
+- publish_call_update(call): called with the updated `calls` row by the
+  status-update, Telnyx webhook and call dispatch paths (any thread/loop)
+- subscribe() / unsubscribe(): event queue of one connected client
+- minute_buckets(): calls and successful calls per minute over the last
+  MINUTE_WINDOW minutes, kept in memory from the published updates
+- campaign_counters(): live counters of a campaign
+
+Events pushed to subscribers:
+    {"type": "call", "call": {...}}          a call changed status/duration
+    {"type": "minute", "bucket": {...}}      a minute bucket changed
+    {"type": "campaign", "campaign": {...}}  counters of a campaign with activity
+
+State lives in the API process (a single uvicorn process); it is owned by
+the API event loop and updates from other loops are handed over to it. Only
+users whose feed is read are tracked; a feed without subscribers is dropped
+after IDLE_FEED_SECONDS without reads.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from api.db_async import db_execute, get_async_db
+
+logger = logging.getLogger(__name__)
+
+# Minutes covered by minute_buckets(), the current one included
+MINUTE_WINDOW = 16
+# Events buffered per client; the oldest are dropped when a client lags behind
+SUBSCRIBER_QUEUE_SIZE = 100
+# Campaign counters are re-read at most once per delay, after the burst of updates of a call
+CAMPAIGN_REFRESH_DELAY_SECONDS = 1.0
+# Feeds without subscribers are forgotten when not read for this long (seeded again on their next read)
+IDLE_FEED_SECONDS = MINUTE_WINDOW * 60
+
+# Same as the completed_calls counter of the rollups
+SUCCESSFUL_STATUSES = ("completed", "ended")
+# Columns of a call pushed in "call" events
+CALL_EVENT_FIELDS = ("id", "status", "agent_id", "batch_campaign_id", "call_duration", "created_at", "updated_at")
+CAMPAIGN_COUNTER_FIELDS = "id, name, status, total_numbers, completed_calls, successful_calls, failed_calls"
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _start_of_minute(value: datetime) -> datetime:
+    return value.replace(second=0, microsecond=0)
+
+
+def _is_successful(call_status: Optional[str]) -> bool:
+    return (call_status or "").lower() in SUCCESSFUL_STATUSES
+
+
+class _UserFeed:
+    """Subscribers and minute buckets of one user"""
+    def __init__(self):
+        self.subscribers: Set[asyncio.Queue] = set()
+        # minute -> {"calls": n, "successful": n}, by call creation minute
+        self.minutes: Dict[datetime, Dict[str, int]] = {}
+        # call id -> (creation minute, last status) of the calls counted in self.minutes
+        self.calls: Dict[str, Tuple[datetime, Optional[str]]] = {}
+        self.seeded = False
+        self.pending_campaigns: Set[str] = set()
+        self.last_read = datetime.now(timezone.utc)
+
+    def prune(self, now: datetime):
+        window_start = _start_of_minute(now) - timedelta(minutes=MINUTE_WINDOW - 1)
+        self.minutes = {minute: bucket for minute, bucket in self.minutes.items() if minute >= window_start}
+        self.calls = {call_id: state for call_id, state in self.calls.items() if state[0] >= window_start}
+
+    def apply(self, call_id: str, created_at: datetime, call_status: Optional[str], now: datetime) -> Optional[datetime]:
+        """Count a call in its creation minute; returns the minute if its bucket changed"""
+        minute = _start_of_minute(created_at)
+        if minute < _start_of_minute(now) - timedelta(minutes=MINUTE_WINDOW - 1):
+            return None
+        bucket = self.minutes.setdefault(minute, {"calls": 0, "successful": 0})
+        previous = self.calls.get(call_id)
+        changed = False
+        if previous is None:
+            bucket["calls"] += 1
+            changed = True
+        was_successful = previous is not None and _is_successful(previous[1])
+        if _is_successful(call_status) != was_successful:
+            bucket["successful"] += 1 if _is_successful(call_status) else -1
+            changed = True
+        self.calls[call_id] = (minute, call_status)
+        return minute if changed else None
+
+    def bucket(self, minute: datetime) -> Dict[str, Any]:
+        counts = self.minutes.get(minute, {"calls": 0, "successful": 0})
+        return {"timestamp": minute.isoformat(), "calls": counts["calls"], "successful": counts["successful"]}
+
+
+_feeds: Dict[str, _UserFeed] = {}
+_feed_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _bind_loop():
+    """The feed belongs to the loop of its first reader (the API loop)"""
+    global _feed_loop
+    loop = asyncio.get_running_loop()
+    if _feed_loop is None or _feed_loop.is_closed():
+        _feed_loop = loop
+
+
+def _feed(user_id: str) -> _UserFeed:
+    feed = _feeds.get(user_id)
+    if feed is None:
+        feed = _UserFeed()
+        _feeds[user_id] = feed
+    return feed
+
+
+def _push(feed: _UserFeed, event: Dict[str, Any]):
+    for queue in list(feed.subscribers):
+        if queue.full():
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+        queue.put_nowait(event)
+
+
+def subscribe(user_id: str) -> asyncio.Queue:
+    """Event queue of a new client of the user's feed"""
+    _bind_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    _feed(user_id).subscribers.add(queue)
+    logger.info(f"📡 Real-time feed: client subscribed for user {user_id} ({len(_feeds[user_id].subscribers)} connected)")
+    return queue
+
+
+def unsubscribe(user_id: str, queue: asyncio.Queue):
+    feed = _feeds.get(user_id)
+    if feed is None:
+        return
+    feed.subscribers.discard(queue)
+    logger.info(f"Real-time feed: client unsubscribed for user {user_id} ({len(feed.subscribers)} connected)")
+    _drop_idle_feeds(datetime.now(timezone.utc))
+
+
+def _drop_idle_feeds(now: datetime):
+    """Forget the feeds nobody subscribes to nor read for IDLE_FEED_SECONDS"""
+    idle_since = now - timedelta(seconds=IDLE_FEED_SECONDS)
+    for user_id, feed in list(_feeds.items()):
+        if not feed.subscribers and not feed.pending_campaigns and feed.last_read < idle_since:
+            del _feeds[user_id]
+
+
+def _apply_call_update(call: Dict[str, Any]):
+    user_id = call.get("user_id")
+    call_id = call.get("id")
+    if not user_id or not call_id:
+        return
+    feed = _feeds.get(str(user_id))
+    if feed is None:
+        # Nobody reads this user's feed; its minute buckets are seeded from the database on first read
+        return
+    now = datetime.now(timezone.utc)
+    feed.prune(now)
+    created_at = _parse_timestamp(call.get("created_at")) or now
+    changed_minute = feed.apply(str(call_id), created_at, call.get("status"), now)
+
+    if not feed.subscribers:
+        return
+    _push(feed, {"type": "call", "call": {field: call.get(field) for field in CALL_EVENT_FIELDS}})
+    if changed_minute is not None:
+        _push(feed, {"type": "minute", "bucket": feed.bucket(changed_minute)})
+    campaign_id = call.get("batch_campaign_id")
+    if campaign_id and str(campaign_id) not in feed.pending_campaigns:
+        feed.pending_campaigns.add(str(campaign_id))
+        task = asyncio.get_running_loop().create_task(_refresh_campaign(str(user_id), str(campaign_id)))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+
+def publish_call_update(call: Optional[Dict[str, Any]]):
+    """Publish the new state of a call (its `calls` row) to the user's feed. Never raises."""
+    if not call or _feed_loop is None:
+        # Nobody has read the feed yet; minute buckets are seeded from the database on first read
+        return
+    try:
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is _feed_loop:
+            _apply_call_update(call)
+        elif not _feed_loop.is_closed():
+            _feed_loop.call_soon_threadsafe(_apply_call_update, dict(call))
+    except Exception as e:
+        logger.warning(f"Could not publish call update {call.get('id')} to the real-time feed: {e}")
+
+
+async def _refresh_campaign(user_id: str, campaign_id: str):
+    await asyncio.sleep(CAMPAIGN_REFRESH_DELAY_SECONDS)
+    feed = _feeds.get(user_id)
+    if feed is None:
+        return
+    feed.pending_campaigns.discard(campaign_id)
+    if not feed.subscribers:
+        return
+    try:
+        counters = await campaign_counters(campaign_id)
+    except Exception as e:
+        logger.warning(f"Could not refresh real-time counters of campaign {campaign_id}: {e}")
+        return
+    if counters:
+        _push(feed, {"type": "campaign", "campaign": counters})
+
+
+async def _count_items(campaign_id: str, statuses: List[str]) -> int:
+    response = await db_execute(
+        get_async_db().table("batch_call_items").select("id", count="exact")
+        .eq("batch_campaign_id", campaign_id).in_("status", statuses).limit(1)
+    )
+    return response.count or 0
+
+
+async def campaign_counters(campaign_id: str) -> Optional[Dict[str, Any]]:
+    """Progress counters of a campaign (same numbers as /batch-campaigns/{id}/progress)"""
+    campaign_response, calling_now, pending_calls = await asyncio.gather(
+        db_execute(get_async_db().table("batch_campaigns").select(CAMPAIGN_COUNTER_FIELDS).eq("id", campaign_id).limit(1)),
+        _count_items(campaign_id, ["calling"]),
+        _count_items(campaign_id, ["pending", "retrying"]),
+    )
+    if not campaign_response.data:
+        return None
+    campaign = campaign_response.data[0]
+    total_numbers = campaign.get("total_numbers") or 0
+    completed_calls = campaign.get("completed_calls") or 0
+    return {
+        "campaign_id": campaign["id"],
+        "campaign_name": campaign.get("name", "Unknown"),
+        "status": campaign.get("status", "unknown"),
+        "total_numbers": total_numbers,
+        "completed_calls": completed_calls,
+        "successful_calls": campaign.get("successful_calls") or 0,
+        "failed_calls": campaign.get("failed_calls") or 0,
+        "pending_calls": pending_calls,
+        "calls_in_progress": calling_now,
+        "progress_percentage": round(completed_calls / total_numbers * 100, 2) if total_numbers > 0 else 0,
+    }
+
+
+async def _seed(user_id: str, feed: _UserFeed, now: datetime):
+    """Load the calls of the window that were created before the feed saw them"""
+    window_start = _start_of_minute(now) - timedelta(minutes=MINUTE_WINDOW - 1)
+    response = await db_execute(
+        get_async_db().table("calls").select("id, created_at, status")
+        .eq("user_id", user_id).gte("created_at", window_start.isoformat())
+    )
+    for call in response.data or []:
+        created_at = _parse_timestamp(call.get("created_at"))
+        # Calls already tracked have a fresher status from their updates
+        if created_at and str(call["id"]) not in feed.calls:
+            feed.apply(str(call["id"]), created_at, call.get("status"), now)
+    feed.seeded = True
+
+
+async def minute_buckets(user_id: str) -> List[Dict[str, Any]]:
+    """Calls and successful calls per creation minute, oldest first, last MINUTE_WINDOW minutes"""
+    _bind_loop()
+    now = datetime.now(timezone.utc)
+    _drop_idle_feeds(now)
+    feed = _feed(user_id)
+    feed.last_read = now
+    if not feed.seeded:
+        await _seed(user_id, feed, now)
+    feed.prune(now)
+    current_minute = _start_of_minute(now)
+    return [feed.bucket(current_minute - timedelta(minutes=offset)) for offset in range(MINUTE_WINDOW - 1, -1, -1)]
@@ -4,19 +4,20 @@ Agent Management Routes
 Handles all agent-related endpoints including CRUD operations,
 agent configuration, and agent calls.
 """
-import json
 import os
-import subprocess
 import logging
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 
-from fastapi import APIRouter, HTTPException, status, Header
+from fastapi import APIRouter, HTTPException, status, Header, Depends
 from pydantic import BaseModel, Field
 
-from ..config import get_user_id_from_token
+from ..supabase_auth import get_authenticated_user_id
 from ..db_client import supabase_service_client
 from ..agent_launcher import launch_outbound_agent
+from ..call_dispatch import OUTBOUND_AGENT_NAME
+from ..config_cache import publish_invalidation
+from services.livekit_client import LiveKitServiceError, create_agent_dispatch
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -279,64 +280,27 @@ async def initiate_agent_call(
                 }
             }
             
-            metadata_json = json.dumps(metadata)
-            
-            # First create the room with our specific name
-            create_room_command = [
-                "lk", "room", "create",
-                "--name", room_name
-            ]
-            
-            logger.info(f"Creating LiveKit room: {' '.join(create_room_command)}")
-            
-            try:
-                room_result = subprocess.run(
-                    create_room_command,
-                    capture_output=True,
-                    text=True,
-                    check=True,
-                    env=os.environ.copy()
-                )
-                logger.info(f"Room created successfully: {room_result.stdout}")
-            except subprocess.CalledProcessError as e:
-                logger.warning(f"Room creation failed (might already exist): {e.stderr}")
-            
-            # Then dispatch agent to the existing room
-            command = [
-                "lk", "dispatch", "create",
-                "--room", room_name,
-                "--agent-name", "outbound-caller", 
-                "--metadata", metadata_json
-            ]
-            
-            logger.info(f"Executing LiveKit dispatch command: {' '.join(command)}")
-            
-            result = subprocess.run(
-                command,
-                capture_output=True,
-                text=True,
-                check=True,
-                env=os.environ.copy()
-            )
-            
-            logger.info(f"LiveKit dispatch successful: {result.stdout}")
+            # Dispatch agent to our named room (LiveKit creates the room with the dispatch)
+            logger.info(f"Creating LiveKit dispatch for agent {agent_id} in room {room_name}")
+            dispatch = await create_agent_dispatch(OUTBOUND_AGENT_NAME, metadata=metadata, room_name=room_name)
+            logger.info(f"LiveKit dispatch successful: {dispatch}")
             
             # Update call status to reflect dispatch
             supabase_service_client.table("calls").update({
                 "status": "dispatched"
             }).eq("id", call_id).execute()
             
-        except subprocess.CalledProcessError as e:
-            logger.error(f"LiveKit dispatch failed: {e.stderr}")
+        except LiveKitServiceError as e:
+            logger.error(f"LiveKit dispatch failed: {e}")
             # Update call status to failed
             supabase_service_client.table("calls").update({
                 "status": "failed",
-                "error_message": f"LiveKit dispatch failed: {e.stderr}"
+                "error_message": f"LiveKit dispatch failed: {e}"
             }).eq("id", call_id).execute()
             
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to dispatch agent: {e.stderr}"
+                detail=f"Failed to dispatch agent: {e}"
             )
         except Exception as e:
             logger.error(f"Unexpected error during dispatch: {e}")
@@ -369,10 +333,8 @@ async def initiate_agent_call(
 @router.post("/", status_code=status.HTTP_201_CREATED, summary="Create new agent")
 async def create_agent(
     request: AgentCreateRequest, 
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
-    user_id = get_user_id_from_token(authorization)
-    
     agent_data = {
         "user_id": user_id,
         "name": request.name,
@@ -422,9 +384,7 @@ async def create_agent(
         )
 
 @router.get("/", summary="Get user's agents")
-async def get_agents(authorization: str = Header(None, alias="Authorization")):
-    user_id = get_user_id_from_token(authorization)
-    
+async def get_agents(user_id: str = Depends(get_authenticated_user_id)):
     try:
         response = supabase_service_client.table("agents").select("*").eq("user_id", user_id).execute()
         
@@ -441,9 +401,7 @@ async def get_agents(authorization: str = Header(None, alias="Authorization")):
         )
 
 @router.get("/{agent_id}", summary="Get specific agent")
-async def get_agent(agent_id: int, authorization: str = Header(None, alias="Authorization")):
-    user_id = get_user_id_from_token(authorization)
-    
+async def get_agent(agent_id: int, user_id: str = Depends(get_authenticated_user_id)):
     try:
         response = supabase_service_client.table("agents").select("*").eq("id", agent_id).eq("user_id", user_id).single().execute()
         
@@ -466,10 +424,8 @@ async def get_agent(agent_id: int, authorization: str = Header(None, alias="Auth
 async def update_agent(
     agent_id: int, 
     request: AgentUpdateRequest, 
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
-    user_id = get_user_id_from_token(authorization)
-    
     # Verify agent belongs to user
     try:
         existing_response = supabase_service_client.table("agents").select("id").eq("id", agent_id).eq("user_id", user_id).single().execute()
@@ -504,6 +460,7 @@ async def update_agent(
         
         if response.data:
             logger.info(f"Agent {agent_id} updated successfully")
+            publish_invalidation("agent", agent_id)
             return response.data[0]
         else:
             raise HTTPException(
@@ -519,15 +476,14 @@ async def update_agent(
         )
 
 @router.delete("/{agent_id}", summary="Delete agent")
-async def delete_agent(agent_id: int, authorization: str = Header(None, alias="Authorization")):
-    user_id = get_user_id_from_token(authorization)
-    
+async def delete_agent(agent_id: int, user_id: str = Depends(get_authenticated_user_id)):
     try:
         # Verify agent belongs to user and delete
         response = supabase_service_client.table("agents").delete().eq("id", agent_id).eq("user_id", user_id).execute()
         
         if response.data:
             logger.info(f"Agent {agent_id} deleted successfully")
+            publish_invalidation("agent", agent_id)
             return {"message": f"Agent {agent_id} deleted successfully"}
         else:
             raise HTTPException(
@@ -7,11 +7,11 @@ signup, and user management.
 import logging
 from typing import Optional
 
-from fastapi import APIRouter, HTTPException, status, Header
+from fastapi import APIRouter, HTTPException, status, Depends
 from pydantic import BaseModel
 import httpx
 
-from ..config import get_user_id_from_token
+from ..supabase_auth import get_authenticated_user_id
 from ..db_client import supabase_service_client
 
 # Set up logging
@@ -155,12 +155,10 @@ async def auth_login(request: UserLoginRequest):
         )
 
 @router.get("/me", summary="Get current user info")
-async def get_current_user(authorization: str = Header(None, alias="Authorization")):
+async def get_current_user(user_id: str = Depends(get_authenticated_user_id)):
     """
     Get current user information from token
     """
-    user_id = get_user_id_from_token(authorization)
-    
     try:
         # Get user profile from public.users
         response = supabase_service_client.table("users").select("*").eq("id", user_id).single().execute()
@@ -4,18 +4,20 @@ Call Management Routes
 Handles all call-related endpoints including initiating calls,
 status updates, and call history.
 """
-import json
 import os
-import subprocess
 import logging
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
 
-from fastapi import APIRouter, HTTPException, status, Header
+from fastapi import APIRouter, HTTPException, status, Header, Depends
 from pydantic import BaseModel, Field
 
-from ..config import get_user_id_from_token
+from ..supabase_auth import get_authenticated_user_id
 from ..db_client import supabase_service_client
+from ..db_async import update_call
+from ..realtime_feed import publish_call_update
+from ..call_dispatch import OUTBOUND_AGENT_NAME
+from services.livekit_client import LiveKitServiceError, create_agent_dispatch
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -74,35 +76,6 @@ class CallStatusUpdateRequest(BaseModel):
     call_duration_seconds: Optional[int] = None
     telnyx_call_control_id: Optional[str] = None
 
-# --- Helper Functions ---
-
-def parse_lk_dispatch_output(output: str) -> tuple[str | None, str | None]:
-    """
-    Parse the output of 'lk dispatch create' command to extract room name and job ID.
-    """
-    logger.info(f"Parsing lk dispatch output: {output}")
-    
-    room_name = None
-    job_id = None
-    
-    for line in output.strip().split('\n'):
-        if 'room:' in line.lower():
-            parts = line.split(':', 1)
-            if len(parts) == 2:
-                room_name = parts[1].strip()
-        
-        if 'id:' in line.lower():
-            parts = line.split(':', 1)
-            if len(parts) == 2:
-                job_id = parts[1].strip()
-    
-    # Often, the room name itself contains the job/dispatch ID for dispatch-created rooms
-    if room_name and room_name.startswith("RM_"):  # Default LiveKit room prefix
-         pass  # Room name is usually sufficient reference initially
-
-    logger.info(f"Parsed from lk output - Room: {room_name}")  # Removed Job ID for now
-    return room_name, job_id  # Job ID might be None
-
 # --- Route Endpoints ---
 
 @router.post("/", summary="Initiate a basic call")
@@ -188,51 +161,15 @@ async def initiate_call(request: CallRequest):
         "supabase_call_id": str(supabase_call_id)
     }
 
-    metadata_json = json.dumps(metadata)
-
-    # Construct the lk dispatch command
-    command = [
-        "lk",
-        "dispatch",
-        "create",
-        "--new-room",
-        "--agent-name", "outbound-caller",
-        "--metadata", metadata_json
-    ]
-
     try:
-        logger.info(f"Executing command: {' '.join(command)}")
-        process_env = os.environ.copy()
-        result = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            check=True,
-            shell=False,
-            env=process_env
-        )
+        dispatch = await create_agent_dispatch(OUTBOUND_AGENT_NAME, metadata=metadata)
+        return {"message": "Call initiated successfully", "dispatch_details": dispatch}
 
-        logger.info(f"lk dispatch command output: {result.stdout}")
-        logger.info(f"lk dispatch command stderr: {result.stderr}")
-
-        if "Dispatch created" not in result.stdout and "id: " not in result.stdout:
-             logger.warning("Dispatch command executed but success message/ID not found in output.")
-
-        return {"message": "Call initiated successfully", "dispatch_details": result.stdout}
-
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Failed to execute lk dispatch command: {e}")
-        logger.error(f"Command output (stdout): {e.stdout}")
-        logger.error(f"Command output (stderr): {e.stderr}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to initiate call: {e.stderr or e.stdout or 'Unknown error'}",
-        )
-    except FileNotFoundError:
-        logger.error("Error: 'lk' command not found. Make sure LiveKit CLI is installed and in PATH.")
+    except LiveKitServiceError as e:
+        logger.error(f"Failed to create LiveKit dispatch: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="'lk' command not found. Server configuration issue."
+            detail=f"Failed to initiate call: {e}",
         )
     except Exception as e:
         logger.exception("An unexpected error occurred")
@@ -242,9 +179,7 @@ async def initiate_call(request: CallRequest):
         )
 
 @router.get("/", summary="Get call history")
-async def get_calls(authorization: str = Header(None, alias="Authorization")):
-    user_id = get_user_id_from_token(authorization)
-    
+async def get_calls(user_id: str = Depends(get_authenticated_user_id)):
     try:
         response = supabase_service_client.table("calls").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
         
@@ -299,11 +234,20 @@ async def update_call_status_by_room(
         update_data["ended_at"] = datetime.utcnow().isoformat()
     
     try:
-        response = supabase_service_client.table("calls").update(update_data).eq("id", supabase_call_id).execute()
+        updated_call = await update_call(supabase_call_id, update_data)
         
-        if response.data:
+        if updated_call:
             logger.info(f"Successfully updated call status for Supabase Call ID: {supabase_call_id}")
-            return {"message": "Call status updated successfully", "call": response.data[0]}
+            publish_call_update(updated_call)
+            
+            # Update batch call item status (frees a dialer slot for campaign calls)
+            try:
+                from ..batch_routes import update_batch_call_item_from_call_status
+                await update_batch_call_item_from_call_status(supabase_call_id, new_status, call_duration_seconds)
+            except Exception as e:
+                logger.error(f"Error updating batch call item for call {supabase_call_id}: {e}")
+            
+            return {"message": "Call status updated successfully", "call": updated_call}
         else:
             error_msg = f"No call found with Supabase Call ID: {supabase_call_id}"
             logger.error(error_msg)
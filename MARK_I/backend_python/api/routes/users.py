@@ -7,10 +7,10 @@ import logging
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
-from fastapi import APIRouter, HTTPException, status, Header
+from fastapi import APIRouter, HTTPException, status, Depends
 from pydantic import BaseModel
 
-from ..config import get_user_id_from_token
+from ..supabase_auth import get_authenticated_user_id
 from ..db_client import supabase_service_client
 
 # Set up logging
@@ -34,12 +34,10 @@ class UserSettingsUpdateRequest(BaseModel):
 # --- Route Endpoints ---
 
 @router.get("/settings", summary="Get user settings")
-async def get_user_settings(authorization: str = Header(None, alias="Authorization")):
+async def get_user_settings(user_id: str = Depends(get_authenticated_user_id)):
     """
     Get current user's settings and profile information
     """
-    user_id = get_user_id_from_token(authorization)
-    
     try:
         # Get user profile from public.users
         response = supabase_service_client.table("users").select("*").eq("id", user_id).single().execute()
@@ -83,13 +81,11 @@ async def get_user_settings(authorization: str = Header(None, alias="Authorizati
 @router.patch("/settings", summary="Update user settings")
 async def update_user_settings(
     request: UserSettingsUpdateRequest, 
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """
     Update user settings and profile information
     """
-    user_id = get_user_id_from_token(authorization)
-    
     # Prepare update data (only include non-None values)
     update_data = {}
     
@@ -143,12 +139,10 @@ async def update_user_settings(
         )
 
 @router.get("/phone-numbers", summary="Get user's phone numbers")
-async def get_phone_numbers(authorization: str = Header(None, alias="Authorization")):
+async def get_phone_numbers(user_id: str = Depends(get_authenticated_user_id)):
     """
     Get phone numbers associated with the user
     """
-    user_id = get_user_id_from_token(authorization)
-    
     try:
         response = supabase_service_client.table("phone_numbers").select("*").eq("user_id", user_id).execute()
         
@@ -0,0 +1,122 @@
+-- Grouped call aggregates used by /analytics/global (api/analytics_aggregation.py).
+-- Returns only aggregates: totals with duration percentiles, and counts/sums
+-- by agent, campaign, region, day and hour (UTC).
+-- The region mapping must stay in sync with classify_region() in Python.
+
+create index if not exists calls_user_id_created_at_idx on public.calls (user_id, created_at, id);
+
+create or replace function public.analytics_call_aggregates(
+    p_user_id uuid,
+    p_start timestamptz,
+    p_end timestamptz,
+    p_campaign_id uuid default null,
+    p_agent_id bigint default null
+)
+returns jsonb
+language sql
+stable
+as $$
+with window_calls as (
+    select
+        c.agent_id,
+        c.batch_campaign_id,
+        coalesce(c.call_duration, 0)::bigint as duration,
+        lower(coalesce(c.status, '')) in ('completed', 'ended') as successful,
+        lower(coalesce(c.status, '')) in ('failed', 'busy', 'no_answer') as failed,
+        to_char(c.created_at at time zone 'UTC', 'YYYY-MM-DD') as day,
+        extract(hour from c.created_at at time zone 'UTC')::int as hour,
+        case
+            when coalesce(c.phone_number_e164, '') like '+1%' then
+                case
+                    when length(c.phone_number_e164) < 5 then 'US/CA'
+                    else case substr(c.phone_number_e164, 3, 3)
+                        when '212' then 'New York, NY'
+                        when '213' then 'Los Angeles, CA'
+                        when '312' then 'Chicago, IL'
+                        when '415' then 'San Francisco, CA'
+                        when '617' then 'Boston, MA'
+                        when '702' then 'Las Vegas, NV'
+                        when '305' then 'Miami, FL'
+                        when '206' then 'Seattle, WA'
+                        when '713' then 'Houston, TX'
+                        when '404' then 'Atlanta, GA'
+                        when '214' then 'Dallas, TX'
+                        when '602' then 'Phoenix, AZ'
+                        else 'US/CA (' || substr(c.phone_number_e164, 3, 3) || ')'
+                    end
+                end
+            when c.phone_number_e164 like '+33%' then 'France'
+            when c.phone_number_e164 like '+44%' then 'United Kingdom'
+            when c.phone_number_e164 like '+49%' then 'Germany'
+            when c.phone_number_e164 like '+34%' then 'Spain'
+            when c.phone_number_e164 like '+39%' then 'Italy'
+            when c.phone_number_e164 like '+61%' then 'Australia'
+            when c.phone_number_e164 like '+81%' then 'Japan'
+            else 'Other'
+        end as region
+    from public.calls c
+    where c.user_id = p_user_id
+      and c.created_at >= p_start
+      and c.created_at <= p_end
+      and (p_campaign_id is null or c.batch_campaign_id = p_campaign_id)
+      and (p_agent_id is null or c.agent_id = p_agent_id)
+),
+grouped as (
+    select
+        grouping(agent_id) = 0 as by_agent,
+        grouping(batch_campaign_id) = 0 as by_campaign,
+        grouping(region) = 0 as by_region,
+        grouping(day) = 0 as by_day,
+        grouping(hour) = 0 as by_hour,
+        agent_id, batch_campaign_id, region, day, hour,
+        count(*) as total_calls,
+        count(*) filter (where successful) as successful_calls,
+        count(*) filter (where successful and duration > 30) as qualified_calls,
+        count(*) filter (where failed) as failed_calls,
+        coalesce(sum(duration), 0) as total_duration
+    from window_calls
+    group by grouping sets ((agent_id), (batch_campaign_id), (region), (day), (hour))
+)
+select jsonb_build_object(
+    'totals', (
+        select jsonb_build_object(
+            'total_calls', count(*),
+            'successful_calls', count(*) filter (where successful),
+            'qualified_calls', count(*) filter (where successful and duration > 30),
+            'failed_calls', count(*) filter (where failed),
+            'total_duration', coalesce(sum(duration), 0),
+            'duration_p50', coalesce(percentile_cont(0.5) within group (order by duration), 0),
+            'duration_p90', coalesce(percentile_cont(0.9) within group (order by duration), 0),
+            'duration_p95', coalesce(percentile_cont(0.95) within group (order by duration), 0)
+        )
+        from window_calls
+    ),
+    'by_agent', coalesce((
+        select jsonb_agg(jsonb_build_object('agent_id', agent_id, 'total_calls', total_calls, 'successful_calls', successful_calls,
+                                            'qualified_calls', qualified_calls, 'failed_calls', failed_calls, 'total_duration', total_duration))
+        from grouped where by_agent and agent_id is not null
+    ), '[]'::jsonb),
+    'by_campaign', coalesce((
+        select jsonb_agg(jsonb_build_object('batch_campaign_id', batch_campaign_id, 'total_calls', total_calls, 'successful_calls', successful_calls,
+                                            'qualified_calls', qualified_calls, 'failed_calls', failed_calls, 'total_duration', total_duration))
+        from grouped where by_campaign and batch_campaign_id is not null
+    ), '[]'::jsonb),
+    'by_region', coalesce((
+        select jsonb_agg(jsonb_build_object('region', region, 'total_calls', total_calls, 'successful_calls', successful_calls,
+                                            'qualified_calls', qualified_calls, 'failed_calls', failed_calls, 'total_duration', total_duration))
+        from grouped where by_region
+    ), '[]'::jsonb),
+    'by_day', coalesce((
+        select jsonb_agg(jsonb_build_object('day', day, 'total_calls', total_calls, 'successful_calls', successful_calls,
+                                            'qualified_calls', qualified_calls, 'failed_calls', failed_calls, 'total_duration', total_duration) order by day)
+        from grouped where by_day
+    ), '[]'::jsonb),
+    'by_hour', coalesce((
+        select jsonb_agg(jsonb_build_object('hour', hour, 'total_calls', total_calls, 'successful_calls', successful_calls,
+                                            'qualified_calls', qualified_calls, 'failed_calls', failed_calls, 'total_duration', total_duration) order by hour)
+        from grouped where by_hour
+    ), '[]'::jsonb)
+);
+$$;
+
+grant execute on function public.analytics_call_aggregates(uuid, timestamptz, timestamptz, uuid, bigint) to service_role;
@@ -0,0 +1,5 @@
+-- Retry delay of batch call items (api/campaign_dialer.py).
+-- An item put back to pending for a retry is dialed again once
+-- next_attempt_at has passed (null: dial as soon as a slot is free).
+
+alter table public.batch_call_items add column if not exists next_attempt_at timestamptz;
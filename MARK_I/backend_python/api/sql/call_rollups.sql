@@ -0,0 +1,290 @@
+-- Call analytics rollups (api/analytics_rollups.py).
+-- Hourly and daily buckets of call counts, outcomes and durations per user,
+-- agent, campaign and region. They are maintained incrementally by
+-- refresh_call_rollups(), which the calls_refresh_rollups trigger runs whenever a
+-- call is inserted, deleted, or has a rolled-up column changed, whichever code path
+-- (API, worker, webhooks) wrote it.
+--
+-- call_rollup_state holds what each call currently contributes to the buckets, so a
+-- refresh subtracts the old contribution and adds the new one. Refreshing a call is
+-- therefore idempotent, and the backfill (python -m api.analytics_rollups) can be
+-- re-run at any time alongside live traffic.
+
+create table if not exists public.call_rollups (
+    user_id uuid not null,
+    -- 'user' | 'agent' | 'campaign' | 'region' | 'campaign_region'
+    scope text not null,
+    -- '' for 'user', agent id, campaign id, region, or '<campaign id>:<region>'
+    scope_id text not null default '',
+    -- 'hour' | 'day' (UTC)
+    granularity text not null,
+    bucket_start timestamptz not null,
+    total_calls integer not null default 0,
+    completed_calls integer not null default 0,   -- status completed/ended
+    connected_calls integer not null default 0,   -- completed and longer than 30s
+    voicemail_calls integer not null default 0,   -- completed, 6-30s
+    calling_calls integer not null default 0,     -- status calling
+    busy_calls integer not null default 0,
+    no_answer_calls integer not null default 0,
+    timeout_calls integer not null default 0,
+    failed_calls integer not null default 0,      -- status failed
+    timed_calls integer not null default 0,       -- duration > 0
+    total_duration bigint not null default 0,
+    duration_le_10 integer not null default 0,
+    duration_le_30 integer not null default 0,
+    duration_le_60 integer not null default 0,
+    duration_le_120 integer not null default 0,
+    duration_le_300 integer not null default 0,
+    duration_gt_300 integer not null default 0,
+    updated_at timestamptz not null default now(),
+    primary key (user_id, scope, scope_id, granularity, bucket_start)
+);
+
+create index if not exists call_rollups_scope_bucket_idx on public.call_rollups (scope, scope_id, granularity, bucket_start);
+
+create table if not exists public.call_rollup_state (
+    call_id uuid primary key,
+    user_id uuid not null,
+    agent_id bigint,
+    batch_campaign_id uuid,
+    region text not null,
+    created_at timestamptz not null,
+    status text,
+    call_duration integer
+);
+
+alter table public.call_rollups enable row level security;
+alter table public.call_rollup_state enable row level security;
+
+
+-- Same mapping as classify_region() in api/analytics_aggregation.py
+create or replace function public.call_region(p_phone text)
+returns text
+language sql
+immutable
+as $$
+    select case
+        when coalesce(p_phone, '') like '+1%' then
+            case
+                when length(p_phone) < 5 then 'US/CA'
+                else case substr(p_phone, 3, 3)
+                    when '212' then 'New York, NY'
+                    when '213' then 'Los Angeles, CA'
+                    when '312' then 'Chicago, IL'
+                    when '415' then 'San Francisco, CA'
+                    when '617' then 'Boston, MA'
+                    when '702' then 'Las Vegas, NV'
+                    when '305' then 'Miami, FL'
+                    when '206' then 'Seattle, WA'
+                    when '713' then 'Houston, TX'
+                    when '404' then 'Atlanta, GA'
+                    when '214' then 'Dallas, TX'
+                    when '602' then 'Phoenix, AZ'
+                    else 'US/CA (' || substr(p_phone, 3, 3) || ')'
+                end
+            end
+        when p_phone like '+33%' then 'France'
+        when p_phone like '+44%' then 'United Kingdom'
+        when p_phone like '+49%' then 'Germany'
+        when p_phone like '+34%' then 'Spain'
+        when p_phone like '+39%' then 'Italy'
+        when p_phone like '+61%' then 'Australia'
+        when p_phone like '+81%' then 'Japan'
+        else 'Other'
+    end
+$$;
+
+
+-- Add (p_sign = 1) or remove (p_sign = -1) one call's contribution to all its buckets
+create or replace function public.apply_call_rollup(
+    p_user_id uuid,
+    p_agent_id bigint,
+    p_campaign_id uuid,
+    p_region text,
+    p_created_at timestamptz,
+    p_status text,
+    p_duration integer,
+    p_sign integer
+)
+returns void
+language plpgsql
+as $$
+declare
+    v_status text := lower(coalesce(p_status, ''));
+    v_duration integer := coalesce(p_duration, 0);
+    v_completed boolean := lower(coalesce(p_status, '')) in ('completed', 'ended');
+begin
+    insert into public.call_rollups as r (
+        user_id, scope, scope_id, granularity, bucket_start,
+        total_calls, completed_calls, connected_calls, voicemail_calls, calling_calls,
+        busy_calls, no_answer_calls, timeout_calls, failed_calls, timed_calls, total_duration,
+        duration_le_10, duration_le_30, duration_le_60, duration_le_120, duration_le_300, duration_gt_300
+    )
+    select
+        p_user_id, s.scope, s.scope_id, g.granularity,
+        date_trunc(g.granularity, p_created_at at time zone 'UTC') at time zone 'UTC',
+        p_sign,
+        p_sign * (v_completed)::int,
+        p_sign * (v_completed and v_duration > 30)::int,
+        p_sign * (v_completed and v_duration > 5 and v_duration <= 30)::int,
+        p_sign * (v_status = 'calling')::int,
+        p_sign * (v_status = 'busy')::int,
+        p_sign * (v_status = 'no_answer')::int,
+        p_sign * (v_status = 'timeout')::int,
+        p_sign * (v_status = 'failed')::int,
+        p_sign * (v_duration > 0)::int,
+        p_sign * v_duration,
+        p_sign * (v_duration <= 10)::int,
+        p_sign * (v_duration > 10 and v_duration <= 30)::int,
+        p_sign * (v_duration > 30 and v_duration <= 60)::int,
+        p_sign * (v_duration > 60 and v_duration <= 120)::int,
+        p_sign * (v_duration > 120 and v_duration <= 300)::int,
+        p_sign * (v_duration > 300)::int
+    from (values
+        ('user', ''),
+        ('agent', p_agent_id::text),
+        ('campaign', p_campaign_id::text),
+        ('region', p_region),
+        ('campaign_region', p_campaign_id::text || ':' || p_region)
+    ) as s(scope, scope_id)
+    cross join (values ('hour'), ('day')) as g(granularity)
+    where s.scope_id is not null
+    on conflict (user_id, scope, scope_id, granularity, bucket_start) do update set
+        total_calls = r.total_calls + excluded.total_calls,
+        completed_calls = r.completed_calls + excluded.completed_calls,
+        connected_calls = r.connected_calls + excluded.connected_calls,
+        voicemail_calls = r.voicemail_calls + excluded.voicemail_calls,
+        calling_calls = r.calling_calls + excluded.calling_calls,
+        busy_calls = r.busy_calls + excluded.busy_calls,
+        no_answer_calls = r.no_answer_calls + excluded.no_answer_calls,
+        timeout_calls = r.timeout_calls + excluded.timeout_calls,
+        failed_calls = r.failed_calls + excluded.failed_calls,
+        timed_calls = r.timed_calls + excluded.timed_calls,
+        total_duration = r.total_duration + excluded.total_duration,
+        duration_le_10 = r.duration_le_10 + excluded.duration_le_10,
+        duration_le_30 = r.duration_le_30 + excluded.duration_le_30,
+        duration_le_60 = r.duration_le_60 + excluded.duration_le_60,
+        duration_le_120 = r.duration_le_120 + excluded.duration_le_120,
+        duration_le_300 = r.duration_le_300 + excluded.duration_le_300,
+        duration_gt_300 = r.duration_gt_300 + excluded.duration_gt_300,
+        updated_at = now();
+end;
+$$;
+
+
+-- Bring the buckets of the given calls in line with their current rows.
+-- Returns the number of calls whose contribution changed.
+create or replace function public.refresh_call_rollups(p_call_ids uuid[])
+returns integer
+language plpgsql
+as $$
+declare
+    v_call_id uuid;
+    v_state public.call_rollup_state%rowtype;
+    v_call record;
+    v_region text;
+    v_changed integer := 0;
+begin
+    foreach v_call_id in array coalesce(p_call_ids, '{}') loop
+        -- Serializes concurrent refreshes of the same call
+        perform pg_advisory_xact_lock(hashtext('call_rollup:' || v_call_id::text));
+
+        v_state := null;
+        select * into v_state from public.call_rollup_state where call_id = v_call_id;
+
+        v_call := null;
+        select c.user_id, c.agent_id, c.batch_campaign_id, c.phone_number_e164, c.created_at, c.status, c.call_duration
+        into v_call
+        from public.calls c
+        where c.id = v_call_id;
+
+        if v_call.user_id is null or v_call.created_at is null then
+            -- Call deleted, or not attributable to a user
+            if v_state.call_id is not null then
+                perform public.apply_call_rollup(v_state.user_id, v_state.agent_id, v_state.batch_campaign_id, v_state.region,
+                                                 v_state.created_at, v_state.status, v_state.call_duration, -1);
+                delete from public.call_rollup_state where call_id = v_call_id;
+                v_changed := v_changed + 1;
+            end if;
+            continue;
+        end if;
+
+        v_region := public.call_region(v_call.phone_number_e164);
+
+        if v_state.call_id is not null
+           and v_state.user_id = v_call.user_id
+           and v_state.agent_id is not distinct from v_call.agent_id
+           and v_state.batch_campaign_id is not distinct from v_call.batch_campaign_id
+           and v_state.region = v_region
+           and v_state.created_at = v_call.created_at
+           and v_state.status is not distinct from v_call.status
+           and v_state.call_duration is not distinct from v_call.call_duration then
+            continue;
+        end if;
+
+        if v_state.call_id is not null then
+            perform public.apply_call_rollup(v_state.user_id, v_state.agent_id, v_state.batch_campaign_id, v_state.region,
+                                             v_state.created_at, v_state.status, v_state.call_duration, -1);
+        end if;
+        perform public.apply_call_rollup(v_call.user_id, v_call.agent_id, v_call.batch_campaign_id, v_region,
+                                         v_call.created_at, v_call.status, v_call.call_duration, 1);
+
+        insert into public.call_rollup_state (call_id, user_id, agent_id, batch_campaign_id, region, created_at, status, call_duration)
+        values (v_call_id, v_call.user_id, v_call.agent_id, v_call.batch_campaign_id, v_region, v_call.created_at, v_call.status, v_call.call_duration)
+        on conflict (call_id) do update set
+            user_id = excluded.user_id,
+            agent_id = excluded.agent_id,
+            batch_campaign_id = excluded.batch_campaign_id,
+            region = excluded.region,
+            created_at = excluded.created_at,
+            status = excluded.status,
+            call_duration = excluded.call_duration;
+
+        v_changed := v_changed + 1;
+    end loop;
+
+    return v_changed;
+end;
+$$;
+
+grant select on public.call_rollups to service_role;
+grant execute on function public.refresh_call_rollups(uuid[]) to service_role;
+
+
+-- Keep the rollups in line with every write to calls, in the writing transaction
+create or replace function public.calls_refresh_rollups()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    if tg_op = 'DELETE' then
+        perform public.refresh_call_rollups(array[old.id]);
+    else
+        perform public.refresh_call_rollups(array[new.id]);
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists calls_refresh_rollups_insert_delete on public.calls;
+create trigger calls_refresh_rollups_insert_delete
+    after insert or delete on public.calls
+    for each row execute function public.calls_refresh_rollups();
+
+drop trigger if exists calls_refresh_rollups_update on public.calls;
+create trigger calls_refresh_rollups_update
+    after update of user_id, agent_id, batch_campaign_id, phone_number_e164, created_at, status, call_duration
+    on public.calls
+    for each row
+    when (
+        old.user_id is distinct from new.user_id
+        or old.agent_id is distinct from new.agent_id
+        or old.batch_campaign_id is distinct from new.batch_campaign_id
+        or old.phone_number_e164 is distinct from new.phone_number_e164
+        or old.created_at is distinct from new.created_at
+        or old.status is distinct from new.status
+        or old.call_duration is distinct from new.call_duration
+    )
+    execute function public.calls_refresh_rollups();
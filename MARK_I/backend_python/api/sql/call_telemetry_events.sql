@@ -0,0 +1,20 @@
+-- Per-call voice pipeline metrics (agents/telemetry.py).
+-- The LiveKit worker batch-inserts utterance_metrics (TTS), llm_metrics and
+-- turn_metrics_complete events from its in-memory telemetry queue.
+
+create table if not exists public.call_telemetry_events (
+    id bigserial primary key,
+    call_id uuid,
+    event_type text not null,
+    room_name text,
+    agent_id bigint,
+    pathway_execution_id uuid,
+    node_id text,
+    payload jsonb not null default '{}'::jsonb,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists call_telemetry_events_call_id_created_at_idx
+    on public.call_telemetry_events (call_id, created_at);
+create index if not exists call_telemetry_events_created_at_idx
+    on public.call_telemetry_events (created_at);
@@ -0,0 +1,16 @@
+-- Invalidations of the configuration cache (api/config_cache.py).
+-- The API inserts a row when it changes an agent, voice, pathway or phone
+-- number; every worker process reads the rows after the last id it applied,
+-- at most once per CONFIG_CACHE_POLL_SECONDS. key is the row id of the kind
+-- ("*" for every row).
+
+create table if not exists public.config_cache_invalidations (
+    id bigserial primary key,
+    kind text not null,
+    key text not null default '*',
+    created_at timestamptz not null default now()
+);
+
+-- Rows are only needed until every worker has polled them (a few seconds);
+-- purge old ones from time to time, e.g. daily:
+-- delete from public.config_cache_invalidations where created_at < now() - interval '1 day';
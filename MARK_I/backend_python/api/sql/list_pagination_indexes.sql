@@ -0,0 +1,9 @@
+-- Indexes for the keyset-paginated list endpoints (api/pagination.py).
+-- Each list is ordered by (sort column, id) within its owner, so a page is an
+-- index range scan however deep the cursor is. calls is covered by
+-- calls_user_id_created_at_idx (api/sql/analytics_call_aggregates.sql).
+
+create index if not exists agents_user_id_id_idx on public.agents (user_id, id);
+create index if not exists phone_numbers_users_id_created_at_idx on public.phone_numbers (users_id, created_at, id);
+create index if not exists batch_campaigns_user_id_created_at_idx on public.batch_campaigns (user_id, created_at, id);
+create index if not exists batch_call_items_campaign_created_at_idx on public.batch_call_items (batch_campaign_id, created_at, id);
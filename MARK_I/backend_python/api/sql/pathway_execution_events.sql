@@ -0,0 +1,32 @@
+-- Append-only log of pathway execution changes (api/pathway_events.py).
+-- Node transitions and variable updates made during a call are inserted here
+-- in batches instead of rewriting pathway_executions.execution_trace and
+-- .variables. seq orders the events of one execution.
+--
+-- pathway_executions keeps the state up to events_compacted_seq: the current
+-- state is that row plus the events after it, and compaction (at completion)
+-- folds the events into the row.
+--
+-- event_key is generated by the writer: a batch retried after an ambiguous
+-- failure (timeout, lost connection) is upserted on it, so events the first
+-- attempt did write are not inserted twice.
+
+create table if not exists public.pathway_execution_events (
+    id bigserial primary key,
+    execution_id uuid not null references public.pathway_executions (id) on delete cascade,
+    seq bigint not null,
+    event_type text not null,
+    node_id text,
+    variables jsonb,
+    payload jsonb,
+    created_at timestamptz not null default now(),
+    event_key uuid,
+    unique (execution_id, seq)
+);
+
+alter table public.pathway_execution_events add column if not exists event_key uuid;
+create unique index if not exists pathway_execution_events_event_key_idx
+    on public.pathway_execution_events (event_key);
+
+alter table public.pathway_executions
+    add column if not exists events_compacted_seq bigint not null default 0;
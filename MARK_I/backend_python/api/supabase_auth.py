@@ -0,0 +1,245 @@
+"""
+Supabase Auth - local JWT verification
+
+Access tokens are verified in-process instead of calling Supabase Auth
+(`auth.get_user`) on every request:
+- HS256 tokens are checked against SUPABASE_JWT_SECRET
+- RS256/ES256 tokens are checked against the project JWKS, fetched once and cached
+- Verification results are cached briefly, keyed by the SHA-256 of the token;
+  only explicit rejections (bad signature, expired, Supabase Auth 401/403) are
+  cached as invalid. When the JWKS or Supabase Auth cannot be reached the
+  request gets a 503 and nothing is cached.
+
+If neither a secret nor a JWKS is available the token is checked with
+Supabase Auth as before, and that result is cached the same way.
+
+Endpoints use the FastAPI dependencies:
+    user_id: str = Depends(get_authenticated_user_id)
+    user: AuthenticatedUser = Depends(get_authenticated_user)
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+import jwt
+from fastapi import Header, HTTPException, status
+
+from . import config  # noqa: F401 - loads .env.local before the variables below are read
+
+logger = logging.getLogger(__name__)
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+
+# How long a verified token is trusted without re-checking (never past its own exp)
+AUTH_CACHE_TTL_SECONDS = 60
+# How long a rejected token keeps being rejected without re-checking
+AUTH_NEGATIVE_CACHE_TTL_SECONDS = 10
+AUTH_CACHE_MAX_ENTRIES = 10000
+# Refetch the JWKS at most this often (also covers key rotation)
+JWKS_CACHE_TTL_SECONDS = 3600
+# Clock skew tolerated on exp/iat
+JWT_LEEWAY_SECONDS = 30
+
+_ASYMMETRIC_ALGORITHMS = ("RS256", "ES256")
+# Supabase Auth statuses that reject the token itself
+_REJECTED_STATUSES = (401, 403)
+
+
+@dataclass
+class AuthenticatedUser:
+    """User behind a verified Supabase access token"""
+    id: str
+    email: Optional[str] = None
+    role: Optional[str] = None
+    claims: Dict[str, Any] = field(default_factory=dict)
+
+
+# token hash -> (expires at (monotonic), user or None when the token was rejected)
+_token_cache: Dict[str, Tuple[float, Optional[AuthenticatedUser]]] = {}
+_token_cache_lock = threading.Lock()
+
+_jwks_client: Optional[jwt.PyJWKClient] = None
+_jwks_client_lock = threading.Lock()
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _cache_get(key: str) -> Tuple[bool, Optional[AuthenticatedUser]]:
+    with _token_cache_lock:
+        entry = _token_cache.get(key)
+        if entry is None:
+            return False, None
+        expires_at, user = entry
+        if time.monotonic() >= expires_at:
+            _token_cache.pop(key, None)
+            return False, None
+        return True, user
+
+
+def _cache_put(key: str, user: Optional[AuthenticatedUser], ttl: float):
+    with _token_cache_lock:
+        if len(_token_cache) >= AUTH_CACHE_MAX_ENTRIES:
+            now = time.monotonic()
+            for expired_key in [k for k, (expires_at, _) in _token_cache.items() if expires_at <= now]:
+                _token_cache.pop(expired_key, None)
+            if len(_token_cache) >= AUTH_CACHE_MAX_ENTRIES:
+                # Still full: drop the oldest insertions
+                for old_key in list(_token_cache)[:AUTH_CACHE_MAX_ENTRIES // 10]:
+                    _token_cache.pop(old_key, None)
+        _token_cache[key] = (time.monotonic() + max(ttl, 0), user)
+
+
+def clear_auth_cache():
+    """Forget every cached verification result (e.g. after signing key rotation)"""
+    with _token_cache_lock:
+        _token_cache.clear()
+
+
+def _get_jwks_client() -> Optional[jwt.PyJWKClient]:
+    global _jwks_client
+    if _jwks_client is None and SUPABASE_URL:
+        with _jwks_client_lock:
+            if _jwks_client is None:
+                jwks_url = f"{SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json"
+                _jwks_client = jwt.PyJWKClient(jwks_url, cache_keys=True, lifespan=JWKS_CACHE_TTL_SECONDS, timeout=5)
+    return _jwks_client
+
+
+def _user_from_claims(claims: Dict[str, Any]) -> AuthenticatedUser:
+    user_id = claims.get("sub")
+    if not user_id:
+        # anon/service_role keys are valid JWTs but do not identify a user
+        raise jwt.InvalidTokenError("Token has no subject")
+    return AuthenticatedUser(id=user_id, email=claims.get("email"), role=claims.get("role"), claims=claims)
+
+
+def _decode_locally(token: str) -> Optional[Dict[str, Any]]:
+    """Verify the token signature and claims locally.
+
+    Returns None when no key material is configured for the token's algorithm.
+    Raises jwt.PyJWTError when the token is invalid.
+    """
+    header = jwt.get_unverified_header(token)
+    algorithm = header.get("alg")
+    decode_options = {"require": ["exp", "sub"]}
+
+    if algorithm == "HS256":
+        if not SUPABASE_JWT_SECRET:
+            return None
+        key = SUPABASE_JWT_SECRET
+    elif algorithm in _ASYMMETRIC_ALGORITHMS:
+        jwks_client = _get_jwks_client()
+        if jwks_client is None:
+            return None
+        try:
+            key = jwks_client.get_signing_key_from_jwt(token).key
+        except jwt.PyJWKClientConnectionError as e:
+            logger.warning(f"Could not fetch Supabase JWKS, falling back to Supabase Auth: {e}")
+            return None
+    else:
+        raise jwt.InvalidAlgorithmError(f"Unsupported token algorithm: {algorithm}")
+
+    return jwt.decode(
+        token,
+        key,
+        algorithms=[algorithm],
+        audience=SUPABASE_JWT_AUDIENCE,
+        leeway=JWT_LEEWAY_SECONDS,
+        options=decode_options,
+    )
+
+
+def _auth_unavailable() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Authentication service unavailable")
+
+
+def _verify_with_supabase(token: str) -> Optional[AuthenticatedUser]:
+    """Remote check through Supabase Auth, used when the token cannot be verified locally.
+
+    Returns None when Supabase Auth rejects the token; raises HTTPException(503)
+    when it could not give an answer.
+    """
+    from gotrue.errors import AuthApiError
+
+    from .db_client import supabase_service_client
+
+    try:
+        user_response = supabase_service_client.auth.get_user(token)
+    except AuthApiError as e:
+        if e.status in _REJECTED_STATUSES:
+            logger.debug(f"Supabase Auth rejected token: {e}")
+            return None
+        logger.warning(f"⚠️ Supabase Auth error while verifying token ({e.status}): {e}")
+        raise _auth_unavailable()
+    except Exception as e:
+        logger.warning(f"⚠️ Could not reach Supabase Auth to verify token: {e}")
+        raise _auth_unavailable()
+    if not user_response or not user_response.user:
+        return None
+    auth_user = user_response.user
+    return AuthenticatedUser(id=auth_user.id, email=auth_user.email, role=getattr(auth_user, "role", None))
+
+
+def verify_access_token(token: str) -> AuthenticatedUser:
+    """Return the user of a Supabase access token, or raise HTTPException(401, or 503 when it cannot be checked)"""
+    if not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing or invalid authorization header")
+
+    key = _token_key(token)
+    found, cached_user = _cache_get(key)
+    if found:
+        if cached_user is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+        return cached_user
+
+    user: Optional[AuthenticatedUser] = None
+    ttl = AUTH_CACHE_TTL_SECONDS
+    try:
+        claims = _decode_locally(token)
+        if claims is not None:
+            user = _user_from_claims(claims)
+            ttl = min(AUTH_CACHE_TTL_SECONDS, claims["exp"] - time.time())
+        else:
+            user = _verify_with_supabase(token)
+    except jwt.PyJWKClientError as e:
+        # No usable signing key (JWKS unreachable or malformed): not the token's fault
+        logger.warning(f"⚠️ Could not get the signing key of an access token: {e}")
+        raise _auth_unavailable()
+    except jwt.PyJWTError as e:
+        logger.debug(f"Invalid access token: {e}")
+        user = None
+
+    if user is None:
+        _cache_put(key, None, AUTH_NEGATIVE_CACHE_TTL_SECONDS)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+    _cache_put(key, user, ttl)
+    return user
+
+
+def get_bearer_token(authorization: Optional[str]) -> str:
+    """Extract the token from an `Authorization: Bearer <token>` header"""
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing or invalid authorization header")
+    return authorization[len("Bearer "):]
+
+
+# ===== FastAPI dependencies =====
+
+def get_authenticated_user(authorization: Optional[str] = Header(None, alias="Authorization")) -> AuthenticatedUser:
+    """Dependency: the user authenticated by the request's bearer token"""
+    return verify_access_token(get_bearer_token(authorization))
+
+
+def get_authenticated_user_id(authorization: Optional[str] = Header(None, alias="Authorization")) -> str:
+    """Dependency: id of the user authenticated by the request's bearer token"""
+    return get_authenticated_user(authorization).id
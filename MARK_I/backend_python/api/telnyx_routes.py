@@ -11,6 +11,7 @@ from datetime import datetime, timezone
 
 # Supabase client import
 from api.db_client import supabase_service_client
+from api.config_cache import publish_invalidation
 
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
@@ -1407,6 +1408,7 @@ async def release_telnyx_number(pam_phone_number_id: str):
     delete_response = supabase_service_client.table("phone_numbers").delete().eq("id", pam_phone_number_id).execute()
     if hasattr(delete_response, 'error') and delete_response.error:
         raise HTTPException(status_code=500, detail=f"Failed to delete phone number from Supabase: {delete_response.error.message}")
+    publish_invalidation("phone_number")
 
     # Determine appropriate success message based on provider type
     if provider_type == "telnyx_user_connected_account":
@@ -2148,6 +2150,7 @@ async def assign_agent_to_number(pam_phone_number_id: str, request_body: AssignA
                 logger.error(f"Error auto-enabling inbound for number {phone_number_id}: {inbound_e}")
                 # Don't fail the agent assignment if inbound setup fails
             
+            publish_invalidation("phone_number", phone_number_info['phone_number_e164'])
             logger.info(f"Successfully assigned phone number {phone_number_id} to agent {agent_id_to_assign}: {updated_agent}")
             return {
                 "message": f"Phone number {phone_number_id} successfully assigned to agent {agent_id_to_assign}",
@@ -0,0 +1,117 @@
+"""Single-pass call aggregation and the choice between rollups, RPC and fallback"""
+
+import asyncio
+import random
+import statistics
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from api import analytics_aggregation
+from api.analytics_aggregation import CallAggregator, _percentile, get_call_aggregates
+from api.analytics_rollups import window_bounds
+
+
+def percentile_cont(values, percentile):
+    values = sorted(values)
+    position = (len(values) - 1) * percentile
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def test_histogram_percentile_matches_percentile_cont():
+    durations = [random.Random(seed).randint(0, 900) for seed in range(501)]
+    histogram = {}
+    for duration in durations:
+        histogram[duration] = histogram.get(duration, 0) + 1
+    for percentile in (0.0, 0.5, 0.9, 0.95, 1.0):
+        assert _percentile(histogram, percentile) == pytest.approx(percentile_cont(durations, percentile))
+    assert _percentile({}, 0.5) == 0.0
+    assert _percentile({7: 4}, 0.9) == 7
+
+
+def call(status, duration, created_at="2024-05-01T10:15:00+00:00", **fields):
+    return {"status": status, "call_duration": duration, "created_at": created_at, "phone_number_e164": "+33612345678", **fields}
+
+
+def test_aggregator_folds_calls_into_groups():
+    aggregator = CallAggregator()
+    aggregator.add(call("completed", 45, agent_id=1, batch_campaign_id="c1"))
+    aggregator.add(call("completed", 10, agent_id=1))
+    aggregator.add(call("no_answer", 0, created_at="2024-05-02T08:00:00+00:00", agent_id=2))
+    aggregator.add(call("COMPLETED", None, phone_number_e164="+14155550100"))
+    result = aggregator.result()
+
+    totals = result["totals"]
+    assert (totals["total_calls"], totals["successful_calls"], totals["qualified_calls"], totals["failed_calls"]) == (4, 3, 1, 1)
+    assert totals["total_duration"] == 55
+    assert totals["duration_p50"] == pytest.approx(statistics.median([45, 10, 0, 0]))
+    assert {group["agent_id"]: group["total_calls"] for group in result["by_agent"]} == {1: 2, 2: 1}
+    assert result["by_campaign"] == [{"batch_campaign_id": "c1", "total_calls": 1, "successful_calls": 1,
+                                      "qualified_calls": 1, "failed_calls": 0, "total_duration": 45}]
+    assert {group["region"] for group in result["by_region"]} == {"France", "San Francisco, CA"}
+    assert {group["day"]: group["total_calls"] for group in result["by_day"]} == {"2024-05-01": 3, "2024-05-02": 1}
+    assert {group["hour"] for group in result["by_hour"]} == {10, 8}
+
+
+def test_aggregator_memory_is_bounded_by_the_histogram():
+    aggregator = CallAggregator()
+    for duration in range(100000):
+        aggregator.add({"status": "completed", "call_duration": duration % 600})
+    aggregator.add({"status": "completed", "call_duration": 10 ** 9})
+    assert len(aggregator._durations) == 601
+
+
+def test_window_bounds_follow_the_rollup_buckets():
+    start = datetime(2024, 5, 1, 10, 15, tzinfo=timezone.utc)
+    assert window_bounds(start, datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)) == (
+        datetime(2024, 5, 1, 10, tzinfo=timezone.utc), datetime(2024, 5, 1, 13, tzinfo=timezone.utc))
+    assert window_bounds(start, datetime(2024, 5, 3, 12, 30, tzinfo=timezone.utc)) == (
+        datetime(2024, 5, 1, 10, tzinfo=timezone.utc), datetime(2024, 5, 4, tzinfo=timezone.utc))
+    assert window_bounds(start, datetime(2024, 5, 3, tzinfo=timezone.utc))[1] == datetime(2024, 5, 3, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def sources(monkeypatch):
+    state = SimpleNamespace(rolled_up_calls=3, window_calls=3, rpc_calls=0)
+    monkeypatch.setattr(analytics_aggregation, "_rollups_unavailable_until", 0.0)
+    monkeypatch.setattr(analytics_aggregation, "_rpc_unavailable_until", 0.0)
+
+    async def get_rollup_aggregates(user_id, start, end):
+        return {"totals": {"total_calls": state.rolled_up_calls}, "source": "rollups"}
+
+    async def count_window_calls(user_id, start, end):
+        return state.window_calls
+
+    async def db_execute(query):
+        state.rpc_calls += 1
+        return SimpleNamespace(data={"totals": {"total_calls": state.window_calls}, "source": "rpc"})
+
+    monkeypatch.setattr(analytics_aggregation, "get_rollup_aggregates", get_rollup_aggregates)
+    monkeypatch.setattr(analytics_aggregation, "count_window_calls", count_window_calls)
+    monkeypatch.setattr(analytics_aggregation, "db_execute", db_execute)
+    monkeypatch.setattr(analytics_aggregation, "get_async_db", lambda: SimpleNamespace(rpc=lambda name, params: None))
+    return state
+
+
+START = datetime(2024, 5, 1, tzinfo=timezone.utc)
+END = datetime(2024, 5, 8, tzinfo=timezone.utc)
+
+
+def test_complete_rollups_are_used(sources):
+    result = asyncio.run(get_call_aggregates("user-1", START, END))
+    assert result["source"] == "rollups"
+    assert sources.rpc_calls == 0
+
+
+def test_unbackfilled_rollups_fall_back_to_the_rpc(sources):
+    sources.rolled_up_calls = 1
+    result = asyncio.run(get_call_aggregates("user-1", START, END))
+    assert result["source"] == "rpc"
+
+
+def test_filtered_windows_skip_the_rollups(sources):
+    result = asyncio.run(get_call_aggregates("user-1", START, END, agent_id=4))
+    assert result["source"] == "rpc"
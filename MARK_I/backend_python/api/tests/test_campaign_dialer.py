@@ -0,0 +1,229 @@
+"""Sliding window of the campaign dialer, against an in-memory batch_call_items table"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from api import campaign_dialer
+from api.campaign_dialer import CampaignDialer, start_campaign_dialer
+
+
+class FakeCampaign:
+    """batch_campaigns status and batch_call_items rows of one campaign"""
+    def __init__(self, item_count: int):
+        self.status = "running"
+        self.items = [{"id": f"item-{i}", "status": "pending"} for i in range(item_count)]
+        self.list_errors = 0
+        self.waiting_retries = 0
+        self.dialed = []
+        self.max_in_flight = 0
+
+    def install(self, monkeypatch):
+        async def db_execute(query):
+            return SimpleNamespace(data=[{"status": self.status}])
+
+        async def list_pending(campaign_id, limit, due_at=None):
+            if self.list_errors:
+                self.list_errors -= 1
+                raise ConnectionError("database unreachable")
+            return [dict(item) for item in self.items if item["status"] == "pending"][:limit]
+
+        async def count_pending(campaign_id):
+            return self.waiting_retries + sum(1 for item in self.items if item["status"] == "pending")
+
+        monkeypatch.setattr(campaign_dialer, "get_async_db", MagicMock())
+        monkeypatch.setattr(campaign_dialer, "db_execute", db_execute)
+        monkeypatch.setattr(campaign_dialer, "list_pending_batch_call_items", list_pending)
+        monkeypatch.setattr(campaign_dialer, "count_pending_batch_call_items", count_pending)
+
+    def dial_fn(self, dialer_ref, succeed=True):
+        async def dial(item):
+            self.dialed.append(item["id"])
+            self.max_in_flight = max(self.max_in_flight, len(dialer_ref()._in_flight))
+            for row in self.items:
+                if row["id"] == item["id"]:
+                    row["status"] = "calling" if succeed else "failed"
+            return succeed
+        return dial
+
+    def finish(self, dialer, item_id):
+        for row in self.items:
+            if row["id"] == item_id:
+                row["status"] = "completed"
+        dialer.release_slot(item_id)
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(campaign_dialer, "DIALER_IDLE_POLL_SECONDS", 0.01)
+    monkeypatch.setattr(campaign_dialer, "DIALER_ERROR_BACKOFF_SECONDS", 0.001)
+    campaign_dialer._active_dialers.clear()
+    yield
+    campaign_dialer._active_dialers.clear()
+
+
+async def settle():
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+def make_dialer(campaign, concurrency_limit, succeed=True):
+    dialer = None
+    dialer = CampaignDialer("campaign-1", concurrency_limit, campaign.dial_fn(lambda: dialer, succeed))
+    return dialer
+
+
+def test_keeps_concurrency_limit_calls_in_flight(monkeypatch):
+    campaign = FakeCampaign(5)
+    campaign.install(monkeypatch)
+
+    async def scenario():
+        dialer = make_dialer(campaign, 2)
+        dialer.start()
+        await settle()
+        assert campaign.dialed == ["item-0", "item-1"]
+
+        campaign.finish(dialer, "item-0")
+        await settle()
+        assert campaign.dialed == ["item-0", "item-1", "item-2"]
+        assert len(dialer._in_flight) == 2
+
+        dialer.stop()
+        await dialer._task
+
+    asyncio.run(scenario())
+    assert campaign.max_in_flight <= 2
+
+
+def test_finishes_when_no_pending_item_is_left(monkeypatch):
+    campaign = FakeCampaign(2)
+    campaign.install(monkeypatch)
+
+    async def scenario():
+        dialer = make_dialer(campaign, 2)
+        campaign_dialer._active_dialers["campaign-1"] = dialer
+        dialer.start()
+        await settle()
+        campaign.finish(dialer, "item-0")
+        campaign.finish(dialer, "item-1")
+        await asyncio.wait_for(dialer._task, timeout=1)
+        return dialer
+
+    dialer = asyncio.run(scenario())
+    assert dialer.stats()["finished_calls"] == 2
+    assert "campaign-1" not in campaign_dialer._active_dialers
+
+
+def test_keeps_polling_while_retries_wait_for_their_delay(monkeypatch):
+    campaign = FakeCampaign(0)
+    campaign.waiting_retries = 1
+    campaign.install(monkeypatch)
+
+    async def scenario():
+        dialer = make_dialer(campaign, 2)
+        dialer.start()
+        await asyncio.sleep(0.05)
+        assert dialer.is_running
+
+        # The retry becomes due
+        campaign.waiting_retries = 0
+        campaign.items.append({"id": "retry-0", "status": "pending"})
+        await asyncio.sleep(0.05)
+        assert campaign.dialed == ["retry-0"]
+        dialer.stop()
+        await dialer._task
+
+    asyncio.run(scenario())
+
+
+def test_database_errors_are_retried_instead_of_finishing(monkeypatch):
+    campaign = FakeCampaign(1)
+    campaign.list_errors = 3
+    campaign.install(monkeypatch)
+
+    async def scenario():
+        dialer = make_dialer(campaign, 1)
+        dialer.start()
+        await asyncio.sleep(0.1)
+        assert dialer.is_running
+        assert campaign.dialed == ["item-0"]
+        assert dialer._consecutive_errors == 0
+        dialer.stop()
+        await dialer._task
+
+    asyncio.run(scenario())
+
+
+def test_error_backoff_doubles_up_to_the_maximum(monkeypatch):
+    monkeypatch.setattr(campaign_dialer, "DIALER_ERROR_BACKOFF_SECONDS", 1)
+    monkeypatch.setattr(campaign_dialer, "DIALER_MAX_ERROR_BACKOFF_SECONDS", 5)
+    dialer = CampaignDialer("campaign-1", 1, None)
+    waits = []
+    for errors in range(1, 6):
+        dialer._consecutive_errors = errors
+        waits.append(dialer._wait_timeout(campaign_dialer.FAILED))
+    assert waits == [1, 2, 4, 5, 5]
+
+
+def test_failed_dispatch_frees_its_slot(monkeypatch):
+    campaign = FakeCampaign(3)
+    campaign.install(monkeypatch)
+
+    async def scenario():
+        dialer = make_dialer(campaign, 1, succeed=False)
+        dialer.start()
+        await asyncio.wait_for(dialer._task, timeout=1)
+        return dialer
+
+    dialer = asyncio.run(scenario())
+    assert campaign.dialed == ["item-0", "item-1", "item-2"]
+    assert dialer.dispatch_failures == 3
+    assert not dialer._in_flight
+
+
+def test_stale_slots_are_reclaimed(monkeypatch):
+    monkeypatch.setattr(campaign_dialer, "DIALER_SLOT_TIMEOUT_SECONDS", 60)
+    dialer = CampaignDialer("campaign-1", 2, None)
+    dialer._in_flight = {"stale": time.monotonic() - 61, "live": time.monotonic()}
+    dialer._reclaim_stale_slots()
+    assert list(dialer._in_flight) == ["live"]
+    assert dialer.timed_out_slots == 1
+
+
+def test_stops_when_campaign_is_no_longer_running(monkeypatch):
+    campaign = FakeCampaign(3)
+    campaign.status = "paused"
+    campaign.install(monkeypatch)
+
+    async def scenario():
+        dialer = make_dialer(campaign, 2)
+        dialer.start()
+        await asyncio.wait_for(dialer._task, timeout=1)
+
+    asyncio.run(scenario())
+    assert campaign.dialed == []
+
+
+def test_resume_replaces_a_stopping_dialer(monkeypatch):
+    campaign = FakeCampaign(0)
+    campaign.waiting_retries = 1
+    campaign.install(monkeypatch)
+
+    async def scenario():
+        first = start_campaign_dialer("campaign-1", 1, campaign.dial_fn(lambda: first))
+        await settle()
+        assert start_campaign_dialer("campaign-1", 1, first._dial_fn) is first
+
+        first.stop()
+        second = start_campaign_dialer("campaign-1", 1, first._dial_fn)
+        assert second is not first
+        await first._task
+        # The old dialer only unregisters itself
+        assert campaign_dialer._active_dialers["campaign-1"] is second
+        second.stop()
+        await second._task
+
+    asyncio.run(scenario())
@@ -0,0 +1,102 @@
+"""LRU/TTL configuration cache and single-flight loads"""
+
+import asyncio
+
+import pytest
+
+from api import config_cache
+from api.config_cache import ConfigCache, cached
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    fresh = ConfigCache(max_entries=3, ttl_seconds=60)
+    monkeypatch.setattr(config_cache, "config_cache", fresh)
+
+    async def no_invalidations():
+        pass
+
+    monkeypatch.setattr(config_cache, "_check_invalidations", no_invalidations)
+    return fresh
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ConfigCache(max_entries=2, ttl_seconds=60)
+    cache.set(("agent", 1), "a")
+    cache.set(("agent", 2), "b")
+    assert cache.get(("agent", 1)) == (True, "a")
+    cache.set(("agent", 3), "c")
+    assert cache.get(("agent", 2)) == (False, None)
+    assert cache.get(("agent", 1)) == (True, "a")
+    assert cache.evictions == 1
+
+
+def test_expired_entries_are_misses(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(config_cache.time, "monotonic", lambda: now[0])
+    cache = ConfigCache(ttl_seconds=10)
+    cache.set(("voice", "v1"), {"id": "v1"})
+    now[0] += 9
+    assert cache.get(("voice", "v1"))[0]
+    now[0] += 2
+    assert cache.get(("voice", "v1")) == (False, None)
+
+
+def test_invalidation_drops_the_row_and_its_dependent_kinds():
+    cache = ConfigCache()
+    cache.set(("agent", 12), "agent")
+    cache.set(("agent", 12, "ai_models"), "models")
+    cache.set(("agent", 13), "other agent")
+    cache.set(("phone_number", "+33612345678"), "routing")
+    cache.set(("voice", "v1"), "voice")
+
+    assert cache.invalidate("agent", 12) == 3
+    assert not cache.get(("agent", 12))[0] and not cache.get(("agent", 12, "ai_models"))[0]
+    assert not cache.get(("phone_number", "+33612345678"))[0]
+    assert cache.get(("agent", 13))[0] and cache.get(("voice", "v1"))[0]
+
+
+def test_concurrent_misses_share_one_load(cache):
+    loads = []
+
+    async def load():
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        return {"id": 7}
+
+    async def scenario():
+        return await asyncio.gather(*(cached(("agent", 7), load) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert results == [{"id": 7}] * 5
+    assert len(loads) == 1
+    assert (cache.misses, cache.shared_loads) == (1, 4)
+    assert asyncio.run(cached(("agent", 7), load)) == {"id": 7}
+    assert cache.hits == 1
+
+
+def test_failed_loads_are_shared_but_not_cached(cache):
+    attempts = []
+
+    async def load():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        raise ConnectionError("database unreachable")
+
+    async def scenario():
+        return await asyncio.gather(*(cached(("pathway", "p1"), load) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert len(attempts) == 1
+    assert cache.get(("pathway", "p1")) == (False, None)
+
+
+def test_none_results_are_cached_unless_asked_not_to(cache):
+    async def load():
+        return None
+
+    asyncio.run(cached(("phone_number", "+1"), load))
+    asyncio.run(cached(("phone_number", "+2"), load, cache_none=False))
+    assert cache.get(("phone_number", "+1")) == (True, None)
+    assert cache.get(("phone_number", "+2")) == (False, None)
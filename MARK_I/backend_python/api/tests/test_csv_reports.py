@@ -0,0 +1,57 @@
+"""CSV serialization and on-the-fly gzip of the report streams"""
+
+import asyncio
+import csv
+import gzip
+import io
+
+import pytest
+
+from api.csv_reports import csv_chunk, format_duration, gzip_chunks
+
+
+def test_csv_chunk_quotes_special_characters():
+    chunk = csv_chunk([["id", "name"], [1, 'Ada "the" Countess, of Lovelace'], [2, "line\nbreak"], [3, None]])
+    assert list(csv.reader(io.StringIO(chunk))) == [
+        ["id", "name"], ["1", 'Ada "the" Countess, of Lovelace'], ["2", "line\nbreak"], ["3", ""],
+    ]
+
+
+def test_csv_chunk_accepts_a_generator():
+    assert csv_chunk(([i, i * 2] for i in range(2))) == "0,0\r\n1,2\r\n"
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+async def text_chunks(*chunks, fail=False):
+    for chunk in chunks:
+        yield chunk
+    if fail:
+        raise ConnectionError("database unreachable")
+
+
+def test_gzip_chunks_round_trip():
+    rows = [csv_chunk([["id", "city"]])] + [csv_chunk([[i, "Zürich"]]) for i in range(500)]
+    compressed = b"".join(asyncio.run(collect(gzip_chunks(text_chunks(*rows)))))
+    assert gzip.decompress(compressed).decode("utf-8") == "".join(rows)
+    assert len(compressed) < len("".join(rows).encode("utf-8"))
+
+
+def test_gzip_stream_error_propagates_without_a_trailer():
+    received = []
+
+    async def scenario():
+        async for chunk in gzip_chunks(text_chunks("id\r\n" * 1000, fail=True)):
+            received.append(chunk)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(scenario())
+    with pytest.raises((EOFError, OSError)):
+        gzip.decompress(b"".join(received))
+
+
+@pytest.mark.parametrize("seconds, formatted", [(None, "0:00"), (0, "0:00"), (59, "0:59"), (61, "1:01"), (3725, "62:05")])
+def test_format_duration(seconds, formatted):
+    assert format_duration(seconds) == formatted
@@ -0,0 +1,107 @@
+"""Cursors of the list endpoints and the keyset filters built from them"""
+
+import asyncio
+import base64
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from postgrest import AsyncPostgrestClient
+
+from api import pagination
+from api.db_async import keyset_after, order_keyset
+from api.pagination import decode_cursor, encode_cursor, fetch_page
+
+
+def calls_query():
+    return AsyncPostgrestClient("http://localhost:54321/rest/v1").table("calls").select("*")
+
+
+def raw_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+@pytest.mark.parametrize("sort_value, row_id", [
+    ("2024-05-01T10:00:00.123456+00:00", "6f1c2a3e-8b4d-4c1e-9a7f-0d2b3c4e5f60"),
+    (42, 7),
+    (1.5, "a1"),
+])
+def test_cursor_round_trip(sort_value, row_id):
+    cursor = encode_cursor(sort_value, row_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == [sort_value, row_id]
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 !",
+    raw_cursor({"sort": 1}),
+    raw_cursor([1, 2, 3]),
+    raw_cursor(['2024-05-01",id.gt."0', 1]),
+    raw_cursor(["x", "1),and(user_id.neq.0"]),
+    raw_cursor([None, 1]),
+    raw_cursor([True, 1]),
+    raw_cursor([{"a": 1}, 1]),
+    raw_cursor(["9" * 65, 1]),
+])
+def test_invalid_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_keyset_after_filters_on_sort_column_then_id():
+    query = keyset_after(calls_query(), "created_at", "2024-05-01T10:00:00+00:00", "abc", descending=True)
+    assert query.params["or"] == (
+        '(created_at.lt."2024-05-01T10:00:00+00:00",'
+        'and(created_at.eq."2024-05-01T10:00:00+00:00",id.lt."abc"))'
+    )
+
+
+def test_keyset_after_on_id_is_a_plain_filter():
+    query = keyset_after(calls_query(), "id", 7, 7)
+    assert query.params["id"] == "gt.7"
+    assert "or" not in query.params
+
+
+def test_order_keyset_breaks_ties_on_id():
+    assert order_keyset(calls_query(), "created_at", descending=True).params["order"] == "created_at.desc,id.desc"
+    assert order_keyset(calls_query(), "id").params["order"] == "id"
+
+
+def install_rows(monkeypatch, rows):
+    queries = []
+
+    async def db_execute(query):
+        queries.append(query)
+        limit = int(query.params.get("limit", len(rows)))
+        return SimpleNamespace(data=rows[:limit], count=len(rows))
+
+    monkeypatch.setattr(pagination, "db_execute", db_execute)
+    return queries
+
+
+def test_fetch_page_returns_the_next_cursor(monkeypatch):
+    rows = [{"id": f"id-{i}", "created_at": f"2024-05-0{9 - i}"} for i in range(3)]
+    queries = install_rows(monkeypatch, rows)
+
+    page = asyncio.run(fetch_page(calls_query(), 2))
+    assert [row["id"] for row in page.rows] == ["id-0", "id-1"]
+    assert decode_cursor(page.next_cursor) == ["2024-05-08", "id-1"]
+    assert page.total_count == 3
+    assert queries[0].params["limit"] == "3"
+
+    next_query = calls_query()
+    asyncio.run(fetch_page(next_query, 2, page.next_cursor))
+    assert queries[1].params["or"].startswith('(created_at.lt."2024-05-08"')
+
+
+def test_fetch_page_without_limit_or_cursor_returns_every_row(monkeypatch):
+    rows = [{"id": f"id-{i}", "created_at": "2024-05-01"} for i in range(pagination.DEFAULT_PAGE_SIZE + 5)]
+    queries = install_rows(monkeypatch, rows)
+
+    page = asyncio.run(fetch_page(calls_query(), None))
+    assert len(page.rows) == len(rows)
+    assert page.next_cursor is None
+    assert "limit" not in queries[0].params
+    assert queries[0].params["order"] == "created_at.desc,id.desc"
@@ -0,0 +1,159 @@
+"""Event folding and the durable event queue of pathway executions"""
+
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from api import pathway_events
+from api.pathway_events import NODE_TRANSITION, VARIABLES_UPDATED, PathwayEventLog, apply_events
+
+
+def empty_state():
+    return {"current_node_id": "start", "variables": {"name": "Ada"}, "execution_trace": [], "last_seq": 0}
+
+
+def test_apply_events_folds_transitions_and_variables_in_order():
+    events = [
+        {"seq": 1, "event_type": NODE_TRANSITION, "node_id": "qualify", "payload": {"reason": "greeted"}, "created_at": "t1"},
+        {"seq": 2, "event_type": VARIABLES_UPDATED, "variables": {"budget": 5000}},
+        {"seq": 3, "event_type": NODE_TRANSITION, "node_id": "book", "payload": None, "created_at": "t3"},
+        {"seq": 4, "event_type": VARIABLES_UPDATED, "variables": {"budget": 7000, "slot": "monday"}},
+    ]
+    state = apply_events(empty_state(), events)
+
+    assert state["current_node_id"] == "book"
+    assert state["variables"] == {"name": "Ada", "budget": 7000, "slot": "monday"}
+    assert state["last_seq"] == 4
+    assert [(entry["from_node"], entry["to_node"]) for entry in state["execution_trace"]] == [("start", "qualify"), ("qualify", "book")]
+    assert state["execution_trace"][0]["result"] == {"reason": "greeted"}
+    assert state["execution_trace"][1]["result"] == {}
+
+
+def test_apply_events_without_events_keeps_the_state():
+    state = apply_events(empty_state(), [])
+    assert state == empty_state()
+
+
+class FakeEventsTable:
+    """Upserts of pathway_execution_events; fails the next `failures` calls"""
+    def __init__(self):
+        self.rows = {}
+        self.failures = 0
+        self.calls = 0
+
+    def install(self, monkeypatch):
+        database = MagicMock()
+
+        def upsert(batch, on_conflict, ignore_duplicates):
+            assert on_conflict == "event_key" and ignore_duplicates
+            return [dict(event) for event in batch]
+
+        database.table.return_value.upsert.side_effect = upsert
+
+        async def db_execute(rows):
+            self.calls += 1
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("connection reset")
+            for row in rows:
+                self.rows.setdefault(row["event_key"], row)
+
+        async def last_event_seq(execution_id):
+            return max((row["seq"] for row in self.rows.values() if row["execution_id"] == execution_id), default=0)
+
+        monkeypatch.setattr(pathway_events, "get_async_db", lambda: database)
+        monkeypatch.setattr(pathway_events, "db_execute", db_execute)
+        monkeypatch.setattr(pathway_events, "last_event_seq", last_event_seq)
+
+
+@pytest.fixture
+def table(monkeypatch):
+    fake = FakeEventsTable()
+    fake.install(monkeypatch)
+    monkeypatch.setattr(pathway_events, "PATHWAY_EVENTS_FLUSH_INTERVAL_SECONDS", 0.001)
+    monkeypatch.setattr(pathway_events, "PATHWAY_EVENTS_RETRY_DELAY_SECONDS", 0.001)
+    return fake
+
+
+def event(key, execution_id="exec-1"):
+    return {"event_key": key, "execution_id": execution_id, "seq": None, "event_type": VARIABLES_UPDATED, "variables": {}}
+
+
+def test_failed_batch_stays_queued_with_its_sequence_numbers(table):
+    async def scenario():
+        event_log = PathwayEventLog(asyncio.get_running_loop())
+        event_log.pending = [event("a"), event("b")]
+        table.failures = 1
+        assert await event_log.flush() is False
+        assert [e["event_key"] for e in event_log.pending] == ["a", "b"]
+        assert [e["seq"] for e in event_log.pending] == [1, 2]
+
+        # An event queued meanwhile is numbered after the retried ones
+        event_log.pending.append(event("c"))
+        assert await event_log.flush() is True
+        return event_log
+
+    event_log = asyncio.run(scenario())
+    assert not event_log.pending
+    assert event_log.insert_failures == 1
+    assert {key: row["seq"] for key, row in table.rows.items()} == {"a": 1, "b": 2, "c": 3}
+
+
+def test_flusher_retries_until_the_insert_succeeds(table):
+    table.failures = 3
+
+    async def scenario():
+        event_log = PathwayEventLog(asyncio.get_running_loop())
+        event_log.append(event("a"))
+        await asyncio.wait_for(event_log._flusher, timeout=1)
+        return event_log
+
+    event_log = asyncio.run(scenario())
+    assert not event_log.pending
+    assert list(table.rows) == ["a"]
+    assert table.calls == 4
+
+
+def test_flush_timeout_keeps_the_interrupted_batch(table, monkeypatch):
+    async def slow_execute(rows):
+        await asyncio.sleep(1)
+
+    monkeypatch.setattr(pathway_events, "db_execute", slow_execute)
+
+    async def scenario():
+        event_log = PathwayEventLog(asyncio.get_running_loop())
+        pathway_events._logs[asyncio.get_running_loop()] = event_log
+        event_log.pending = [event("a")]
+        written = await pathway_events.flush_events(timeout=0.01)
+        return written, event_log
+
+    written, event_log = asyncio.run(scenario())
+    assert written is False
+    assert [e["event_key"] for e in event_log.pending] == ["a"]
+
+
+def test_seq_conflict_numbers_the_batch_again(table, monkeypatch):
+    conflict = Exception("duplicate key")
+    conflict.code = pathway_events.UNIQUE_VIOLATION
+    original = pathway_events.db_execute
+    attempts = []
+
+    async def db_execute(rows):
+        attempts.append([row["seq"] for row in rows])
+        if len(attempts) == 1:
+            # Another process appended seq 1 meanwhile
+            table.rows["other"] = {"event_key": "other", "execution_id": "exec-1", "seq": 1}
+            raise conflict
+        await original(rows)
+
+    monkeypatch.setattr(pathway_events, "db_execute", db_execute)
+
+    async def scenario():
+        event_log = PathwayEventLog(asyncio.get_running_loop())
+        event_log.pending = [event("a")]
+        return await event_log.flush()
+
+    assert asyncio.run(scenario()) is True
+    assert attempts == [[1], [2]]
+    assert table.rows["a"]["seq"] == 2
@@ -0,0 +1,126 @@
+"""Local verification of access tokens and the verification cache"""
+
+import sys
+import time
+from types import SimpleNamespace
+
+import jwt
+import pytest
+from fastapi import HTTPException
+from gotrue.errors import AuthApiError
+
+from api import supabase_auth
+from api.supabase_auth import verify_access_token
+
+SECRET = "test-jwt-secret-long-enough-for-hs256"
+
+
+def make_token(sub="user-1", expires_in=3600, secret=SECRET, **claims):
+    payload = {"sub": sub, "exp": int(time.time()) + expires_in, "aud": "authenticated", "email": "ada@example.com", **claims}
+    return jwt.encode(payload, secret, algorithm="HS256")
+
+
+@pytest.fixture(autouse=True)
+def local_secret(monkeypatch):
+    monkeypatch.setattr(supabase_auth, "SUPABASE_JWT_SECRET", SECRET)
+    supabase_auth.clear_auth_cache()
+    yield
+    supabase_auth.clear_auth_cache()
+
+
+def count_decodes(monkeypatch):
+    calls = []
+    original = supabase_auth._decode_locally
+
+    def decode(token):
+        calls.append(token)
+        return original(token)
+
+    monkeypatch.setattr(supabase_auth, "_decode_locally", decode)
+    return calls
+
+
+def test_valid_token_is_verified_once_then_cached(monkeypatch):
+    decodes = count_decodes(monkeypatch)
+    token = make_token()
+
+    first = verify_access_token(token)
+    second = verify_access_token(token)
+
+    assert first.id == "user-1" and first.email == "ada@example.com"
+    assert second is first
+    assert len(decodes) == 1
+
+
+def test_cached_user_does_not_outlive_the_token(monkeypatch):
+    token = make_token(expires_in=5)
+    verify_access_token(token)
+    expires_at, _ = supabase_auth._token_cache[supabase_auth._token_key(token)]
+    assert expires_at - time.monotonic() <= 5
+
+
+@pytest.mark.parametrize("token", [
+    make_token(secret="another-secret-long-enough-for-hs256"),
+    make_token(expires_in=-3600),
+    make_token(sub=None),
+    "not-a-jwt",
+])
+def test_rejected_tokens_are_cached_as_invalid(monkeypatch, token):
+    decodes = count_decodes(monkeypatch)
+    for _ in range(2):
+        with pytest.raises(HTTPException) as error:
+            verify_access_token(token)
+        assert error.value.status_code == 401
+    assert len(decodes) == 1
+
+
+def test_unreachable_jwks_is_a_503_and_not_cached(monkeypatch):
+    def decode(token):
+        raise jwt.PyJWKClientError("Fail to fetch data from the url")
+
+    monkeypatch.setattr(supabase_auth, "_decode_locally", decode)
+    token = make_token()
+    with pytest.raises(HTTPException) as error:
+        verify_access_token(token)
+    assert error.value.status_code == 503
+    assert supabase_auth._token_key(token) not in supabase_auth._token_cache
+
+
+def install_supabase_auth(monkeypatch, get_user):
+    monkeypatch.setattr(supabase_auth, "_decode_locally", lambda token: None)
+    client = SimpleNamespace(auth=SimpleNamespace(get_user=get_user))
+    monkeypatch.setitem(sys.modules, "api.db_client", SimpleNamespace(supabase_service_client=client))
+
+
+def test_supabase_auth_rejection_is_cached(monkeypatch):
+    calls = []
+
+    def get_user(token):
+        calls.append(token)
+        raise AuthApiError("invalid JWT", 401)
+
+    install_supabase_auth(monkeypatch, get_user)
+    for _ in range(2):
+        with pytest.raises(HTTPException) as error:
+            verify_access_token("opaque-token")
+        assert error.value.status_code == 401
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("failure", [ConnectionError("connection reset"), AuthApiError("upstream error", 500)])
+def test_supabase_auth_outage_is_a_503_and_not_cached(monkeypatch, failure):
+    calls = []
+
+    def get_user(token):
+        calls.append(token)
+        if len(calls) == 1:
+            raise failure
+        return SimpleNamespace(user=SimpleNamespace(id="user-2", email=None, role="authenticated"))
+
+    install_supabase_auth(monkeypatch, get_user)
+    with pytest.raises(HTTPException) as error:
+        verify_access_token("opaque-token")
+    assert error.value.status_code == 503
+
+    # The next request checks again instead of reusing a cached rejection
+    assert verify_access_token("opaque-token").id == "user-2"
@@ -0,0 +1,88 @@
+"""Refresh schedule of the OAuth token refresh engine and per-provider rate limits"""
+
+import asyncio
+
+import pytest
+
+from api import token_refresh
+from api.token_refresh import TOKEN_REFRESH_JITTER_SECONDS, TOKEN_REFRESH_LEAD_SECONDS, ProviderRateLimiter, TokenRefreshEngine
+
+NOW = 1_700_000_000.0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    monkeypatch.setattr(token_refresh.time, "time", lambda: NOW)
+
+
+def test_refresh_is_scheduled_before_expiry_with_jitter(clock):
+    engine = TokenRefreshEngine()
+    expires_at = NOW + 3600
+    for i in range(50):
+        engine.schedule(f"conn-{i}", "hubspot", expires_at)
+    refresh_times = [refresh_at for refresh_at, _, _ in engine._schedule]
+    latest = expires_at - TOKEN_REFRESH_LEAD_SECONDS
+    assert all(latest - TOKEN_REFRESH_JITTER_SECONDS <= refresh_at <= latest for refresh_at in refresh_times)
+    # Connections expiring together are spread over the jitter window
+    assert max(refresh_times) - min(refresh_times) > TOKEN_REFRESH_JITTER_SECONDS / 2
+
+
+def test_schedule_orders_by_refresh_time_and_skips_duplicates(clock):
+    engine = TokenRefreshEngine()
+    engine.schedule("late", "slack", NOW + 7200)
+    engine.schedule("expired", "google_calendar", NOW - 60)
+    engine.schedule("unknown-expiry", "calendly", None)
+    engine.schedule("late", "slack", NOW + 60)
+    engine.schedule("unsupported", "notion", NOW)
+
+    assert engine.stats()["scheduled"] == 3
+    first = sorted(engine._schedule)[:2]
+    # Expired and unknown expiries are due now
+    assert {connection_id for _, connection_id, _ in first} == {"expired", "unknown-expiry"}
+    assert all(refresh_at == NOW for refresh_at, _, _ in first)
+
+
+def test_rate_limiter_spaces_calls(monkeypatch):
+    now = [100.0]
+    sleeps = []
+
+    async def sleep(seconds):
+        sleeps.append(round(seconds, 6))
+        now[0] += seconds
+
+    monkeypatch.setattr(token_refresh.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(token_refresh.asyncio, "sleep", sleep)
+    limiter = ProviderRateLimiter(rate=4.0)
+
+    async def scenario():
+        for _ in range(3):
+            await limiter.acquire()
+
+    asyncio.run(scenario())
+    assert sleeps == [0.25, 0.25]
+
+
+def test_refresh_skips_connections_refreshed_since_scheduled(clock, monkeypatch):
+    refreshed = []
+
+    async def fetch_one(query):
+        return {"id": "conn-1", "expires_at": "2099-01-01T00:00:00+00:00"}
+
+    async def refresh_oauth_token(connection):
+        refreshed.append(connection["id"])
+
+    monkeypatch.setattr(token_refresh, "get_async_db", lambda: _AnyQuery())
+    monkeypatch.setattr(token_refresh, "fetch_one", fetch_one)
+    monkeypatch.setattr(token_refresh, "refresh_oauth_token", refresh_oauth_token)
+
+    engine = TokenRefreshEngine()
+    engine._scheduled.add("conn-1")
+    assert asyncio.run(engine.refresh("conn-1", "hubspot")) is False
+    assert refreshed == []
+    assert "conn-1" not in engine._scheduled
+
+
+class _AnyQuery:
+    """Query builder accepting any chain of calls"""
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
@@ -0,0 +1,254 @@
+"""
+OAuth token refresh engine
+
+Keeps the access tokens of active app connections fresh from the API event
+loop (started and stopped with the application, no dedicated thread):
+
+- a scan every TOKEN_REFRESH_SCAN_INTERVAL_SECONDS selects the active
+  connections expiring within TOKEN_REFRESH_HORIZON_SECONDS (keyset pages) and
+  schedules each one once, in a priority queue ordered by refresh time
+- the refresh time is TOKEN_REFRESH_LEAD_SECONDS before expiry, minus a random
+  jitter of up to TOKEN_REFRESH_JITTER_SECONDS, so connections created or
+  refreshed together do not come due together
+- due connections are refreshed by TOKEN_REFRESH_CONCURRENCY workers; each
+  provider's token endpoint is called at most PROVIDER_REFRESH_RATES per second
+- the token requests go through the shared aiohttp session (http_clients)
+
+token_refresh_stats() reports the queue and the refresh counters.
+"""
+
+import asyncio
+import heapq
+import logging
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+try:
+    from .db_async import Row, fetch_one, get_async_db, iter_keyset_pages
+    from .oauth_utils import OAUTH_CONFIGS, refresh_oauth_token
+except ImportError:
+    # Imported as a top-level module (LiveKit worker adds api/ to sys.path)
+    from db_async import Row, fetch_one, get_async_db, iter_keyset_pages
+    from oauth_utils import OAUTH_CONFIGS, refresh_oauth_token
+
+logger = logging.getLogger(__name__)
+
+TOKEN_REFRESH_ENABLED = os.getenv("TOKEN_REFRESH_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+TOKEN_REFRESH_SCAN_INTERVAL_SECONDS = float(os.getenv("TOKEN_REFRESH_SCAN_INTERVAL_SECONDS", "300"))
+TOKEN_REFRESH_HORIZON_SECONDS = 3600
+TOKEN_REFRESH_LEAD_SECONDS = 600
+TOKEN_REFRESH_JITTER_SECONDS = 240
+TOKEN_REFRESH_CONCURRENCY = int(os.getenv("TOKEN_REFRESH_CONCURRENCY", "8"))
+# Token endpoint calls per second and provider
+DEFAULT_PROVIDER_REFRESH_RATE = 5.0
+PROVIDER_REFRESH_RATES = {
+    "google_calendar": 10.0,
+    "hubspot": 5.0,
+    "salesforce": 5.0,
+    "calendly": 2.0,
+    "slack": 2.0,
+}
+
+SCHEDULE_COLUMNS = "id, expires_at, app_integrations!inner(name)"
+REFRESH_COLUMNS = "*, app_integrations!inner(name, display_name)"
+
+
+def _timestamp(value: Any) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class ProviderRateLimiter:
+    """Spaces the calls to one provider's token endpoint at `rate` per second"""
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self.next_at = 0.0
+
+    async def acquire(self):
+        now = time.monotonic()
+        wait = self.next_at - now
+        self.next_at = max(now, self.next_at) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class TokenRefreshEngine:
+    """Priority queue of connections to refresh and the workers refreshing them"""
+    def __init__(self, concurrency: int = TOKEN_REFRESH_CONCURRENCY):
+        self.concurrency = concurrency
+        # (refresh at, connection id, app name), earliest first
+        self._schedule: List[Tuple[float, str, str]] = []
+        self._scheduled: Set[str] = set()
+        self._due: asyncio.Queue = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+        self._limiters: Dict[str, ProviderRateLimiter] = {}
+        self._tasks: List[asyncio.Task] = []
+        self.in_flight = 0
+        self.refreshed = 0
+        self.failed = 0
+        self.last_scan_at: Optional[str] = None
+
+    def schedule(self, connection_id: str, app_name: str, expires_at: Optional[float]):
+        """Refresh a connection before it expires (once while it is pending)"""
+        if connection_id in self._scheduled or app_name not in OAUTH_CONFIGS:
+            return
+        refresh_at = time.time()
+        if expires_at is not None:
+            refresh_at = max(refresh_at, expires_at - TOKEN_REFRESH_LEAD_SECONDS - random.uniform(0, TOKEN_REFRESH_JITTER_SECONDS))
+        heapq.heappush(self._schedule, (refresh_at, connection_id, app_name))
+        self._scheduled.add(connection_id)
+        self._wakeup.set()
+
+    async def scan(self) -> int:
+        """Schedule the active connections expiring within the horizon; returns how many were found"""
+        horizon = (datetime.utcnow() + timedelta(seconds=TOKEN_REFRESH_HORIZON_SECONDS)).isoformat()
+        found = 0
+        async for rows in iter_keyset_pages(
+            lambda: get_async_db().table("user_app_connections").select(SCHEDULE_COLUMNS)
+            .eq("connection_status", "active").lt("expires_at", horizon),
+            sort_column="expires_at",
+        ):
+            for row in rows:
+                found += 1
+                self.schedule(str(row["id"]), (row.get("app_integrations") or {}).get("name"), _timestamp(row.get("expires_at")))
+        self.last_scan_at = datetime.now(timezone.utc).isoformat()
+        if found:
+            logger.info(f"🔑 {found} connections expiring within {TOKEN_REFRESH_HORIZON_SECONDS // 60} min ({len(self._schedule)} scheduled)")
+        return found
+
+    def _limiter(self, app_name: str) -> ProviderRateLimiter:
+        limiter = self._limiters.get(app_name)
+        if limiter is None:
+            limiter = ProviderRateLimiter(PROVIDER_REFRESH_RATES.get(app_name, DEFAULT_PROVIDER_REFRESH_RATE))
+            self._limiters[app_name] = limiter
+        return limiter
+
+    async def refresh(self, connection_id: str, app_name: str, refresh_within: float = TOKEN_REFRESH_LEAD_SECONDS + TOKEN_REFRESH_JITTER_SECONDS) -> bool:
+        """Refresh one connection if its token expires within `refresh_within` seconds.
+        The row is read again: it may have been refreshed or revoked since it was scheduled.
+        """
+        await self._limiter(app_name).acquire()
+        self.in_flight += 1
+        try:
+            connection: Optional[Row] = await fetch_one(
+                get_async_db().table("user_app_connections").select(REFRESH_COLUMNS)
+                .eq("id", connection_id).eq("connection_status", "active")
+            )
+            expires_at = _timestamp(connection.get("expires_at")) if connection else None
+            if not connection or (expires_at is not None and expires_at - time.time() > refresh_within):
+                return False
+            await refresh_oauth_token(connection)
+            self.refreshed += 1
+            return True
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"Failed to refresh token for {app_name} connection {connection_id}: {e}")
+            return False
+        finally:
+            self.in_flight -= 1
+            self._scheduled.discard(connection_id)
+
+    async def _dispatch(self):
+        """Move connections from the schedule to the worker queue when they come due"""
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            while self._schedule and self._schedule[0][0] <= now:
+                _, connection_id, app_name = heapq.heappop(self._schedule)
+                self._due.put_nowait((connection_id, app_name))
+            timeout = self._schedule[0][0] - now if self._schedule else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _work(self):
+        while True:
+            connection_id, app_name = await self._due.get()
+            try:
+                await self.refresh(connection_id, app_name)
+            finally:
+                self._due.task_done()
+
+    async def _scan_periodically(self):
+        while True:
+            try:
+                await self.scan()
+            except Exception as e:
+                logger.error(f"Error in token refresh scan: {e}")
+            await asyncio.sleep(TOKEN_REFRESH_SCAN_INTERVAL_SECONDS)
+
+    def start(self):
+        if self._tasks:
+            return
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._scan_periodically()), loop.create_task(self._dispatch())]
+        self._tasks += [loop.create_task(self._work()) for _ in range(self.concurrency)]
+        logger.info(f"OAuth token refresh engine started ({self.concurrency} workers)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "scheduled": len(self._schedule),
+            "due": self._due.qsize(),
+            "in_flight": self.in_flight,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "next_refresh_in_seconds": round(self._schedule[0][0] - time.time(), 1) if self._schedule else None,
+            "last_scan_at": self.last_scan_at,
+        }
+
+
+_engine: Optional[TokenRefreshEngine] = None
+
+
+def start_token_refresh():
+    """Start the refresh engine in the running loop (application startup)"""
+    global _engine
+    if not TOKEN_REFRESH_ENABLED:
+        logger.info("OAuth token refresh engine disabled (TOKEN_REFRESH_ENABLED)")
+        return
+    if _engine is None:
+        _engine = TokenRefreshEngine()
+    _engine.start()
+
+
+async def stop_token_refresh():
+    global _engine
+    if _engine is not None:
+        await _engine.stop()
+        _engine = None
+
+
+async def refresh_expiring_connections() -> int:
+    """One scan and refresh of the expiring connections, concurrently; returns how many were refreshed"""
+    engine = TokenRefreshEngine()
+    await engine.scan()
+    due: List[Tuple[float, str, str]] = engine._schedule
+    semaphore = asyncio.Semaphore(engine.concurrency)
+
+    async def refresh(connection_id: str, app_name: str) -> bool:
+        async with semaphore:
+            return await engine.refresh(connection_id, app_name, refresh_within=TOKEN_REFRESH_HORIZON_SECONDS)
+
+    results = await asyncio.gather(*(refresh(connection_id, app_name) for _, connection_id, app_name in due))
+    return sum(results)
+
+
+def token_refresh_stats() -> Dict[str, Any]:
+    return _engine.stats() if _engine is not None else {"running": False}
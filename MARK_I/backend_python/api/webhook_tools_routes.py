@@ -10,12 +10,12 @@ from datetime import datetime, timezone, timedelta
 from typing import List, Optional, Dict, Any, Union
 from urllib.parse import urlparse
 
-from fastapi import APIRouter, HTTPException, status, Header, BackgroundTasks
+from fastapi import APIRouter, HTTPException, status, Depends, BackgroundTasks
 from pydantic import BaseModel, Field, validator, HttpUrl
 import jsonschema
 from jsonschema import validate, ValidationError
 
-from api.config import get_user_id_from_token
+from api.supabase_auth import get_authenticated_user_id
 from api.db_client import supabase_service_client
 from api.webhook_executor import execute_webhook_with_logging
 
@@ -162,11 +162,9 @@ def sanitize_webhook_headers(headers: Dict[str, str]) -> Dict[str, str]:
 @router.post("/", response_model=WebhookResponse, status_code=status.HTTP_201_CREATED)
 async def create_webhook(
     request: WebhookCreateRequest,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Create a new webhook"""
-    user_id = get_user_id_from_token(authorization)
-    
     # Check for duplicate webhook name
     existing_webhook = supabase_service_client.table("webhooks").select("id").eq("user_id", user_id).eq("name", request.name).execute()
     if existing_webhook.data:
@@ -199,14 +197,12 @@ async def create_webhook(
 
 @router.get("/", response_model=List[WebhookResponse])
 async def list_webhooks(
-    authorization: str = Header(None, alias="Authorization"),
+    user_id: str = Depends(get_authenticated_user_id),
     enabled_only: Optional[bool] = None,
     limit: int = 50,
     offset: int = 0
 ):
     """List user's webhooks"""
-    user_id = get_user_id_from_token(authorization)
-    
     query = supabase_service_client.table("webhooks").select("*").eq("user_id", user_id)
     
     if enabled_only is not None:
@@ -219,11 +215,9 @@ async def list_webhooks(
 @router.get("/{webhook_id}", response_model=WebhookResponse)
 async def get_webhook(
     webhook_id: str,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Get webhook details"""
-    user_id = get_user_id_from_token(authorization)
-    
     result = supabase_service_client.table("webhooks").select("*").eq("id", webhook_id).eq("user_id", user_id).single().execute()
     
     if not result.data:
@@ -235,11 +229,9 @@ async def get_webhook(
 async def update_webhook(
     webhook_id: str,
     request: WebhookUpdateRequest,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Update webhook configuration"""
-    user_id = get_user_id_from_token(authorization)
-    
     # Verify webhook ownership
     webhook = supabase_service_client.table("webhooks").select("*").eq("id", webhook_id).eq("user_id", user_id).single().execute()
     if not webhook.data:
@@ -273,11 +265,9 @@ async def update_webhook(
 @router.delete("/{webhook_id}")
 async def delete_webhook(
     webhook_id: str,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Delete a webhook"""
-    user_id = get_user_id_from_token(authorization)
-    
     # Verify webhook ownership and delete
     result = supabase_service_client.table("webhooks").delete().eq("id", webhook_id).eq("user_id", user_id).execute()
     
@@ -290,12 +280,10 @@ async def delete_webhook(
 async def test_webhook(
     webhook_id: str,
     request: WebhookTestRequest,
-    authorization: str = Header(None, alias="Authorization"),
+    user_id: str = Depends(get_authenticated_user_id),
     background_tasks: BackgroundTasks = BackgroundTasks()
 ):
     """Test webhook execution with mock data"""
-    user_id = get_user_id_from_token(authorization)
-    
     # Get webhook details
     webhook_result = supabase_service_client.table("webhooks").select("*").eq("id", webhook_id).eq("user_id", user_id).single().execute()
     if not webhook_result.data:
@@ -328,12 +316,10 @@ async def test_webhook(
 async def execute_webhook(
     webhook_id: str,
     request: WebhookExecutionRequest,
-    authorization: str = Header(None, alias="Authorization"),
+    user_id: str = Depends(get_authenticated_user_id),
     background_tasks: BackgroundTasks = BackgroundTasks()
 ):
     """Execute webhook in production context"""
-    user_id = get_user_id_from_token(authorization)
-    
     # Get webhook details
     webhook_result = supabase_service_client.table("webhooks").select("*").eq("id", webhook_id).eq("user_id", user_id).single().execute()
     if not webhook_result.data:
@@ -361,14 +347,12 @@ async def execute_webhook(
 @router.get("/{webhook_id}/executions", response_model=List[WebhookExecutionResponse])
 async def get_webhook_executions(
     webhook_id: str,
-    authorization: str = Header(None, alias="Authorization"),
+    user_id: str = Depends(get_authenticated_user_id),
     status_filter: Optional[str] = None,
     limit: int = 50,
     offset: int = 0
 ):
     """Get webhook execution history"""
-    user_id = get_user_id_from_token(authorization)
-    
     # Verify webhook ownership
     webhook = supabase_service_client.table("webhooks").select("id").eq("id", webhook_id).eq("user_id", user_id).single().execute()
     if not webhook.data:
@@ -385,12 +369,10 @@ async def get_webhook_executions(
 
 @router.get("/analytics/usage")
 async def get_webhooks_usage_analytics(
-    authorization: str = Header(None, alias="Authorization"),
+    user_id: str = Depends(get_authenticated_user_id),
     days: int = 30
 ):
     """Get webhooks usage analytics"""
-    user_id = get_user_id_from_token(authorization)
-    
     # Get usage statistics
     end_date = datetime.now(timezone.utc)
     start_date = end_date - timedelta(days=days)
@@ -434,11 +416,9 @@ async def get_webhooks_usage_analytics(
 @router.get("/agents/{agent_id}/webhooks", response_model=List[WebhookResponse])
 async def get_agent_webhooks(
     agent_id: str,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Get webhooks available to a specific agent"""
-    user_id = get_user_id_from_token(authorization)
-    
     # Get all enabled webhooks for user
     result = supabase_service_client.table("webhooks").select("*").eq("user_id", user_id).eq("is_enabled", True).execute()
     
@@ -455,11 +435,9 @@ async def get_agent_webhooks(
 async def assign_webhooks_to_agent(
     agent_id: str,
     webhook_ids: List[str],
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Assign specific webhooks to an agent"""
-    user_id = get_user_id_from_token(authorization)
-    
     # Verify agent ownership (if agent exists in agents table)
     try:
         agent = supabase_service_client.table("agents").select("id").eq("id", agent_id).eq("user_id", user_id).single().execute()
@@ -484,11 +462,9 @@ async def assign_webhooks_to_agent(
 async def remove_webhook_from_agent(
     agent_id: str,
     webhook_id: str,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Remove webhook from agent"""
-    user_id = get_user_id_from_token(authorization)
-    
     # Get webhook and update allowed_agents
     webhook = supabase_service_client.table("webhooks").select("allowed_agents").eq("id", webhook_id).eq("user_id", user_id).single().execute()
     if not webhook.data:
@@ -504,12 +480,11 @@ async def remove_webhook_from_agent(
 @router.get("/executions/{execution_id}", response_model=WebhookExecutionResponse)
 async def get_execution_result(
     execution_id: str,
-    authorization: str = Header(None, alias="Authorization")
+    user_id: str = Depends(get_authenticated_user_id)
 ):
     """Get execution result by execution ID"""
     try:
         logger.info(f"Getting execution result for ID: {execution_id}")
-        user_id = get_user_id_from_token(authorization)
         logger.info(f"User ID: {user_id}")
         
         # Get execution result
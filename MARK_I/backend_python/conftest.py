@@ -0,0 +1,15 @@
+"""
+Unit test setup: the api modules read their Supabase settings at import time.
+No test talks to Supabase; the database helpers are replaced per test.
+"""
+
+import os
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_ANON_KEY", "test-anon-key")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test-service-role-key")
+os.environ.setdefault("SUPABASE_JWT_SECRET", "test-jwt-secret")
+
+# The pinned python-multipart (0.0.2, imported by fastapi) registers its vendored
+# six.moves, which breaks dateutil (imported by supabase) when it loads first
+import dateutil.tz  # noqa: E402,F401
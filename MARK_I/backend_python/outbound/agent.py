@@ -123,12 +123,22 @@ from livekit.plugins import (
     deepgram,
     openai,
     cartesia,
-    silero,
 )
 from livekit.agents.llm import ChatMessage
 from pydantic import BaseModel, Field
 from typing import AsyncIterable
 
+# Worker prewarm helpers are shared with agents/outbound_agent.py
+_agents_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'agents')
+if _agents_dir not in sys.path:
+    sys.path.insert(0, _agents_dir)
+from worker_resources import CallTimeline, get_http_session, get_openai_client, get_vad, prewarm, prewarm_plugins
+# Outbound HTTP clients are pooled per job (api/http_clients.py) and closed at shutdown
+_api_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api')
+if _api_dir not in sys.path:
+    sys.path.insert(0, _api_dir)
+from http_clients import close_http_clients, get_http_client
+
 # --- Répliquer les modèles Pydantic (ou importer d'un fichier commun) ---
 class VADConfig(BaseModel):
     provider: str = "silero"
@@ -497,32 +507,32 @@ async def get_telnyx_call_duration(call_control_id: str | None) -> int | None: #
     }
     
     try:
-        async with httpx.AsyncClient() as client:
-            logger.info(f"Tentative de récupération de la durée via Telnyx pour call_control_id: {call_control_id}")
-            response = await client.get(url, headers=headers)
-            
-            if response.status_code == 404:
-                logger.warning(f"Call not found in Telnyx for call_control_id: {call_control_id}")
-                return None
-            elif response.status_code == 422:
-                logger.warning(f"Invalid call_control_id format for Telnyx: {call_control_id}")
-                return None
-            
-            response.raise_for_status()
-            data = response.json()
+        # Pooled client of the Telnyx API (keep-alive), closed at job shutdown
+        logger.info(f"Tentative de récupération de la durée via Telnyx pour call_control_id: {call_control_id}")
+        response = await get_http_client(url).get(url, headers=headers)
+        
+        if response.status_code == 404:
+            logger.warning(f"Call not found in Telnyx for call_control_id: {call_control_id}")
+            return None
+        elif response.status_code == 422:
+            logger.warning(f"Invalid call_control_id format for Telnyx: {call_control_id}")
+            return None
+        
+        response.raise_for_status()
+        data = response.json()
+        
+        if not data.get("data"):
+            logger.warning(f"No data field in Telnyx response for call_control_id: {call_control_id}")
+            return None
             
-            if not data.get("data"):
-                logger.warning(f"No data field in Telnyx response for call_control_id: {call_control_id}")
-                return None
-                
-            duration = data["data"].get("call_duration_secs")
-            if duration is None:
-                logger.warning(f"No call_duration_secs in Telnyx response for call_control_id: {call_control_id}")
-                return None
-                
-            logger.info(f"Durée réelle récupérée via Telnyx pour call_control_id {call_control_id}: {duration}s")
-            return duration
+        duration = data["data"].get("call_duration_secs")
+        if duration is None:
+            logger.warning(f"No call_duration_secs in Telnyx response for call_control_id: {call_control_id}")
+            return None
             
+        logger.info(f"Durée réelle récupérée via Telnyx pour call_control_id {call_control_id}: {duration}s")
+        return duration
+        
     except httpx.HTTPStatusError as e:
         logger.error(f"Erreur HTTP lors de la récupération de la durée via Telnyx: {e.response.status_code} - {e.response.text}")
         return None
@@ -560,10 +570,9 @@ async def update_call_status_in_backend(room_name: str, new_status: str, supabas
 
     logger.info(f"Tentative de mise à jour des infos pour room {room_name} (Supabase ID: {supabase_call_id}) avec payload: {payload} via backend: {update_url}")
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.patch(update_url, json=payload, headers=headers)
-            response.raise_for_status()
-            logger.info(f"Infos mises à jour avec succès pour room {room_name} (Supabase ID: {supabase_call_id}): {response.json()}")
+        response = await get_http_client(update_url).patch(update_url, json=payload, headers=headers)
+        response.raise_for_status()
+        logger.info(f"Infos mises à jour avec succès pour room {room_name} (Supabase ID: {supabase_call_id}): {response.json()}")
     except httpx.HTTPStatusError as e:
         logger.error(f"Erreur HTTP lors de la mise à jour des infos pour {room_name} (Supabase ID: {supabase_call_id}): {e.response.status_code} - {e.response.text}")
     except Exception as e:
@@ -574,9 +583,12 @@ async def entrypoint(ctx: JobContext):
     participant = None
     call_connected_time = None
     supabase_call_id = None
+    timeline = CallTimeline(ctx.proc)
+    ctx.add_shutdown_callback(close_http_clients)
 
     try:
         await ctx.connect()
+        timeline.mark("room_connected")
         logger.info(f"Connexion établie à la room {ctx.room.name}")
         raw_metadata = ctx.job.metadata
         logger.info(f"Métadonnées brutes du job: {raw_metadata}")
@@ -763,11 +775,15 @@ async def entrypoint(ctx: JobContext):
     else:
         logger.warning("Configuration IA non trouvée ou invalide dans les métadonnées. Utilisation des défauts.")
 
+    # Plugin HTTP session shared by the jobs of this process
+    http_session = get_http_session(ctx.proc)
+
     # Instantiate VAD plugin based on parsed config
     vad_plugin = None
     if ai_models_config.vad.provider == "silero":
         try:
-            vad_plugin = silero.VAD.load()
+            # Loaded once per process by prewarm()
+            vad_plugin = get_vad(ctx.proc)
             logger.info(f"Plugin VAD Silero chargé.")
         except Exception as e:
             logger.error(f"Erreur lors du chargement du plugin VAD Silero: {e}")
@@ -779,7 +795,7 @@ async def entrypoint(ctx: JobContext):
     stt_plugin = None
     if ai_models_config.stt.provider == "deepgram":
         try:
-            stt_plugin = deepgram.STT(language=ai_models_config.stt.language, model=ai_models_config.stt.model)
+            stt_plugin = deepgram.STT(language=ai_models_config.stt.language, model=ai_models_config.stt.model, http_session=http_session)
             logger.info(f"Plugin STT Deepgram chargé (lang: {ai_models_config.stt.language}, model: {ai_models_config.stt.model}).")
         except Exception as e:
              logger.error(f"Erreur lors du chargement du plugin STT Deepgram: {e}")
@@ -790,7 +806,7 @@ async def entrypoint(ctx: JobContext):
     tts_plugin = None
     if ai_models_config.tts.provider == "cartesia":
         try:
-            tts_plugin = cartesia.TTS(model=ai_models_config.tts.model, voice=ai_models_config.tts.voice_id)
+            tts_plugin = cartesia.TTS(model=ai_models_config.tts.model, voice=ai_models_config.tts.voice_id, http_session=http_session)
             logger.info(f"Plugin TTS Cartesia chargé (model: {ai_models_config.tts.model}, voice: {ai_models_config.tts.voice_id}).")
         except Exception as e:
              logger.error(f"Erreur lors du chargement du plugin TTS Cartesia: {e}")
@@ -801,7 +817,7 @@ async def entrypoint(ctx: JobContext):
     llm_plugin = None
     if ai_models_config.llm.provider == "openai":
         try:
-            llm_plugin = openai.LLM(model=ai_models_config.llm.model)
+            llm_plugin = openai.LLM(model=ai_models_config.llm.model, client=get_openai_client(ctx.proc))
             logger.info(f"Plugin LLM OpenAI chargé (model: {ai_models_config.llm.model}).")
         except Exception as e:
              logger.error(f"Erreur lors du chargement du plugin LLM OpenAI: {e}")
@@ -985,6 +1001,9 @@ async def entrypoint(ctx: JobContext):
             llm=llm_plugin,
         )
         logger.info("AgentSession created successfully with dynamic plugins.")
+        # Open the TTS/STT streaming connections while the phone rings
+        prewarm_plugins(tts_plugin, stt_plugin, llm_plugin)
+        timeline.mark("session_ready")
     except Exception as e:
         logger.error(f"Failed to create AgentSession with dynamic plugins: {e}", exc_info=True)
         await ctx.room.disconnect()
@@ -1056,6 +1075,7 @@ async def entrypoint(ctx: JobContext):
                 api.CreateSIPParticipantRequest(**create_sip_participant_args)
             )
                 
+            timeline.mark("call_answered")
             logger.info(f"SIP call presumably answered for {phone_number} (wait_until_answered=True). Waiting for participant 'phone_user' to join.")
             participant = await ctx.wait_for_participant(identity="phone_user")
             logger.info(f"Participant 'phone_user' ({participant.sid}) connected to room {ctx.room.name}.")
@@ -1095,6 +1115,7 @@ async def entrypoint(ctx: JobContext):
 
     # SIP call successful and participant joined. Now start the agent session.
     logger.info(f"Call connected (OUTBOUND), participant joined. Starting agent session for supabase_call_id: {supabase_call_id}")
+    timeline.watch_first_audio(session)
 
     async def run_session_safely(): 
         final_status = "unknown" # Default status
@@ -1281,6 +1302,7 @@ if __name__ == "__main__":
     # Define the worker options
     opts = WorkerOptions(
         entrypoint_fnc=entrypoint,
+        prewarm_fnc=prewarm,  # Loads Silero VAD and plugin clients once per process
         agent_name=worker_name,
         port=http_port,  # Pass the dynamically assigned port here
     )
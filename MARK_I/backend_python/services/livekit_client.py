@@ -1,9 +1,13 @@
 import os
+import uuid
 import httpx
+import asyncio
+import weakref
 import logging
 import json
 from typing import List, Dict, Any, Optional
 from livekit import api # Revert to using livekit.api for AccessToken and grants
+from api.http_clients import get_http_client
 
 # Try to import SIP service classes, but make it conditional for different LiveKit versions
 try:
@@ -118,56 +122,56 @@ async def _make_livekit_request(
 
     logger.debug(f"LiveKit API Request: POST {LIVEKIT_API_URL.rstrip('/')}/twirp/livekit.{service}/{method} - Payload: {json.dumps(payload)}")
 
-    async with httpx.AsyncClient(timeout=20.0) as client:
+    client = get_http_client(LIVEKIT_API_URL)  # Pooled client of the LiveKit server (keep-alive), default timeout of 20s
+    try:
+        # Twirp requests are typically POST
+        response = await client.post(f"{LIVEKIT_API_URL.rstrip('/')}/twirp/livekit.{service}/{method}", json=payload if payload else {}, headers=headers)
+        logger.debug(f"LiveKit API Response: Status {response.status_code} - Text: {response.text[:500]}")
+        
+        # Check for non-JSON "OK" response before attempting to parse
+        # For create/update/delete operations, a plain "OK" is suspicious.
+        is_mutating_operation = any(kw in method for kw in ["Create", "Update", "Delete", "Set", "Add", "Remove", "Patch"])
+        if response.status_code == 200 and response.text.strip().upper() == "OK":
+            if is_mutating_operation:
+                logger.warning(f"LiveKit API returned HTTP 200 with plain 'OK' for a mutating method {method} on {service}. Returning a special status.")
+                return {
+                    "status": "success_plain_ok",
+                    "message": f"LiveKit method {method} on {service} returned plain 'OK'. Assuming success but no data returned.",
+                    "service": service,
+                    "method": method
+                }
+            else: # For non-mutating methods (e.g., Get, List), "OK" might be an empty success.
+                logger.info(f"LiveKit API returned HTTP 200 with 'OK' body for non-mutating method {method} on {service}. Treating as success with no data.")
+                return {"status": "success", "message": "Operation successful, empty response from server", "data": {}}
+
+        response.raise_for_status() # For other 2xx that might have JSON, or any non-2xx
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        error_message = f"LiveKit API HTTP error: {e.response.status_code}"
+        details_text = e.response.text
         try:
-            # Twirp requests are typically POST
-            response = await client.post(f"{LIVEKIT_API_URL.rstrip('/')}/twirp/livekit.{service}/{method}", json=payload if payload else {}, headers=headers)
-            logger.debug(f"LiveKit API Response: Status {response.status_code} - Text: {response.text[:500]}")
-            
-            # Check for non-JSON "OK" response before attempting to parse
-            # For create/update/delete operations, a plain "OK" is suspicious.
-            is_mutating_operation = any(kw in method for kw in ["Create", "Update", "Delete", "Set", "Add", "Remove", "Patch"])
-            if response.status_code == 200 and response.text.strip().upper() == "OK":
-                if is_mutating_operation:
-                    logger.warning(f"LiveKit API returned HTTP 200 with plain 'OK' for a mutating method {method} on {service}. Returning a special status.")
-                    return {
-                        "status": "success_plain_ok",
-                        "message": f"LiveKit method {method} on {service} returned plain 'OK'. Assuming success but no data returned.",
-                        "service": service,
-                        "method": method
-                    }
-                else: # For non-mutating methods (e.g., Get, List), "OK" might be an empty success.
-                    logger.info(f"LiveKit API returned HTTP 200 with 'OK' body for non-mutating method {method} on {service}. Treating as success with no data.")
-                    return {"status": "success", "message": "Operation successful, empty response from server", "data": {}}
-
-            response.raise_for_status() # For other 2xx that might have JSON, or any non-2xx
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            error_message = f"LiveKit API HTTP error: {e.response.status_code}"
-            details_text = e.response.text
-            try:
-                error_json = e.response.json()
-                # Twirp errors often have a specific JSON structure
-                twirp_code = error_json.get("code")
-                twirp_msg = error_json.get("msg")
-                if twirp_code and twirp_msg:
-                    error_message += f" - Twirp Code: {twirp_code} - Message: {twirp_msg}"
-                    details_text = f"Twirp Error: {twirp_code} - {twirp_msg}. Full: {e.response.text[:500]}"
-                else:
-                    error_message += f" - Response: {e.response.text[:200]}"
-            except json.JSONDecodeError:
-                error_message += f" - Non-JSON response: {e.response.text[:200]}"
-            
-            logger.error(error_message, exc_info=True)
-            if e.response.status_code == 404: # Or specific Twirp code for "not_found"
-                raise LiveKitTrunkNotFoundError(f"LiveKit resource not found at {LIVEKIT_API_URL.rstrip('/')}/twirp/livekit.{service}/{method}. Detail: {error_message}", status_code=404, details=details_text)
-            raise LiveKitServiceError(error_message, status_code=e.response.status_code, details=details_text)
-        except httpx.RequestError as e:
-            logger.error(f"LiveKit request error for POST {LIVEKIT_API_URL.rstrip('/')}/twirp/livekit.{service}/{method}: {e}", exc_info=True)
-            raise LiveKitServiceError(f"LiveKit request error: {str(e)}", status_code=503)
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to decode JSON response from LiveKit for POST {LIVEKIT_API_URL.rstrip('/')}/twirp/livekit.{service}/{method}: {e.doc[:200]}", exc_info=True)
-            raise LiveKitServiceError(f"Invalid JSON response from LiveKit: {str(e)}", status_code=502)
+            error_json = e.response.json()
+            # Twirp errors often have a specific JSON structure
+            twirp_code = error_json.get("code")
+            twirp_msg = error_json.get("msg")
+            if twirp_code and twirp_msg:
+                error_message += f" - Twirp Code: {twirp_code} - Message: {twirp_msg}"
+                details_text = f"Twirp Error: {twirp_code} - {twirp_msg}. Full: {e.response.text[:500]}"
+            else:
+                error_message += f" - Response: {e.response.text[:200]}"
+        except json.JSONDecodeError:
+            error_message += f" - Non-JSON response: {e.response.text[:200]}"
+        
+        logger.error(error_message, exc_info=True)
+        if e.response.status_code == 404: # Or specific Twirp code for "not_found"
+            raise LiveKitTrunkNotFoundError(f"LiveKit resource not found at {LIVEKIT_API_URL.rstrip('/')}/twirp/livekit.{service}/{method}. Detail: {error_message}", status_code=404, details=details_text)
+        raise LiveKitServiceError(error_message, status_code=e.response.status_code, details=details_text)
+    except httpx.RequestError as e:
+        logger.error(f"LiveKit request error for POST {LIVEKIT_API_URL.rstrip('/')}/twirp/livekit.{service}/{method}: {e}", exc_info=True)
+        raise LiveKitServiceError(f"LiveKit request error: {str(e)}", status_code=503)
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to decode JSON response from LiveKit for POST {LIVEKIT_API_URL.rstrip('/')}/twirp/livekit.{service}/{method}: {e.doc[:200]}", exc_info=True)
+        raise LiveKitServiceError(f"Invalid JSON response from LiveKit: {str(e)}", status_code=502)
 
 
 async def create_sip_trunk(
@@ -1199,6 +1203,103 @@ async def delete_sip_dispatch_rule(rule_id: str) -> bool:
 
 # ===== END INBOUND INFRASTRUCTURE =====
 
+# ===== AGENT DISPATCH =====
+# Native replacement for `lk dispatch create`. The LiveKitAPI client owns an
+# aiohttp session bound to the event loop it was created on, so one pooled
+# client is kept per loop (the API loop and the scheduler thread's loop).
+
+_pooled_lk_api_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, api.LiveKitAPI]" = weakref.WeakKeyDictionary()
+
+# Max dispatches sent in parallel by create_agent_dispatches
+AGENT_DISPATCH_BATCH_CONCURRENCY = 10
+
+def get_pooled_livekit_api() -> api.LiveKitAPI:
+    """Returns the long-lived LiveKitAPI client of the running event loop, creating it on first use."""
+    if not LIVEKIT_API_URL or not LIVEKIT_API_KEY or not LIVEKIT_API_SECRET:
+        logger.error("LiveKit API URL, Key, or Secret is not configured.")
+        raise LiveKitConfigurationError("LiveKit API credentials are not fully configured.")
+
+    loop = asyncio.get_running_loop()
+    lk_api_client = _pooled_lk_api_clients.get(loop)
+    if lk_api_client is None:
+        lk_api_client = api.LiveKitAPI(LIVEKIT_API_URL, LIVEKIT_API_KEY, LIVEKIT_API_SECRET)
+        _pooled_lk_api_clients[loop] = lk_api_client
+        logger.info("Created pooled LiveKit API client for the current event loop")
+    return lk_api_client
+
+def has_pooled_livekit_api() -> bool:
+    """Whether the running event loop holds a pooled LiveKitAPI client."""
+    return asyncio.get_running_loop() in _pooled_lk_api_clients
+
+async def close_pooled_livekit_api():
+    """Closes the pooled LiveKitAPI client of the running event loop (call on shutdown)."""
+    loop = asyncio.get_running_loop()
+    lk_api_client = _pooled_lk_api_clients.pop(loop, None)
+    if lk_api_client:
+        await lk_api_client.aclose()
+
+async def create_agent_dispatch(
+    agent_name: str,
+    metadata: Optional[Dict[str, Any]] = None,
+    room_name: Optional[str] = None,
+    room_prefix: str = "call",
+) -> Dict[str, Any]:
+    """
+    Dispatches an agent to a room through the LiveKit AgentDispatch API.
+    A new room name is generated when `room_name` is not given (same as `lk dispatch create --new-room`);
+    LiveKit creates the room when the dispatch is registered.
+
+    Returns:
+        Dict with dispatch_id, room_name and agent_name
+    """
+    room_name = room_name or f"{room_prefix}-{uuid.uuid4().hex[:12]}"
+    dispatch_request = api.CreateAgentDispatchRequest(
+        agent_name=agent_name,
+        room=room_name,
+        metadata=json.dumps(metadata) if metadata is not None else "",
+    )
+
+    lk_api_client = get_pooled_livekit_api()
+    try:
+        dispatch = await lk_api_client.agent_dispatch.create_dispatch(dispatch_request)
+    except api.TwirpError as e:
+        logger.error(f"LiveKit TwirpError creating dispatch for agent '{agent_name}' in room {room_name}: Code: {e.code}, Msg: {e.message}")
+        raise LiveKitServiceError(f"Failed to create agent dispatch: {e.message}", status_code=e.status, details=f"Twirp Error: Code={e.code}, Message={e.message}")
+    except Exception as e:
+        logger.error(f"Error creating LiveKit dispatch for agent '{agent_name}' in room {room_name}: {e}")
+        raise LiveKitServiceError(f"Failed to create agent dispatch: {str(e)}")
+
+    logger.info(f"✅ Created LiveKit dispatch {dispatch.id} for agent '{agent_name}' in room {dispatch.room or room_name}")
+    return {
+        "dispatch_id": dispatch.id,
+        "room_name": dispatch.room or room_name,
+        "agent_name": dispatch.agent_name or agent_name,
+    }
+
+async def create_agent_dispatches(
+    dispatches: List[Dict[str, Any]],
+    max_concurrency: int = AGENT_DISPATCH_BATCH_CONCURRENCY,
+) -> List[Dict[str, Any]]:
+    """
+    Creates several agent dispatches concurrently over the pooled client.
+    Each entry takes the keyword arguments of create_agent_dispatch.
+
+    Returns:
+        One dict per input, in order: the dispatch details, or {"error": "..."} when that dispatch failed
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def _create(dispatch_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                return await create_agent_dispatch(**dispatch_kwargs)
+            except LiveKitServiceError as e:
+                return {"error": str(e)}
+
+    return await asyncio.gather(*[_create(d) for d in dispatches])
+
+# ===== END AGENT DISPATCH =====
+
 # Example of how you might call this if you were not using the SDK directly:
 # async def main_example():
 #     try:
@@ -4,6 +4,7 @@ import logging
 from typing import Optional, List, Dict, Any
 import asyncio
 import json
+from api.http_clients import get_http_client
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -67,62 +68,62 @@ async def _make_telnyx_request(
     logger.info(f"[DEBUG_URL_CONSTRUCTION] Original TELNYX_API_BASE_URL: '{TELNYX_API_BASE_URL}', Original endpoint: '{endpoint}'")
     logger.info(f"[DEBUG_URL_CONSTRUCTION] Cleaned Base: '{clean_base_url}', Cleaned Endpoint: '{clean_endpoint}', Final Constructed URL: '{url}'")
 
-    async with httpx.AsyncClient(timeout=20.0) as client: # Default timeout of 20s for Telnyx requests
-        try:
-            response = await client.request(
-                method.upper(),
-                url,
-                json=json_data,
-                params=params,
-                headers=headers
-            )
-            
-            logger.debug(f"Telnyx API Response: Status {response.status_code} - Text: {response.text[:500]}...") # Log snippet of response
-            
-            response.raise_for_status() # Raises HTTPStatusError for 4xx/5xx responses
-            return response.json()
+    client = get_http_client(url) # Pooled client of the Telnyx API (keep-alive), default timeout of 20s
+    try:
+        response = await client.request(
+            method.upper(),
+            url,
+            json=json_data,
+            params=params,
+            headers=headers
+        )
         
-        except httpx.HTTPStatusError as e:
-            error_message = f"Telnyx API HTTP error: {e.response.status_code}"
-            telnyx_api_errors = []
-            try:
-                error_details = e.response.json()
-                telnyx_api_errors = error_details.get("errors", [])
-                if telnyx_api_errors:
-                    first_error = telnyx_api_errors[0]
-                    error_message += f" - Code: {first_error.get('code')} - Title: {first_error.get('title')} - Detail: {first_error.get('detail', '')}"
-                else:
-                    error_message += f" - Response: {e.response.text[:200]}" # Show part of raw response if no structured error
-            except json.JSONDecodeError:
-                error_message += f" - Non-JSON response: {e.response.text[:200]}"
-
-            logger.error(error_message, exc_info=True)
-
-            if e.response.status_code == 404:
-                raise NumberNotFoundError(f"Resource not found at {endpoint}. Detail: {error_message}", status_code=404, telnyx_errors=telnyx_api_errors)
-            
-            # Check for specific Telnyx error codes within the response body for already reserved
+        logger.debug(f"Telnyx API Response: Status {response.status_code} - Text: {response.text[:500]}...") # Log snippet of response
+        
+        response.raise_for_status() # Raises HTTPStatusError for 4xx/5xx responses
+        return response.json()
+    
+    except httpx.HTTPStatusError as e:
+        error_message = f"Telnyx API HTTP error: {e.response.status_code}"
+        telnyx_api_errors = []
+        try:
+            error_details = e.response.json()
+            telnyx_api_errors = error_details.get("errors", [])
             if telnyx_api_errors:
-                for err in telnyx_api_errors:
-                    if err.get("code") == 85006: # "phone_number.already_reserved"
-                        raise NumberAlreadyReservedError(f"Phone number is already reserved. Detail: {error_message}", status_code=e.response.status_code, telnyx_errors=telnyx_api_errors)
-            
-            # General purchase or reservation error
-            if "number_orders" in endpoint or "number_reservations" in endpoint:
-                 if e.response.status_code == 422: # Often validation errors
-                     raise TelnyxPurchaseError(f"Telnyx validation error during purchase/reservation. Detail: {error_message}", status_code=422, telnyx_errors=telnyx_api_errors)
-                 raise TelnyxPurchaseError(f"Telnyx API error during purchase/reservation. Detail: {error_message}", status_code=e.response.status_code, telnyx_errors=telnyx_api_errors)
+                first_error = telnyx_api_errors[0]
+                error_message += f" - Code: {first_error.get('code')} - Title: {first_error.get('title')} - Detail: {first_error.get('detail', '')}"
+            else:
+                error_message += f" - Response: {e.response.text[:200]}" # Show part of raw response if no structured error
+        except json.JSONDecodeError:
+            error_message += f" - Non-JSON response: {e.response.text[:200]}"
+
+        logger.error(error_message, exc_info=True)
 
-            raise TelnyxServiceError(error_message, status_code=e.response.status_code, telnyx_errors=telnyx_api_errors)
+        if e.response.status_code == 404:
+            raise NumberNotFoundError(f"Resource not found at {endpoint}. Detail: {error_message}", status_code=404, telnyx_errors=telnyx_api_errors)
         
-        except httpx.RequestError as e: # Network errors, timeouts other than HTTPStatusError
-            logger.error(f"Telnyx request error for {method} {url}: {e}", exc_info=True)
-            raise TelnyxServiceError(f"Telnyx request error: {str(e)}", status_code=503) # 503 for service unavailable type errors
+        # Check for specific Telnyx error codes within the response body for already reserved
+        if telnyx_api_errors:
+            for err in telnyx_api_errors:
+                if err.get("code") == 85006: # "phone_number.already_reserved"
+                    raise NumberAlreadyReservedError(f"Phone number is already reserved. Detail: {error_message}", status_code=e.response.status_code, telnyx_errors=telnyx_api_errors)
         
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to decode JSON response from Telnyx for {method} {url}: {e.doc[:200]}...", exc_info=True)
-            # This case should be rare if raise_for_status() is working, but good for robustness
-            raise TelnyxServiceError(f"Invalid JSON response from Telnyx: {str(e)}", status_code=502) # 502 for bad gateway type errors
+        # General purchase or reservation error
+        if "number_orders" in endpoint or "number_reservations" in endpoint:
+             if e.response.status_code == 422: # Often validation errors
+                 raise TelnyxPurchaseError(f"Telnyx validation error during purchase/reservation. Detail: {error_message}", status_code=422, telnyx_errors=telnyx_api_errors)
+             raise TelnyxPurchaseError(f"Telnyx API error during purchase/reservation. Detail: {error_message}", status_code=e.response.status_code, telnyx_errors=telnyx_api_errors)
+
+        raise TelnyxServiceError(error_message, status_code=e.response.status_code, telnyx_errors=telnyx_api_errors)
+    
+    except httpx.RequestError as e: # Network errors, timeouts other than HTTPStatusError
+        logger.error(f"Telnyx request error for {method} {url}: {e}", exc_info=True)
+        raise TelnyxServiceError(f"Telnyx request error: {str(e)}", status_code=503) # 503 for service unavailable type errors
+    
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to decode JSON response from Telnyx for {method} {url}: {e.doc[:200]}...", exc_info=True)
+        # This case should be rare if raise_for_status() is working, but good for robustness
+        raise TelnyxServiceError(f"Invalid JSON response from Telnyx: {str(e)}", status_code=502) # 502 for bad gateway type errors
 
 async def list_available_numbers(
     country_code: str,